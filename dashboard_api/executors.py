@@ -0,0 +1,174 @@
+"""Pools de hilos acotados por categoría para el trabajo bloqueante del dashboard.
+
+Muchos handlers son `async def` pero llaman código bloqueante (recorrer discos, enumerar
+conexiones, WMI y nvidia-smi, netsh): una petición lenta congelaba el event loop entero,
+websocket incluido, y las que iban por el executor por defecto competían todas por el mismo.
+Aquí cada categoría (`fs`, `network`, `wmi`, `defense`, `general`) tiene su propio
+`ThreadPoolExecutor` con:
+
+- un tope de trabajos en vuelo (hilos + cola, MCP_DASH_POOL_MAX_QUEUE): lleno, la petición
+  se rechaza al momento con `PoolBusy` (503) en vez de acumularse;
+- un plazo por llamada: vencido, el handler recibe `PoolTimeout` (504). Un hilo ya arrancado
+  no se puede interrumpir; sigue ocupando su hueco hasta terminar, así que la cola refleja la
+  ocupación real. Un trabajo que aún esperaba en cola se cancela.
+
+Cada pool lleva métricas por endpoint: llamadas, errores, rechazos, timeouts, latencia
+(media, máxima, p95 de las últimas 256) y espera en cola.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from mcp_win_admin import config as cfg
+
+
+class PoolError(Exception):
+    status_code = 503
+
+    def __init__(self, pool: str, endpoint: str, message: str) -> None:
+        super().__init__(message)
+        self.pool = pool
+        self.endpoint = endpoint
+
+
+class PoolBusy(PoolError):
+    status_code = 503
+
+
+class PoolTimeout(PoolError):
+    status_code = 504
+
+
+class _EndpointStats:
+    __slots__ = ("calls", "errors", "rejected", "timeouts", "ms_total", "ms_max", "wait_ms_total", "wait_ms_max", "recent")
+
+    def __init__(self) -> None:
+        self.calls = self.errors = self.rejected = self.timeouts = 0
+        self.ms_total = self.ms_max = self.wait_ms_total = self.wait_ms_max = 0.0
+        self.recent: Deque[float] = deque(maxlen=256)
+
+    def as_dict(self) -> Dict[str, Any]:
+        done = len(self.recent)
+        p95 = sorted(self.recent)[min(done - 1, int(done * 0.95))] if done else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.ms_total / self.calls, 2) if self.calls else None,
+            "max_ms": round(self.ms_max, 2),
+            "p95_ms": round(p95, 2) if p95 is not None else None,
+            "queue_wait_avg_ms": round(self.wait_ms_total / self.calls, 2) if self.calls else None,
+            "queue_wait_max_ms": round(self.wait_ms_max, 2),
+        }
+
+
+class BoundedPool:
+    def __init__(self, name: str, workers: int, max_queue: int, timeout: float) -> None:
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.timeout = float(timeout)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"dash-{name}")
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._running = 0
+        self._endpoints: Dict[str, _EndpointStats] = {}
+
+    def _ep(self, endpoint: str) -> _EndpointStats:
+        st = self._endpoints.get(endpoint)
+        if st is None:
+            st = self._endpoints[endpoint] = _EndpointStats()
+        return st
+
+    def _release(self, _fut: Future) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    async def run(
+        self, endpoint: str, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any
+    ) -> Any:
+        """Ejecuta `fn(*args, **kwargs)` en el pool; PoolBusy si está lleno, PoolTimeout si vence el plazo."""
+        with self._lock:
+            st = self._ep(endpoint)
+            if self._inflight >= self.workers + self.max_queue:
+                st.rejected += 1
+                raise PoolBusy(self.name, endpoint, f"pool '{self.name}' saturado")
+            self._inflight += 1
+        submitted = time.perf_counter()
+        waited = [0.0]
+
+        def job() -> Any:
+            started = time.perf_counter()
+            waited[0] = (started - submitted) * 1000
+            with self._lock:
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        cf = self._executor.submit(job)
+        cf.add_done_callback(self._release)
+        limit = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(cf)), limit if limit > 0 else None)
+        except asyncio.TimeoutError:
+            cf.cancel()  # sólo surte efecto si seguía en cola
+            with self._lock:
+                st.timeouts += 1
+            raise PoolTimeout(self.name, endpoint, f"'{endpoint}' superó {limit:g} s") from None
+        except asyncio.CancelledError:
+            cf.cancel()
+            raise
+        except Exception:
+            with self._lock:
+                st.errors += 1
+            raise
+        finally:
+            if cf.done() and not cf.cancelled():
+                ms = (time.perf_counter() - submitted) * 1000
+                with self._lock:
+                    st.calls += 1
+                    st.ms_total += ms
+                    st.ms_max = max(st.ms_max, ms)
+                    st.wait_ms_total += waited[0]
+                    st.wait_ms_max = max(st.wait_ms_max, waited[0])
+                    st.recent.append(ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout,
+                "inflight": self._inflight,
+                "running": self._running,
+                "queued": max(0, self._inflight - self._running),
+                "endpoints": {ep: st.as_dict() for ep, st in sorted(self._endpoints.items())},
+            }
+
+
+POOLS: Dict[str, BoundedPool] = {
+    "fs": BoundedPool("fs", cfg.DASH_POOL_FS_WORKERS, cfg.DASH_POOL_MAX_QUEUE, cfg.DASH_FS_TIMEOUT_SECONDS),
+    "network": BoundedPool("network", cfg.DASH_POOL_NETWORK_WORKERS, cfg.DASH_POOL_MAX_QUEUE, cfg.DASH_POOL_TIMEOUT_SECONDS),
+    "wmi": BoundedPool("wmi", cfg.DASH_POOL_WMI_WORKERS, cfg.DASH_POOL_MAX_QUEUE, cfg.DASH_POOL_TIMEOUT_SECONDS),
+    "defense": BoundedPool("defense", cfg.DASH_POOL_DEFENSE_WORKERS, cfg.DASH_POOL_MAX_QUEUE, cfg.DASH_DEFENSE_TIMEOUT_SECONDS),
+    "general": BoundedPool("general", cfg.DASH_POOL_GENERAL_WORKERS, cfg.DASH_POOL_MAX_QUEUE, cfg.DASH_POOL_TIMEOUT_SECONDS),
+}
+
+
+async def run(
+    pool: str, endpoint: str, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any
+) -> Any:
+    return await POOLS[pool].run(endpoint, fn, *args, timeout=timeout, **kwargs)
+
+
+def stats() -> Dict[str, Any]:
+    return {name: p.stats() for name, p in POOLS.items()}
@@ -2,13 +2,13 @@ import asyncio
 import json
 import os
 import time
-from typing import List, Dict, Tuple, Any, Callable
+from typing import List, Dict, Tuple, Any, Optional
 
 import psutil
 import shutil
 import subprocess
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi import APIRouter
 from pydantic import BaseModel
@@ -18,10 +18,22 @@ except Exception:  # optional on some systems
     wmi = None
 
 from . import metrics, actions
+from . import executors
+from .executors import PoolError
+from .sections import SectionCache
+from .wshub import BroadcastHub
+from mcp_win_admin import duindex as du_mod
+from mcp_win_admin import sizetree as stree_mod
+from mcp_win_admin import dupes as dup_mod
 from mcp_win_admin import filesystem as fs_mod
 from mcp_win_admin import connections as con_mod
 from mcp_win_admin import defense as def_mod
 from mcp_win_admin import profiles as prof_mod
+from mcp_win_admin import procsampler as psamp_mod
+from mcp_win_admin import perfsampler as perf_mod
+from mcp_win_admin import metricstore as mstore_mod
+from mcp_win_admin import db as db_mod
+from mcp_win_admin import config as cfg
 from .mcp_client import mcp_singleton as mcp
 
 app = FastAPI(title="Windows Admin Dashboard", version="0.1.0")
@@ -31,6 +43,36 @@ app.mount("/static", StaticFiles(directory="dashboard_ui"), name="static")
 router = APIRouter(prefix="/api")
 
 
+@app.exception_handler(PoolError)
+async def _pool_error(_request, exc: PoolError):
+    # Pool saturado (503) o plazo vencido (504): ver executors.py
+    return JSONResponse({"error": str(exc), "pool": exc.pool}, status_code=exc.status_code)
+
+
+@app.on_event("startup")
+async def _start_samplers():
+    # /api/processes/top y los candidatos de gamebooster leen CPU/RSS precalculados
+    if cfg.PROC_SAMPLER_ENABLED:
+        psamp_mod.start()
+    # /api/metrics, /api/info y /ws leen el último snapshot en vez de consultar psutil
+    if cfg.METRICS_SAMPLER_ENABLED:
+        perf_mod.start()
+    # /api/metrics/range lee la tabla snapshots y sus agregados
+    try:
+        db_mod.init_db()
+        if cfg.METRICS_ROLLUP_ENABLED:
+            # Los snapshots los graba el servidor MCP; aquí sólo se compacta
+            mstore_mod.start(record=False)
+    except Exception:
+        pass
+    # /api/fs/heavy y /api/fs/tree responden desde el índice de uso de disco si cubre la unidad
+    if cfg.DU_INDEX_ENABLED:
+        try:
+            du_mod.start()
+        except Exception:
+            pass
+
+
 @app.on_event("shutdown")
 async def _shutdown_mcp():
     try:
@@ -41,17 +83,61 @@ async def _shutdown_mcp():
 
 @router.get("/metrics")
 async def get_metrics():
-    return metrics.snapshot()
+    return await executors.run("general", "/api/metrics", metrics.snapshot)
+
+
+@router.get("/metrics/range")
+async def get_metrics_range(
+    metric: str = "cpu_percent",
+    since: float | None = None,
+    until: float | None = None,
+    resolution: str = "auto",
+    max_points: int = 500,
+):
+    try:
+        return await executors.run(
+            "general",
+            "/api/metrics/range",
+            lambda: mstore_mod.query(metric, since=since, until=until, resolution=resolution, max_points=max_points),
+        )
+    except PoolError:
+        raise
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@router.get("/history/{metric}")
+async def get_history(
+    metric: str,
+    range: str = "1h",
+    since: float | None = None,
+    until: float | None = None,
+    resolution: str = "auto",
+    points: int = 300,
+):
+    try:
+        data = await executors.run(
+            "general", "/api/history", lambda: metrics.history(metric, range, since, until, resolution, points)
+        )
+    except PoolError:
+        raise
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if "error" in data:
+        return JSONResponse(data, status_code=400)
+    return data
 
 
 @router.get("/processes/top")
 async def get_processes_top(by: str = "memory", limit: int = 10):
-    return metrics.top_processes(by=by, limit=limit)
+    return await executors.run("general", "/api/processes/top", metrics.top_processes, by, limit)
 
 
 @router.get("/connections")
 async def get_connections(limit: int = 50):
-    return metrics.connections(limit=limit)
+    return await executors.run("network", "/api/connections", metrics.connections, limit)
 
 
 # --------------------------- MCP proxy endpoints ---------------------------
@@ -266,8 +352,7 @@ def _net_info() -> dict:
     return {"primary": primary, "interfaces": out}
 
 
-@router.get("/sensors")
-async def sensors():
+def _sensors_sync() -> dict:
     # Try vendor/monitor WMI first (more reliable on Windows), then fallbacks.
     ohm = _temps_openhw_wmi()
     cpu = ohm.get("cpu") or _cpu_temp_psutil() or _cpu_temp_wmi()
@@ -285,117 +370,110 @@ async def sensors():
     }
 
 
-def _list_heavy_files(root: str, max_depth: int = 2, top_n: int = 3, follow_symlinks: bool = False) -> List[Dict]:
-    """Top-N archivos más pesados bajo `root` hasta `max_depth` (simple y tolerante a errores)."""
-    root = os.path.abspath(root)
-    results: List[Tuple[int, str]] = []  # (size, path)
+@router.get("/sensors")
+async def sensors():
+    # WMI y nvidia-smi pueden tardar segundos: pool propio
+    return await executors.run("wmi", "/api/sensors", _sensors_sync)
+
+
+def _fs_heavy_sync(limit: int, max_depth: int, min_size_mb: int) -> List[Dict]:
+    data = []
     try:
-        start_depth = root.rstrip(os.sep).count(os.sep)
-        for cur, dirs, files in os.walk(root, followlinks=follow_symlinks):
-            try:
-                depth = cur.rstrip(os.sep).count(os.sep) - start_depth
-                if depth > max_depth:
-                    # No descender más
-                    dirs[:] = []
-                    continue
-                for fn in files:
-                    fp = os.path.join(cur, fn)
-                    try:
-                        sz = os.path.getsize(fp)
-                        results.append((sz, fp))
-                    except Exception:
-                        continue
-            except Exception:
-                continue
+        parts = psutil.disk_partitions(all=False)
     except Exception:
-        pass
-    results.sort(key=lambda t: t[0], reverse=True)
-    out = [{"path": p, "size_bytes": s, "size_mb": round(s / (1024*1024), 2)} for s, p in results[: max(1, top_n)]]
-    return out
+        parts = []
+    for part in parts:
+        root = part.mountpoint
+        opts = (getattr(part, "opts", "") or "").lower()
+        # Skip CD-ROM and non-directories/unmounted roots
+        if "cdrom" in opts:
+            continue
+        if not os.path.isdir(root):
+            continue
+        try:
+            usage = psutil.disk_usage(root)
+        except Exception:
+            continue
+        try:
+            dirs, files = fs_mod.heavy_view(root, limit, max_depth, min_size_mb, child_files=5)
+        except Exception:
+            dirs, files = [], []
+        data.append({
+            "device": part.device,
+            "mountpoint": root,
+            "percent": usage.percent,
+            "dirs": dirs,
+            "files": files,
+        })
+    return data
 
 
 @router.get("/fs/heavy")
 async def fs_heavy(limit: int = 3, max_depth: int = 2, min_size_mb: int = 200):
     """Devuelve para cada disco: uso, top-N carpetas pesadas (con hijos) y top-N archivos pesados."""
     try:
-        data = []
-        try:
-            parts = psutil.disk_partitions(all=False)
-        except Exception:
-            parts = []
-        for part in parts:
-            root = part.mountpoint
-            opts = (getattr(part, "opts", "") or "").lower()
-            # Skip CD-ROM and non-directories/unmounted roots
-            if "cdrom" in opts:
-                continue
-            if not os.path.isdir(root):
-                continue
-            try:
-                usage = psutil.disk_usage(root)
-            except Exception:
-                continue
-            try:
-                dirs = fs_mod.list_heavy_paths(
-                    root=root,
-                    max_depth=max_depth,
-                    top_n=limit,
-                    min_size_mb=min_size_mb,
-                    follow_symlinks=False,
-                )
-            except Exception:
-                dirs = []
-            # Añadir hijos y top_files de forma tolerante a errores
-            for d in dirs:
-                try:
-                    d["children"] = fs_mod.list_heavy_paths(
-                        root=d["path"], max_depth=1, top_n=limit, min_size_mb=max(10, min_size_mb // 10), follow_symlinks=False
-                    )
-                except Exception:
-                    d["children"] = []
-                try:
-                    d["top_files"] = _list_heavy_files(root=d["path"], max_depth=1, top_n=5)
-                except Exception:
-                    d["top_files"] = []
-            try:
-                files = _list_heavy_files(root=root, max_depth=max_depth, top_n=limit)
-            except Exception:
-                files = []
-            data.append({
-                "device": part.device,
-                "mountpoint": root,
-                "percent": usage.percent,
-                "dirs": dirs,
-                "files": files,
-            })
-        return data
+        return await executors.run("fs", "/api/fs/heavy", _fs_heavy_sync, limit, max_depth, min_size_mb)
+    except PoolError:
+        raise
     except Exception:
         # Never 500; return empty on unexpected conditions
         return []
 
 
 @router.get("/fs/tree")
-async def fs_tree(drive: str = "C", top_n: int = 3, max_depth: int = 2, min_size_mb: int = 200):
+async def fs_tree(
+    drive: str = "C",
+    top_n: int = 3,
+    max_depth: int = 2,
+    min_size_mb: int = 200,
+    ext: str = "",
+    min_age_days: float = 0,
+    max_age_days: float = 0,
+):
+    """Carpetas y archivos pesados de una unidad; `ext`/`min_age_days`/`max_age_days` filtran los archivos."""
     root = f"{drive}:\\" if len(drive) == 1 and not drive.endswith(":\\") else drive
     try:
-        dirs = fs_mod.list_heavy_paths(
-            root=root, max_depth=max_depth, top_n=top_n, min_size_mb=min_size_mb, follow_symlinks=False
-        )
-        for d in dirs:
-            try:
-                d["children"] = fs_mod.list_heavy_paths(
-                    root=d["path"], max_depth=1, top_n=top_n, min_size_mb=max(10, min_size_mb // 10), follow_symlinks=False
-                )
-            except Exception:
-                d["children"] = []
-        return {"drive": root, "top_dirs": dirs, "top_files": _list_heavy_files(root, max_depth=max_depth, top_n=top_n)}
+        if not os.path.isdir(root):
+            raise ValueError(f"Root path is not a directory: {root}")
+        dirs, files = await executors.run("fs", "/api/fs/tree", fs_mod.heavy_view, root, top_n, max_depth, min_size_mb)
+        if ext or min_age_days or max_age_days:
+            files = await executors.run(
+                "fs",
+                "/api/fs/tree",
+                lambda: fs_mod.list_heavy_files(
+                    root, top_n=top_n, max_depth=max_depth, extensions=ext,
+                    min_age_days=min_age_days, max_age_days=max_age_days,
+                ),
+            )
+        return {"drive": root, "top_dirs": dirs, "top_files": files}
+    except PoolError:
+        raise
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=400)
 
 
-@router.get("/network/hosts")
-async def network_hosts():
-    """Agrega conexiones por host remoto y por proceso para vista resumida de red."""
+@router.get("/fs/duplicates")
+async def fs_duplicates(root: str = "C:\\", min_size_kb: float = 1024, ext: str = "", max_seconds: float = 0):
+    """Duplicados en NDJSON: una línea por grupo en cuanto se confirma y al final el resumen."""
+    try:
+        finder = dup_mod.DuplicateFinder(root, min_size_kb=min_size_kb, extensions=ext, max_seconds=max_seconds)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def lines():
+        # Cada grupo se pide al pool fs; entre grupos el loop queda libre
+        groups = finder.groups()
+        while True:
+            group = await executors.run("fs", "/api/fs/duplicates", next, groups, None, timeout=0)
+            if group is None:
+                break
+            yield json.dumps({"type": "group", **group}) + "\n"
+        yield json.dumps({"type": "summary", **finder.summary()}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _network_hosts_sync() -> dict:
     conns = con_mod.list_connections(limit=500, kind="inet", listening_only=False, include_process=True)
     host_map: Dict[str, Dict] = {}
     proc_map: Dict[str, Dict] = {}
@@ -442,6 +520,12 @@ async def network_hosts():
     return {"hosts": hosts[:100], "processes": processes[:100]}
 
 
+@router.get("/network/hosts")
+async def network_hosts():
+    """Agrega conexiones por host remoto y por proceso para vista resumida de red."""
+    return await executors.run("network", "/api/network/hosts", _network_hosts_sync)
+
+
 @router.get("/action/diagnostics/status")
 async def action_diagnostics_status():
     return actions.get_diagnostics_status()
@@ -461,7 +545,9 @@ async def action_report_prepare():
 
 # --------------------------- Info Aggregator ---------------------------
 
-_cache_sections: Dict[str, Tuple[float, Any]] = {}
+# Refresco single-flight por sección, versiones para ETag y espera de cambios (ver sections.py)
+_sections = SectionCache()
+_INFO_MAX_WAIT_SECONDS = 60.0
 _SECTION_TTLS: Dict[str, float] = {
     "core": 2.0,
     "diagnostics": 2.0,
@@ -478,8 +564,7 @@ async def _info_fetch_core():
             return res
     except Exception:
         pass
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, metrics.snapshot)
+    return await executors.run("general", "/api/info", metrics.snapshot)
 
 
 async def _info_fetch_diagnostics():
@@ -494,24 +579,11 @@ async def _info_fetch_sensors():
 
 async def _info_fetch_disks():
     # Extrae solo la parte de discos desde snapshot para payload liviano
-    loop = asyncio.get_running_loop()
-    snap = await loop.run_in_executor(None, metrics.snapshot)
+    snap = await executors.run("general", "/api/info", metrics.snapshot)
     return snap.get("disks") or []
 
 
-async def _get_section_cached(name: str, fetcher: Callable[[], Any], ttl: float):
-    now = time.time()
-    cached = _cache_sections.get(name)
-    if cached and (now - cached[0]) <= ttl:
-        return cached[1]
-    val = await fetcher()
-    _cache_sections[name] = (now, val)
-    return val
-
-
-@router.get("/info")
-async def info(sections: str = "core,diagnostics"):
-    req = [s.strip().lower() for s in sections.split(',') if s.strip()]
+async def _info_collect(req: List[str]) -> Tuple[Dict[str, Any], Dict[str, str], List[str]]:
     req_set = set(req)
     out: Dict[str, Any] = {}
     errors: Dict[str, str] = {}
@@ -521,18 +593,18 @@ async def info(sections: str = "core,diagnostics"):
     disks_requested = "disks" in req_set
     for s in req:
         if s == "core":
-            tasks.append(_get_section_cached("core", _info_fetch_core, _SECTION_TTLS["core"]))
+            tasks.append(_sections.get("core", _info_fetch_core, _SECTION_TTLS["core"]))
             names.append("core")
         elif s == "diagnostics":
-            tasks.append(_get_section_cached("diagnostics", _info_fetch_diagnostics, _SECTION_TTLS["diagnostics"]))
+            tasks.append(_sections.get("diagnostics", _info_fetch_diagnostics, _SECTION_TTLS["diagnostics"]))
             names.append("diagnostics")
         elif s == "sensors":
-            tasks.append(_get_section_cached("sensors", _info_fetch_sensors, _SECTION_TTLS["sensors"]))
+            tasks.append(_sections.get("sensors", _info_fetch_sensors, _SECTION_TTLS["sensors"]))
             names.append("sensors")
         elif s == "disks":
             # Si también se solicitó 'core', derivamos discos desde ese resultado para evitar doble snapshot
             if not core_requested:
-                tasks.append(_get_section_cached("disks", _info_fetch_disks, _SECTION_TTLS["disks"]))
+                tasks.append(_sections.get("disks", _info_fetch_disks, _SECTION_TTLS["disks"]))
                 names.append("disks")
             # else: no agendar, se derivará tras el gather
         else:
@@ -556,7 +628,45 @@ async def info(sections: str = "core,diagnostics"):
             # Si 'core' falló, reflejar dependencia en el error de 'disks'
             core_err = errors.get("core", "core missing")
             errors["disks"] = f"unavailable (core failed: {core_err})"
-    return {"sections": out, "partial": bool(errors), "errors": errors or None, "ts": int(time.time())}
+    return out, errors, names
+
+
+def _etag_matches(header: Optional[str], tag: str) -> bool:
+    """If-None-Match: lista de ETags separada por comas o `*`; comparación débil (sin `W/`)."""
+    if not header:
+        return False
+    opaque = tag[2:] if tag.startswith("W/") else tag
+    for cand in header.split(","):
+        cand = cand.strip()
+        if cand == "*":
+            return True
+        if (cand[2:] if cand.startswith("W/") else cand) == opaque:
+            return True
+    return False
+
+
+@router.get("/info")
+async def info(request: Request, sections: str = "core,diagnostics", wait_for_change: float = 0):
+    """Secciones agregadas con ETag débil armado con el hash de su contenido.
+
+    Si `If-None-Match` incluye el ETag actual (o es `*`) responde 304. Con `wait_for_change=N` (hasta 60 s)
+    espera hasta N s a que alguna sección cambie antes de devolver el 304.
+    """
+    req = [s.strip().lower() for s in sections.split(',') if s.strip()]
+    client_tag = request.headers.get("if-none-match")
+    deadline = time.monotonic() + max(0.0, min(float(wait_for_change or 0), _INFO_MAX_WAIT_SECONDS))
+    step = min([_SECTION_TTLS[s] for s in req if s in _SECTION_TTLS] or [1.0])
+    while True:
+        out, errors, names = await _info_collect(req)
+        tag = _sections.etag(names, extra=",".join(sorted(errors)))
+        if not _etag_matches(client_tag, tag):
+            body = {"sections": out, "partial": bool(errors), "errors": errors or None, "ts": int(time.time())}
+            return JSONResponse(body, headers={"ETag": tag})
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return Response(status_code=304, headers={"ETag": tag})
+        # Sin cambios: esperar a que otra petición refresque algo o a que venza el TTL más corto
+        await _sections.wait_for_change(min(remaining, step))
 
 
 # --------------------------- GameBooster / Defense API ---------------------------
@@ -607,6 +717,10 @@ async def gamebooster_candidates(limit: int = 10):
     No ejecuta cambios. Solo sugiere candidatos con metadatos y razones.
     """
     limit = max(1, min(50, int(limit)))
+    return await executors.run("general", "/api/gamebooster/candidates", _gamebooster_candidates_sync, limit)
+
+
+def _gamebooster_candidates_sync(limit: int) -> dict:
     items = metrics.top_processes(by="memory", limit=50)
     patterns = (
         "onedrive", "teams", "slack", "discord", "updater", "update", "helper",
@@ -639,8 +753,13 @@ async def gamebooster_candidates(limit: int = 10):
 @router.post("/process/kill")
 async def process_kill(req: KillReq):
     try:
-        res = def_mod.kill_process_execute(pid=req.pid, confirm=req.confirm, policy_name=req.policy_name)
+        res = await executors.run(
+            "defense", "/api/process/kill", def_mod.kill_process_execute,
+            pid=req.pid, confirm=req.confirm, policy_name=req.policy_name,
+        )
         return res
+    except PoolError:
+        raise
     except Exception as e:  # pragma: no cover
         return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
 
@@ -648,8 +767,13 @@ async def process_kill(req: KillReq):
 @router.post("/process/isolate")
 async def process_isolate(req: IsolateReq):
     try:
-        res = def_mod.process_isolate_execute(pid=req.pid, confirm=req.confirm, policy_name=req.policy_name)
+        res = await executors.run(
+            "defense", "/api/process/isolate", def_mod.process_isolate_execute,
+            pid=req.pid, confirm=req.confirm, policy_name=req.policy_name,
+        )
         return res
+    except PoolError:
+        raise
     except Exception as e:  # pragma: no cover
         return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
 
@@ -657,8 +781,13 @@ async def process_isolate(req: IsolateReq):
 @router.post("/process/unsandbox")
 async def process_unsandbox(req: UnsandboxReq):
     try:
-        res = def_mod.process_unsandbox_execute(pid=req.pid, confirm=req.confirm)
+        res = await executors.run(
+            "defense", "/api/process/unsandbox", def_mod.process_unsandbox_execute,
+            pid=req.pid, confirm=req.confirm,
+        )
         return res
+    except PoolError:
+        raise
     except Exception as e:  # pragma: no cover
         return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
 
@@ -666,8 +795,13 @@ async def process_unsandbox(req: UnsandboxReq):
 @router.post("/file/quarantine")
 async def file_quarantine(req: QuarantineReq):
     try:
-        res = def_mod.quarantine_execute(path=req.path, confirm=req.confirm, policy_name=req.policy_name)
+        res = await executors.run(
+            "defense", "/api/file/quarantine", def_mod.quarantine_execute,
+            path=req.path, confirm=req.confirm, policy_name=req.policy_name,
+        )
         return res
+    except PoolError:
+        raise
     except Exception as e:  # pragma: no cover
         return JSONResponse({"ok": False, "error": str(e)}, status_code=400)
 
@@ -683,16 +817,42 @@ async def index():
 async def gamebooster():
     return FileResponse("dashboard_ui/gamebooster.html")
 
+# Un único productor de métricas para todos los clientes de /ws (ver wshub.py), en el pool general
+ws_hub = BroadcastHub(metrics.snapshot, interval=2.0, run=lambda fn: executors.run("general", "/ws", fn))
+
+
+@app.get("/api/ws/stats")
+async def get_ws_stats():
+    return ws_hub.stats()
+
+
+@app.get("/api/info/stats")
+async def get_info_stats():
+    return _sections.stats()
+
+
+@app.get("/api/fs/tree/stats")
+async def get_fs_tree_stats():
+    """Árboles de tamaños cacheados: completos o no, duración y subárboles más lentos (ver sizetree.py)."""
+    return stree_mod.stats()
+
+
+@app.get("/api/executors/stats")
+async def get_executor_stats():
+    """Ocupación, cola, rechazos, timeouts y latencia por endpoint de cada pool (ver executors.py)."""
+    return executors.stats()
+
+
 @app.websocket("/ws")
 async def ws_endpoint(websocket: WebSocket):
     await websocket.accept()
+    sub = ws_hub.subscribe()
     try:
-        while True:
-            data = metrics.snapshot()
-            await websocket.send_text(json.dumps(data))
-            await asyncio.sleep(2.0)
-    except WebSocketDisconnect:
+        await ws_hub.serve(websocket.send_text, sub)
+    except (WebSocketDisconnect, RuntimeError):
         return
+    finally:
+        ws_hub.unsubscribe(sub)
 
 # Alias para permitir "/ws/" y evitar errores 400 por barra final
 @app.websocket("/ws/")
@@ -1,13 +1,31 @@
 from __future__ import annotations
 
+import re
+import time
+from typing import Dict, List, Optional
+
 import psutil
-from typing import Dict, List
 
 from mcp_win_admin import processes as proc_mod
 from mcp_win_admin import connections as conn_mod
+from mcp_win_admin import perfsampler
+from mcp_win_admin import metricstore
+from mcp_win_admin import config as cfg
+from mcp_win_admin.downsample import lttb
+from mcp_win_admin.lru import LRUCache
 
 
 def snapshot() -> Dict:
+    if perfsampler.ready():
+        # Lectura O(1) del último snapshot publicado por el hilo de métricas
+        s = perfsampler.snapshot()
+        return {
+            "cpu_percent": s["cpu_percent"],
+            "cpu_count": s.get("cpu_count"),
+            "memory": dict(s["memory"]),
+            "disks": list(s.get("disks") or []),
+            "net": dict(s.get("net") or {}),
+        }
     vm = psutil.virtual_memory()
     disks = []
     for part in psutil.disk_partitions(all=False):
@@ -37,6 +55,71 @@ def snapshot() -> Dict:
     }
 
 
+_RANGE_RE = re.compile(r"^(\d+)([mhd])$")
+_RANGE_UNITS = {"m": 60, "h": 3600, "d": 86400}
+# Respuestas de /api/history por (métrica, rango, resolución, puntos)
+_HISTORY_CACHE = LRUCache(
+    "history",
+    max_entries=cfg.HISTORY_CACHE_MAX_ENTRIES,
+    max_bytes=8 * 1024 * 1024,
+    ttl_seconds=cfg.HISTORY_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=cfg.HISTORY_CACHE_TTL_SECONDS,
+)
+
+
+def parse_range(value: str) -> int:
+    """'15m', '6h', '7d' -> segundos."""
+    m = _RANGE_RE.match((value or "").strip().lower())
+    if not m:
+        raise ValueError(f"rango no válido: {value!r} (ej. 15m, 6h, 7d)")
+    return int(m.group(1)) * _RANGE_UNITS[m.group(2)]
+
+
+def history(
+    metric: str,
+    range: str = "1h",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    resolution: str = "auto",
+    points: int = 300,
+) -> Dict:
+    """Serie de `metric` reducida con LTTB a como mucho `points` puntos.
+
+    Con `since`/`until` (epoch) se usa ese intervalo; si no, los últimos `range` (15m, 6h, 7d).
+    Los rangos relativos se alinean a un paso de span/points para que peticiones seguidas
+    compartan entrada de caché.
+    """
+    points = max(3, min(int(points), 5000))
+    if since is None:
+        span = parse_range(range)
+        step = max(1, span // points)
+        end = float(until) if until is not None else float((int(time.time()) // step + 1) * step)
+        since = end - span
+        until = end
+    key = (metric, float(since), float(until) if until is not None else None, resolution, points)
+    cached = _HISTORY_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    # Se piden más puntos de los que se enviarán para que LTTB tenga forma que conservar
+    data = metricstore.query(metric, since=since, until=until, resolution=resolution, max_points=points * 8)
+    if "error" in data:
+        return data
+    rows = data["points"]
+    # En agregados, LTTB elige sobre la media y se devuelve la fila completa (min/max incluidos)
+    y = 1 if data["resolution"] == "raw" else data["fields"].index("avg")
+    out = dict(data)
+    out["source_points"] = len(rows)
+    out["points"] = lttb(rows, points, y=y)
+    out["downsampled"] = len(out["points"]) < len(rows)
+    _HISTORY_CACHE.put(key, out)
+    return out
+
+
+def history_cache_stats() -> Dict:
+    return _HISTORY_CACHE.stats()
+
+
 def top_processes(by: str = "memory", limit: int = 10) -> List[Dict]:
     sort_by = by if by in {"memory", "cpu", "pid"} else "memory"
     include_cpu = sort_by == "cpu"
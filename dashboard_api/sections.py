@@ -0,0 +1,137 @@
+"""Caché de secciones de /api/info con refresco single-flight, versiones y espera de cambios.
+
+Antes, al vencer el TTL de una sección, cada petición concurrente llamaba a su fetcher
+(p. ej. `metrics.get` por MCP) a la vez. Aquí sólo la primera lanza el refresco; las demás
+esperan esa misma tarea.
+
+Cada sección lleva un contador de versión que sólo sube cuando el contenido cambia
+(comparando un hash del JSON); los clientes pueden esperar un cambio (`wait_for_change`) en
+vez de volver a preguntar. El aviso es un `asyncio.Event` por event loop: un Event queda
+ligado al primer loop que lo espera y el dashboard puede atender peticiones desde varios.
+
+El ETag de la respuesta (`If-None-Match` -> 304) se arma con esos hashes y no con las
+versiones: los contadores vuelven a 1 al reiniciar el dashboard y un cliente con un ETag
+viejo recibiría 304 para un contenido distinto.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+
+class _Section:
+    __slots__ = ("value", "fetched_at", "version", "digest", "inflight")
+
+    def __init__(self) -> None:
+        self.value: Any = None
+        self.fetched_at = 0.0
+        self.version = 0
+        self.digest: Optional[str] = None
+        self.inflight: Optional[asyncio.Future] = None
+
+
+def _digest(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class SectionCache:
+    def __init__(self) -> None:
+        self._sections: Dict[str, _Section] = {}
+        self._changed: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Event]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._stats = {"hits": 0, "refreshes": 0, "coalesced": 0, "changes": 0, "errors": 0}
+
+    def _section(self, name: str) -> _Section:
+        sec = self._sections.get(name)
+        if sec is None:
+            sec = self._sections[name] = _Section()
+        return sec
+
+    def _event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        ev = self._changed.get(loop)
+        if ev is None:
+            ev = self._changed[loop] = asyncio.Event()
+        return ev
+
+    def _notify(self) -> None:
+        """Despierta a los que esperan en cualquier loop; los siguientes usan eventos nuevos."""
+        current = asyncio.get_running_loop()
+        waiting, self._changed = list(self._changed.items()), weakref.WeakKeyDictionary()
+        for loop, ev in waiting:
+            if loop is current:
+                ev.set()
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(ev.set)
+
+    async def _refresh(self, name: str, sec: _Section, fetcher: Fetcher) -> Any:
+        try:
+            value = await fetcher()
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            sec.inflight = None
+        sec.value = value
+        sec.fetched_at = time.time()
+        digest = _digest(value)
+        if digest != sec.digest:
+            sec.digest = digest
+            sec.version += 1
+            self._stats["changes"] += 1
+            self._notify()
+        return value
+
+    async def get(self, name: str, fetcher: Fetcher, ttl: float) -> Any:
+        """Valor de la sección; vencido el TTL lo refresca una sola tarea para todos."""
+        sec = self._section(name)
+        if sec.version and time.time() - sec.fetched_at <= ttl:
+            self._stats["hits"] += 1
+            return sec.value
+        # una tarea de otro loop no se puede esperar desde éste: se refresca aparte
+        if sec.inflight is None or sec.inflight.get_loop() is not asyncio.get_running_loop():
+            self._stats["refreshes"] += 1
+            sec.inflight = asyncio.ensure_future(self._refresh(name, sec, fetcher))
+        else:
+            self._stats["coalesced"] += 1
+        # shield: si este cliente se va, el refresco sigue para los demás
+        return await asyncio.shield(sec.inflight)
+
+    def version(self, name: str) -> int:
+        sec = self._sections.get(name)
+        return sec.version if sec else 0
+
+    def etag(self, names: Iterable[str], extra: str = "") -> str:
+        """ETag débil con el hash del contenido de cada sección (estable entre reinicios)."""
+        parts = []
+        for n in names:
+            sec = self._sections.get(n)
+            parts.append(f"{n}:{sec.digest if sec and sec.digest else '-'}")
+        if extra:
+            parts.append(";" + extra)
+        raw = ",".join(parts).encode("utf-8")
+        return f'W/"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+    async def wait_for_change(self, timeout: float) -> bool:
+        """Espera hasta `timeout` s a que cambie alguna sección; False si no cambió."""
+        try:
+            await asyncio.wait_for(self._event().wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._stats)
+        out["sections"] = {
+            n: {"version": s.version, "age_seconds": round(time.time() - s.fetched_at, 2) if s.fetched_at else None}
+            for n, s in sorted(self._sections.items())
+        }
+        return out
@@ -0,0 +1,165 @@
+"""Hub de difusión para /ws: un único productor y frames compartidos por todos los clientes.
+
+Antes cada conexión tenía su propio bucle que llamaba a `metrics.snapshot()` cada 2 s y
+serializaba el JSON completo. Aquí una sola tarea produce un snapshot por tick y genera dos
+frames ya serializados:
+
+- `{"type": "full", "seq": n, "data": {...}}`: snapshot completo;
+- `{"type": "delta", "seq": n, "data": {campos cambiados}, "removed": [...]}`: sólo los
+  campos de primer nivel que cambiaron respecto al frame n-1.
+
+Cada suscriptor tiene un único hueco "pendiente": si el cliente es lento, el frame nuevo
+sustituye al no enviado (se descartan los intermedios, no se encolan). Un cliente recibe el
+delta sólo si su último frame fue el n-1; si no (primer frame o tras un descarte), el completo.
+La tarea productora se arranca con el primer suscriptor y termina con el último.
+
+`run` decide dónde se ejecuta el productor (bloqueante): por defecto el executor del loop;
+el dashboard lo pasa por el pool `general` de executors.py. Los fallos del productor no
+cortan el bucle pero se cuentan en `produce_errors`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+Frame = Tuple[int, str, Optional[str]]  # (seq, full, delta)
+
+
+class Subscriber:
+    __slots__ = ("pending", "event", "last_seq", "sent", "dropped")
+
+    def __init__(self) -> None:
+        self.pending: Optional[Frame] = None
+        self.event = asyncio.Event()
+        self.last_seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+
+class BroadcastHub:
+    def __init__(
+        self,
+        produce: Callable[[], Dict[str, Any]],
+        interval: float = 2.0,
+        run: Optional[Callable[[Callable[[], Dict[str, Any]]], Awaitable[Dict[str, Any]]]] = None,
+    ) -> None:
+        self._produce = produce
+        self._runner = run
+        self.interval = float(interval)
+        self._subs: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last: Optional[Dict[str, Any]] = None
+        self._seq = 0
+        self._stats = {"frames": 0, "full_frames": 0, "delta_frames": 0, "dropped": 0, "sends": 0, "send_errors": 0,
+                       "produce_errors": 0}
+        self._send_ms_total = 0.0
+        self._send_ms_max = 0.0
+        self._send_ms_last = 0.0
+        self._produce_ms_last = 0.0
+
+    # --- suscripción -------------------------------------------------------------------
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        self._subs.add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif self._last is not None:
+            # Nuevo cliente: recibe ya el último estado sin esperar al siguiente tick
+            sub.pending = self._frame_for_new()
+            sub.event.set()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subs.discard(sub)
+
+    # --- productor ---------------------------------------------------------------------
+    def _frame_for_new(self) -> Frame:
+        full = json.dumps({"type": "full", "seq": self._seq, "data": self._last})
+        return (self._seq, full, None)
+
+    def publish(self, data: Dict[str, Any]) -> Optional[Frame]:
+        """Serializa una vez el frame del tick y lo deja en el hueco de cada suscriptor."""
+        prev = self._last
+        delta_text: Optional[str] = None
+        if prev is not None:
+            changed = {k: v for k, v in data.items() if prev.get(k) != v}
+            removed = [k for k in prev if k not in data]
+            if not changed and not removed:
+                return None
+            self._seq += 1
+            delta_text = json.dumps({"type": "delta", "seq": self._seq, "data": changed, "removed": removed})
+        else:
+            self._seq += 1
+        self._last = data
+        frame = (self._seq, json.dumps({"type": "full", "seq": self._seq, "data": data}), delta_text)
+        self._stats["frames"] += 1
+        for sub in self._subs:
+            if sub.pending is not None:
+                sub.dropped += 1
+                self._stats["dropped"] += 1
+            sub.pending = frame
+            sub.event.set()
+        return frame
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._subs:
+            t0 = time.perf_counter()
+            try:
+                if self._runner is not None:
+                    data = await self._runner(self._produce)
+                else:
+                    data = await loop.run_in_executor(None, self._produce)
+                self._produce_ms_last = round((time.perf_counter() - t0) * 1000, 2)
+                self.publish(data)
+            except Exception:
+                # incluye PoolBusy/PoolTimeout: se reintenta en el siguiente tick
+                self._stats["produce_errors"] += 1
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    # --- consumo -----------------------------------------------------------------------
+    async def next_text(self, sub: Subscriber) -> str:
+        """Espera el siguiente frame del suscriptor y elige delta o completo."""
+        await sub.event.wait()
+        sub.event.clear()
+        seq, full, delta = sub.pending  # type: ignore[misc]
+        sub.pending = None
+        use_delta = delta is not None and sub.last_seq == seq - 1
+        sub.last_seq = seq
+        self._stats["delta_frames" if use_delta else "full_frames"] += 1
+        return delta if use_delta else full  # type: ignore[return-value]
+
+    async def serve(self, send: Callable[[str], Any], sub: Subscriber) -> None:
+        """Bucle de envío de un cliente; termina cuando `send` falla (desconexión)."""
+        while True:
+            text = await self.next_text(sub)
+            t0 = time.perf_counter()
+            try:
+                await send(text)
+            except Exception:
+                self._stats["send_errors"] += 1
+                raise
+            ms = (time.perf_counter() - t0) * 1000
+            sub.sent += 1
+            self._stats["sends"] += 1
+            self._send_ms_total += ms
+            self._send_ms_last = ms
+            self._send_ms_max = max(self._send_ms_max, ms)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self._stats)
+        sends = out["sends"]
+        out.update({
+            "subscribers": len(self._subs),
+            "running": self._task is not None and not self._task.done(),
+            "seq": self._seq,
+            "interval_seconds": self.interval,
+            "produce_ms_last": self._produce_ms_last,
+            "send_ms_last": round(self._send_ms_last, 2),
+            "send_ms_avg": round(self._send_ms_total / sends, 2) if sends else None,
+            "send_ms_max": round(self._send_ms_max, 2),
+        })
+        return out
@@ -530,8 +530,17 @@
       if (pollTimer) { clearInterval(pollTimer); pollTimer = null; }
       showStatus('Conectado por WebSocket en tiempo real.', 'ok');
     };
+    // Frames del hub: "full" trae el snapshot completo; "delta" sólo los campos cambiados
+    let wsState = {};
     ws.onmessage = ev => {
-      const data = JSON.parse(ev.data);
+      const frame = JSON.parse(ev.data);
+      if (frame.type === 'delta') {
+        wsState = Object.assign({}, wsState, frame.data || {});
+        for (const k of frame.removed || []) delete wsState[k];
+      } else {
+        wsState = frame.data || {};
+      }
+      const data = wsState;
       updateMetrics(data);
       // Marcar recepción reciente para apagar watchdog de polling HTTP
       try { __coreLastEvtTs = Date.now(); } catch {}
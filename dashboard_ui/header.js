@@ -101,11 +101,19 @@
   }
 
   let __hdrInfoTimer = null;
+  let __hdrInfoEtag = null;
+  let __hdrInfoData = null;
   async function pollInfoHdr() {
     try {
-      const res = await fetch('/api/info?sections=core,diagnostics,sensors', { cache: 'no-store' });
-      if (!res.ok) throw new Error('bad status');
-      const data = await res.json();
+      // Petición condicional: 304 si ninguna sección cambió desde la última respuesta
+      const headers = (__hdrInfoEtag && __hdrInfoData) ? { 'If-None-Match': __hdrInfoEtag } : {};
+      const res = await fetch('/api/info?sections=core,diagnostics,sensors', { cache: 'no-store', headers });
+      if (res.status !== 304 && !res.ok) throw new Error('bad status');
+      if (res.status !== 304) {
+        __hdrInfoData = await res.json();
+        __hdrInfoEtag = res.headers.get('ETag');
+      }
+      const data = __hdrInfoData;
       const core = data?.sections?.core || null;
       const s = data?.sections?.diagnostics || {};
       const sensors = data?.sections?.sensors || null;
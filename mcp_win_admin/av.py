@@ -1,32 +1,51 @@
 import hashlib
 import os
 import socket
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import os as _os
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
 import httpx
+import threading
 import time
 
 from . import db
 from . import config as cfg
 from . import scanner
 from . import behavioral
+from . import breaker
+from . import quota
+from . import cloudplan
+from . import refresh
+from .singleflight import SingleFlight
 
 
 SUPPORTED_ALGOS = ("sha256", "md5", "sha1")
 
 _LAST_CALL: Dict[str, float] = {}
 _MIN_INTERVAL = 0.5  # seconds per source
+_THROTTLE_LOCK = threading.Lock()
+_FLIGHT = SingleFlight("hash")
+# gethostbyname no admite timeout; se ejecuta en hilos aparte y se abandona si vence
+_DNS_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="MHRDNS")
 
 
 def _throttle(key: str) -> None:
-    now = time.monotonic()
-    last = _LAST_CALL.get(key, 0.0)
-    delta = now - last
-    if delta < _MIN_INTERVAL:
-        time.sleep(_MIN_INTERVAL - delta)
-    _LAST_CALL[key] = time.monotonic()
+    # Reserve the next slot under the lock so foreground calls and refresh workers share the budget
+    with _THROTTLE_LOCK:
+        now = time.monotonic()
+        last = _LAST_CALL.get(key, 0.0)
+        wait = max(0.0, _MIN_INTERVAL - (now - last))
+        _LAST_CALL[key] = now + wait
+    try:
+        if wait > 0:
+            time.sleep(wait)
+        # Cuota compartida entre procesos (sólo fuentes con límites); QuotaExhausted si no hay tokens
+        quota.consume(key)
+    finally:
+        # Las esperas locales no son latencia de la fuente: no inflan el timeout adaptativo
+        breaker.exclude_wait(time.monotonic() - now)
 
 
 def _hash_file(path: Path, algo: str = "sha256", chunk_size: int = 1024 * 1024) -> str:
@@ -79,14 +98,14 @@ def _walk_files(base: Path, recursive: bool = True, limit: Optional[int] = None)
 
 
 def vt_lookup_hash(hash_hex: str, *, client: Optional[httpx.Client] = None) -> Optional[Dict]:
-    _throttle("virustotal")
     api_key = os.getenv("VT_API_KEY")
     if not api_key:
         return None
+    _throttle("virustotal")
     url = f"https://www.virustotal.com/api/v3/files/{hash_hex}"
     close_client = False
     if client is None:
-        client = httpx.Client(timeout=15)
+        client = httpx.Client(timeout=breaker.timeout_for("virustotal"))
         close_client = True
     try:
         resp = client.get(url, headers={"x-apikey": api_key})
@@ -120,6 +139,7 @@ def vt_lookup_hash(hash_hex: str, *, client: Optional[httpx.Client] = None) -> O
             "permalink": f"https://www.virustotal.com/gui/file/{hash_hex}",
         }
     except Exception as e:
+        quota.refund_unsent("virustotal", e)
         return {"source": "virustotal", "error": str(e), "verdict": "unknown"}
     finally:
         if close_client:
@@ -157,9 +177,12 @@ def teamcymru_mhr_lookup_hash(hash_hex: str) -> Optional[Dict]:
             except Exception:
                 pass
         if ip is None:
-            # Fallback a socket.gethostbyname (sin control fino de timeout)
+            # Fallback a socket.gethostbyname en un pool acotado para poder aplicar el timeout
+            fut = _DNS_POOL.submit(socket.gethostbyname, name)
             try:
-                ip = socket.gethostbyname(name)
+                ip = fut.result(timeout=timeout_s)
+            except FuturesTimeout:
+                return {"source": "teamcymru", "verdict": "unknown", "error": f"dns timeout after {timeout_s}s"}
             except Exception:
                 return {"source": "teamcymru", "verdict": "unknown"}
         if ip == "127.0.0.2":
@@ -169,6 +192,52 @@ def teamcymru_mhr_lookup_hash(hash_hex: str) -> Optional[Dict]:
         return {"source": "teamcymru", "error": str(e), "verdict": "unknown"}
 
 
+def _lookup_hash_source(hash_hex: str, source: str) -> Optional[Dict]:
+    if source == "virustotal":
+        return vt_lookup_hash(hash_hex)
+    if source == "malwarebazaar":
+        return malwarebazaar_lookup_hash(hash_hex)
+    if source == "teamcymru":
+        return teamcymru_mhr_lookup_hash(hash_hex)
+    return None
+
+
+def _fetch_hash_source(hash_hex: str, algo: str, source: str) -> Optional[Dict]:
+    r = breaker.call(source, _lookup_hash_source, hash_hex, source)
+    if r is None or r.get("status") in breaker.UNCACHEABLE_STATUSES:
+        # Circuito abierto o sin cuota: no persistir, para no envenenar la caché con 'unknown'
+        return r
+    try:
+        db.upsert_hash_verdict(
+            hash_hex=hash_hex,
+            algo=algo,
+            verdict=r.get("verdict", "unknown"),
+            source=source,
+            metadata=None,
+        )
+    except Exception:
+        pass
+    return r
+
+
+def _fetch_hash_sources(hash_hex: str, algo: str, sources: Tuple[str, ...]) -> List[Dict]:
+    """Consulta las fuentes indicadas para un hash y persiste cada veredicto (best effort).
+
+    Cada (hash, fuente) pasa por single-flight: llamadas concurrentes comparten una sola consulta.
+    """
+    results: List[Dict] = []
+    for s in sources:
+        r = _FLIGHT.do((hash_hex.lower(), algo, s), lambda s=s: _fetch_hash_source(hash_hex, algo, s))
+        if r is not None:
+            results.append(dict(r))
+    return results
+
+
+def _source_ttl(ttl_seconds: Optional[int]) -> Optional[int]:
+    """TTL soft de la caché por fuente: sin TTL explícito, el de reputación por defecto."""
+    return cfg.DEFAULT_REP_TTL if ttl_seconds is None else ttl_seconds
+
+
 def check_hash(
     hash_hex: str,
     *,
@@ -176,16 +245,26 @@ def check_hash(
     use_cloud: bool = True,
     sources: Tuple[str, ...] = ("malwarebazaar", "teamcymru"),
     ttl_seconds: Optional[int] = None,
+    hard_ttl_seconds: Optional[int] = None,
+    expand_sources: bool = True,
+    deferred: Tuple[str, ...] = (),
 ) -> Dict:
     """Check a hash against cache and optionally cloud sources.
 
+    Per-source cache entries within `ttl_seconds` are served without a cloud call; entries
+    past it but within the hard TTL are served as `stale` and refreshed in the background.
+    Without `ttl_seconds` the per-source soft TTL is MCP_DEFAULT_REP_TTL, so cached rows
+    still age out and get re-queried.
+    expand_sources=False keeps `sources` as given. Sources in `deferred` (left out by a budget
+    plan) are only read from cache: no blocking fetch and no background refresh.
+
     Returns: dict with consolidated verdict and per-source details.
     """
     algo = algo.lower()
     out: Dict = {"hash": hash_hex, "algo": algo, "verdict": "unknown", "sources": []}
 
     # If using the default free-only sources and FREE_ONLY_SOURCES is disabled, extend to include VirusTotal
-    if sources == ("malwarebazaar", "teamcymru") and not cfg.FREE_ONLY_SOURCES:
+    if expand_sources and sources == ("malwarebazaar", "teamcymru") and not cfg.FREE_ONLY_SOURCES:
         sources = ("virustotal", "malwarebazaar", "teamcymru")
 
     cached = db.get_hash_verdict(hash_hex=hash_hex, algo=algo, ttl_seconds=ttl_seconds)
@@ -194,53 +273,36 @@ def check_hash(
         out["verdict"] = cached.get("verdict", out["verdict"])  # initial suggestion
 
     if use_cloud:
+        try:
+            rows = db.get_hash_verdict_sources(hash_hex=hash_hex, algo=algo) or []
+        except Exception:
+            rows = []
+        fresh, stale = refresh.split_rows(
+            rows, ttl_seconds=_source_ttl(ttl_seconds), hard_ttl_seconds=hard_ttl_seconds
+        )
+        to_fetch: List[str] = []
         for s in sources:
-            if s == "virustotal":
-                vt = vt_lookup_hash(hash_hex)
-                if vt is not None:
-                    out["sources"].append(vt)
-                    v = vt.get("verdict", "unknown")
-                    # persist best effort
-                    try:
-                        db.upsert_hash_verdict(
-                            hash_hex=hash_hex,
-                            algo=algo,
-                            verdict=v,
-                            source="virustotal",
-                            metadata=None,
-                        )
-                    except Exception:
-                        pass
-            elif s == "malwarebazaar":
-                mb = malwarebazaar_lookup_hash(hash_hex)
-                if mb is not None:
-                    out["sources"].append(mb)
-                    v = mb.get("verdict", "unknown")
-                    try:
-                        db.upsert_hash_verdict(
-                            hash_hex=hash_hex,
-                            algo=algo,
-                            verdict=v,
-                            source="malwarebazaar",
-                            metadata=None,
-                        )
-                    except Exception:
-                        pass
-            elif s == "teamcymru":
-                tc = teamcymru_mhr_lookup_hash(hash_hex)
-                if tc is not None:
-                    out["sources"].append(tc)
-                    v = tc.get("verdict", "unknown")
-                    try:
-                        db.upsert_hash_verdict(
-                            hash_hex=hash_hex,
-                            algo=algo,
-                            verdict=v,
-                            source="teamcymru",
-                            metadata=None,
-                        )
-                    except Exception:
-                        pass
+            row = fresh.get(s) or stale.get(s)
+            if row is None:
+                if s not in deferred:
+                    to_fetch.append(s)
+                continue
+            entry = {"source": s, "verdict": row.get("verdict", "unknown"), "cached": True}
+            if s in stale:
+                entry["stale"] = True
+                refresh.record("stale_served")
+                if s not in deferred:
+                    refresh.enqueue(
+                        ("hash", hash_hex.lower(), algo, s),
+                        lambda s=s: _fetch_hash_sources(hash_hex, algo, (s,)),
+                    )
+            else:
+                refresh.record("fresh_hits")
+            out["sources"].append(entry)
+        if to_fetch:
+            fetched = _fetch_hash_sources(hash_hex, algo, tuple(to_fetch))
+            refresh.record("blocking_fetches", len(fetched))
+            out["sources"].extend(fetched)
     # consolidate: prefer worst verdict among sources
     order = {"malicious": 3, "suspicious": 2, "clean": 1, "unknown": 0}
     best = out.get("verdict", "unknown")
@@ -261,33 +323,89 @@ def scan_path(
     use_cloud: bool = False,
     sources: Tuple[str, ...] = ("malwarebazaar", "teamcymru"),
     ttl_seconds: Optional[int] = None,
+    cloud_budgets: Optional[Dict[str, int]] = None,
 ) -> List[Dict]:
     """Scan a path (file or directory) computing hashes and checking verdicts.
 
     limit caps the number of files to avoid extremely long scans.
+    With use_cloud, uncached hashes are ranked by cloudplan and budgeted sources
+    (cloud_budgets or MCP_AV_CLOUD_BUDGETS) are spent on the top of the list; the rest
+    are reported in `cloud_deferred` and queued for process_deferred_lookups().
     """
     base = Path(target).expanduser()
     # If using the default free-only sources and FREE_ONLY_SOURCES is disabled, extend to include VirusTotal
     if sources == ("malwarebazaar", "teamcymru") and not cfg.FREE_ONLY_SOURCES:
         sources = ("virustotal", "malwarebazaar", "teamcymru")
     files = list(_walk_files(base, recursive=recursive, limit=limit))
-    results: List[Dict] = []
+    hashed: List[Tuple[Path, Optional[str], Optional[str]]] = []
     for f in files:
         try:
-            h = _hash_file(f, algo)
-            verdict = check_hash(h, algo=algo, use_cloud=use_cloud, sources=sources, ttl_seconds=ttl_seconds)
-            results.append({
+            hashed.append((f, _hash_file(f, algo), None))
+        except Exception as e:
+            hashed.append((f, None, str(e)))
+
+    deferred: Dict[str, Tuple[str, ...]] = {}
+    if use_cloud:
+        deferred = cloudplan.plan_scan(
+            [(f, h) for f, h, _ in hashed if h],
+            algo=algo.lower(),
+            sources=sources,
+            ttl_seconds=_source_ttl(ttl_seconds),
+            budgets=cloud_budgets,
+        )
+
+    results: List[Dict] = []
+    for f, h, err in hashed:
+        if h is None:
+            results.append({"path": str(f), "error": err})
+            continue
+        try:
+            skip = deferred.get(h.lower(), ())
+            if skip:
+                verdict = check_hash(
+                    h, algo=algo, use_cloud=use_cloud, sources=sources,
+                    ttl_seconds=ttl_seconds, expand_sources=False, deferred=skip,
+                )
+            else:
+                verdict = check_hash(h, algo=algo, use_cloud=use_cloud, sources=sources, ttl_seconds=ttl_seconds)
+            item = {
                 "path": str(f),
                 "algo": algo,
                 "hash": h,
                 "verdict": verdict.get("verdict", "unknown"),
                 "details": verdict,
-            })
+            }
+            if skip:
+                item["cloud_deferred"] = list(skip)
+            results.append(item)
         except Exception as e:
             results.append({"path": str(f), "error": str(e)})
     return results
 
 
+def process_deferred_lookups(limit: int = 50, budgets: Optional[Dict[str, int]] = None) -> Dict:
+    """Ejecuta las consultas aplazadas por el planificador, de mayor a menor puntuación, dentro del presupuesto."""
+    budgets = cloudplan.parse_budgets(cfg.AV_CLOUD_BUDGETS) if budgets is None else budgets
+    entries = db.list_deferred_lookups(limit=max(1, int(limit)))
+    remaining = cloudplan.remaining_budgets({e["source"] for e in entries}, budgets)
+    done: List[Tuple[str, str, str]] = []
+    results: List[Dict] = []
+    for e in entries:
+        s = e["source"]
+        if s in remaining:
+            if remaining[s] <= 0:
+                continue
+            remaining[s] -= 1
+        fetched = _fetch_hash_sources(e["hash"], e["algo"], (s,))
+        r = fetched[0] if fetched else {"source": s, "verdict": "unknown"}
+        if r.get("status") in breaker.UNCACHEABLE_STATUSES:
+            continue  # circuito abierto o sin cuota: se reintenta en otra ejecución
+        done.append((e["hash"], e["algo"], s))
+        results.append({"hash": e["hash"], "algo": e["algo"], "source": s, "path": e.get("path"), "verdict": r.get("verdict", "unknown")})
+    db.delete_deferred_lookups(done)
+    return {"processed": len(done), "remaining": db.count_deferred_lookups(), "results": results}
+
+
 def malwarebazaar_lookup_hash(hash_hex: str, *, client: Optional[httpx.Client] = None) -> Optional[Dict]:
     _throttle("malwarebazaar")
     """Consulta MalwareBazaar (abuse.ch) por hash (sha256 preferido).
@@ -297,7 +415,7 @@ def malwarebazaar_lookup_hash(hash_hex: str, *, client: Optional[httpx.Client] =
     url = "https://mb-api.abuse.ch/api/v1/"
     close_client = False
     if client is None:
-        client = httpx.Client(timeout=15)
+        client = httpx.Client(timeout=breaker.timeout_for("malwarebazaar"))
         close_client = True
     try:
         resp = client.post(url, data={"query": "get_info", "hash": hash_hex})
@@ -310,6 +428,7 @@ def malwarebazaar_lookup_hash(hash_hex: str, *, client: Optional[httpx.Client] =
             return {"source": "malwarebazaar", "verdict": "malicious", "count": len(data.get("data", []))}
         return {"source": "malwarebazaar", "verdict": "unknown", "status": status}
     except Exception as e:
+        quota.refund_unsent("malwarebazaar", e)
         return {"source": "malwarebazaar", "error": str(e), "verdict": "unknown"}
     finally:
         if close_client:
@@ -1,5 +1,13 @@
+import threading
+import time
 import psutil
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from . import config as cfg
+from . import procinfo
+from . import rules as rulesmod
+from .rules import PrefixTrie  # noqa: F401  (re-export)
 
 # A list of suspicious process names. This is a simple example; a real-world
 # implementation would use a more sophisticated method of identifying suspicious
@@ -16,6 +24,192 @@ SENSITIVE_DIRECTORIES = [
     "C:\\Windows\\SysWOW64",
 ]
 
+
+def default_rules() -> List[Dict[str, Any]]:
+    """Built-in rules equivalent to the lists above; MCP_BEHAVIOR_RULES_PATH adds more."""
+    return [
+        {
+            "id": "suspicious-name",
+            "name": list(SUSPICIOUS_PROCESS_NAMES),
+            "severity": "high",
+            "reason": "Suspicious process name",
+        },
+        {
+            "id": "sensitive-dir-open",
+            "open_file_prefix": list(SENSITIVE_DIRECTORIES),
+            "reason": "Writing to sensitive directory: {path}",
+        },
+    ]
+
+
+_RULESET: Optional[rulesmod.RuleSet] = None
+_RULES_SIG: Optional[Tuple[str, int]] = None
+_RULES_ERROR: Optional[str] = None
+_RULES_LOCK = threading.Lock()
+
+
+def _rules_signature() -> Tuple[str, int]:
+    path = cfg.BEHAVIOR_RULES_PATH
+    if not path:
+        return ("", 0)
+    try:
+        return (path, Path(path).stat().st_mtime_ns)
+    except OSError:
+        return (path, -1)
+
+
+def get_ruleset() -> rulesmod.RuleSet:
+    """Compiled rules, recompiled only when the rules file changes."""
+    global _RULESET, _RULES_SIG, _RULES_ERROR
+    sig = _rules_signature()
+    with _RULES_LOCK:
+        if _RULESET is not None and sig == _RULES_SIG:
+            return _RULESET
+        raw = default_rules()
+        error = None
+        if sig[0] and sig[1] >= 0:
+            try:
+                raw += rulesmod.load_rules_file(Path(sig[0]))
+                _RULESET = rulesmod.compile_rules(raw)
+            except Exception as e:
+                # A broken rules file must not disable the built-in checks
+                error = f"{sig[0]}: {e}"
+                _RULESET = rulesmod.compile_rules(default_rules())
+        else:
+            if sig[0]:
+                error = f"{sig[0]}: not found"
+            _RULESET = rulesmod.compile_rules(raw)
+        _RULES_SIG = sig
+        _RULES_ERROR = error
+        return _RULESET
+
+
+def rules_summary() -> Dict[str, Any]:
+    out = get_ruleset().summary()
+    out["source"] = cfg.BEHAVIOR_RULES_PATH or None
+    out["error"] = _RULES_ERROR
+    return out
+
+
+# Expensive per-process attributes from previous runs, keyed by (pid, create_time).
+# "fp" is the handle/fd count: if it did not change, the open files are assumed unchanged,
+# but only for MCP_BEHAVIOR_OPEN_FILES_MAX_AGE_SECONDS; closing one file and opening another
+# keeps the count, so an older list is always fetched again.
+_SEEN: Dict[Tuple[int, Any], Dict[str, Any]] = {}
+_RUN_LOCK = threading.Lock()
+_LAST_STATS: Dict[str, Any] = {}
+
+
+def _handle_count(proc: psutil.Process) -> Optional[int]:
+    fn = getattr(proc, "num_handles", None) or getattr(proc, "num_fds", None)
+    try:
+        return fn() if fn is not None else None
+    except Exception:
+        return None
+
+
+def _connections(proc: psutil.Process) -> list:
+    fn = getattr(proc, "net_connections", None) or getattr(proc, "connections")
+    return fn(kind="inet")
+
+
+def run_staged() -> Dict[str, Any]:
+    """
+    Staged behavioral check driven by the compiled rule set.
+
+    1. enumerate: pid, name and create_time only.
+    2. rules: each process is matched against the rule indexes; psutil attributes (exe, ppid,
+       connections, open_files) are fetched lazily, only when a candidate rule needs them.
+       open_files is reused from the previous run when the process is known, its handle
+       count did not change and the cached list is younger than the configured max age.
+
+    Returns:
+        {"findings": [...], "stats": {per-stage timings and counters}}.
+    """
+    ruleset = get_ruleset()
+    with _RUN_LOCK:
+        timings: Dict[str, float] = {}
+        counters = {"open_files_checked": 0, "open_files_reused": 0, "access_denied": 0}
+        t = time.perf_counter()
+        procs = list(psutil.process_iter(['pid', 'name', 'create_time']))
+        timings["enumerate_ms"] = (time.perf_counter() - t) * 1000
+
+        current = set()
+
+        def fetcher(proc, key):
+            def fetch(attr: str) -> Any:
+                t0 = time.perf_counter()
+                try:
+                    if attr == "open_files":
+                        return _open_files(proc, key, counters)
+                    if attr == "connections":
+                        return _connections(proc)
+                    return getattr(proc, attr)()
+                except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+                    counters["access_denied"] += 1
+                    return None
+                finally:
+                    k = f"{attr}_ms"
+                    timings[k] = timings.get(k, 0.0) + (time.perf_counter() - t0) * 1000
+            return fetch
+
+        findings: List[Dict[str, Any]] = []
+        t = time.perf_counter()
+        for proc in procs:
+            key = (proc.info['pid'], proc.info.get('create_time'))
+            current.add(key)
+            view = rulesmod.ProcessView(proc.info['pid'], proc.info.get('name'), fetcher(proc, key))
+            findings.extend(ruleset.evaluate(view, parent_name=procinfo.name))
+        for key in [k for k in _SEEN if k not in current]:
+            del _SEEN[key]
+        timings["rules_ms"] = (time.perf_counter() - t) * 1000
+
+        stats = {
+            "processes": len(procs),
+            "rules": len(ruleset),
+            **counters,
+            "findings": len(findings),
+            **{k: round(v, 2) for k, v in timings.items()},
+        }
+        _LAST_STATS.clear()
+        _LAST_STATS.update(stats)
+        return {"findings": findings, "stats": stats}
+
+
+def _open_files(proc: psutil.Process, key: Tuple[int, Any], counters: Dict[str, int]) -> List[str]:
+    fp = _handle_count(proc)
+    now = time.monotonic()
+    prev = _SEEN.get(key)
+    if (
+        prev is not None and fp is not None and prev["fp"] == fp
+        and now - prev["at"] < cfg.BEHAVIOR_OPEN_FILES_MAX_AGE_SECONDS
+    ):
+        counters["open_files_reused"] += 1
+        return prev["paths"]
+    counters["open_files_checked"] += 1
+    try:
+        paths = [f.path for f in (proc.open_files() or [])]
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        counters["access_denied"] += 1
+        paths = []
+    _SEEN[key] = {"fp": fp, "paths": paths, "at": now}
+    return paths
+
+
+def last_run_stats() -> Dict[str, Any]:
+    return dict(_LAST_STATS)
+
+
+def reset() -> None:
+    global _RULESET, _RULES_SIG
+    with _RUN_LOCK:
+        _SEEN.clear()
+        _LAST_STATS.clear()
+    with _RULES_LOCK:
+        _RULESET = None
+        _RULES_SIG = None
+
+
 def check_running_processes() -> List[Dict[str, Any]]:
     """
     Checks running processes for suspicious behavior.
@@ -23,29 +217,4 @@ def check_running_processes() -> List[Dict[str, Any]]:
     Returns:
         A list of suspicious findings.
     """
-    findings = []
-    for proc in psutil.process_iter(['pid', 'name', 'open_files', 'connections']):
-        try:
-            # Check for suspicious process names
-            if proc.info['name'] and proc.info['name'].lower() in SUSPICIOUS_PROCESS_NAMES:
-                findings.append({
-                    "pid": proc.info['pid'],
-                    "name": proc.info['name'],
-                    "reason": "Suspicious process name",
-                })
-
-            # Check for writing to sensitive directories
-            if proc.info['open_files']:
-                for file in proc.info['open_files']:
-                    for sensitive_dir in SENSITIVE_DIRECTORIES:
-                        if file.path.lower().startswith(sensitive_dir.lower()):
-                            findings.append({
-                                "pid": proc.info['pid'],
-                                "name": proc.info['name'],
-                                "reason": f"Writing to sensitive directory: {file.path}",
-                            })
-
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-
-    return findings
+    return run_staged()["findings"]
@@ -0,0 +1,201 @@
+"""Salud por fuente de threat-intel: circuit breaker y timeouts adaptativos.
+
+- closed: las consultas pasan; N fallos consecutivos abren el circuito.
+- open: las consultas se rechazan al instante (`source_unavailable`) durante el cooldown.
+- half_open: pasado el cooldown se deja pasar una única consulta de prueba; si va bien el
+  circuito se cierra, si falla vuelve a abrirse.
+
+El timeout de cada fuente se deriva del p95 de sus latencias recientes (multiplicado y acotado
+entre MCP_REP_TIMEOUT_MIN_SECONDS y MCP_REP_TIMEOUT_MAX_SECONDS). Las esperas locales de la
+consulta (throttling por fuente y cuota, ver `exclude_wait`) no cuentan como latencia.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from . import config as cfg
+from . import quota
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_LATENCY_WINDOW = 50
+_MIN_SAMPLES = 5
+
+# Estados de resultado que no deben cachearse (no dicen nada del indicador)
+UNCACHEABLE_STATUSES = ("source_unavailable", "quota_exhausted")
+
+# Segundos de espera local acumulados por la consulta en curso de cada hilo
+_WAITED = threading.local()
+
+
+class SourceHealth:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        data = sorted(self.latencies)
+        idx = min(len(data) - 1, max(0, int(round(q * (len(data) - 1)))))
+        return data[idx]
+
+    def timeout(self) -> float:
+        lo = cfg.REP_TIMEOUT_MIN_SECONDS
+        hi = max(lo, cfg.REP_TIMEOUT_MAX_SECONDS)
+        if len(self.latencies) < _MIN_SAMPLES:
+            return hi
+        p95 = self.percentile(0.95) or hi
+        return round(min(hi, max(lo, p95 * cfg.REP_TIMEOUT_P95_MULTIPLIER)), 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "source": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened_at": self.opened_at,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "samples": len(self.latencies),
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "timeout_seconds": self.timeout(),
+        }
+
+
+_LOCK = threading.Lock()
+_SOURCES: Dict[str, SourceHealth] = {}
+
+
+def _get(source: str) -> SourceHealth:
+    h = _SOURCES.get(source)
+    if h is None:
+        h = SourceHealth(source)
+        _SOURCES[source] = h
+    return h
+
+
+def allow(source: str) -> bool:
+    """True si se puede consultar la fuente ahora (cerrado o sonda half-open disponible)."""
+    with _LOCK:
+        h = _get(source)
+        if h.state == CLOSED:
+            return True
+        if h.state == OPEN:
+            if h.opened_at is not None and time.monotonic() - h.opened_at >= cfg.REP_BREAKER_COOLDOWN_SECONDS:
+                h.state = HALF_OPEN
+                h.probe_in_flight = False
+            else:
+                h.rejected += 1
+                return False
+        # half-open: una sola sonda a la vez
+        if h.probe_in_flight:
+            h.rejected += 1
+            return False
+        h.probe_in_flight = True
+        return True
+
+
+def record_success(source: str, latency: Optional[float] = None) -> None:
+    with _LOCK:
+        h = _get(source)
+        h.successes += 1
+        h.consecutive_failures = 0
+        h.probe_in_flight = False
+        h.state = CLOSED
+        h.opened_at = None
+        if latency is not None:
+            h.latencies.append(float(latency))
+
+
+def record_failure(source: str, latency: Optional[float] = None) -> None:
+    with _LOCK:
+        h = _get(source)
+        h.failures += 1
+        h.consecutive_failures += 1
+        if latency is not None:
+            h.latencies.append(float(latency))
+        if h.state == HALF_OPEN or h.consecutive_failures >= max(1, cfg.REP_BREAKER_FAILURES):
+            h.state = OPEN
+            h.opened_at = time.monotonic()
+        h.probe_in_flight = False
+
+
+def release(source: str) -> None:
+    """Libera una sonda half-open que terminó sin resultado concluyente (p.ej. sin API key)."""
+    with _LOCK:
+        _get(source).probe_in_flight = False
+
+
+def timeout_for(source: str) -> float:
+    with _LOCK:
+        return _get(source).timeout()
+
+
+def unavailable(source: str) -> Dict[str, Any]:
+    return {"source": source, "verdict": "unknown", "status": "source_unavailable"}
+
+
+def exclude_wait(seconds: float) -> None:
+    """Descuenta `seconds` de la latencia de la consulta en curso en este hilo (throttle, cuota)."""
+    _WAITED.seconds = getattr(_WAITED, "seconds", 0.0) + max(0.0, seconds)
+
+
+def call(source: str, fn, *args, **kwargs) -> Optional[Dict[str, Any]]:
+    """Ejecuta una consulta a `source` bajo el breaker y registra latencia y resultado.
+
+    Un resultado con clave `error` cuenta como fallo; `status == "no_api_key"` no cuenta.
+    Si el libro de cuotas deniega la llamada se retorna `quota_exhausted` sin tocar la salud.
+    """
+    if not allow(source):
+        return unavailable(source)
+    _WAITED.seconds = 0.0
+    t0 = time.monotonic()
+
+    def elapsed_since() -> float:
+        return max(0.0, time.monotonic() - t0 - _WAITED.seconds)
+
+    try:
+        res = fn(*args, **kwargs)
+    except quota.QuotaExhausted:
+        release(source)
+        return quota.exhausted(source)
+    except Exception:
+        record_failure(source, elapsed_since())
+        raise
+    elapsed = elapsed_since()
+    if isinstance(res, dict) and res.get("error"):
+        record_failure(source, elapsed)
+    elif res is None or (isinstance(res, dict) and res.get("status") == "no_api_key"):
+        release(source)
+    else:
+        record_success(source, elapsed)
+    return res
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _LOCK:
+        return {name: h.to_dict() for name, h in sorted(_SOURCES.items())}
+
+
+def reset(source: Optional[str] = None) -> None:
+    with _LOCK:
+        if source:
+            _SOURCES.pop(source, None)
+        else:
+            _SOURCES.clear()
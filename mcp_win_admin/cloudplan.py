@@ -0,0 +1,188 @@
+"""Planificador del presupuesto de consultas a la nube para escaneos de hashes.
+
+Con cuotas pequeñas (p.ej. VirusTotal) no conviene gastar las consultas en el orden en que
+aparecen los archivos. Los hashes sin caché de un escaneo se puntúan por:
+
+- tipo ejecutable (extensión),
+- recencia (mtime),
+- ubicación de riesgo (temp, descargas, carpetas de inicio, AppData\\Roaming, Public),
+- prevalencia en el escaneo (los raros primero),
+- resultados previos `unknown` (se relegan: volver a preguntar suele aportar poco).
+
+Las fuentes con presupuesto (MCP_AV_CLOUD_BUDGETS, p.ej. "virustotal=25") se reparten desde
+arriba de la lista; lo que no cabe se guarda en la cola persistente `av_deferred_lookups`
+para ejecuciones posteriores. El presupuesto de cada fuente se acota con los tokens que le
+quedan en el libro de cuotas (quota.py), y las fuentes con cuota pero sin presupuesto
+declarado usan esos tokens como presupuesto. Las demás fuentes no se limitan.
+"""
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import config as cfg
+from . import db
+from . import quota
+from . import refresh
+
+EXECUTABLE_EXTS = frozenset({
+    ".exe", ".dll", ".sys", ".scr", ".com", ".cpl", ".msi", ".ocx", ".drv",
+    ".ps1", ".psm1", ".bat", ".cmd", ".vbs", ".vbe", ".js", ".jse", ".wsf", ".hta", ".jar", ".lnk",
+})
+RISKY_DIR_MARKERS = ("/temp/", "/tmp/", "/downloads/", "/startup/", "/appdata/roaming/", "/users/public/")
+
+_DAY = 86400.0
+
+
+@dataclass
+class Candidate:
+    hash: str
+    algo: str
+    path: str
+    needs: Tuple[str, ...]
+    score: float = 0.0
+    reasons: List[str] = field(default_factory=list)
+
+
+def parse_budgets(spec: Optional[str]) -> Dict[str, int]:
+    """'virustotal=25,otx=10' -> {'virustotal': 25, 'otx': 10}; entradas inválidas se ignoran."""
+    out: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        try:
+            if name.strip():
+                out[name.strip()] = max(0, int(value))
+        except ValueError:
+            continue
+    return out
+
+
+def score(path: str, *, mtime: Optional[float], prevalence: int, prev_unknown: bool, now: Optional[float] = None) -> Tuple[float, List[str]]:
+    now = time.time() if now is None else now
+    norm = "/" + str(path).lower().replace("\\", "/")
+    total = 0.0
+    reasons: List[str] = []
+    if os.path.splitext(norm)[1] in EXECUTABLE_EXTS:
+        total += 40
+        reasons.append("executable")
+    if any(m in norm for m in RISKY_DIR_MARKERS):
+        total += 30
+        reasons.append("risky_location")
+    if mtime is not None:
+        age = now - mtime
+        if age <= _DAY:
+            total += 25
+            reasons.append("modified_24h")
+        elif age <= 7 * _DAY:
+            total += 15
+            reasons.append("modified_7d")
+        elif age <= 30 * _DAY:
+            total += 5
+    total += 15.0 / max(1, prevalence)
+    if prevalence == 1:
+        reasons.append("rare")
+    if prev_unknown:
+        total -= 20
+        reasons.append("previously_unknown")
+    return round(total, 2), reasons
+
+
+def allocate(
+    candidates: Sequence[Candidate], budgets: Dict[str, int]
+) -> Tuple[Dict[str, Tuple[str, ...]], List[Tuple[Candidate, str]]]:
+    """Reparte los presupuestos por fuente en orden de puntuación.
+
+    Retorna ({hash: fuentes asignadas}, [(candidato, fuente aplazada)]).
+    """
+    remaining = dict(budgets)
+    allowed: Dict[str, Tuple[str, ...]] = {}
+    deferred: List[Tuple[Candidate, str]] = []
+    for c in sorted(candidates, key=lambda c: (-c.score, c.hash)):
+        got: List[str] = []
+        for s in c.needs:
+            if s not in remaining:
+                got.append(s)
+            elif remaining[s] > 0:
+                remaining[s] -= 1
+                got.append(s)
+            else:
+                deferred.append((c, s))
+        allowed[c.hash] = tuple(got)
+    return allowed, deferred
+
+
+def remaining_budgets(sources: Iterable[str], budgets: Dict[str, int]) -> Dict[str, int]:
+    """Presupuesto por fuente: el declarado, acotado por los tokens que quedan en el libro de cuotas."""
+    out: Dict[str, int] = {}
+    for s in sources:
+        caps = [v for v in (budgets.get(s), quota.available(s)) if v is not None]
+        if caps:
+            out[s] = min(caps)
+    return out
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def plan_scan(
+    items: Iterable[Tuple[Path, str]],
+    *,
+    algo: str,
+    sources: Tuple[str, ...],
+    ttl_seconds: Optional[int],
+    budgets: Optional[Dict[str, int]] = None,
+) -> Dict[str, Tuple[str, ...]]:
+    """Planifica las consultas de un escaneo y persiste lo aplazado.
+
+    `items` son pares (ruta, hash). Retorna {hash: fuentes aplazadas} sólo para los hashes
+    a los que les falta alguna fuente; el resto puede consultarse con normalidad.
+    """
+    budgets = parse_budgets(cfg.AV_CLOUD_BUDGETS) if budgets is None else budgets
+    budgets = remaining_budgets(sources, budgets)
+    budgeted = [s for s in sources if s in budgets]
+    if not budgeted:
+        return {}
+    paths: Dict[str, List[Path]] = {}
+    for p, h in items:
+        paths.setdefault(h.lower(), []).append(p)
+
+    now = time.time()
+    candidates: List[Candidate] = []
+    for h, ps in paths.items():
+        try:
+            rows = db.get_hash_verdict_sources(hash_hex=h, algo=algo) or []
+        except Exception:
+            rows = []
+        # Las stale también gastan cuota (se refrescan en segundo plano): cuentan en el plan
+        fresh, _stale = refresh.split_rows(rows, ttl_seconds=ttl_seconds)
+        needs = tuple(s for s in budgeted if s not in fresh)
+        if not needs:
+            continue
+        prev_unknown = bool(rows) and all(str(r.get("verdict", "unknown")) == "unknown" for r in rows)
+        best: Optional[Candidate] = None
+        for p in ps:
+            sc, why = score(str(p), mtime=_mtime(p), prevalence=len(ps), prev_unknown=prev_unknown, now=now)
+            if best is None or sc > best.score:
+                best = Candidate(hash=h, algo=algo, path=str(p), needs=needs, score=sc, reasons=why)
+        if best is not None:
+            candidates.append(best)
+
+    allowed, deferred = allocate(candidates, budgets)
+    try:
+        db.enqueue_deferred_lookups(
+            [{"hash": c.hash, "algo": c.algo, "source": s, "path": c.path, "score": c.score} for c, s in deferred]
+        )
+        db.delete_deferred_lookups([(h, algo, s) for h, got in allowed.items() for s in got])
+    except Exception:
+        pass
+    out: Dict[str, Tuple[str, ...]] = {}
+    for c, s in deferred:
+        out[c.hash] = out.get(c.hash, ()) + (s,)
+    return out
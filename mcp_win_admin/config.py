@@ -41,6 +41,102 @@ FIREWALL_CMD_TIMEOUT: float = _get_float("MCP_FIREWALL_CMD_TIMEOUT", 5.0)
 DEFAULT_REP_TTL: int = _get_int("MCP_DEFAULT_REP_TTL", 86400)  # 1 día
 # Fuentes gratuitas solamente por defecto (omite servicios que requieren API key)
 FREE_ONLY_SOURCES: bool = _get_bool("MCP_FREE_ONLY_SOURCES", True)
+# Stale-while-revalidate: entre el TTL (soft) y el TTL duro se sirve la caché y se refresca en segundo plano
+REP_SWR_ENABLED: bool = _get_bool("MCP_REP_SWR_ENABLED", True)
+REP_HARD_TTL_FACTOR: float = _get_float("MCP_REP_HARD_TTL_FACTOR", 4.0)  # TTL duro = TTL soft * factor
+REP_REFRESH_QUEUE_MAX: int = _get_int("MCP_REP_REFRESH_QUEUE_MAX", 256)
+# Circuit breaker por fuente y timeouts adaptativos (p95 de latencia * multiplicador, acotado)
+REP_BREAKER_FAILURES: int = _get_int("MCP_REP_BREAKER_FAILURES", 5)
+REP_BREAKER_COOLDOWN_SECONDS: float = _get_float("MCP_REP_BREAKER_COOLDOWN_SECONDS", 60.0)
+REP_TIMEOUT_MIN_SECONDS: float = _get_float("MCP_REP_TIMEOUT_MIN_SECONDS", 2.0)
+REP_TIMEOUT_MAX_SECONDS: float = _get_float("MCP_REP_TIMEOUT_MAX_SECONDS", 15.0)
+REP_TIMEOUT_P95_MULTIPLIER: float = _get_float("MCP_REP_TIMEOUT_P95_MULTIPLIER", 3.0)
+# Precalentado de reputación desde conexiones vivas (desactivado por defecto: hace consultas a la nube)
+REP_PREFETCH_ENABLED: bool = _get_bool("MCP_REP_PREFETCH_ENABLED", False)
+REP_PREFETCH_INTERVAL_SECONDS: float = _get_float("MCP_REP_PREFETCH_INTERVAL_SECONDS", 30.0)
+REP_PREFETCH_BUDGET: int = _get_int("MCP_REP_PREFETCH_BUDGET", 20)  # consultas a la nube por ciclo
+REP_PREFETCH_SOURCES: str = os.getenv("MCP_REP_PREFETCH_SOURCES", "threatfox,urlhaus")
+# Presupuesto de consultas a la nube por escaneo de hashes ("fuente=n,..."; fuentes no listadas sin límite)
+AV_CLOUD_BUDGETS: str = os.getenv("MCP_AV_CLOUD_BUDGETS", "virustotal=25")
+AV_DEFERRED_MAX: int = _get_int("MCP_AV_DEFERRED_MAX", 10000)  # tamaño máximo de la cola de consultas aplazadas
+# Libro de cuotas compartido entre procesos ("fuente=n/segundos|n/segundos,..."; se suma a los límites por defecto)
+QUOTA_ENABLED: bool = _get_bool("MCP_QUOTA_ENABLED", True)
+QUOTA_LIMITS: str = os.getenv("MCP_QUOTA_LIMITS", "")
+QUOTA_MAX_WAIT_SECONDS: float = _get_float("MCP_QUOTA_MAX_WAIT_SECONDS", 20.0)  # espera máxima antes de rendirse
+QUOTA_DB_PATH: str = os.getenv("MCP_QUOTA_DB_PATH", "")  # por defecto quota.sqlite3 junto a la base de estado
+# Reglas de comportamiento adicionales (JSON, o YAML con PyYAML); se recargan si cambia el archivo
+BEHAVIOR_RULES_PATH: str = os.getenv("MCP_BEHAVIOR_RULES_PATH", "")
+# Edad máxima de los open_files reutilizados por conteo de handles (0: consultar siempre)
+BEHAVIOR_OPEN_FILES_MAX_AGE_SECONDS: float = _get_float("MCP_BEHAVIOR_OPEN_FILES_MAX_AGE_SECONDS", 30.0)
+# Caché LRU en memoria delante de SQLite (veredictos de hash y reputación)
+DB_CACHE_ENABLED: bool = _get_bool("MCP_DB_CACHE_ENABLED", True)
+DB_CACHE_MAX_ENTRIES: int = _get_int("MCP_DB_CACHE_MAX_ENTRIES", 4096)
+DB_CACHE_MAX_BYTES: int = _get_int("MCP_DB_CACHE_MAX_BYTES", 4 * 1024 * 1024)
+DB_CACHE_TTL_SECONDS: float = _get_float("MCP_DB_CACHE_TTL_SECONDS", 300.0)
+DB_CACHE_NEGATIVE_TTL_SECONDS: float = _get_float("MCP_DB_CACHE_NEGATIVE_TTL_SECONDS", 30.0)  # sin filas o sólo 'unknown'
+# Caché de metadatos de procesos indexada por (pid, create_time)
+PROC_CACHE_MAX_ENTRIES: int = _get_int("MCP_PROC_CACHE_MAX_ENTRIES", 2048)
+PROC_CACHE_TTL_SECONDS: float = _get_float("MCP_PROC_CACHE_TTL_SECONDS", 600.0)
+# Muestreo de procesos en segundo plano (CPU%, RSS, IO, hilos precalculados)
+PROC_SAMPLER_ENABLED: bool = _get_bool("MCP_PROC_SAMPLER_ENABLED", False)
+PROC_SAMPLER_INTERVAL_SECONDS: float = _get_float("MCP_PROC_SAMPLER_INTERVAL_SECONDS", 2.0)
+# Diario de arranques/salidas de procesos en SQLite
+PROC_JOURNAL_ENABLED: bool = _get_bool("MCP_PROC_JOURNAL_ENABLED", False)
+PROC_JOURNAL_INTERVAL_SECONDS: float = _get_float("MCP_PROC_JOURNAL_INTERVAL_SECONDS", 1.0)
+PROC_JOURNAL_RETENTION_DAYS: float = _get_float("MCP_PROC_JOURNAL_RETENTION_DAYS", 7.0)  # <0 no purga
+PROC_JOURNAL_HASH: bool = _get_bool("MCP_PROC_JOURNAL_HASH", True)  # hash SHA-256 del exe en cada arranque
+# Seguimiento de conexiones por deltas (eventos open/close de flujos)
+CONNTRACK_ENABLED: bool = _get_bool("MCP_CONNTRACK_ENABLED", False)
+CONNTRACK_INTERVAL_SECONDS: float = _get_float("MCP_CONNTRACK_INTERVAL_SECONDS", 2.0)
+CONNTRACK_MAX_EVENTS: int = _get_int("MCP_CONNTRACK_MAX_EVENTS", 10000)  # tamaño del buffer circular de eventos
+# Muestreo de métricas del sistema en segundo plano (snapshot sin bloqueo + histórico en memoria)
+METRICS_SAMPLER_ENABLED: bool = _get_bool("MCP_METRICS_SAMPLER_ENABLED", False)
+METRICS_CPU_INTERVAL_SECONDS: float = _get_float("MCP_METRICS_CPU_INTERVAL_SECONDS", 1.0)
+METRICS_MEMORY_INTERVAL_SECONDS: float = _get_float("MCP_METRICS_MEMORY_INTERVAL_SECONDS", 2.0)
+METRICS_DISK_INTERVAL_SECONDS: float = _get_float("MCP_METRICS_DISK_INTERVAL_SECONDS", 30.0)
+METRICS_NET_INTERVAL_SECONDS: float = _get_float("MCP_METRICS_NET_INTERVAL_SECONDS", 2.0)
+METRICS_PROCS_INTERVAL_SECONDS: float = _get_float("MCP_METRICS_PROCS_INTERVAL_SECONDS", 5.0)
+METRICS_HISTORY_POINTS: int = _get_int("MCP_METRICS_HISTORY_POINTS", 3600)  # buffer circular (1 punto por vuelta)
+# Agregados por minuto/hora de la tabla snapshots (min/max/avg/p95) y su retención
+METRICS_ROLLUP_ENABLED: bool = _get_bool("MCP_METRICS_ROLLUP_ENABLED", False)
+METRICS_ROLLUP_INTERVAL_SECONDS: float = _get_float("MCP_METRICS_ROLLUP_INTERVAL_SECONDS", 60.0)
+METRICS_ROLLUP_RECORD: bool = _get_bool("MCP_METRICS_ROLLUP_RECORD", True)  # guarda un snapshot por vuelta si el muestreador está activo
+METRICS_RAW_RETENTION_HOURS: float = _get_float("MCP_METRICS_RAW_RETENTION_HOURS", 48.0)
+METRICS_MINUTE_RETENTION_DAYS: float = _get_float("MCP_METRICS_MINUTE_RETENTION_DAYS", 14.0)
+METRICS_HOUR_RETENTION_DAYS: float = _get_float("MCP_METRICS_HOUR_RETENTION_DAYS", 400.0)
+# Caché de respuestas de /api/history (series ya reducidas con LTTB)
+HISTORY_CACHE_TTL_SECONDS: float = _get_float("MCP_HISTORY_CACHE_TTL_SECONDS", 15.0)
+HISTORY_CACHE_MAX_ENTRIES: int = _get_int("MCP_HISTORY_CACHE_MAX_ENTRIES", 256)
+# Árbol de tamaños de directorios en memoria (fs_top_dirs, /api/fs/heavy, /api/fs/tree)
+FS_TREE_TTL_SECONDS: float = _get_float("MCP_FS_TREE_TTL_SECONDS", 300.0)  # pasado el TTL se reconstruye en segundo plano
+FS_TREE_MAX_TREES: int = _get_int("MCP_FS_TREE_MAX_TREES", 8)
+FS_TREE_TOP_FILES: int = _get_int("MCP_FS_TREE_TOP_FILES", 20)  # archivos pesados guardados por nodo
+FS_TREE_HEAP_DEPTH: int = _get_int("MCP_FS_TREE_HEAP_DEPTH", 3)  # profundidad máxima de nodos que conservan su top-K
+FS_SCAN_WORKERS: int = _get_int("MCP_FS_SCAN_WORKERS", 8)  # hilos para subárboles de nivel 1 y 2 (1: recorrido secuencial)
+FS_SCAN_DEADLINE_SECONDS: float = _get_float("MCP_FS_SCAN_DEADLINE_SECONDS", 60.0)  # 0: sin plazo; al vencer se devuelve el árbol parcial
+# Índice persistente de uso de disco (SQLite propio) refrescado por mtime de carpeta / USN Journal
+DU_INDEX_ENABLED: bool = _get_bool("MCP_DU_INDEX_ENABLED", False)  # fs_top_dirs y /api/fs/* responden desde el índice si cubre la ruta
+DU_INDEX_PATH: str = os.getenv("MCP_DU_INDEX_PATH", "")  # vacío: du_index.sqlite3 junto a la base principal
+DU_INDEX_ROOTS: str = os.getenv("MCP_DU_INDEX_ROOTS", "")  # raíces separadas por comas que refresca el hilo
+DU_INDEX_REFRESH_SECONDS: float = _get_float("MCP_DU_INDEX_REFRESH_SECONDS", 900.0)
+DU_INDEX_MIN_FILE_MB: float = _get_float("MCP_DU_INDEX_MIN_FILE_MB", 16.0)  # archivos guardados para la vista de archivos pesados
+DU_INDEX_USN: bool = _get_bool("MCP_DU_INDEX_USN", False)  # Windows: relistar también las carpetas que el USN Journal marca como cambiadas
+# Buscador de duplicados (tamaño -> hash parcial -> hash completo)
+DUP_PARTIAL_KB: int = _get_int("MCP_DUP_PARTIAL_KB", 64)  # ventana hasheada al principio y al final de cada archivo
+DUP_HASH_WORKERS: int = _get_int("MCP_DUP_HASH_WORKERS", 4)
+DUP_MAX_FILES: int = _get_int("MCP_DUP_MAX_FILES", 2000000)  # tope de archivos recorridos por búsqueda
+DUP_HASH_CACHE_ENTRIES: int = _get_int("MCP_DUP_HASH_CACHE_ENTRIES", 100000)  # hashes cacheados por (ruta, tamaño, mtime)
+DUP_HASH_CACHE_TTL_SECONDS: float = _get_float("MCP_DUP_HASH_CACHE_TTL_SECONDS", 3600.0)
+# Pools de hilos del dashboard por categoría (trabajo bloqueante fuera del event loop)
+DASH_POOL_FS_WORKERS: int = _get_int("MCP_DASH_POOL_FS_WORKERS", 2)
+DASH_POOL_NETWORK_WORKERS: int = _get_int("MCP_DASH_POOL_NETWORK_WORKERS", 4)
+DASH_POOL_WMI_WORKERS: int = _get_int("MCP_DASH_POOL_WMI_WORKERS", 2)
+DASH_POOL_DEFENSE_WORKERS: int = _get_int("MCP_DASH_POOL_DEFENSE_WORKERS", 2)
+DASH_POOL_GENERAL_WORKERS: int = _get_int("MCP_DASH_POOL_GENERAL_WORKERS", 4)
+DASH_POOL_MAX_QUEUE: int = _get_int("MCP_DASH_POOL_MAX_QUEUE", 16)  # trabajos en espera por pool; lleno: 503
+DASH_POOL_TIMEOUT_SECONDS: float = _get_float("MCP_DASH_POOL_TIMEOUT_SECONDS", 15.0)  # network, wmi, general; vencido: 504
+DASH_FS_TIMEOUT_SECONDS: float = _get_float("MCP_DASH_FS_TIMEOUT_SECONDS", 120.0)
+DASH_DEFENSE_TIMEOUT_SECONDS: float = _get_float("MCP_DASH_DEFENSE_TIMEOUT_SECONDS", 30.0)
 
 # Mantenimiento de base de datos
 DB_MAINT_ENABLED: bool = _get_bool("MCP_DB_MAINT_ENABLED", True)
@@ -2,6 +2,7 @@ from typing import Dict, List, Optional
 
 import psutil
 from . import config as cfg
+from . import procinfo
 
 
 def list_connections(
@@ -15,7 +16,7 @@ def list_connections(
 
     - kind: 'inet', 'tcp', 'udp', etc.
     - listening_only: True para solo sockets en LISTEN
-    - include_process: añade nombre del proceso (puede ser costoso o denegado)
+    - include_process: añade nombre del proceso (vía la caché de procinfo; None si denegado)
     """
     # Aplicar cap de límite según configuración
     limit = cfg.clamp_limit(limit, "connections")
@@ -35,11 +36,7 @@ def list_connections(
                     "pid": c.pid,
                 }
                 if include_process and c.pid:
-                    try:
-                        p = psutil.Process(c.pid)
-                        item["process_name"] = p.name()
-                    except Exception:
-                        item["process_name"] = None
+                    item["process_name"] = procinfo.name(c.pid)
                 items.append(item)
                 if len(items) >= limit:
                     break
@@ -0,0 +1,225 @@
+"""Seguimiento de conexiones por deltas: eventos de apertura/cierre de flujos.
+
+Cada llamada a connections_list vuelve a enumerar todo y no guarda historia, así que las
+conexiones cortas (beaconing) entre dos sondeos se pierden. Este módulo muestrea
+`psutil.net_connections` cada MCP_CONNTRACK_INTERVAL_SECONDS y compara con la muestra
+anterior. Los flujos se identifican por (laddr, raddr, pid); sólo se siguen los que tienen
+extremo remoto.
+
+- Los eventos `open`/`close` van a un buffer circular acotado (MCP_CONNTRACK_MAX_EVENTS),
+  cada uno con un cursor creciente: los clientes piden `changes(since_cursor)` y reciben
+  sólo lo nuevo.
+- Por host remoto se acumulan en SQLite (`conn_host_stats`) aperturas, cierres y la
+  duración de los flujos cerrados; `history(host)` los combina con los eventos recientes.
+
+Sin el hilo en marcha (MCP_CONNTRACK_ENABLED=false), `changes()` toma una muestra al vuelo,
+de modo que cada sondeo sigue viendo los deltas desde el anterior.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import psutil
+
+from . import config as cfg
+from . import db
+from . import procinfo
+
+FlowKey = Tuple[str, str, Optional[int]]
+
+_LOCK = threading.Lock()
+_SAMPLE_LOCK = threading.Lock()
+_FLOWS: Dict[FlowKey, Dict[str, Any]] = {}
+_EVENTS: Deque[Dict[str, Any]] = deque(maxlen=max(1, cfg.CONNTRACK_MAX_EVENTS))
+_SEQ = 0
+_STATS = {"samples": 0, "opened": 0, "closed": 0, "errors": 0, "dropped_events": 0}
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+
+
+def _addr(a: Any) -> str:
+    return f"{getattr(a, 'ip', '')}:{getattr(a, 'port', '')}"
+
+
+def _host(raddr: str) -> str:
+    return raddr.rsplit(":", 1)[0]
+
+
+def sample_flows() -> Dict[FlowKey, str]:
+    """Flujos remotos actuales: {(laddr, raddr, pid): status}."""
+    out: Dict[FlowKey, str] = {}
+    for c in psutil.net_connections(kind="inet"):
+        if not c.raddr:
+            continue
+        out[(_addr(c.laddr) if c.laddr else "", _addr(c.raddr), c.pid)] = c.status
+    return out
+
+
+def _emit(kind: str, key: FlowKey, flow: Dict[str, Any], ts: float, **extra: Any) -> Dict[str, Any]:
+    global _SEQ
+    _SEQ += 1
+    if len(_EVENTS) == _EVENTS.maxlen:
+        _STATS["dropped_events"] += 1
+    ev = {
+        "cursor": _SEQ,
+        "ts": ts,
+        "event": kind,
+        "laddr": key[0],
+        "raddr": key[1],
+        "pid": key[2],
+        "process_name": flow.get("process_name"),
+        "status": flow.get("status"),
+        **extra,
+    }
+    _EVENTS.append(ev)
+    return ev
+
+
+def sample_once(current: Optional[Dict[FlowKey, str]] = None, *, now: Optional[float] = None) -> Dict[str, Any]:
+    """Toma una muestra, emite eventos de apertura/cierre y persiste los agregados por host."""
+    with _SAMPLE_LOCK:
+        if current is None:
+            current = sample_flows()
+        ts = time.time() if now is None else now
+        names: Dict[int, Optional[str]] = {}
+        for _, _, pid in current.keys() - _FLOWS.keys():
+            if pid and pid not in names:
+                names[pid] = procinfo.name(pid)
+
+        hosts: Dict[str, Dict[str, Any]] = {}
+        with _LOCK:
+            opened = closed = 0
+            for key in list(_FLOWS.keys() - current.keys()):
+                flow = _FLOWS.pop(key)
+                duration = round(ts - flow["opened"], 3)
+                _emit("close", key, flow, ts, duration=duration)
+                closed += 1
+                h = hosts.setdefault(_host(key[1]), {"host": _host(key[1]), "ts": ts, "opened": 0, "closed": 0, "seconds": 0.0})
+                h["closed"] += 1
+                h["seconds"] += max(0.0, duration)
+            for key, status in current.items():
+                flow = _FLOWS.get(key)
+                if flow is not None:
+                    flow["status"] = status
+                    continue
+                flow = {"opened": ts, "status": status, "process_name": names.get(key[2]) if key[2] else None}
+                _FLOWS[key] = flow
+                _emit("open", key, flow, ts)
+                opened += 1
+                h = hosts.setdefault(_host(key[1]), {"host": _host(key[1]), "ts": ts, "opened": 0, "closed": 0, "seconds": 0.0})
+                h["opened"] += 1
+                h.update({"raddr": key[1], "pid": key[2], "process": flow["process_name"]})
+            _STATS["samples"] += 1
+            _STATS["opened"] += opened
+            _STATS["closed"] += closed
+            cursor = _SEQ
+            active = len(_FLOWS)
+
+        if hosts:
+            try:
+                db.record_conn_host_activity(hosts.values())
+            except Exception:
+                with _LOCK:
+                    _STATS["errors"] += 1
+        return {"opened": opened, "closed": closed, "active": active, "cursor": cursor}
+
+
+def is_running() -> bool:
+    return _THREAD is not None and _THREAD.is_alive()
+
+
+def changes(since_cursor: int = 0, limit: int = 500) -> Dict[str, Any]:
+    """Eventos con cursor > `since_cursor` (como mucho `limit`).
+
+    `truncated` indica que el buffer ya descartó eventos posteriores a `since_cursor`: el
+    cliente debería volver a pedir un listado completo.
+    """
+    if not is_running():
+        sample_once()
+    limit = max(1, int(limit))
+    with _LOCK:
+        oldest = _EVENTS[0]["cursor"] if _EVENTS else _SEQ + 1
+        events = [dict(e) for e in _EVENTS if e["cursor"] > since_cursor]
+        latest = _SEQ
+        active = len(_FLOWS)
+    more = len(events) > limit
+    events = events[:limit]
+    return {
+        "cursor": events[-1]["cursor"] if more else latest,
+        "events": events,
+        "more": more,
+        "truncated": since_cursor + 1 < oldest <= latest,
+        "active_flows": active,
+        "running": is_running(),
+    }
+
+
+def history(host: str, limit: int = 100) -> Dict[str, Any]:
+    """Agregados persistidos y eventos recientes (del buffer) de un host remoto (IP o IP:puerto)."""
+    ip = _host(host) if host.count(":") == 1 else host
+    with _LOCK:
+        events = [dict(e) for e in _EVENTS if e["raddr"] == host or _host(e["raddr"]) == ip]
+        active = [
+            {"laddr": k[0], "raddr": k[1], "pid": k[2], "since": f["opened"], "status": f["status"], "process_name": f["process_name"]}
+            for k, f in _FLOWS.items()
+            if _host(k[1]) == ip
+        ]
+    return {
+        "host": ip,
+        "aggregate": db.get_conn_host_stats(ip),
+        "active": active,
+        "events": events[-max(1, int(limit)):],
+    }
+
+
+def _loop() -> None:
+    interval = max(0.5, float(cfg.CONNTRACK_INTERVAL_SECONDS))
+    while not _STOP.is_set():
+        try:
+            sample_once()
+        except Exception:
+            with _LOCK:
+                _STATS["errors"] += 1
+        _STOP.wait(interval)
+
+
+def start() -> bool:
+    """Arranca el hilo de muestreo (idempotente)."""
+    global _THREAD
+    with _LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, name="ConnTrack", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+        out.update({"active_flows": len(_FLOWS), "buffered_events": len(_EVENTS), "cursor": _SEQ})
+    out["running"] = is_running()
+    return out
+
+
+def reset() -> None:
+    global _SEQ
+    with _LOCK:
+        _FLOWS.clear()
+        _EVENTS.clear()
+        _SEQ = 0
+        for k in _STATS:
+            _STATS[k] = 0
@@ -3,8 +3,10 @@ from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
+from . import config as cfg
+from .lru import LRUCache
 
 DEFAULT_DB_DIR = Path.home() / ".mcp_win_admin"
 DEFAULT_DB_PATH = DEFAULT_DB_DIR / "state.sqlite3"
@@ -42,6 +44,66 @@ def get_conn(db_path: Optional[Path] = None) -> Iterable[sqlite3.Connection]:
         conn.close()
 
 
+# Capa LRU en memoria para las lecturas calientes de veredictos/reputación (ver lru.py).
+# Se cachean las filas crudas por clave y el filtrado por TTL se aplica en cada lectura, así
+# que un mismo resultado sirve para cualquier ttl_seconds. Las escrituras de este módulo
+# invalidan su clave; escrituras de otros procesos se ven al expirar la entrada.
+_ROW_CACHE = LRUCache(
+    "db_rows",
+    max_entries=cfg.DB_CACHE_MAX_ENTRIES,
+    max_bytes=cfg.DB_CACHE_MAX_BYTES,
+    ttl_seconds=cfg.DB_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=cfg.DB_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+
+def _cache_key(db_path: Optional[Path], table: str, *key: Any) -> tuple:
+    return (str(db_path or DEFAULT_DB_PATH), table, *key)
+
+
+def _is_negative(rows: list[Dict[str, Any]]) -> bool:
+    return not rows or all(str(r.get("verdict") or "").lower() == "unknown" for r in rows)
+
+
+def _cached_rows(
+    db_path: Optional[Path],
+    table: str,
+    key: tuple,
+    sql: str,
+    params: tuple,
+    convert: Optional[Callable[[sqlite3.Row], Dict[str, Any]]] = None,
+) -> list[Dict[str, Any]]:
+    """Filas de `sql` pasando por la caché en memoria (copias, para que el llamador pueda mutarlas)."""
+    ck = _cache_key(db_path, table, *key)
+    rows = _ROW_CACHE.get(ck) if cfg.DB_CACHE_ENABLED else None
+    if rows is None:
+        gen = _ROW_CACHE.generation()
+        with get_conn(db_path) as conn:
+            rows = [(convert or dict)(r) for r in conn.execute(sql, params).fetchall()]
+        if cfg.DB_CACHE_ENABLED:
+            _ROW_CACHE.put(ck, rows, negative=_is_negative(rows), generation=gen)
+    return [dict(r) for r in rows]
+
+
+def _invalidate(db_path: Optional[Path], table: str, *key: Any) -> None:
+    _ROW_CACHE.invalidate(_cache_key(db_path, table, *key))
+
+
+def row_cache_clear(db_path: Optional[Path] = None) -> int:
+    """Vacía la caché en memoria (toda, o sólo la de `db_path`). Útil tras escrituras directas con get_conn."""
+    if db_path is None:
+        _ROW_CACHE.clear()
+        return 0
+    target = str(db_path)
+    return _ROW_CACHE.invalidate_where(lambda k: k[0] == target)
+
+
+def row_cache_stats() -> Dict[str, Any]:
+    out = _ROW_CACHE.stats()
+    out["enabled"] = cfg.DB_CACHE_ENABLED
+    return out
+
+
 def init_db(db_path: Optional[Path] = None) -> None:
     with get_conn(db_path) as conn:
         conn.executescript(
@@ -60,6 +122,19 @@ def init_db(db_path: Optional[Path] = None) -> None:
 
             CREATE INDEX IF NOT EXISTS idx_snapshots_ts ON snapshots(ts_utc);
 
+            -- Per-minute/per-hour aggregates of snapshots (see metricstore.py); bucket is epoch start
+            CREATE TABLE IF NOT EXISTS snapshot_rollups (
+                resolution INTEGER NOT NULL,
+                metric TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                avg REAL NOT NULL,
+                p95 REAL NOT NULL,
+                PRIMARY KEY (resolution, metric, bucket)
+            ) WITHOUT ROWID;
+
             CREATE TABLE IF NOT EXISTS events (
                 id INTEGER PRIMARY KEY,
                 ts_utc TEXT NOT NULL,
@@ -85,6 +160,50 @@ def init_db(db_path: Optional[Path] = None) -> None:
             CREATE INDEX IF NOT EXISTS idx_av_hash ON av_hash_verdicts(hash);
             CREATE INDEX IF NOT EXISTS idx_av_last_seen ON av_hash_verdicts(last_seen);
 
+            -- Cloud hash lookups deferred by the budget planner (see cloudplan.py)
+            CREATE TABLE IF NOT EXISTS av_deferred_lookups (
+                hash TEXT NOT NULL,
+                algo TEXT NOT NULL,
+                source TEXT NOT NULL,
+                path TEXT,
+                score REAL NOT NULL,
+                enqueued_at TEXT NOT NULL,
+                PRIMARY KEY (hash, algo, source)
+            );
+            CREATE INDEX IF NOT EXISTS idx_av_deferred_score ON av_deferred_lookups(score);
+
+            -- Process lifecycle journal (see procjournal.py); ts is epoch seconds
+            CREATE TABLE IF NOT EXISTS proc_journal (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                event TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                create_time REAL,
+                ppid INTEGER,
+                name TEXT,
+                exe TEXT COLLATE NOCASE,
+                cmdline TEXT,
+                username TEXT,
+                exe_sha256 TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_proc_journal_ts ON proc_journal(ts);
+            CREATE INDEX IF NOT EXISTS idx_proc_journal_exe ON proc_journal(exe, ts);
+            CREATE INDEX IF NOT EXISTS idx_proc_journal_ppid ON proc_journal(ppid, ts);
+            CREATE INDEX IF NOT EXISTS idx_proc_journal_pid ON proc_journal(pid, create_time);
+
+            -- Per remote host connection aggregates from the connection tracker (see conntrack.py)
+            CREATE TABLE IF NOT EXISTS conn_host_stats (
+                host TEXT PRIMARY KEY,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                opened INTEGER NOT NULL DEFAULT 0,
+                closed INTEGER NOT NULL DEFAULT 0,
+                total_seconds REAL NOT NULL DEFAULT 0,
+                last_raddr TEXT,
+                last_pid INTEGER,
+                last_process TEXT
+            ) WITHOUT ROWID;
+
             -- File integrity monitoring
             CREATE TABLE IF NOT EXISTS integrity_baselines (
                 id INTEGER PRIMARY KEY,
@@ -107,59 +226,40 @@ def init_db(db_path: Optional[Path] = None) -> None:
             );
             CREATE INDEX IF NOT EXISTS idx_integrity_files_baseline ON integrity_files(baseline_id);
 
-            -- Reputation cache for IPs and domains
-            CREATE TABLE IF NOT EXISTS reputation_ip (
-                ip TEXT PRIMARY KEY,
-                verdict TEXT NOT NULL,
-                source TEXT NOT NULL,
-                first_seen TEXT NOT NULL,
-                last_seen TEXT NOT NULL,
-                metadata TEXT
-            );
-
-            CREATE TABLE IF NOT EXISTS reputation_domain (
-                domain TEXT PRIMARY KEY,
-                verdict TEXT NOT NULL,
-                source TEXT NOT NULL,
-                first_seen TEXT NOT NULL,
-                last_seen TEXT NOT NULL,
-                metadata TEXT
-            );
-            """
-        )
-        # Per-source reputation caches (non-breaking addition)
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS reputation_ip_src (
-                ip TEXT NOT NULL,
-                source TEXT NOT NULL,
-                verdict TEXT NOT NULL,
-                first_seen TEXT NOT NULL,
-                last_seen TEXT NOT NULL,
-                metadata TEXT,
-                PRIMARY KEY (ip, source)
+            -- Reputation cache for IPs and domains: one row per (type, value, source).
+            -- Verdict/source are integer-encoded and timestamps are epoch seconds.
+            CREATE TABLE IF NOT EXISTS indicator_sources (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
             );
 
-            CREATE TABLE IF NOT EXISTS reputation_domain_src (
-                domain TEXT NOT NULL,
-                source TEXT NOT NULL,
-                verdict TEXT NOT NULL,
-                first_seen TEXT NOT NULL,
-                last_seen TEXT NOT NULL,
+            CREATE TABLE IF NOT EXISTS indicators (
+                type INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                source INTEGER NOT NULL,
+                verdict INTEGER NOT NULL,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
                 metadata TEXT,
-                PRIMARY KEY (domain, source)
-            );
-            """
-        )
-        # Helpful indexes for maintenance/TTL purges and reporting
-        conn.executescript(
-            """
-            CREATE INDEX IF NOT EXISTS idx_rep_ip_last_seen ON reputation_ip(last_seen);
-            CREATE INDEX IF NOT EXISTS idx_rep_domain_last_seen ON reputation_domain(last_seen);
-            CREATE INDEX IF NOT EXISTS idx_rep_ip_src_last_seen ON reputation_ip_src(last_seen);
-            CREATE INDEX IF NOT EXISTS idx_rep_domain_src_last_seen ON reputation_domain_src(last_seen);
+                PRIMARY KEY (type, value, source)
+            ) WITHOUT ROWID;
+
+            -- Aggregate verdict per indicator (worst verdict across sources)
+            CREATE VIEW IF NOT EXISTS indicator_verdicts AS
+            SELECT i.type AS type,
+                   i.value AS value,
+                   MAX(i.verdict) AS verdict,
+                   group_concat(s.name, ',') AS source,
+                   MIN(i.first_seen) AS first_seen,
+                   MAX(i.last_seen) AS last_seen,
+                   COUNT(*) AS sources
+            FROM indicators i JOIN indicator_sources s ON s.id = i.source
+            GROUP BY i.type, i.value;
             """
         )
+        _migrate_legacy_reputation(conn)
+        for key in [k for k in _SOURCE_IDS if k[0] == str(db_path or DEFAULT_DB_PATH)]:
+            _SOURCE_IDS.pop(key, None)
 
         # Run optimizer pass at init (cheap, safe)
         try:
@@ -168,13 +268,13 @@ def init_db(db_path: Optional[Path] = None) -> None:
             pass
 
 
-def insert_snapshot(data: Dict[str, Any], db_path: Optional[Path] = None) -> int:
+def insert_snapshot(data: Dict[str, Any], db_path: Optional[Path] = None, *, ts: Optional[float] = None) -> int:
     """Insert a system snapshot and return its row id.
 
     Expected keys: cpu_percent, mem_percent, mem_total, mem_used, disk_percent, uptime_seconds,
-    processes_total
+    processes_total. `ts` (epoch) defaults to now.
     """
-    now = datetime.now(timezone.utc).isoformat()
+    now = _iso_utc(ts) if ts is not None else datetime.now(timezone.utc).isoformat()
     with get_conn(db_path) as conn:
         cur = conn.execute(
             """
@@ -205,6 +305,103 @@ def get_last_snapshot(db_path: Optional[Path] = None) -> Optional[Dict[str, Any]
         return dict(row) if row else None
 
 
+def _iso_utc(ts: float) -> str:
+    return datetime.fromtimestamp(float(ts), timezone.utc).isoformat()
+
+
+def _epoch(ts_utc: str) -> float:
+    return datetime.fromisoformat(ts_utc).timestamp()
+
+
+def list_snapshots_between(since: float, until: float, db_path: Optional[Path] = None) -> list[Dict[str, Any]]:
+    """Snapshots with since <= ts < until (epoch), oldest first; each row gets an epoch `ts`.
+
+    ts_utc is ISO-8601 UTC text, which sorts chronologically, so the range uses idx_snapshots_ts.
+    """
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM snapshots WHERE ts_utc >= ? AND ts_utc < ? ORDER BY ts_utc",
+            (_iso_utc(since), _iso_utc(until)),
+        ).fetchall()
+    out = []
+    for r in rows:
+        d = dict(r)
+        d["ts"] = _epoch(d["ts_utc"])
+        out.append(d)
+    return out
+
+
+def count_snapshots_between(since: float, until: float, db_path: Optional[Path] = None) -> int:
+    with get_conn(db_path) as conn:
+        row = conn.execute(
+            "SELECT COUNT(*) FROM snapshots WHERE ts_utc >= ? AND ts_utc < ?",
+            (_iso_utc(since), _iso_utc(until)),
+        ).fetchone()
+    return int(row[0])
+
+
+def first_snapshot_ts(after: Optional[float] = None, db_path: Optional[Path] = None) -> Optional[float]:
+    """Epoch of the oldest snapshot (optionally at or after `after`), or None."""
+    with get_conn(db_path) as conn:
+        if after is None:
+            row = conn.execute("SELECT MIN(ts_utc) FROM snapshots").fetchone()
+        else:
+            row = conn.execute("SELECT MIN(ts_utc) FROM snapshots WHERE ts_utc >= ?", (_iso_utc(after),)).fetchone()
+    return _epoch(row[0]) if row and row[0] else None
+
+
+_ROLLUP_COLS = ("resolution", "metric", "bucket", "n", "min", "max", "avg", "p95")
+
+
+def upsert_snapshot_rollups(items: Iterable[Dict[str, Any]], db_path: Optional[Path] = None) -> int:
+    rows = [tuple(it[c] for c in _ROLLUP_COLS) for it in items]
+    if not rows:
+        return 0
+    with get_conn(db_path) as conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO snapshot_rollups ({', '.join(_ROLLUP_COLS)}) VALUES ({', '.join('?' * len(_ROLLUP_COLS))})",
+            rows,
+        )
+    return len(rows)
+
+
+def query_snapshot_rollups(
+    resolution: int, metric: str, since: float, until: float, db_path: Optional[Path] = None
+) -> list[Dict[str, Any]]:
+    """Rollups of one metric with since <= bucket < until, oldest first."""
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            "SELECT bucket, n, min, max, avg, p95 FROM snapshot_rollups"
+            " WHERE resolution = ? AND metric = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (int(resolution), metric, since, until),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def last_rollup_bucket(resolution: int, db_path: Optional[Path] = None) -> Optional[int]:
+    with get_conn(db_path) as conn:
+        row = conn.execute("SELECT MAX(bucket) FROM snapshot_rollups WHERE resolution = ?", (int(resolution),)).fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def purge_snapshots_older_than(ttl_seconds: int, db_path: Optional[Path] = None) -> int:
+    if ttl_seconds is None or ttl_seconds < 0:
+        return 0
+    cutoff = _iso_utc(datetime.now(timezone.utc).timestamp() - ttl_seconds)
+    with get_conn(db_path) as conn:
+        cur = conn.execute("DELETE FROM snapshots WHERE ts_utc < ?", (cutoff,))
+        return int(cur.rowcount if cur.rowcount is not None else 0)
+
+
+def purge_snapshot_rollups_older_than(resolution: int, ttl_seconds: int, db_path: Optional[Path] = None) -> int:
+    if ttl_seconds is None or ttl_seconds < 0:
+        return 0
+    cutoff = datetime.now(timezone.utc).timestamp() - ttl_seconds
+    with get_conn(db_path) as conn:
+        cur = conn.execute("DELETE FROM snapshot_rollups WHERE resolution = ? AND bucket < ?", (int(resolution), cutoff))
+        return int(cur.rowcount if cur.rowcount is not None else 0)
+
+
 from . import events as evtmod
 
 def log_event(level: str, message: str, code: Optional[str] = None, db_path: Optional[Path] = None) -> int:
@@ -247,6 +444,7 @@ def upsert_hash_verdict(
             """,
             (hash_hex.lower(), algo.lower(), source, verdict, now, now, metadata),
         )
+    _invalidate(db_path, "av_hash_verdicts", hash_hex.lower(), algo.lower())
 
 
 def get_hash_verdict(
@@ -257,31 +455,217 @@ def get_hash_verdict(
     Prefers malicious > suspicious > clean > unknown when multiple sources exist.
     """
     order = {"malicious": 3, "suspicious": 2, "clean": 1, "unknown": 0}
+    rows = _hash_rows(hash_hex, algo, db_path)
+    if not rows:
+        return None
+    if ttl_seconds is not None and ttl_seconds >= 0:
+        try:
+            cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
+            fresh_rows = []
+            for r in rows:
+                # last_seen is ISO; parse conservatively
+                try:
+                    dt = datetime.fromisoformat(r["last_seen"])
+                    ts = dt.timestamp()
+                except Exception:
+                    ts = 0
+                if ts >= cutoff:
+                    fresh_rows.append(r)
+            rows = fresh_rows or rows  # if none fresh, keep originals to allow fallback
+        except Exception:
+            pass
+    return max(rows, key=lambda r: order.get(r["verdict"].lower(), -1))
+
+
+def get_hash_verdict_sources(*, hash_hex: str, algo: str, db_path: Optional[Path] = None) -> list[Dict[str, Any]]:
+    """Return every cached per-source verdict for the hash (no TTL filtering)."""
+    return _hash_rows(hash_hex, algo, db_path)
+
+
+def _hash_rows(hash_hex: str, algo: str, db_path: Optional[Path]) -> list[Dict[str, Any]]:
+    h, a = hash_hex.lower(), algo.lower()
+    return _cached_rows(
+        db_path, "av_hash_verdicts", (h, a),
+        "SELECT * FROM av_hash_verdicts WHERE hash = ? AND algo = ?", (h, a),
+    )
+
+
+def enqueue_deferred_lookups(items: Iterable[Dict[str, Any]], db_path: Optional[Path] = None) -> int:
+    """Añade (hash, algo, source) a la cola de consultas aplazadas conservando la mayor puntuación.
+
+    La cola se recorta a MCP_AV_DEFERRED_MAX entradas descartando las de menor puntuación.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    rows = [
+        (str(it["hash"]).lower(), str(it["algo"]).lower(), it["source"], it.get("path"), float(it.get("score", 0.0)), now)
+        for it in items
+    ]
+    if not rows:
+        return 0
     with get_conn(db_path) as conn:
-        rows = conn.execute(
-            "SELECT * FROM av_hash_verdicts WHERE hash = ? AND algo = ?",
-            (hash_hex.lower(), algo.lower()),
-        ).fetchall()
-        if not rows:
-            return None
-        if ttl_seconds is not None and ttl_seconds >= 0:
-            try:
-                cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
-                fresh_rows = []
-                for r in rows:
-                    # last_seen is ISO; parse conservatively
-                    try:
-                        dt = datetime.fromisoformat(r["last_seen"])  # type: ignore[index]
-                        ts = dt.timestamp()
-                    except Exception:
-                        ts = 0
-                    if ts >= cutoff:
-                        fresh_rows.append(r)
-                rows = fresh_rows or rows  # if none fresh, keep originals to allow fallback
-            except Exception:
-                pass
-        best = max(rows, key=lambda r: order.get(r["verdict"].lower(), -1))
-        return dict(best)
+        conn.executemany(
+            """
+            INSERT INTO av_deferred_lookups (hash, algo, source, path, score, enqueued_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(hash, algo, source) DO UPDATE SET
+                path = excluded.path,
+                score = MAX(av_deferred_lookups.score, excluded.score)
+            """,
+            rows,
+        )
+        conn.execute(
+            """
+            DELETE FROM av_deferred_lookups WHERE rowid IN (
+                SELECT rowid FROM av_deferred_lookups ORDER BY score DESC, enqueued_at LIMIT -1 OFFSET ?
+            )
+            """,
+            (max(0, cfg.AV_DEFERRED_MAX),),
+        )
+    return len(rows)
+
+
+def list_deferred_lookups(limit: int = 100, source: Optional[str] = None, db_path: Optional[Path] = None) -> list[Dict[str, Any]]:
+    """Consultas aplazadas, de mayor a menor puntuación."""
+    sql = "SELECT * FROM av_deferred_lookups"
+    params: tuple = ()
+    if source:
+        sql += " WHERE source = ?"
+        params = (source,)
+    sql += " ORDER BY score DESC, enqueued_at LIMIT ?"
+    with get_conn(db_path) as conn:
+        return [dict(r) for r in conn.execute(sql, params + (int(limit),)).fetchall()]
+
+
+def count_deferred_lookups(source: Optional[str] = None, db_path: Optional[Path] = None) -> int:
+    sql, params = "SELECT COUNT(*) FROM av_deferred_lookups", ()
+    if source:
+        sql, params = sql + " WHERE source = ?", (source,)
+    with get_conn(db_path) as conn:
+        return int(conn.execute(sql, params).fetchone()[0])
+
+
+def delete_deferred_lookups(keys: Iterable[Tuple[str, str, str]], db_path: Optional[Path] = None) -> int:
+    rows = [(h.lower(), a.lower(), s) for h, a, s in keys]
+    if not rows:
+        return 0
+    with get_conn(db_path) as conn:
+        cur = conn.executemany("DELETE FROM av_deferred_lookups WHERE hash = ? AND algo = ? AND source = ?", rows)
+        return int(cur.rowcount if cur.rowcount is not None else 0)
+
+
+def record_conn_host_activity(items: Iterable[Dict[str, Any]], db_path: Optional[Path] = None) -> int:
+    """Acumula aperturas/cierres de flujos por host remoto.
+
+    Cada item: host, ts (epoch), opened, closed, seconds (duración de los cerrados), raddr, pid, process.
+    """
+    rows = [
+        (
+            it["host"], int(it["ts"]), int(it["ts"]), int(it.get("opened", 0)), int(it.get("closed", 0)),
+            float(it.get("seconds", 0.0)), it.get("raddr"), it.get("pid"), it.get("process"),
+        )
+        for it in items
+    ]
+    if not rows:
+        return 0
+    with get_conn(db_path) as conn:
+        conn.executemany(
+            """
+            INSERT INTO conn_host_stats (host, first_seen, last_seen, opened, closed, total_seconds, last_raddr, last_pid, last_process)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(host) DO UPDATE SET
+                last_seen = MAX(conn_host_stats.last_seen, excluded.last_seen),
+                opened = conn_host_stats.opened + excluded.opened,
+                closed = conn_host_stats.closed + excluded.closed,
+                total_seconds = conn_host_stats.total_seconds + excluded.total_seconds,
+                last_raddr = COALESCE(excluded.last_raddr, conn_host_stats.last_raddr),
+                last_pid = COALESCE(excluded.last_pid, conn_host_stats.last_pid),
+                last_process = COALESCE(excluded.last_process, conn_host_stats.last_process)
+            """,
+            rows,
+        )
+    return len(rows)
+
+
+def _conn_host_row(row: sqlite3.Row) -> Dict[str, Any]:
+    out = dict(row)
+    out["first_seen"] = _iso(out["first_seen"])
+    out["last_seen"] = _iso(out["last_seen"])
+    return out
+
+
+def get_conn_host_stats(host: str, db_path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    with get_conn(db_path) as conn:
+        row = conn.execute("SELECT * FROM conn_host_stats WHERE host = ?", (host,)).fetchone()
+    return _conn_host_row(row) if row is not None else None
+
+
+def list_conn_host_stats(limit: int = 100, db_path: Optional[Path] = None) -> list[Dict[str, Any]]:
+    """Hosts remotos vistos por el tracker, los más recientes primero."""
+    with get_conn(db_path) as conn:
+        rows = conn.execute("SELECT * FROM conn_host_stats ORDER BY last_seen DESC LIMIT ?", (int(limit),)).fetchall()
+    return [_conn_host_row(r) for r in rows]
+
+
+_PROC_JOURNAL_COLS = ("ts", "event", "pid", "create_time", "ppid", "name", "exe", "cmdline", "username", "exe_sha256")
+
+
+def insert_proc_journal_events(items: Iterable[Dict[str, Any]], db_path: Optional[Path] = None) -> int:
+    rows = [tuple(it.get(c) for c in _PROC_JOURNAL_COLS) for it in items]
+    if not rows:
+        return 0
+    with get_conn(db_path) as conn:
+        conn.executemany(
+            f"INSERT INTO proc_journal ({', '.join(_PROC_JOURNAL_COLS)}) VALUES ({', '.join('?' * len(_PROC_JOURNAL_COLS))})",
+            rows,
+        )
+    return len(rows)
+
+
+def query_proc_journal(
+    *,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    exe: Optional[str] = None,
+    name: Optional[str] = None,
+    ppid: Optional[int] = None,
+    pid: Optional[int] = None,
+    event: Optional[str] = None,
+    limit: int = 200,
+    db_path: Optional[Path] = None,
+) -> list[Dict[str, Any]]:
+    """Eventos del diario de procesos, más recientes primero. Todos los filtros son opcionales."""
+    where: list[str] = []
+    params: list[Any] = []
+    for col, op, val in (
+        ("ts", ">=", since),
+        ("ts", "<=", until),
+        ("exe", "=", exe),
+        ("ppid", "=", ppid),
+        ("pid", "=", pid),
+        ("event", "=", event),
+    ):
+        if val is not None:
+            where.append(f"{col} {op} ?")
+            params.append(val)
+    if name:
+        where.append("name LIKE ?")
+        params.append(f"%{name}%")
+    sql = "SELECT * FROM proc_journal"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+    params.append(int(limit))
+    with get_conn(db_path) as conn:
+        return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def purge_proc_journal_older_than(ttl_seconds: int, db_path: Optional[Path] = None) -> int:
+    if ttl_seconds is None or ttl_seconds < 0:
+        return 0
+    cutoff = datetime.now(timezone.utc).timestamp() - ttl_seconds
+    with get_conn(db_path) as conn:
+        cur = conn.execute("DELETE FROM proc_journal WHERE ts < ?", (cutoff,))
+        return int(cur.rowcount if cur.rowcount is not None else 0)
 
 
 def insert_integrity_baseline(*, name: str, root_path: str, algo: str, db_path: Optional[Path] = None) -> int:
@@ -354,152 +738,199 @@ def get_integrity_files(baseline_id: int, db_path: Optional[Path] = None) -> lis
         return [dict(r) for r in rows]
 
 
-def upsert_ip_reputation(*, ip: str, verdict: str, source: str, metadata: Optional[str] = None, db_path: Optional[Path] = None) -> None:
-    now = datetime.now(timezone.utc).isoformat()
+# Tipos de indicador y códigos de veredicto de la tabla `indicators`
+IND_IP = 1
+IND_DOMAIN = 2
+_IND_KEYS = {IND_IP: "ip", IND_DOMAIN: "domain"}
+VERDICT_CODES = {"unknown": 0, "clean": 1, "suspicious": 2, "malicious": 3}
+VERDICT_NAMES = {v: k for k, v in VERDICT_CODES.items()}
+
+# (db_path, nombre de fuente) -> id en indicator_sources
+_SOURCE_IDS: Dict[tuple, int] = {}
+
+# Tablas previas a `indicators`; las de por fuente primero para que prevalezcan sobre el agregado
+_LEGACY_REPUTATION = (
+    ("reputation_ip_src", IND_IP, "ip"),
+    ("reputation_domain_src", IND_DOMAIN, "domain"),
+    ("reputation_ip", IND_IP, "ip"),
+    ("reputation_domain", IND_DOMAIN, "domain"),
+)
+
+
+def _migrate_legacy_reputation(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Copia las cuatro tablas de reputación antiguas a `indicators` y las elimina.
+
+    Se ejecuta en init_db; si no quedan tablas antiguas no hace nada. Retorna filas migradas por tabla.
+    """
+    found = {r[0] for r in (conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'reputation_%'") or ())}
+    legacy = [t for t in _LEGACY_REPUTATION if t[0] in found]
+    if not legacy:
+        return {}
+    verdict_sql = "CASE lower(t.verdict) " + " ".join(f"WHEN '{k}' THEN {v}" for k, v in VERDICT_CODES.items()) + " ELSE 0 END"
+    counts: Dict[str, int] = {}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table, kind, col in legacy:
+            conn.execute(f"INSERT OR IGNORE INTO indicator_sources (name) SELECT DISTINCT source FROM {table}")
+            cur = conn.execute(
+                f"""
+                INSERT INTO indicators (type, value, source, verdict, first_seen, last_seen, metadata)
+                SELECT {kind}, t.{col}, s.id, {verdict_sql},
+                       COALESCE(CAST(strftime('%s', t.first_seen) AS INTEGER), 0),
+                       COALESCE(CAST(strftime('%s', t.last_seen) AS INTEGER), 0),
+                       t.metadata
+                FROM {table} t JOIN indicator_sources s ON s.name = t.source
+                WHERE 1
+                ON CONFLICT(type, value, source) DO NOTHING
+                """
+            )
+            counts[table] = int(cur.rowcount if cur.rowcount is not None else 0)
+            conn.execute(f"DROP TABLE {table}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return counts
+
+
+def _iso(ts: Any) -> Any:
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+    return ts
+
+
+def _within_ttl(last_seen: Any, ttl_seconds: Optional[int]) -> bool:
+    if ttl_seconds is None or not ttl_seconds >= 0:
+        return True
+    try:
+        cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
+    except Exception:
+        return True
+    try:
+        ts = datetime.fromisoformat(last_seen).timestamp()
+    except Exception:
+        ts = 0
+    return ts >= cutoff
+
+
+def _source_id(conn: sqlite3.Connection, db_path: Optional[Path], name: str) -> int:
+    key = (str(db_path or DEFAULT_DB_PATH), name)
+    sid = _SOURCE_IDS.get(key)
+    if sid is None:
+        conn.execute("INSERT OR IGNORE INTO indicator_sources (name) VALUES (?)", (name,))
+        sid = int(conn.execute("SELECT id FROM indicator_sources WHERE name = ?", (name,)).fetchone()[0])
+        _SOURCE_IDS[key] = sid
+    return sid
+
+
+def _upsert_indicator(kind: int, value: str, source: str, verdict: str, metadata: Optional[str], db_path: Optional[Path]) -> None:
+    now = int(datetime.now(timezone.utc).timestamp())
+    code = VERDICT_CODES.get(str(verdict).lower(), 0)
     with get_conn(db_path) as conn:
+        sid = _source_id(conn, db_path, source)
         conn.execute(
             """
-            INSERT INTO reputation_ip (ip, verdict, source, first_seen, last_seen, metadata)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(ip) DO UPDATE SET
+            INSERT INTO indicators (type, value, source, verdict, first_seen, last_seen, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(type, value, source) DO UPDATE SET
                 verdict = excluded.verdict,
-                source = excluded.source,
                 last_seen = excluded.last_seen,
                 metadata = excluded.metadata
             """,
-            (ip, verdict, source, now, now, metadata),
+            (kind, value, sid, code, now, now, metadata),
         )
+    _invalidate(db_path, "indicators", kind, value)
+    _invalidate(db_path, "indicator_verdicts", kind, value)
+
+
+def _indicator_rows(kind: int, value: str, db_path: Optional[Path]) -> list[Dict[str, Any]]:
+    col = _IND_KEYS[kind]
+
+    def convert(r: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            col: value,
+            "source": r["source"],
+            "verdict": VERDICT_NAMES.get(r["verdict"], "unknown"),
+            "first_seen": _iso(r["first_seen"]),
+            "last_seen": _iso(r["last_seen"]),
+            "metadata": r["metadata"],
+        }
+
+    return _cached_rows(
+        db_path, "indicators", (kind, value),
+        """
+        SELECT s.name AS source, i.verdict, i.first_seen, i.last_seen, i.metadata
+        FROM indicators i JOIN indicator_sources s ON s.id = i.source
+        WHERE i.type = ? AND i.value = ?
+        """,
+        (kind, value),
+        convert,
+    )
+
+
+def _indicator_aggregate(kind: int, value: str, db_path: Optional[Path]) -> Optional[Dict[str, Any]]:
+    col = _IND_KEYS[kind]
+
+    def convert(r: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            col: value,
+            "verdict": VERDICT_NAMES.get(r["verdict"], "unknown"),
+            "source": r["source"],
+            "sources": r["sources"],
+            "first_seen": _iso(r["first_seen"]),
+            "last_seen": _iso(r["last_seen"]),
+            "metadata": None,
+        }
+
+    rows = _cached_rows(
+        db_path, "indicator_verdicts", (kind, value),
+        "SELECT verdict, source, sources, first_seen, last_seen FROM indicator_verdicts WHERE type = ? AND value = ?",
+        (kind, value),
+        convert,
+    )
+    return rows[0] if rows else None
+
+
+def upsert_ip_reputation(*, ip: str, verdict: str, source: str, metadata: Optional[str] = None, db_path: Optional[Path] = None) -> None:
+    """Compatibilidad: el agregado ya no se guarda (lo calcula la vista `indicator_verdicts`),
+    así que equivale a registrar el veredicto de `source` para la IP."""
+    _upsert_indicator(IND_IP, ip, source, verdict, metadata, db_path)
 
 
 def get_ip_reputation(*, ip: str, db_path: Optional[Path] = None, ttl_seconds: Optional[int] = None) -> Optional[Dict[str, Any]]:
-    with get_conn(db_path) as conn:
-        row = conn.execute("SELECT * FROM reputation_ip WHERE ip = ?", (ip,)).fetchone()
-        if not row:
-            return None
-        if ttl_seconds is not None and ttl_seconds >= 0:
-            try:
-                cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
-                try:
-                    dt = datetime.fromisoformat(row["last_seen"])  # type: ignore[index]
-                    ts = dt.timestamp()
-                except Exception:
-                    ts = 0
-                if ts < cutoff:
-                    return None
-            except Exception:
-                pass
-        return dict(row)
+    """Veredicto agregado (el peor entre fuentes); `last_seen` es el de la fuente más reciente."""
+    row = _indicator_aggregate(IND_IP, ip, db_path)
+    if row is None or not _within_ttl(row["last_seen"], ttl_seconds):
+        return None
+    return row
 
 
 def upsert_ip_reputation_source(*, ip: str, source: str, verdict: str, metadata: Optional[str] = None, db_path: Optional[Path] = None) -> None:
-    now = datetime.now(timezone.utc).isoformat()
-    with get_conn(db_path) as conn:
-        conn.execute(
-            """
-            INSERT INTO reputation_ip_src (ip, source, verdict, first_seen, last_seen, metadata)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(ip, source) DO UPDATE SET
-                verdict = excluded.verdict,
-                last_seen = excluded.last_seen,
-                metadata = excluded.metadata
-            """,
-            (ip, source, verdict, now, now, metadata),
-        )
+    _upsert_indicator(IND_IP, ip, source, verdict, metadata, db_path)
 
 
 def get_ip_reputation_sources(*, ip: str, db_path: Optional[Path] = None, ttl_seconds: Optional[int] = None) -> list[Dict[str, Any]]:
-    with get_conn(db_path) as conn:
-        rows = conn.execute("SELECT * FROM reputation_ip_src WHERE ip = ?", (ip,)).fetchall()
-        out: list[Dict[str, Any]] = []
-        for row in rows:
-            if ttl_seconds is not None and ttl_seconds >= 0:
-                try:
-                    cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
-                    try:
-                        dt = datetime.fromisoformat(row["last_seen"])  # type: ignore[index]
-                        ts = dt.timestamp()
-                    except Exception:
-                        ts = 0
-                    if ts < cutoff:
-                        continue
-                except Exception:
-                    pass
-            out.append(dict(row))
-        return out
+    return [r for r in _indicator_rows(IND_IP, ip, db_path) if _within_ttl(r["last_seen"], ttl_seconds)]
 
 
 def upsert_domain_reputation_source(*, domain: str, source: str, verdict: str, metadata: Optional[str] = None, db_path: Optional[Path] = None) -> None:
-    now = datetime.now(timezone.utc).isoformat()
-    with get_conn(db_path) as conn:
-        conn.execute(
-            """
-            INSERT INTO reputation_domain_src (domain, source, verdict, first_seen, last_seen, metadata)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(domain, source) DO UPDATE SET
-                verdict = excluded.verdict,
-                last_seen = excluded.last_seen,
-                metadata = excluded.metadata
-            """,
-            (domain.lower(), source, verdict, now, now, metadata),
-        )
+    _upsert_indicator(IND_DOMAIN, domain.lower(), source, verdict, metadata, db_path)
 
 
 def get_domain_reputation_sources(*, domain: str, db_path: Optional[Path] = None, ttl_seconds: Optional[int] = None) -> list[Dict[str, Any]]:
-    with get_conn(db_path) as conn:
-        rows = conn.execute("SELECT * FROM reputation_domain_src WHERE domain = ?", (domain.lower(),)).fetchall()
-        out: list[Dict[str, Any]] = []
-        for row in rows:
-            if ttl_seconds is not None and ttl_seconds >= 0:
-                try:
-                    cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
-                    try:
-                        dt = datetime.fromisoformat(row["last_seen"])  # type: ignore[index]
-                        ts = dt.timestamp()
-                    except Exception:
-                        ts = 0
-                    if ts < cutoff:
-                        continue
-                except Exception:
-                    pass
-            out.append(dict(row))
-        return out
+    return [r for r in _indicator_rows(IND_DOMAIN, domain.lower(), db_path) if _within_ttl(r["last_seen"], ttl_seconds)]
 
 
 def upsert_domain_reputation(*, domain: str, verdict: str, source: str, metadata: Optional[str] = None, db_path: Optional[Path] = None) -> None:
-    now = datetime.now(timezone.utc).isoformat()
-    with get_conn(db_path) as conn:
-        conn.execute(
-            """
-            INSERT INTO reputation_domain (domain, verdict, source, first_seen, last_seen, metadata)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(domain) DO UPDATE SET
-                verdict = excluded.verdict,
-                source = excluded.source,
-                last_seen = excluded.last_seen,
-                metadata = excluded.metadata
-            """,
-            (domain.lower(), verdict, source, now, now, metadata),
-        )
+    """Compatibilidad: equivale a `upsert_domain_reputation_source` (ver `upsert_ip_reputation`)."""
+    _upsert_indicator(IND_DOMAIN, domain.lower(), source, verdict, metadata, db_path)
 
 
 def get_domain_reputation(*, domain: str, db_path: Optional[Path] = None, ttl_seconds: Optional[int] = None) -> Optional[Dict[str, Any]]:
-    with get_conn(db_path) as conn:
-        row = conn.execute("SELECT * FROM reputation_domain WHERE domain = ?", (domain.lower(),)).fetchone()
-        if not row:
-            return None
-        if ttl_seconds is not None and ttl_seconds >= 0:
-            try:
-                cutoff = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
-                try:
-                    dt = datetime.fromisoformat(row["last_seen"])  # type: ignore[index]
-                    ts = dt.timestamp()
-                except Exception:
-                    ts = 0
-                if ts < cutoff:
-                    return None
-            except Exception:
-                pass
-        return dict(row)
+    row = _indicator_aggregate(IND_DOMAIN, domain.lower(), db_path)
+    if row is None or not _within_ttl(row["last_seen"], ttl_seconds):
+        return None
+    return row
 
 
 def purge_events_older_than(ttl_seconds: int, db_path: Optional[Path] = None) -> int:
@@ -517,19 +948,19 @@ def purge_events_older_than(ttl_seconds: int, db_path: Optional[Path] = None) ->
 
 
 def purge_reputation_older_than(ttl_seconds: int, db_path: Optional[Path] = None) -> Dict[str, int]:
-    """Elimina reputación antigua (global y por fuente) basada en last_seen. Retorna conteos por tabla.
+    """Elimina reputación antigua (por fuente) basada en last_seen. Retorna conteos por tipo de indicador.
 
     Si ttl_seconds < 0, no hace nada.
     """
-    counts = {"reputation_ip": 0, "reputation_domain": 0, "reputation_ip_src": 0, "reputation_domain_src": 0}
+    counts = {name: 0 for name in _IND_KEYS.values()}
     if ttl_seconds is None or int(ttl_seconds) < 0:
         return counts
-    cutoff_ts = datetime.now(timezone.utc).timestamp() - int(ttl_seconds)
-    cutoff_iso = datetime.fromtimestamp(cutoff_ts, tz=timezone.utc).isoformat()
+    cutoff_ts = int(datetime.now(timezone.utc).timestamp() - int(ttl_seconds))
     with get_conn(db_path) as conn:
-        for table in ("reputation_ip", "reputation_domain", "reputation_ip_src", "reputation_domain_src"):
-            cur = conn.execute(f"DELETE FROM {table} WHERE last_seen < ?", (cutoff_iso,))
-            counts[table] = int(cur.rowcount if cur.rowcount is not None else 0)
+        for kind, name in _IND_KEYS.items():
+            cur = conn.execute("DELETE FROM indicators WHERE type = ? AND last_seen < ?", (kind, cutoff_ts))
+            counts[name] = int(cur.rowcount if cur.rowcount is not None else 0)
+    row_cache_clear(db_path or DEFAULT_DB_PATH)
     return counts
 
 
@@ -544,7 +975,9 @@ def purge_av_hash_verdicts_older_than(ttl_seconds: int, db_path: Optional[Path]
     cutoff_iso = datetime.fromtimestamp(cutoff_ts, tz=timezone.utc).isoformat()
     with get_conn(db_path) as conn:
         cur = conn.execute("DELETE FROM av_hash_verdicts WHERE last_seen < ?", (cutoff_iso,))
-        return int(cur.rowcount if cur.rowcount is not None else 0)
+        deleted = int(cur.rowcount if cur.rowcount is not None else 0)
+    row_cache_clear(db_path or DEFAULT_DB_PATH)
+    return deleted
 
 
 def purge_old_data(
@@ -14,6 +14,7 @@ import subprocess
 from . import db
 from . import alerts as alertmod
 from . import config as cfg
+from . import procinfo
 
 
 QUARANTINE_DIR = Path.home() / ".mcp_win_admin" / "quarantine"
@@ -79,10 +80,11 @@ def _is_system_process(p: psutil.Process) -> bool:
     try:
         if p.pid in (0, 4):
             return True
-        name = (p.name() or "").lower()
+        info = procinfo.describe(p, ("name", "username")) or {}
+        name = (info.get("name") or "").lower()
         if name in _CRITICAL_NAMES:
             return True
-        username = (p.username() or "").lower()
+        username = (info.get("username") or "").lower()
         if "system" in username:
             return True
     except Exception:
@@ -203,6 +205,7 @@ def kill_process_execute(pid: int, *, confirm: bool = False, policy_name: str =
 
     try:
         p.terminate()
+        procinfo.forget(int(pid))
         try:
             p.wait(timeout=3)
             db.log_event("INFO", f"Terminate process PID={pid} (policy={policy.name})")
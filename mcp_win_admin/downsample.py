@@ -0,0 +1,84 @@
+"""Reducción de series temporales con Largest-Triangle-Three-Buckets (LTTB).
+
+LTTB conserva la forma visual de una serie (picos y valles) con `threshold` puntos: el
+primero y el último se mantienen y, de cada cubeta intermedia, se elige el punto que forma
+el triángulo de mayor área con el punto elegido antes y la media de la cubeta siguiente.
+
+Con NumPy (opcional, extra `perf`) las medias de cubeta y las áreas de cada cubeta se
+calculan vectorizadas; sin NumPy se usa la versión en Python puro, con el mismo resultado.
+"""
+from __future__ import annotations
+
+from typing import List, Sequence
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # optional
+    np = None
+
+
+def _bounds(n: int, threshold: int) -> List[int]:
+    """Límites [b_k, b_k+1) de las threshold-2 cubetas intermedias sobre los índices 1..n-2."""
+    every = (n - 2) / (threshold - 2)
+    return [int(k * every) + 1 for k in range(threshold - 2)] + [n - 1]
+
+
+def _indices_py(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    n = len(xs)
+    bounds = _bounds(n, threshold)
+    out = [0]
+    a = 0
+    for k in range(threshold - 2):
+        lo, hi = bounds[k], bounds[k + 1]
+        # media de la cubeta siguiente (la última "cubeta" es el punto final)
+        nlo, nhi = hi, (bounds[k + 2] if k + 2 < len(bounds) else n)
+        cnt = nhi - nlo
+        avg_x = sum(xs[nlo:nhi]) / cnt
+        avg_y = sum(ys[nlo:nhi]) / cnt
+        ax, ay = xs[a], ys[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(n - 1)
+    return out
+
+
+def _indices_np(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    x = np.asarray(xs, dtype=float)
+    y = np.asarray(ys, dtype=float)
+    n = len(x)
+    bounds = np.asarray(_bounds(n, threshold) + [n])
+    starts = bounds[1:-1]
+    counts = bounds[2:] - starts
+    avg_x = np.add.reduceat(x, starts) / counts
+    avg_y = np.add.reduceat(y, starts) / counts
+    out = [0]
+    a = 0
+    for k in range(threshold - 2):
+        lo, hi = bounds[k], bounds[k + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - avg_x[k]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[k] - ay))
+        a = int(lo + np.argmax(area))
+        out.append(a)
+    out.append(n - 1)
+    return out
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Índices de los puntos elegidos (ordenados). Si no hace falta reducir, todos."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    if np is not None:
+        return _indices_np(xs, ys, threshold)
+    return _indices_py(xs, ys, threshold)
+
+
+def lttb(points: Sequence[Sequence[float]], threshold: int, *, x: int = 0, y: int = 1) -> List[Sequence[float]]:
+    """Reduce filas `points` (p. ej. [ts, valor, ...]) a `threshold` usando las columnas x/y."""
+    idx = lttb_indices([p[x] for p in points], [p[y] for p in points], threshold)
+    return [points[i] for i in idx]
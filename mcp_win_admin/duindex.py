@@ -0,0 +1,471 @@
+"""Índice persistente de uso de disco por directorio (al estilo WizTree), refrescado por deltas.
+
+Incluso con un recorrido rápido, medir un volumen de varios TB lleva minutos. Este índice
+guarda en SQLite (archivo propio, MCP_DU_INDEX_PATH) una fila por directorio con su mtime,
+lo que contiene directamente (tamaño, archivos, subdirectorios) y los totales de su subárbol,
+más los archivos de al menos MCP_DU_INDEX_MIN_FILE_MB para la vista de archivos pesados.
+
+Refrescar no vuelve a listar todo: se hace `stat` de cada directorio indexado y sólo se
+relistan (`scandir`) los que cambiaron de mtime (entradas creadas, borradas o renombradas);
+los totales se recalculan de abajo arriba y sólo se escriben las filas cuyo valor cambió
+(los directorios modificados y sus ancestros). El mtime de una carpeta no cambia cuando
+crece un archivo existente: con MCP_DU_INDEX_USN (Windows, NTFS) se leen además del USN
+Journal las carpetas con cambios desde el último refresco y se relistan aunque su mtime no
+haya cambiado; los IDs del journal se comparan con el `st_ino` (ID de archivo NTFS) que ya
+da el `stat` de cada carpeta, sin resolver rutas. `refresh(root, full=True)` relista todo.
+
+Indexar una carpeta que contiene raíces ya indexadas las absorbe: sus filas pasan a colgar
+de la nueva raíz y sólo se relistan las carpetas intermedias.
+
+Las consultas (`top_dirs`, `top_files`) son lecturas indexadas de milisegundos; los
+tamaños son los del subárbol completo, sin límite de profundidad.
+"""
+from __future__ import annotations
+
+import os
+import platform
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import config as cfg
+from . import db
+from . import monitor_usn
+
+INDEX_PATH: Path = Path(cfg.DU_INDEX_PATH) if cfg.DU_INDEX_PATH else db.DEFAULT_DB_DIR / "du_index.sqlite3"
+
+_USN_MAX_DIRTY = 200_000  # más carpetas cambiadas que esto: se descarta el journal y basta el mtime
+
+_READY: set = set()
+_READY_LOCK = threading.Lock()
+_REFRESH_LOCK = threading.Lock()
+_STATS = {"refreshes": 0, "errors": 0}
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+
+
+def _conn():
+    path = INDEX_PATH
+    key = str(path)
+    if key not in _READY:
+        with _READY_LOCK, db.get_conn(path) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS du_roots (
+                    key TEXT PRIMARY KEY,
+                    root TEXT NOT NULL,
+                    dir_id INTEGER NOT NULL,
+                    built_at REAL NOT NULL,
+                    refreshed_at REAL NOT NULL,
+                    refresh_ms REAL,
+                    journal_id TEXT,
+                    next_usn INTEGER
+                ) WITHOUT ROWID;
+
+                -- key: ruta normalizada (os.path.normcase); size/files/dirs: totales del subárbol
+                CREATE TABLE IF NOT EXISTS du_dirs (
+                    id INTEGER PRIMARY KEY,
+                    parent_id INTEGER,
+                    key TEXT NOT NULL UNIQUE,
+                    path TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL DEFAULT 0,
+                    own_size INTEGER NOT NULL DEFAULT 0,
+                    own_files INTEGER NOT NULL DEFAULT 0,
+                    own_dirs INTEGER NOT NULL DEFAULT 0,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    files INTEGER NOT NULL DEFAULT 0,
+                    dirs INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_du_dirs_parent ON du_dirs(parent_id, size);
+
+                CREATE TABLE IF NOT EXISTS du_files (
+                    dir_id INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_du_files_dir ON du_files(dir_id);
+                CREATE INDEX IF NOT EXISTS idx_du_files_key ON du_files(key);
+                """
+            )
+            _READY.add(key)
+    return db.get_conn(path)
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _prefix(key: str) -> str:
+    return key if key.endswith(os.sep) else key + os.sep
+
+
+def _iter_dir(path: str) -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                yield entry
+    except (PermissionError, FileNotFoundError, OSError):
+        return
+
+
+class _Dir:
+    __slots__ = ("id", "parent", "key", "path", "depth", "mtime", "own_size", "own_files", "own_dirs", "totals")
+
+    def __init__(self, row: Tuple) -> None:
+        (self.id, self.parent, self.key, self.path, self.depth, self.mtime,
+         self.own_size, self.own_files, self.own_dirs, size, files, dirs) = row
+        self.totals = (size, files, dirs)
+
+
+class _Refresh:
+    """Un refresco de una raíz dentro de una transacción."""
+
+    def __init__(self, conn, root_id: int, full: bool, dirty: Set[int]) -> None:
+        self.conn = conn
+        self.full = full
+        self.dirty = dirty
+        self.min_file = int(cfg.DU_INDEX_MIN_FILE_MB * 1024 * 1024)
+        self.nodes: Dict[int, _Dir] = {}
+        self.children: Dict[int, List[int]] = {}
+        self.changed: Set[int] = set()
+        self.counters = {"dirs_checked": 0, "dirs_rescanned": 0, "dirs_added": 0, "dirs_removed": 0, "rows_updated": 0}
+        self.root_id = root_id
+
+    def load(self, key: str) -> None:
+        rows = self.conn.execute(
+            "SELECT id, parent_id, key, path, depth, mtime_ns, own_size, own_files, own_dirs, size, files, dirs"
+            " FROM du_dirs WHERE key = ? OR (key >= ? AND key < ?)",
+            (key, _prefix(key), _prefix(key) + "\uffff"),
+        ).fetchall()
+        for r in rows:
+            d = _Dir(tuple(r))
+            self.nodes[d.id] = d
+            self.children.setdefault(d.id, [])
+        for d in self.nodes.values():
+            if d.parent is not None and d.parent in self.nodes:
+                self.children[d.parent].append(d.id)
+
+    def _insert(self, parent: int, path: str, depth: int) -> int:
+        key = _norm(path)
+        cur = self.conn.execute(
+            "INSERT INTO du_dirs (parent_id, key, path, depth) VALUES (?, ?, ?, ?)", (parent, key, path, depth)
+        )
+        d = _Dir((cur.lastrowid, parent, key, path, depth, 0, 0, 0, 0, 0, 0, 0))
+        self.nodes[d.id] = d
+        self.children[d.id] = []
+        self.counters["dirs_added"] += 1
+        return d.id
+
+    def _remove(self, i: int) -> None:
+        doomed: List[int] = []
+        stack = [i]
+        while stack:
+            j = stack.pop()
+            doomed.append(j)
+            stack.extend(self.children.pop(j, ()))
+        for j in doomed:
+            self.nodes.pop(j, None)
+            self.changed.discard(j)
+        for k in range(0, len(doomed), 500):
+            chunk = doomed[k:k + 500]
+            marks = ",".join("?" * len(chunk))
+            self.conn.execute(f"DELETE FROM du_dirs WHERE id IN ({marks})", chunk)
+            self.conn.execute(f"DELETE FROM du_files WHERE dir_id IN ({marks})", chunk)
+        self.counters["dirs_removed"] += len(doomed)
+
+    def _rescan(self, d: _Dir, mtime: int) -> None:
+        own_size = own_files = own_dirs = 0
+        big: List[Tuple[int, str, str, int]] = []
+        subdirs: Dict[str, str] = {}
+        for entry in _iter_dir(d.path):
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_file(follow_symlinks=False):
+                    try:
+                        sz = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        sz = 0
+                    own_size += sz
+                    own_files += 1
+                    if sz >= self.min_file:
+                        big.append((d.id, _norm(entry.path), entry.path, sz))
+                elif entry.is_dir(follow_symlinks=False):
+                    own_dirs += 1
+                    subdirs[_norm(entry.path)] = entry.path
+            except OSError:
+                continue
+        kids = self.children[d.id]
+        for c in list(kids):
+            if self.nodes[c].key not in subdirs:
+                kids.remove(c)
+                self._remove(c)
+        known = {self.nodes[c].key for c in kids}
+        for key, path in subdirs.items():
+            if key not in known:
+                kids.append(self._insert(d.id, path, d.depth + 1))
+        d.mtime, d.own_size, d.own_files, d.own_dirs = mtime, own_size, own_files, own_dirs
+        self.changed.add(d.id)
+        self.conn.execute("DELETE FROM du_files WHERE dir_id = ?", (d.id,))
+        if big:
+            self.conn.executemany("INSERT INTO du_files (dir_id, key, path, size) VALUES (?, ?, ?, ?)", big)
+        self.counters["dirs_rescanned"] += 1
+
+    def run(self) -> None:
+        order: List[int] = []
+        queue = deque([self.root_id])
+        while queue:
+            i = queue.popleft()
+            d = self.nodes.get(i)
+            if d is None:
+                continue
+            self.counters["dirs_checked"] += 1
+            try:
+                st = os.stat(d.path)
+                mtime = st.st_mtime_ns
+            except OSError:
+                if i == self.root_id:
+                    raise ValueError(f"Root path is not a directory: {d.path}")
+                if d.parent in self.children:
+                    self.children[d.parent].remove(i)
+                self._remove(i)
+                continue
+            if self.full or mtime != d.mtime or st.st_ino in self.dirty:
+                self._rescan(d, mtime)
+            order.append(i)
+            queue.extend(self.children[i])
+        # Totales de abajo arriba (en anchura, los hijos van después de su padre)
+        updates = []
+        for i in reversed(order):
+            d = self.nodes[i]
+            size, files, dirs = d.own_size, d.own_files, d.own_dirs
+            for c in self.children[i]:
+                cs, cf, cd = self.nodes[c].totals
+                size, files, dirs = size + cs, files + cf, dirs + cd
+            if (size, files, dirs) != d.totals or i in self.changed:
+                d.totals = (size, files, dirs)
+                updates.append((d.mtime, d.own_size, d.own_files, d.own_dirs, size, files, dirs, i))
+        self.conn.executemany(
+            "UPDATE du_dirs SET mtime_ns = ?, own_size = ?, own_files = ?, own_dirs = ?, size = ?, files = ?, dirs = ?"
+            " WHERE id = ?",
+            updates,
+        )
+        self.counters["rows_updated"] = len(updates)
+
+
+def _usn_dirty(root: str, prev: Optional[Dict[str, Any]]) -> Tuple[Set[int], Dict[str, Any]]:
+    """IDs de las carpetas con cambios según el USN Journal desde el refresco anterior (sólo raíces de unidad)."""
+    drive, tail = os.path.splitdrive(root)
+    if not (cfg.DU_INDEX_USN and platform.system() == "Windows" and drive and tail in ("\\", "/", "")):
+        return set(), {}
+    info = monitor_usn.query_usn_info(drive)
+    if "error" in info or "Next USN" not in info:
+        return set(), {}
+    state = {"journal_id": info.get("Journal ID"), "next_usn": int(info["Next USN"])}
+    if not prev or prev.get("journal_id") != state["journal_id"] or prev.get("next_usn") is None:
+        return set(), state
+    res = monitor_usn.read_journal_parent_ids(drive, int(prev["next_usn"]))
+    ids = res.get("parent_ids") or []
+    if "error" in res or len(ids) > _USN_MAX_DIRTY:
+        return set(), state
+    dirty: Set[int] = set()
+    for fid in ids:
+        try:
+            dirty.add(int(fid, 16))
+        except ValueError:
+            continue
+    return dirty, state
+
+
+def _adopt_nested(conn, root: str, root_id: int) -> int:
+    """Cuelga de la raíz nueva las raíces ya indexadas bajo ella; devuelve cuántas absorbió.
+
+    Las carpetas intermedias que falten se crean con mtime 0 para que el refresco las liste.
+    """
+    lo = _prefix(_norm(root))
+    nested = conn.execute(
+        "SELECT key, root, dir_id FROM du_roots WHERE key >= ? AND key < ? ORDER BY key", (lo, lo + "\uffff")
+    ).fetchall()
+    for r in nested:
+        parent_id, path = root_id, root
+        parts = os.path.relpath(r["root"], root).split(os.sep)
+        for depth, part in enumerate(parts[:-1], start=1):
+            path = os.path.join(path, part)
+            row = conn.execute("SELECT id FROM du_dirs WHERE key = ?", (_norm(path),)).fetchone()
+            if row is None:
+                row = [conn.execute(
+                    "INSERT INTO du_dirs (parent_id, key, path, depth) VALUES (?, ?, ?, ?)",
+                    (parent_id, _norm(path), path, depth),
+                ).lastrowid]
+            parent_id = int(row[0])
+        sub = _prefix(r["key"])
+        conn.execute(
+            "UPDATE du_dirs SET depth = depth + ? WHERE key = ? OR (key >= ? AND key < ?)",
+            (len(parts), r["key"], sub, sub + "\uffff"),
+        )
+        conn.execute("UPDATE du_dirs SET parent_id = ? WHERE id = ?", (parent_id, r["dir_id"]))
+        conn.execute("DELETE FROM du_roots WHERE key = ?", (r["key"],))
+    return len(nested)
+
+
+def refresh(root: str, *, full: bool = False) -> Dict[str, Any]:
+    """Construye (la primera vez) o refresca por deltas el índice de `root`."""
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise ValueError(f"Root path is not a directory: {root}")
+    key = _norm(root)
+    t0 = time.perf_counter()
+    with _REFRESH_LOCK, _conn() as conn:
+        prev = conn.execute("SELECT * FROM du_roots WHERE key = ?", (key,)).fetchone()
+        prev = dict(prev) if prev else None
+        dirty, usn_state = _usn_dirty(root, prev)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if prev is None:
+                row = conn.execute("SELECT id FROM du_dirs WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    raise ValueError(f"{root} ya está dentro de otra raíz indexada")
+                root_id = int(conn.execute(
+                    "INSERT INTO du_dirs (parent_id, key, path, depth) VALUES (NULL, ?, ?, 0)", (key, root)
+                ).lastrowid)
+                adopted = _adopt_nested(conn, root, root_id)
+                built_at = time.time()
+            else:
+                root_id, built_at, adopted = int(prev["dir_id"]), prev["built_at"], 0
+            job = _Refresh(conn, root_id, full, dirty)
+            job.load(key)
+            job.run()
+            elapsed = round((time.perf_counter() - t0) * 1000, 1)
+            conn.execute(
+                "INSERT OR REPLACE INTO du_roots (key, root, dir_id, built_at, refreshed_at, refresh_ms, journal_id, next_usn)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, root, root_id, built_at, time.time(), elapsed,
+                 usn_state.get("journal_id"), usn_state.get("next_usn")),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    _STATS["refreshes"] += 1
+    return {"root": root, "initial": prev is None, "roots_adopted": adopted, "usn_dirty": len(dirty), "elapsed_ms": elapsed, **job.counters}
+
+
+def _node(path: str) -> Optional[Dict[str, Any]]:
+    with _conn() as conn:
+        row = conn.execute("SELECT id, depth FROM du_dirs WHERE key = ?", (_norm(path),)).fetchone()
+    return dict(row) if row else None
+
+
+def covers(path: str) -> bool:
+    """True si `path` está dentro de una raíz indexada."""
+    return _node(path) is not None
+
+
+def _row(r, base_depth: int) -> Dict[str, Any]:
+    return {
+        "path": r["path"],
+        "size_bytes": r["size"],
+        "size_mb": round(r["size"] / (1024 * 1024), 2),
+        "file_count": r["files"],
+        "dir_count": r["dirs"],
+        "depth": r["depth"] - base_depth,
+    }
+
+
+def top_dirs(path: str, top_n: int = 30, min_bytes: int = 0) -> Optional[List[Dict[str, Any]]]:
+    """Subdirectorios de `path` por tamaño del subárbol; None si `path` no está indexado."""
+    node = _node(path)
+    if node is None:
+        return None
+    with _conn() as conn:
+        rows = conn.execute(
+            "SELECT path, size, files, dirs, depth FROM du_dirs WHERE parent_id = ? AND size >= ?"
+            " ORDER BY size DESC LIMIT ?",
+            (node["id"], int(min_bytes), max(1, int(top_n))),
+        ).fetchall()
+    return [_row(r, node["depth"]) for r in rows]
+
+
+def top_files(path: str, top_n: int = 10) -> Optional[List[Dict[str, Any]]]:
+    """Archivos más pesados bajo `path` (de al menos MCP_DU_INDEX_MIN_FILE_MB); None si no está indexado."""
+    if _node(path) is None:
+        return None
+    p = _prefix(_norm(path))
+    with _conn() as conn:
+        rows = conn.execute(
+            "SELECT path, size FROM du_files WHERE key >= ? AND key < ? ORDER BY size DESC LIMIT ?",
+            (p, p + "\uffff", max(1, int(top_n))),
+        ).fetchall()
+    return [{"path": r["path"], "size_bytes": r["size"], "size_mb": round(r["size"] / (1024 * 1024), 2)} for r in rows]
+
+
+def roots() -> List[str]:
+    with _conn() as conn:
+        return [r["root"] for r in conn.execute("SELECT root FROM du_roots ORDER BY root").fetchall()]
+
+
+def status() -> Dict[str, Any]:
+    with _conn() as conn:
+        rs = [dict(r) for r in conn.execute("SELECT * FROM du_roots ORDER BY root").fetchall()]
+        for r in rs:
+            top = conn.execute("SELECT size, files, dirs FROM du_dirs WHERE id = ?", (r["dir_id"],)).fetchone()
+            n = conn.execute(
+                "SELECT COUNT(*) FROM du_dirs WHERE key = ? OR (key >= ? AND key < ?)",
+                (r["key"], _prefix(r["key"]), _prefix(r["key"]) + "\uffff"),
+            ).fetchone()[0]
+            r.update({"size_bytes": top["size"] if top else 0, "files": top["files"] if top else 0, "indexed_dirs": n})
+    return {"path": str(INDEX_PATH), "roots": rs, "running": is_running(), **_STATS}
+
+
+def configured_roots() -> List[str]:
+    return [r.strip() for r in (cfg.DU_INDEX_ROOTS or "").split(",") if r.strip()]
+
+
+def _targets() -> Iterable[str]:
+    seen: Set[str] = set()
+    for r in configured_roots() + roots():
+        if _norm(r) not in seen:
+            seen.add(_norm(r))
+            yield r
+
+
+def is_running() -> bool:
+    return _THREAD is not None and _THREAD.is_alive()
+
+
+def _loop() -> None:
+    interval = max(30.0, float(cfg.DU_INDEX_REFRESH_SECONDS))
+    while not _STOP.is_set():
+        for root in _targets():
+            if _STOP.is_set():
+                break
+            try:
+                refresh(root)
+            except Exception:
+                _STATS["errors"] += 1
+        _STOP.wait(interval)
+
+
+def start() -> bool:
+    """Arranca el refresco periódico de las raíces (MCP_DU_INDEX_ROOTS y las ya indexadas)."""
+    global _THREAD
+    with _READY_LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, name="DuIndex", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
@@ -0,0 +1,233 @@
+"""Buscador de archivos duplicados: tamaño -> hash parcial -> hash completo.
+
+Hashear todo un disco para encontrar duplicados lee cada byte. El embudo clásico evita casi
+toda esa lectura:
+
+1. un recorrido `os.scandir` agrupa por tamaño; un tamaño con un solo archivo no puede tener
+   duplicados y se descarta sin abrirlo;
+2. en los grupos que quedan se hashean sólo los primeros y los últimos
+   MCP_DUP_PARTIAL_KB (64 KiB por defecto) de cada archivo;
+3. sólo los que coinciden también en el hash parcial se hashean completos (BLAKE2b).
+   Un archivo que cabe en las dos ventanas ya quedó hasheado completo en el paso 2.
+
+Los grupos se procesan del tamaño mayor al menor y se emiten (`DuplicateFinder.groups`) en
+cuanto se confirman, cada uno con los bytes recuperables (tamaño x (copias - 1)). Los
+enlaces duros (mismo dispositivo e inodo) son un solo archivo y no cuentan como copia. Los
+hashes se cachean por (ruta, tamaño, mtime) como en procinfo, así que repetir la búsqueda
+sobre el mismo árbol no relee lo que no cambió; el hasheo se reparte en
+MCP_DUP_HASH_WORKERS hilos (hashlib libera el GIL con bloques grandes).
+
+El escáner nativo (`scanner.scan_path_parallel`) no se usa: calcula el SHA-256 completo de
+todos los archivos, justo lo que este embudo evita.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import config as cfg
+from .lru import LRUCache
+from .sizetree import _iter_dir
+from .topk import TopK, file_filter
+
+_HASHES = LRUCache(
+    "dupes_hashes",
+    max_entries=cfg.DUP_HASH_CACHE_ENTRIES,
+    max_bytes=cfg.DUP_HASH_CACHE_ENTRIES * 256,
+    ttl_seconds=cfg.DUP_HASH_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=cfg.DUP_HASH_CACHE_TTL_SECONDS,
+)
+
+Ident = Tuple[int, int]
+
+
+def _partial_hash(path: str, size: int, window: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if size <= 2 * window:
+            h.update(f.read())
+        else:
+            h.update(f.read(window))
+            f.seek(-window, os.SEEK_END)
+            h.update(f.read(window))
+    return h.hexdigest()
+
+
+def _full_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk_size)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+class DuplicateFinder:
+    """Una búsqueda de duplicados bajo `root`; `groups()` emite los grupos confirmados."""
+
+    def __init__(
+        self,
+        root: str,
+        min_size_kb: float = 1024,
+        extensions: str = "",
+        max_files: int = 0,
+        max_seconds: float = 0,
+        workers: int = 0,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        if not os.path.isdir(self.root):
+            raise ValueError(f"Root path is not a directory: {self.root}")
+        self.min_bytes = max(1, int(min_size_kb * 1024))
+        self.accept = file_filter(extensions)
+        self.max_files = int(max_files) if max_files and max_files > 0 else cfg.DUP_MAX_FILES
+        self.max_seconds = float(max_seconds or 0)
+        self.workers = max(1, int(workers or cfg.DUP_HASH_WORKERS))
+        self.window = max(4, int(cfg.DUP_PARTIAL_KB)) * 1024
+        self._lock = threading.Lock()
+        self._t0 = 0.0
+        self.stats: Dict[str, Any] = {
+            "files_scanned": 0,
+            "size_candidates": 0,
+            "partial_hashed": 0,
+            "full_hashed": 0,
+            "hash_cache_hits": 0,
+            "hardlinks_skipped": 0,
+            "bytes_read": 0,
+            "groups": 0,
+            "duplicate_files": 0,
+            "reclaimable_bytes": 0,
+            "truncated": False,
+        }
+
+    # --- etapas ------------------------------------------------------------------------
+    def _by_size(self) -> Dict[int, List[str]]:
+        by_size: Dict[int, List[str]] = defaultdict(list)
+        stack = [self.root]
+        n = 0
+        while stack:
+            for entry in _iter_dir(stack.pop()):
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                n += 1
+                if st.st_size >= self.min_bytes and (self.accept is None or self.accept(entry.path, st)):
+                    by_size[st.st_size].append(entry.path)
+                if n >= self.max_files:
+                    self.stats["truncated"] = True
+                    stack.clear()
+                    break
+        self.stats["files_scanned"] = n
+        return by_size
+
+    def _digest(self, path: str, size: int, kind: str) -> Optional[Tuple[Ident, str]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if st.st_size != size:  # cambió durante la búsqueda
+            return None
+        key = (path, size, st.st_mtime_ns, kind)
+        digest = _HASHES.get(key)
+        if digest is None:
+            try:
+                digest = _partial_hash(path, size, self.window) if kind == "partial" else _full_hash(path)
+            except OSError:
+                return None
+            _HASHES.put(key, digest)
+            read = min(size, 2 * self.window) if kind == "partial" else size
+            with self._lock:
+                self.stats["bytes_read"] += read
+                self.stats[f"{kind}_hashed"] += 1
+        else:
+            with self._lock:
+                self.stats["hash_cache_hits"] += 1
+        return (st.st_dev, st.st_ino), digest
+
+    def _bucket(self, pool: ThreadPoolExecutor, paths: List[str], size: int, kind: str) -> List[Tuple[str, List[str]]]:
+        """Agrupa `paths` por hash `kind`; sólo devuelve los grupos con 2+ archivos distintos."""
+        buckets: Dict[str, List[str]] = defaultdict(list)
+        seen: Dict[str, set] = defaultdict(set)
+        for path, res in zip(paths, pool.map(lambda p: self._digest(p, size, kind), paths)):
+            if res is None:
+                continue
+            ident, digest = res
+            if ident[1] and ident in seen[digest]:
+                with self._lock:
+                    self.stats["hardlinks_skipped"] += 1
+                continue
+            seen[digest].add(ident)
+            buckets[digest].append(path)
+        return [(d, ps) for d, ps in buckets.items() if len(ps) > 1]
+
+    def _expired(self) -> bool:
+        return bool(self.max_seconds) and time.perf_counter() - self._t0 > self.max_seconds
+
+    def groups(self) -> Iterator[Dict[str, Any]]:
+        """Grupos de duplicados confirmados, del tamaño mayor al menor, a medida que se confirman."""
+        self._t0 = time.perf_counter()
+        by_size = self._by_size()
+        sizes = sorted((s for s, ps in by_size.items() if len(ps) > 1), reverse=True)
+        self.stats["size_candidates"] = sum(len(by_size[s]) for s in sizes)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="DupHash") as pool:
+            for size in sizes:
+                if self._expired():
+                    self.stats["truncated"] = True
+                    break
+                for digest, paths in self._bucket(pool, by_size.pop(size), size, "partial"):
+                    confirmed = [(digest, paths)] if size <= 2 * self.window else self._bucket(pool, paths, size, "full")
+                    for h, ps in confirmed:
+                        group = {
+                            "size_bytes": size,
+                            "hash": h,
+                            "count": len(ps),
+                            "reclaimable_bytes": size * (len(ps) - 1),
+                            "paths": sorted(ps),
+                        }
+                        self.stats["groups"] += 1
+                        self.stats["duplicate_files"] += len(ps) - 1
+                        self.stats["reclaimable_bytes"] += group["reclaimable_bytes"]
+                        yield group
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"root": self.root, "min_size_bytes": self.min_bytes, "hash": "blake2b", **self.stats}
+        out["reclaimable_mb"] = round(out["reclaimable_bytes"] / (1024 * 1024), 2)
+        out["elapsed_ms"] = round((time.perf_counter() - self._t0) * 1000, 1) if self._t0 else 0.0
+        return out
+
+
+def find_duplicates(
+    root: str,
+    min_size_kb: float = 1024,
+    extensions: str = "",
+    max_groups: int = 100,
+    max_files: int = 0,
+    max_seconds: float = 0,
+) -> Dict[str, Any]:
+    """Busca duplicados bajo `root` y devuelve el resumen con los `max_groups` grupos que más liberan."""
+    finder = DuplicateFinder(root, min_size_kb, extensions, max_files, max_seconds)
+    top: TopK[Dict[str, Any]] = TopK(max_groups, key=lambda g: g["reclaimable_bytes"])
+    for group in finder.groups():
+        top.push(group)
+    out = finder.summary()
+    out["groups_returned"] = len(top)
+    out["duplicates"] = top.items()
+    return out
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _HASHES.stats()
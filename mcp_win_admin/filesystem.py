@@ -1,58 +1,21 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
-from typing import Iterator, List
+from typing import Dict, List, Tuple
 
+from . import config as cfg
+from . import duindex, sizetree
+from .topk import TopK, file_filter
 
-@dataclass
-class DirStat:
-    path: str
-    size_bytes: int
-    file_count: int
-    dir_count: int
-    depth: int
 
-
-def _iter_dir(path: str, follow_symlinks: bool) -> Iterator[os.DirEntry]:
+def _indexed(root: str, follow_symlinks: bool = False) -> bool:
+    """True si la ruta se puede responder desde el índice persistente (ver duindex.py)."""
+    if not cfg.DU_INDEX_ENABLED or follow_symlinks:
+        return False
     try:
-        with os.scandir(path) as it:
-            for entry in it:
-                yield entry
-    except (PermissionError, FileNotFoundError, OSError):
-        return
-
-
-def _dir_size(path: str, max_depth: int, follow_symlinks: bool, depth: int = 0) -> DirStat:
-    total = 0
-    files = 0
-    dirs = 0
-
-    # If max depth reached, only count files at this level
-    if depth > max_depth:
-        return DirStat(path, 0, 0, 0, depth)
-
-    for entry in _iter_dir(path, follow_symlinks):
-        try:
-            if entry.is_symlink() and not follow_symlinks:
-                continue
-            if entry.is_file(follow_symlinks=follow_symlinks):
-                try:
-                    total += entry.stat(follow_symlinks=follow_symlinks).st_size
-                except (PermissionError, FileNotFoundError, OSError):
-                    pass
-                files += 1
-            elif entry.is_dir(follow_symlinks=follow_symlinks):
-                dirs += 1
-                if depth < max_depth:
-                    child = _dir_size(entry.path, max_depth, follow_symlinks, depth + 1)
-                    total += child.size_bytes
-                    files += child.file_count
-                    dirs += child.dir_count
-        except (PermissionError, FileNotFoundError, OSError):
-            continue
-
-    return DirStat(path=path, size_bytes=total, file_count=files, dir_count=dirs, depth=depth)
+        return duindex.covers(root)
+    except Exception:
+        return False
 
 
 def list_heavy_paths(
@@ -64,6 +27,9 @@ def list_heavy_paths(
 ) -> List[dict]:
     """Return the heaviest directories under root (recursive, up to max_depth).
 
+    Answered from the persistent disk usage index when it covers `root` (sizes are then
+    whole-subtree, see duindex.py), otherwise from the cached size tree (see sizetree.py).
+
     - root: starting directory (e.g., C:\\)
     - max_depth: how deep to recurse (2-3 recommended)
     - top_n: number of top directories to return
@@ -74,31 +40,97 @@ def list_heavy_paths(
     if not os.path.isdir(root):
         raise ValueError(f"Root path is not a directory: {root}")
 
-    results: List[DirStat] = []
+    threshold = int(min_size_mb * 1024 * 1024)
+    if _indexed(root, follow_symlinks):
+        rows = duindex.top_dirs(root, top_n, threshold)
+        if rows is not None:
+            return rows
+    tree = sizetree.get_tree(root, max_depth=max_depth, follow_symlinks=follow_symlinks)
+    return [tree.row(i) for i in tree.top_children(0, top_n, threshold)]
+
+
+def _file_row(size: int, path: str) -> Dict:
+    return {"path": path, "size_bytes": size, "size_mb": round(size / (1024 * 1024), 2)}
+
+
+def _stream_heavy_files(root: str, top_n: int, max_depth: int, min_bytes: int, accept, follow_symlinks: bool) -> List[Dict]:
+    top: TopK = TopK(top_n)
+    stack = [(root, 0)]
+    while stack:
+        path, depth = stack.pop()
+        for entry in sizetree._iter_dir(path):
+            try:
+                if entry.is_symlink() and not follow_symlinks:
+                    continue
+                if entry.is_file(follow_symlinks=follow_symlinks):
+                    st = entry.stat(follow_symlinks=follow_symlinks)
+                    floor = top.threshold()
+                    if st.st_size < min_bytes or (floor is not None and st.st_size <= floor[0]):
+                        continue
+                    if accept is None or accept(entry.path, st):
+                        top.push((st.st_size, entry.path))
+                elif depth < max_depth and entry.is_dir(follow_symlinks=follow_symlinks):
+                    stack.append((entry.path, depth + 1))
+            except (PermissionError, FileNotFoundError, OSError):
+                continue
+    return [_file_row(sz, p) for sz, p in top.items()]
 
-    # Evaluate immediate children and recurse up to max_depth
-    for entry in _iter_dir(root, follow_symlinks):
-        try:
-            if entry.is_dir(follow_symlinks=follow_symlinks):
-                stat = _dir_size(entry.path, max_depth=max_depth, follow_symlinks=follow_symlinks, depth=1)
-                results.append(stat)
-        except (PermissionError, FileNotFoundError, OSError):
-            continue
 
-    # Filter and sort
+def list_heavy_files(
+    root: str = "C:\\",
+    top_n: int = 20,
+    max_depth: int = 2,
+    min_size_mb: float = 0,
+    extensions: str = "",
+    min_age_days: float = 0,
+    max_age_days: float = 0,
+    follow_symlinks: bool = False,
+) -> List[dict]:
+    """Return the heaviest files under root, optionally filtered by extension or age.
+
+    Without filters the answer comes from the bounded per-directory top-K already kept by
+    the index or the size tree (at most MCP_FS_TREE_TOP_FILES files). With filters the tree
+    cannot answer, so files are streamed from scandir through a bounded `TopK`: memory stays
+    O(top_n) whatever the number of files.
+
+    - extensions: comma separated, e.g. ".iso,.vhdx"
+    - min_age_days: only files not modified for at least N days
+    - max_age_days: only files modified in the last N days
+    """
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise ValueError(f"Root path is not a directory: {root}")
+    top_n = max(1, int(top_n))
+    min_bytes = int(min_size_mb * 1024 * 1024)
+    accept = file_filter(extensions, min_age_days, max_age_days)
+    if accept is None and top_n <= cfg.FS_TREE_TOP_FILES:
+        files = None
+        if _indexed(root, follow_symlinks):
+            files = duindex.top_files(root, top_n)
+        if files is None:
+            files = sizetree.get_tree(root, max_depth=max_depth, follow_symlinks=follow_symlinks).top_files(0, top_n)
+        return [f for f in files if f["size_bytes"] >= min_bytes]
+    return _stream_heavy_files(root, top_n, max_depth, min_bytes, accept, follow_symlinks)
+
+
+def heavy_view(root: str, top_n: int, max_depth: int, min_size_mb: int, child_files: int = 0) -> Tuple[List[Dict], List[Dict]]:
+    """Carpetas pesadas de `root` (con sus hijos) y archivos pesados, del índice o de un único árbol."""
     threshold = int(min_size_mb * 1024 * 1024)
-    heavy = [r for r in results if r.size_bytes >= threshold]
-    heavy.sort(key=lambda r: r.size_bytes, reverse=True)
-
-    out = [
-        {
-            "path": r.path,
-            "size_bytes": r.size_bytes,
-            "size_mb": round(r.size_bytes / (1024 * 1024), 2),
-            "file_count": r.file_count,
-            "dir_count": r.dir_count,
-            "depth": r.depth,
-        }
-        for r in heavy[: max(1, top_n)]
-    ]
-    return out
+    child_min = int(max(10, min_size_mb // 10) * 1024 * 1024)
+    if _indexed(root):
+        dirs = duindex.top_dirs(root, top_n, threshold)
+        if dirs is not None:
+            for d in dirs:
+                d["children"] = duindex.top_dirs(d["path"], top_n, child_min) or []
+                if child_files:
+                    d["top_files"] = duindex.top_files(d["path"], child_files) or []
+            return dirs, duindex.top_files(root, top_n) or []
+    tree = sizetree.get_tree(root, max_depth=max_depth, follow_symlinks=False)
+    dirs = []
+    for i in tree.top_children(0, top_n, threshold):
+        d = tree.row(i)
+        d["children"] = [tree.row(j) for j in tree.top_children(i, top_n, child_min)]
+        if child_files:
+            d["top_files"] = tree.top_files(i, child_files)
+        dirs.append(d)
+    return dirs, tree.top_files(0, top_n)
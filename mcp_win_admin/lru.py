@@ -0,0 +1,166 @@
+"""Caché LRU en memoria, acotada por entradas y bytes y con TTL por entrada.
+
+Se usa como capa delante de SQLite para las lecturas calientes de veredictos y reputación:
+un acierto evita abrir conexión, aplicar PRAGMAs y ejecutar la consulta. Los resultados
+negativos (sin filas o sólo `unknown`) usan un TTL más corto para que un veredicto nuevo
+escrito por otro proceso se vea pronto.
+
+Las escrituras del propio proceso invalidan la clave (`invalidate`). Para que una lectura
+lenta que empezó antes de la invalidación no reinserte datos viejos, cada invalidación
+recibe un número de generación que se guarda por clave (`put(generation=...)` sólo se
+descarta si *esa* clave se invalidó después de la lectura): las escrituras a otras claves
+no impiden llenar la caché. Se guardan como mucho `_TOMBSTONES_PER_ENTRY * max_entries`
+marcas; al descartar la más vieja, o con `invalidate_where`/`clear`, las lecturas en curso
+anteriores se descartan todas por precaución.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+_TOMBSTONES_PER_ENTRY = 4
+
+
+def approx_size(value: Any) -> int:
+    """Estimación barata del tamaño en bytes de filas (dicts/listas de dicts) cacheadas."""
+    if value is None:
+        return 16
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(approx_size(v) for v in value)
+    if isinstance(value, dict):
+        size = 64
+        for k, v in value.items():
+            size += len(str(k)) + (len(v) if isinstance(v, (str, bytes)) else 8) + 16
+        return size
+    if isinstance(value, (str, bytes)):
+        return 49 + len(value)
+    return 16
+
+
+class LRUCache:
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        sizeof: Callable[[Any], int] = approx_size,
+    ) -> None:
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_seconds = float(ttl_seconds)
+        self.negative_ttl_seconds = float(negative_ttl_seconds)
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._gen = 0
+        # key -> generación de su última invalidación; puts con generación < _floor se descartan
+        self._tombs: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._floor = 0
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "puts": 0}
+
+    def generation(self) -> int:
+        """Generación actual: tomarla antes de leer la fuente y pasarla a `put`."""
+        with self._lock:
+            return self._gen
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self._stats["misses"] += 1
+                return default
+            value, expires_at, size = item  # type: ignore[misc]
+            if expires_at <= now:
+                del self._data[key]
+                self._bytes -= size
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, *, negative: bool = False, generation: Optional[int] = None) -> bool:
+        """Inserta `value`. Si `key` se invalidó después de `generation`, no guarda."""
+        ttl = self.negative_ttl_seconds if negative else self.ttl_seconds
+        if ttl <= 0:
+            return False
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if generation is not None and (generation < self._floor or self._tombs.get(key, -1) > generation):
+                return False
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            self._stats["puts"] += 1
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+            return True
+
+    def _bump_all(self) -> None:
+        """Invalida toda lectura en curso (claves desconocidas). Llamar con el lock."""
+        self._gen += 1
+        self._floor = self._gen
+        self._tombs.clear()
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._gen += 1
+            self._tombs[key] = self._gen
+            self._tombs.move_to_end(key)
+            while len(self._tombs) > _TOMBSTONES_PER_ENTRY * self.max_entries:
+                _, gen = self._tombs.popitem(last=False)
+                self._floor = max(self._floor, gen)
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+                self._stats["invalidations"] += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            self._bump_all()
+            doomed = [k for k in self._data if predicate(k)]
+            for k in doomed:
+                self._bytes -= self._data.pop(k)[2]
+            self._stats["invalidations"] += len(doomed)
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bump_all()
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out.update({
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            })
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+        return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
@@ -0,0 +1,248 @@
+"""Serie temporal de snapshots: datos crudos recientes + agregados por minuto y por hora.
+
+`db.insert_snapshot` escribe una fila cruda por llamada y sólo había `get_last_snapshot`:
+pintar una semana suponía leer y enviar todas las filas. Aquí un trabajo de compactación
+agrega las filas crudas en cubetas cerradas de 60 s y 3600 s (`snapshot_rollups`: n, min,
+max, avg y p95 por métrica) y purga cada nivel según su retención
+(MCP_METRICS_RAW_RETENTION_HOURS, MCP_METRICS_MINUTE_RETENTION_DAYS,
+MCP_METRICS_HOUR_RETENTION_DAYS).
+
+`query()` retorna un rango de tiempo con la resolución más fina que quepa en `max_points`
+(cruda, 1m o 1h). La cubeta en curso, aún sin compactar, se agrega al vuelo desde las filas
+crudas para que el final de la serie no quede atrasado. Sin el hilo, las consultas compactan
+las cubetas cerradas como mucho una vez por `_READ_COMPACT_SECONDS` y nunca purgan: purgar
+es cosa del hilo.
+
+Con el muestreador de métricas activo, el hilo de compactación del servidor MCP guarda además
+un snapshot por vuelta; el del dashboard sólo compacta (`start(record=False)`), para no
+insertar cada snapshot dos veces en la base compartida.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import config as cfg
+from . import db
+from . import perfsampler
+from . import system
+
+METRICS = ("cpu_percent", "mem_percent", "disk_percent", "mem_used", "processes_total")
+RESOLUTIONS = {"1m": 60, "1h": 3600}
+RAW_FIELDS = ("ts", "value")
+ROLLUP_FIELDS = ("ts", "n", "min", "max", "avg", "p95")
+
+_CHUNK_SECONDS = 86400  # filas crudas leídas por pasada de compactación
+_READ_COMPACT_SECONDS = 60.0  # sin hilo: intervalo mínimo entre compactaciones desde query()
+
+_LOCK = threading.Lock()
+_STATS = {"runs": 0, "rollups_written": 0, "recorded": 0, "purged": 0, "errors": 0}
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+_LAST_READ_COMPACT = 0.0
+
+
+def _p95(values: List[float]) -> float:
+    """Percentil 95 por rango más cercano (`values` ordenado)."""
+    return values[max(0, math.ceil(0.95 * len(values)) - 1)]
+
+
+def aggregate(rows: Iterable[Dict[str, Any]], resolution: int, metrics: Iterable[str] = METRICS) -> List[Dict[str, Any]]:
+    """Agrega filas crudas (con `ts` epoch) en cubetas de `resolution` segundos."""
+    buckets: Dict[tuple, List[float]] = {}
+    metrics = tuple(metrics)
+    for r in rows:
+        b = int(r["ts"] // resolution) * resolution
+        for m in metrics:
+            v = r.get(m)
+            if v is not None:
+                buckets.setdefault((m, b), []).append(float(v))
+    out: List[Dict[str, Any]] = []
+    for (m, b), vals in sorted(buckets.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        vals.sort()
+        out.append({
+            "resolution": resolution,
+            "metric": m,
+            "bucket": b,
+            "n": len(vals),
+            "min": vals[0],
+            "max": vals[-1],
+            "avg": sum(vals) / len(vals),
+            "p95": _p95(vals),
+        })
+    return out
+
+
+def _compact_resolution(resolution: int, now: float) -> int:
+    """Agrega las cubetas cerradas aún no compactadas. Retorna filas escritas."""
+    end = int(now // resolution) * resolution
+    last = db.last_rollup_bucket(resolution)
+    start = db.first_snapshot_ts(after=None if last is None else last + resolution)
+    written = 0
+    while start is not None and start < end:
+        lo = int(start // resolution) * resolution
+        hi = min(end, lo + max(resolution, _CHUNK_SECONDS // resolution * resolution))
+        rows = db.list_snapshots_between(lo, hi)
+        written += db.upsert_snapshot_rollups(aggregate(rows, resolution))
+        # Saltar huecos sin datos en vez de recorrerlos cubeta a cubeta
+        start = db.first_snapshot_ts(after=hi)
+    return written
+
+
+def compact(now: Optional[float] = None, *, purge: bool = True) -> Dict[str, Any]:
+    """Compacta las cubetas cerradas de cada resolución y (con `purge`) purga lo que supera la retención."""
+    now = time.time() if now is None else now
+    out: Dict[str, Any] = {}
+    for label, res in RESOLUTIONS.items():
+        out[f"rollups_{label}"] = _compact_resolution(res, now)
+    purged = 0
+    if purge:
+        purged += db.purge_snapshots_older_than(int(cfg.METRICS_RAW_RETENTION_HOURS * 3600))
+        purged += db.purge_snapshot_rollups_older_than(60, int(cfg.METRICS_MINUTE_RETENTION_DAYS * 86400))
+        purged += db.purge_snapshot_rollups_older_than(3600, int(cfg.METRICS_HOUR_RETENTION_DAYS * 86400))
+    out["purged"] = purged
+    with _LOCK:
+        _STATS["runs"] += 1
+        _STATS["rollups_written"] += out["rollups_1m"] + out["rollups_1h"]
+        _STATS["purged"] += purged
+    return out
+
+
+def record() -> Optional[int]:
+    """Guarda el snapshot actual del muestreador (si está activo). Retorna el id o None."""
+    if not perfsampler.ready():
+        return None
+    row_id = db.insert_snapshot(system.get_performance_snapshot().to_dict())
+    with _LOCK:
+        _STATS["recorded"] += 1
+    return row_id
+
+
+def _compact_for_read(now: float) -> None:
+    """Sin hilo: compacta las cubetas cerradas (sin purgar) como mucho cada _READ_COMPACT_SECONDS.
+
+    La cola sin compactar se agrega al vuelo en query(), así que saltarse una vuelta sólo
+    cuesta leer algunas filas crudas más.
+    """
+    global _LAST_READ_COMPACT
+    with _LOCK:
+        if time.monotonic() - _LAST_READ_COMPACT < _READ_COMPACT_SECONDS:
+            return
+        _LAST_READ_COMPACT = time.monotonic()
+    compact(now, purge=False)
+
+
+def _pick_resolution(since: float, until: float, max_points: int, now: float) -> str:
+    span = max(0.0, until - since)
+    raw_from = now - cfg.METRICS_RAW_RETENTION_HOURS * 3600
+    if since >= raw_from and db.count_snapshots_between(since, until) <= max_points:
+        return "raw"
+    minute_from = now - cfg.METRICS_MINUTE_RETENTION_DAYS * 86400
+    if since >= minute_from and span / 60 <= max_points:
+        return "1m"
+    return "1h"
+
+
+def query(
+    metric: str = "cpu_percent",
+    *,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    resolution: str = "auto",
+    max_points: int = 500,
+) -> Dict[str, Any]:
+    """Serie de `metric` en [since, until) (epoch; por defecto las últimas 24 h).
+
+    - resolution: auto|raw|1m|1h. `auto` elige la más fina con como mucho `max_points` puntos.
+    Puntos crudos: [ts, value]; agregados: [ts, n, min, max, avg, p95].
+    """
+    if metric not in METRICS:
+        return {"error": "unknown_metric", "metric": metric, "metrics": list(METRICS)}
+    if resolution not in ("auto", "raw", *RESOLUTIONS):
+        return {"error": "bad_resolution", "resolution": resolution, "resolutions": ["auto", "raw", *RESOLUTIONS]}
+    now = time.time()
+    until = now if until is None else float(until)
+    since = until - 86400 if since is None else float(since)
+    max_points = max(1, int(max_points))
+    if not is_running():
+        _compact_for_read(now)
+    if resolution == "auto":
+        resolution = _pick_resolution(since, until, max_points, now)
+
+    out: Dict[str, Any] = {"metric": metric, "since": since, "until": until, "resolution": resolution}
+    if resolution == "raw":
+        rows = db.list_snapshots_between(since, until)
+        out["fields"] = list(RAW_FIELDS)
+        out["points"] = [[r["ts"], float(r[metric])] for r in rows]
+        return out
+
+    res = RESOLUTIONS[resolution]
+    lo = int(since // res) * res
+    points = [[r["bucket"], r["n"], r["min"], r["max"], r["avg"], r["p95"]] for r in db.query_snapshot_rollups(res, metric, lo, until)]
+    # Cola aún no compactada (cubeta en curso): se agrega al vuelo desde los datos crudos
+    last = db.last_rollup_bucket(res)
+    tail_from = max(lo, last + res if last is not None else lo)
+    if tail_from < until:
+        for r in aggregate(db.list_snapshots_between(tail_from, until), res, (metric,)):
+            points.append([r["bucket"], r["n"], r["min"], r["max"], r["avg"], r["p95"]])
+    out["fields"] = list(ROLLUP_FIELDS)
+    out["points"] = points
+    return out
+
+
+def is_running() -> bool:
+    return _THREAD is not None and _THREAD.is_alive()
+
+
+def _loop(record_snapshots: bool) -> None:
+    interval = max(5.0, float(cfg.METRICS_ROLLUP_INTERVAL_SECONDS))
+    while not _STOP.is_set():
+        try:
+            if record_snapshots and cfg.METRICS_ROLLUP_RECORD:
+                record()
+            compact()
+        except Exception:
+            with _LOCK:
+                _STATS["errors"] += 1
+        _STOP.wait(interval)
+
+
+def start(record: bool = True) -> bool:
+    """Arranca el hilo de compactación (idempotente). `record`: guardar además snapshots.
+
+    Sólo un proceso debe grabar (el servidor MCP); el dashboard arranca con `record=False`.
+    """
+    global _THREAD
+    with _LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, args=(record,), name="MetricStore", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+    out["running"] = is_running()
+    return out
+
+
+def reset() -> None:
+    global _LAST_READ_COMPACT
+    with _LOCK:
+        _LAST_READ_COMPACT = 0.0
+        for k in _STATS:
+            _STATS[k] = 0
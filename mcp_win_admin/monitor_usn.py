@@ -1,3 +1,4 @@
+import csv
 import platform
 import re
 import subprocess
@@ -39,3 +40,48 @@ def query_usn_info(drive: str = "C") -> Dict:
             data[k] = m.group(1)
     data["drive"] = drive
     return data
+
+
+def parse_readjournal_csv(text: str) -> Dict:
+    """Extrae de la salida CSV de 'fsutil usn readjournal' los IDs de carpeta padre y el último USN."""
+    lines = [ln for ln in (text or "").splitlines() if ln.strip()]
+    # fsutil puede imprimir líneas informativas antes de la cabecera
+    start = next((i for i, ln in enumerate(lines) if "usn" in ln.lower() and "," in ln), None)
+    if start is None:
+        return {"parent_ids": [], "last_usn": None}
+    reader = csv.reader(lines[start:])
+    header = [h.strip().lower() for h in next(reader)]
+    try:
+        i_usn = header.index("usn")
+        i_parent = next(i for i, h in enumerate(header) if h.startswith("parent file id"))
+    except (ValueError, StopIteration):
+        return {"parent_ids": [], "last_usn": None}
+    parents: Dict[str, None] = {}
+    last = None
+    for row in reader:
+        if len(row) <= max(i_usn, i_parent):
+            continue
+        try:
+            last = int(row[i_usn].strip(), 0)
+        except ValueError:
+            continue
+        parents[row[i_parent].strip()] = None
+    return {"parent_ids": list(parents), "last_usn": last}
+
+
+def read_journal_parent_ids(drive: str, start_usn: int) -> Dict:
+    """IDs de las carpetas con cambios desde `start_usn` ('fsutil usn readjournal ... csv')."""
+    if platform.system() != "Windows":
+        return {"error": "Solo disponible en Windows"}
+    drive = (drive or "C").rstrip(": /\\")
+    cmd = ["fsutil", "usn", "readjournal", f"{drive}:", f"startusn={int(start_usn)}", "csv"]
+    try:
+        cp = subprocess.run(cmd, capture_output=True, text=True, check=False, shell=False)
+    except Exception as e:
+        return {"drive": drive, "error": str(e)}
+    if cp.returncode != 0:
+        return {"drive": drive, "error": cp.stderr.strip() or cp.stdout.strip() or f"rc={cp.returncode}"}
+    out = parse_readjournal_csv(cp.stdout)
+    out["drive"] = drive
+    return out
+
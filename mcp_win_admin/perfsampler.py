@@ -0,0 +1,227 @@
+"""Muestreo de métricas del sistema en segundo plano (CPU, memoria, discos, red).
+
+`system.get_performance_snapshot` bloqueaba 200 ms en `cpu_percent(interval=0.2)` y recorría
+las particiones en cada llamada; el dashboard repetía `disk_usage` por partición en cada
+/api/metrics y cada 2 s por websocket. Aquí un único hilo refresca cada métrica con su
+propio intervalo (MCP_METRICS_*_INTERVAL_SECONDS) y publica un snapshot nuevo sustituyendo
+la referencia: los lectores nunca toman locks y leer es O(1).
+
+Además guarda un buffer circular en memoria (MCP_METRICS_HISTORY_POINTS) con una muestra
+compacta por vuelta: (ts, cpu, mem%, disco%, rx B/s, tx B/s).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+
+import psutil
+
+from . import config as cfg
+
+HISTORY_FIELDS = ("ts", "cpu_percent", "mem_percent", "disk_percent", "net_rx_rate", "net_tx_rate")
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+_SNAP: Mapping[str, Any] = _EMPTY
+_HISTORY: Deque[Tuple[float, ...]] = deque(maxlen=max(1, cfg.METRICS_HISTORY_POINTS))
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+_START_LOCK = threading.Lock()
+_NET_PREV: Dict[str, float] = {}
+_STATS = {"ticks": 0, "errors": 0}
+_CPU_PRIMED = False
+
+
+def _publish(**updates: Any) -> None:
+    """Publica un snapshot nuevo (copia + cambios). Sólo escribe el hilo del muestreador."""
+    global _SNAP
+    now = time.time()
+    snap = dict(_SNAP)
+    snap.update(updates)
+    refreshed = dict(snap.get("updated") or {})
+    for k in updates:
+        refreshed[k] = now
+    snap["updated"] = refreshed
+    snap["ts"] = now
+    _SNAP = MappingProxyType(snap)
+
+
+def _read_cpu() -> Dict[str, Any]:
+    global _CPU_PRIMED
+    value = float(psutil.cpu_percent(interval=None))
+    if not _CPU_PRIMED:
+        # La primera lectura sólo fija la base (psutil devuelve 0.0): no se publica
+        _CPU_PRIMED = True
+        return {}
+    return {"cpu_percent": value, "cpu_count": psutil.cpu_count(logical=True)}
+
+
+def _read_memory() -> Dict[str, Any]:
+    vm = psutil.virtual_memory()
+    return {"memory": {"total": int(vm.total), "available": int(vm.available), "used": int(vm.used), "percent": float(vm.percent)}}
+
+
+def _read_disks() -> Dict[str, Any]:
+    disks: List[Dict[str, Any]] = []
+    total = used = 0
+    for part in psutil.disk_partitions(all=False):
+        try:
+            usage = psutil.disk_usage(part.mountpoint)
+        except Exception:
+            continue
+        disks.append({
+            "device": part.device,
+            "mountpoint": part.mountpoint,
+            "fstype": part.fstype,
+            "total": usage.total,
+            "used": usage.used,
+            "free": usage.free,
+            "percent": usage.percent,
+        })
+        # Mismo criterio que system._overall_disk_percent: sólo unidades con fs en Windows
+        if part.fstype and os.name == "nt":
+            total += usage.total
+            used += usage.used
+    return {"disks": disks, "disk_percent": (used / total * 100.0) if total else 0.0}
+
+
+def _read_net() -> Dict[str, Any]:
+    io = psutil.net_io_counters()
+    now = time.monotonic()
+    rx_rate = tx_rate = 0.0
+    if _NET_PREV:
+        dt = max(1e-6, now - _NET_PREV["t"])
+        rx_rate = max(0.0, (io.bytes_recv - _NET_PREV["rx"]) / dt)
+        tx_rate = max(0.0, (io.bytes_sent - _NET_PREV["tx"]) / dt)
+    _NET_PREV.update({"t": now, "rx": io.bytes_recv, "tx": io.bytes_sent})
+    return {"net": {"bytes_recv": int(io.bytes_recv), "bytes_sent": int(io.bytes_sent), "rx_rate": round(rx_rate, 1), "tx_rate": round(tx_rate, 1)}}
+
+
+def _read_procs() -> Dict[str, Any]:
+    return {"processes_total": len(psutil.pids()), "boot_time": psutil.boot_time()}
+
+
+def _metrics() -> List[Tuple[str, Any, float]]:
+    return [
+        ("cpu", _read_cpu, cfg.METRICS_CPU_INTERVAL_SECONDS),
+        ("memory", _read_memory, cfg.METRICS_MEMORY_INTERVAL_SECONDS),
+        ("disks", _read_disks, cfg.METRICS_DISK_INTERVAL_SECONDS),
+        ("net", _read_net, cfg.METRICS_NET_INTERVAL_SECONDS),
+        ("procs", _read_procs, cfg.METRICS_PROCS_INTERVAL_SECONDS),
+    ]
+
+
+def refresh(names: Optional[Tuple[str, ...]] = None) -> None:
+    """Refresca ahora las métricas indicadas (todas por defecto) y añade un punto al histórico."""
+    updates: Dict[str, Any] = {}
+    for name, fn, _ in _metrics():
+        if names is None or name in names:
+            try:
+                updates.update(fn())
+            except Exception:
+                _STATS["errors"] += 1
+    if updates:
+        _publish(**updates)
+    _record()
+
+
+def _record() -> None:
+    s = _SNAP
+    if "cpu_percent" not in s:
+        return
+    mem = s.get("memory") or {}
+    net = s.get("net") or {}
+    _HISTORY.append((
+        s["ts"],
+        float(s.get("cpu_percent", 0.0)),
+        float(mem.get("percent", 0.0)),
+        float(s.get("disk_percent", 0.0)),
+        float(net.get("rx_rate", 0.0)),
+        float(net.get("tx_rate", 0.0)),
+    ))
+
+
+def _loop() -> None:
+    metrics = _metrics()
+    due = {name: 0.0 for name, _, _ in metrics}
+    tick = max(0.2, min(iv for _, _, iv in metrics))
+    while not _STOP.is_set():
+        now = time.monotonic()
+        names = tuple(name for name, _, iv in metrics if now >= due[name])
+        for name, _, iv in metrics:
+            if name in names:
+                due[name] = now + max(0.2, iv)
+        try:
+            refresh(names)
+            _STATS["ticks"] += 1
+        except Exception:
+            _STATS["errors"] += 1
+        _STOP.wait(tick)
+
+
+def start() -> bool:
+    """Arranca el hilo (idempotente). La primera lectura de CPU sólo fija la base de medida."""
+    global _THREAD
+    with _START_LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, name="PerfSampler", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
+
+
+def is_running() -> bool:
+    return _THREAD is not None and _THREAD.is_alive()
+
+
+def ready() -> bool:
+    """True si el hilo corre y ya hay valores de todas las métricas (CPU: desde la segunda lectura)."""
+    s = _SNAP
+    return is_running() and all(k in s for k in ("cpu_percent", "memory", "disk_percent", "processes_total"))
+
+
+def snapshot() -> Mapping[str, Any]:
+    """Último snapshot publicado (de sólo lectura). O(1): no toca psutil."""
+    return _SNAP
+
+
+def history(since: Optional[float] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Puntos del buffer circular (más antiguos primero) posteriores a `since` (epoch)."""
+    points = list(_HISTORY)
+    if since is not None:
+        points = [p for p in points if p[0] > since]
+    if limit is not None and limit > 0:
+        points = points[-int(limit):]
+    return {"fields": list(HISTORY_FIELDS), "points": [list(p) for p in points]}
+
+
+def stats() -> Dict[str, Any]:
+    s = _SNAP
+    return {
+        **_STATS,
+        "running": is_running(),
+        "history_points": len(_HISTORY),
+        "updated": dict(s.get("updated") or {}),
+    }
+
+
+def reset() -> None:
+    global _SNAP, _CPU_PRIMED
+    _SNAP = _EMPTY
+    _CPU_PRIMED = False
+    _HISTORY.clear()
+    _NET_PREV.clear()
+    _STATS.update({"ticks": 0, "errors": 0})
@@ -0,0 +1,206 @@
+"""Precalentado de la caché de reputación a partir de las conexiones vivas.
+
+Un hilo daemon muestrea `psutil.net_connections` cada MCP_REP_PREFETCH_INTERVAL_SECONDS y
+lo compara con la muestra anterior. Las IPs remotas públicas nuevas cuya caché está fría
+(alguna fuente sin entrada fresh ni stale) se consultan con `reputation.check_ip`, como
+mucho MCP_REP_PREFETCH_BUDGET por ciclo; el resto queda pendiente para ciclos siguientes.
+
+`note_lookup(ip)` lo llaman los consumidores (p.ej. connections_list_enriched) para medir
+qué fracción de sus consultas encontró la IP ya precalentada.
+"""
+from __future__ import annotations
+
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+import psutil
+
+from . import config as cfg
+from . import db
+from . import refresh
+from . import reputation as rep
+
+_DEFAULT_SOURCES = ("threatfox", "urlhaus")
+_MAX_TRACKED = 4096
+
+_STATS_KEYS = (
+    "cycles",
+    "new_ips",
+    "prefetched",
+    "already_warm",
+    "deferred",
+    "dropped",
+    "errors",
+    "enrich_hits",
+    "enrich_misses",
+)
+
+_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {k: 0 for k in _STATS_KEYS}
+_LAST_SAMPLE: Set[str] = set()
+_BACKLOG: "OrderedDict[str, None]" = OrderedDict()
+_WARMED: "OrderedDict[str, float]" = OrderedDict()  # ip -> momento del precalentado
+_LAST_CYCLE: Dict[str, Any] = {}
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+
+
+def _sources() -> tuple:
+    return cfg.get_effective_sources(cfg.REP_PREFETCH_SOURCES, _DEFAULT_SOURCES, rep.IP_SOURCES)
+
+
+def _is_public(ip: str) -> bool:
+    try:
+        return ipaddress.ip_address(ip).is_global
+    except ValueError:
+        return False
+
+
+def sample_remote_ips() -> Set[str]:
+    """IPs remotas públicas de las conexiones actuales."""
+    out: Set[str] = set()
+    for c in psutil.net_connections(kind="inet"):
+        ip = getattr(c.raddr, "ip", None) if c.raddr else None
+        if ip and _is_public(ip):
+            out.add(ip)
+    return out
+
+
+def _is_warm(ip: str, sources: tuple, ttl: Optional[int]) -> bool:
+    rows = db.get_ip_reputation_sources(ip=ip, ttl_seconds=None) or []
+    fresh, stale = refresh.split_rows(rows, ttl_seconds=ttl)
+    return all(s in fresh or s in stale for s in sources)
+
+
+def _mark_warm(ip: str) -> None:
+    with _LOCK:
+        _WARMED[ip] = time.time()
+        _WARMED.move_to_end(ip)
+        while len(_WARMED) > _MAX_TRACKED:
+            _WARMED.popitem(last=False)
+
+
+def run_once(current: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """Un ciclo: muestrea, calcula IPs nuevas y precalienta hasta agotar el presupuesto."""
+    t0 = time.perf_counter()
+    if current is None:
+        current = sample_remote_ips()
+    sources = _sources()
+    ttl = cfg.effective_rep_ttl(cfg.DEFAULT_REP_TTL)
+    budget = max(0, cfg.REP_PREFETCH_BUDGET)
+
+    with _LOCK:
+        new = current - _LAST_SAMPLE
+        _LAST_SAMPLE.clear()
+        _LAST_SAMPLE.update(current)
+        for ip in sorted(new):
+            _BACKLOG[ip] = None
+        # Lo que ya no está conectado no merece una consulta
+        for ip in [ip for ip in _BACKLOG if ip not in current]:
+            del _BACKLOG[ip]
+            _STATS["dropped"] += 1
+        candidates = list(_BACKLOG)
+        _STATS["cycles"] += 1
+        _STATS["new_ips"] += len(new)
+
+    prefetched = warm = errors = 0
+    for ip in candidates:
+        if _STOP.is_set():
+            break
+        try:
+            if _is_warm(ip, sources, ttl):
+                warm += 1
+                _mark_warm(ip)
+            elif prefetched < budget:
+                rep.check_ip(ip, use_cloud=True, ttl_seconds=ttl, sources=sources)
+                prefetched += 1
+                _mark_warm(ip)
+            else:
+                continue  # sin presupuesto: sigue en el backlog
+        except Exception:
+            errors += 1
+        with _LOCK:
+            _BACKLOG.pop(ip, None)
+
+    with _LOCK:
+        deferred = len(_BACKLOG)
+        _STATS["prefetched"] += prefetched
+        _STATS["already_warm"] += warm
+        _STATS["deferred"] += deferred
+        _STATS["errors"] += errors
+        _LAST_CYCLE.clear()
+        _LAST_CYCLE.update({
+            "sampled": len(current),
+            "new": len(new),
+            "prefetched": prefetched,
+            "already_warm": warm,
+            "deferred": deferred,
+            "errors": errors,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        })
+        return dict(_LAST_CYCLE)
+
+
+def note_lookup(ip: str) -> bool:
+    """Registra una consulta de enriquecimiento; True si la IP la había precalentado el prefetcher."""
+    with _LOCK:
+        hit = ip in _WARMED
+        _STATS["enrich_hits" if hit else "enrich_misses"] += 1
+        return hit
+
+
+def _loop() -> None:
+    interval = max(1.0, float(cfg.REP_PREFETCH_INTERVAL_SECONDS))
+    while not _STOP.is_set():
+        try:
+            run_once()
+        except Exception:
+            with _LOCK:
+                _STATS["errors"] += 1
+        _STOP.wait(interval)
+
+
+def start() -> bool:
+    """Arranca el hilo de precalentado (idempotente)."""
+    global _THREAD
+    with _LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, name="RepPrefetch", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+        out["running"] = _THREAD is not None and _THREAD.is_alive()
+        out["backlog"] = len(_BACKLOG)
+        out["tracked_warm"] = len(_WARMED)
+        out["last_cycle"] = dict(_LAST_CYCLE)
+    lookups = out["enrich_hits"] + out["enrich_misses"]
+    out["hit_rate"] = round(out["enrich_hits"] / lookups, 3) if lookups else None
+    return out
+
+
+def reset() -> None:
+    with _LOCK:
+        for k in _STATS:
+            _STATS[k] = 0
+        _LAST_SAMPLE.clear()
+        _BACKLOG.clear()
+        _WARMED.clear()
+        _LAST_CYCLE.clear()
@@ -6,6 +6,9 @@ import heapq
 
 import psutil
 
+from . import procinfo
+from . import procsampler
+
 SortKey = Literal["memory", "cpu", "pid"]
 
 
@@ -67,7 +70,17 @@ def list_processes(
     - limit: número máximo de elementos a devolver
     - fast: si True, evita cálculos costosos (username y CPU) salvo que se pidan
     - include_cpu: si True, calcula `cpu_percent` (rápido pero puede añadir latencia)
+
+    Con el muestreador en marcha (MCP_PROC_SAMPLER_ENABLED) se leen sus valores precalculados:
+    CPU real, RSS, IO e hilos, sin recorrer los procesos.
     """
+    if procsampler.ready():
+        rows = procsampler.top(sort_by=sort_by, limit=limit)
+        for r in rows:
+            info = procinfo.describe(r["pid"], ("username",)) if not fast else None
+            r["username"] = info.get("username") if info else None
+        return rows
+
     # Use minimal attrs to reduce per-process syscalls
     need_memory = sort_by == "memory"
     attrs = ["pid", "name"] + (["memory_info"] if need_memory else [])
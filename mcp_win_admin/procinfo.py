@@ -0,0 +1,168 @@
+"""Caché de metadatos de procesos compartida (nombre, exe, cmdline, usuario, hash del exe).
+
+Listados como `connections.list_connections(include_process=True)` o el dashboard creaban un
+`psutil.Process` y llamaban a `name()`/`username()` por cada conexión o candidato, en cada
+petición. Aquí las entradas se indexan por (pid, create_time): un PID reutilizado por otro
+proceso tiene otra clave, así que nunca se devuelven datos del proceso anterior, y la entrada
+vieja se invalida al detectarlo.
+
+Los campos se rellenan de forma perezosa: sólo se consulta a psutil lo que pide el llamador y
+lo que ya se conoce se reutiliza. `exe_sha256` se calcula bajo demanda a partir de `exe` y se
+cachea también por (ruta, tamaño, mtime), así que procesos del mismo ejecutable no lo rehashean.
+Si no se puede obtener `create_time` (objetos simulados, procesos protegidos) se leen los
+campos sin cachear.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, Union
+
+import psutil
+
+from . import config as cfg
+from .lru import LRUCache
+
+FIELDS = ("name", "ppid", "exe", "cmdline", "username", "exe_sha256")
+
+_CACHE = LRUCache(
+    "procinfo",
+    max_entries=cfg.PROC_CACHE_MAX_ENTRIES,
+    max_bytes=cfg.PROC_CACHE_MAX_ENTRIES * 2048,
+    ttl_seconds=cfg.PROC_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=cfg.PROC_CACHE_TTL_SECONDS,
+)
+_HASHES = LRUCache(
+    "procinfo_hashes",
+    max_entries=cfg.PROC_CACHE_MAX_ENTRIES,
+    max_bytes=cfg.PROC_CACHE_MAX_ENTRIES * 512,
+    ttl_seconds=cfg.PROC_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=cfg.PROC_CACHE_TTL_SECONDS,
+)
+_LOCK = threading.Lock()
+_CREATE_TIMES: Dict[int, float] = {}  # pid -> create_time de la entrada vigente
+_STATS = {"pid_reused": 0, "uncacheable": 0, "field_reads": 0}
+
+
+def _sha256_file(path: str, chunk_size: int = 1 << 20) -> Optional[str]:
+    # Muchos procesos comparten ejecutable (svchost, navegadores): se hashea una vez por versión
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_size, st.st_mtime_ns)
+    cached = _HASHES.get(key)
+    if cached is not None:
+        return cached
+    try:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                b = f.read(chunk_size)
+                if not b:
+                    break
+                h.update(b)
+        digest = h.hexdigest()
+        _HASHES.put(key, digest)
+        return digest
+    except OSError:
+        return None
+
+
+def _read_field(p: Any, field: str, known: Dict[str, Any]) -> Any:
+    with _LOCK:
+        _STATS["field_reads"] += 1
+    try:
+        if field == "exe_sha256":
+            exe = known["exe"] if "exe" in known else _read_field(p, "exe", known)
+            known.setdefault("exe", exe)
+            return _sha256_file(exe) if exe else None
+        value = getattr(p, field)()
+        if field == "cmdline" and value is not None:
+            value = list(value)
+        return value
+    except Exception:
+        return None
+
+
+def _create_time(p: Any) -> Optional[float]:
+    try:
+        return float(p.create_time())
+    except Exception:
+        return None
+
+
+def describe(proc: Union[int, Any], fields: Iterable[str] = ("name",)) -> Optional[Dict[str, Any]]:
+    """Metadatos del proceso (`pid` o `psutil.Process`) con los `fields` pedidos.
+
+    Retorna None si el proceso no existe o no se puede abrir. Un campo que psutil no deja leer
+    (AccessDenied, etc.) vale None.
+    """
+    try:
+        p = psutil.Process(int(proc)) if isinstance(proc, int) else proc
+    except Exception:
+        return None
+    pid = getattr(p, "pid", proc if isinstance(proc, int) else None)
+    wanted = [f for f in fields if f in FIELDS]
+    ct = _create_time(p)
+    if ct is None:
+        with _LOCK:
+            _STATS["uncacheable"] += 1
+        known: Dict[str, Any] = {}
+        for f in wanted:
+            if f not in known:
+                known[f] = _read_field(p, f, known)
+        return {"pid": pid, "create_time": None, **{f: known.get(f) for f in wanted}}
+
+    key = (pid, ct)
+    entry = _CACHE.get(key)
+    if entry is None:
+        with _LOCK:
+            prev = _CREATE_TIMES.get(pid)
+            if prev is not None and prev != ct:
+                _STATS["pid_reused"] += 1
+            if len(_CREATE_TIMES) > 4 * cfg.PROC_CACHE_MAX_ENTRIES:
+                _CREATE_TIMES.clear()
+            _CREATE_TIMES[pid] = ct
+        if prev is not None and prev != ct:
+            _CACHE.invalidate((pid, prev))
+        entry = {"pid": pid, "create_time": ct}
+    missing = [f for f in wanted if f not in entry]
+    if missing:
+        entry = dict(entry)
+        for f in missing:
+            if f not in entry:
+                entry[f] = _read_field(p, f, entry)
+        _CACHE.put(key, entry)
+    return {"pid": pid, "create_time": ct, **{f: entry.get(f) for f in wanted}}
+
+
+def name(proc: Union[int, Any]) -> Optional[str]:
+    info = describe(proc, ("name",))
+    return info.get("name") if info else None
+
+
+def forget(pid: int) -> None:
+    """Descarta la entrada de `pid` (p.ej. tras terminar el proceso)."""
+    with _LOCK:
+        ct = _CREATE_TIMES.pop(int(pid), None)
+    if ct is not None:
+        _CACHE.invalidate((int(pid), ct))
+
+
+def clear() -> None:
+    with _LOCK:
+        _CREATE_TIMES.clear()
+        for k in _STATS:
+            _STATS[k] = 0
+    _CACHE.clear()
+    _CACHE.reset_stats()
+    _HASHES.clear()
+
+
+def stats() -> Dict[str, Any]:
+    out = _CACHE.stats()
+    with _LOCK:
+        out.update(_STATS)
+    return out
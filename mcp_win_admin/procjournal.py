@@ -0,0 +1,258 @@
+"""Diario del ciclo de vida de procesos: eventos de arranque y salida.
+
+Entre dos llamadas a processes_list no queda rastro de los procesos que arrancaron y
+terminaron, que es justo donde se esconde el malware. Este módulo compara cada
+MCP_PROC_JOURNAL_INTERVAL_SECONDS el conjunto de procesos vivos, identificados por
+(pid, create_time) para no confundir PIDs reutilizados, y escribe en SQLite (`proc_journal`):
+
+- `start`: ppid, nombre, exe, cmdline, usuario y hash del exe (de la caché de procinfo,
+  que hashea cada ejecutable una sola vez);
+- `exit`: el mismo proceso al desaparecer;
+- `running`: los procesos ya vivos en la primera muestra, para poder reconstruir árboles.
+
+`query()` filtra por rango de tiempo, exe, nombre o padre usando los índices de la tabla;
+`tree()` reconstruye el árbol de procesos (o la rama y cadena de padres de un PID). Las
+filas más antiguas que MCP_PROC_JOURNAL_RETENTION_DAYS se purgan desde el propio hilo.
+
+Sólo el hilo (MCP_PROC_JOURNAL_ENABLED) escribe en el diario: las consultas nunca muestrean,
+porque describir y hashear todos los procesos vivos no cabe en una petición. Sin el hilo, el
+diario sólo contiene lo que se registró mientras estuvo activo (vacío si nunca lo estuvo).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from . import config as cfg
+from . import db
+from . import procinfo
+
+ProcKey = Tuple[int, float]
+
+_FIELDS = ("ppid", "name", "exe", "cmdline", "username")
+_PURGE_EVERY_SECONDS = 3600.0
+
+_LOCK = threading.Lock()
+_LIVE: Dict[ProcKey, Dict[str, Any]] = {}
+_PRIMED = False
+_LAST_PURGE = 0.0
+_STATS = {"samples": 0, "started": 0, "exited": 0, "errors": 0, "purged": 0}
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+
+
+def parse_ts(value: Any) -> Optional[float]:
+    """Epoch o ISO-8601 -> epoch; vacío/None -> None."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def sample_keys() -> Dict[ProcKey, int]:
+    """Procesos vivos: {(pid, create_time): pid}."""
+    out: Dict[ProcKey, int] = {}
+    for p in psutil.process_iter(["create_time"]):
+        ct = p.info.get("create_time")
+        if ct is None:
+            continue
+        out[(p.pid, round(float(ct), 3))] = p.pid
+    return out
+
+
+def _describe(key: ProcKey) -> Dict[str, Any]:
+    fields = _FIELDS + (("exe_sha256",) if cfg.PROC_JOURNAL_HASH else ())
+    info = procinfo.describe(key[0], fields) or {}
+    cmdline = info.get("cmdline")
+    return {
+        "pid": key[0],
+        "create_time": key[1],
+        "ppid": info.get("ppid"),
+        "name": info.get("name"),
+        "exe": info.get("exe"),
+        "cmdline": " ".join(cmdline) if isinstance(cmdline, list) else cmdline,
+        "username": info.get("username"),
+        "exe_sha256": info.get("exe_sha256"),
+    }
+
+
+def sample_once(current: Optional[Dict[ProcKey, int]] = None, *, now: Optional[float] = None) -> Dict[str, Any]:
+    """Compara con la muestra anterior y registra arranques y salidas."""
+    global _PRIMED
+    if current is None:
+        current = sample_keys()
+    ts = time.time() if now is None else now
+    with _LOCK:
+        new = [k for k in current if k not in _LIVE]
+        gone = [k for k in _LIVE if k not in current]
+        first = not _PRIMED
+        _PRIMED = True
+
+    described = {k: _describe(k) for k in new}
+    events: List[Dict[str, Any]] = []
+    with _LOCK:
+        for k in gone:
+            row = _LIVE.pop(k)
+            events.append({**row, "ts": ts, "event": "exit"})
+        for k in new:
+            _LIVE[k] = described[k]
+            events.append({**described[k], "ts": ts, "event": "running" if first else "start"})
+        _STATS["samples"] += 1
+        if not first:
+            _STATS["started"] += len(new)
+        _STATS["exited"] += len(gone)
+    try:
+        db.insert_proc_journal_events(events)
+    except Exception:
+        with _LOCK:
+            _STATS["errors"] += 1
+    return {"started": 0 if first else len(new), "exited": len(gone), "live": len(current), "baseline": first}
+
+
+def _maybe_purge() -> None:
+    global _LAST_PURGE
+    if time.monotonic() - _LAST_PURGE < _PURGE_EVERY_SECONDS:
+        return
+    _LAST_PURGE = time.monotonic()
+    days = cfg.PROC_JOURNAL_RETENTION_DAYS
+    if days >= 0:
+        n = db.purge_proc_journal_older_than(int(days * 86400))
+        with _LOCK:
+            _STATS["purged"] += n
+
+
+def is_running() -> bool:
+    return _THREAD is not None and _THREAD.is_alive()
+
+
+def query(
+    *,
+    since: Any = None,
+    until: Any = None,
+    exe: Optional[str] = None,
+    name: Optional[str] = None,
+    ppid: Optional[int] = None,
+    pid: Optional[int] = None,
+    event: Optional[str] = None,
+    limit: int = 200,
+) -> List[Dict[str, Any]]:
+    """Eventos del diario (más recientes primero). Sólo lectura: no muestrea."""
+    return db.query_proc_journal(
+        since=parse_ts(since), until=parse_ts(until), exe=exe or None, name=name or None,
+        ppid=ppid, pid=pid, event=event or None, limit=limit,
+    )
+
+
+def tree(pid: Optional[int] = None, *, since: Any = None, limit: int = 5000) -> Dict[str, Any]:
+    """Reconstruye el árbol de procesos a partir del diario.
+
+    Un hijo se cuelga de la instancia más reciente de su ppid creada antes que él (así un PID
+    reutilizado no hereda hijos ajenos). Con `pid`, retorna su rama y la cadena de padres.
+    """
+    rows = query(since=since, limit=limit)
+    nodes: Dict[ProcKey, Dict[str, Any]] = {}
+    for r in reversed(rows):  # del más antiguo al más reciente
+        key = (r["pid"], r["create_time"])
+        node = nodes.get(key)
+        if node is None:
+            node = {
+                k: r.get(k) for k in ("pid", "create_time", "ppid", "name", "exe", "cmdline", "username", "exe_sha256")
+            }
+            node.update({"started": None, "exited": None, "children": []})
+            nodes[key] = node
+        if r["event"] == "start":
+            node["started"] = r["ts"]
+        elif r["event"] == "exit":
+            node["exited"] = r["ts"]
+
+    by_pid: Dict[int, List[ProcKey]] = {}
+    for key in sorted(nodes, key=lambda k: (k[0], k[1] or 0.0)):
+        by_pid.setdefault(key[0], []).append(key)
+
+    parents: Dict[ProcKey, ProcKey] = {}
+    for key, node in nodes.items():
+        ppid = node.get("ppid")
+        if ppid is None or ppid == key[0]:
+            continue
+        best = None
+        for cand in by_pid.get(ppid, ()):
+            if (cand[1] or 0.0) <= (key[1] or 0.0):
+                best = cand
+        if best is not None:
+            parents[key] = best
+            nodes[best]["children"].append(node)
+
+    if pid is None:
+        roots = [n for k, n in nodes.items() if k not in parents]
+        return {"roots": roots, "processes": len(nodes)}
+
+    instances = by_pid.get(int(pid))
+    if not instances:
+        return {"error": "pid_not_found", "pid": int(pid)}
+    key = instances[-1]
+    ancestors: List[Dict[str, Any]] = []
+    cur = parents.get(key)
+    while cur is not None and len(ancestors) < 64:
+        n = nodes[cur]
+        ancestors.append({k: v for k, v in n.items() if k != "children"})
+        cur = parents.get(cur)
+    return {"process": nodes[key], "ancestors": ancestors}
+
+
+def _loop() -> None:
+    interval = max(0.2, float(cfg.PROC_JOURNAL_INTERVAL_SECONDS))
+    while not _STOP.is_set():
+        try:
+            sample_once()
+            _maybe_purge()
+        except Exception:
+            with _LOCK:
+                _STATS["errors"] += 1
+        _STOP.wait(interval)
+
+
+def start() -> bool:
+    """Arranca el hilo del diario (idempotente)."""
+    global _THREAD
+    with _LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, name="ProcJournal", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+        out["live"] = len(_LIVE)
+    out["running"] = is_running()
+    return out
+
+
+def reset() -> None:
+    global _PRIMED, _LAST_PURGE
+    with _LOCK:
+        _LIVE.clear()
+        _PRIMED = False
+        _LAST_PURGE = 0.0
+        for k in _STATS:
+            _STATS[k] = 0
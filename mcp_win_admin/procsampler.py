@@ -0,0 +1,219 @@
+"""Muestreo de procesos en segundo plano: CPU%, RSS, IO e hilos precalculados.
+
+`cpu_percent(interval=0.0)` sobre un `psutil.Process` recién creado siempre devuelve 0.0
+(no hay medida previa) y obtener un valor real exige bloquear un intervalo por llamada.
+Este hilo recorre `psutil.process_iter()` cada MCP_PROC_SAMPLER_INTERVAL_SECONDS; psutil
+reutiliza los mismos objetos Process entre vueltas (y descarta los de PIDs reutilizados),
+así que `cpu_percent()` mide el delta desde la vuelta anterior. Las lecturas de cada proceso
+van dentro de `oneshot()` para agrupar syscalls.
+
+Cada vuelta construye una tabla compacta por columnas (`array`) y la publica de golpe,
+junto con el orden por memoria, CPU y PID: los lectores (`top`) no toman locks ni ordenan,
+sólo recorren los primeros `limit` índices.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+from . import config as cfg
+
+SORT_KEYS = ("memory", "cpu", "pid")
+
+
+class ProcTable:
+    """Tabla por columnas de una vuelta del muestreo."""
+
+    __slots__ = ("ts", "pid", "create_time", "cpu", "rss", "read_bytes", "write_bytes", "threads", "names", "order")
+
+    def __init__(self, ts: float) -> None:
+        self.ts = ts
+        self.pid = array("q")
+        self.create_time = array("d")
+        self.cpu = array("d")
+        self.rss = array("q")
+        self.read_bytes = array("q")
+        self.write_bytes = array("q")
+        self.threads = array("l")
+        self.names: List[Optional[str]] = []
+        self.order: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.pid)
+
+    def append(self, pid: int, create_time: float, cpu: float, rss: int, rd: int, wr: int, threads: int, name: Optional[str]) -> None:
+        self.pid.append(pid)
+        self.create_time.append(create_time)
+        self.cpu.append(cpu)
+        self.rss.append(rss)
+        self.read_bytes.append(rd)
+        self.write_bytes.append(wr)
+        self.threads.append(threads)
+        self.names.append(name)
+
+    def finish(self) -> "ProcTable":
+        idx = range(len(self.pid))
+        self.order = {
+            "memory": array("l", sorted(idx, key=lambda i: self.rss[i], reverse=True)),
+            "cpu": array("l", sorted(idx, key=lambda i: self.cpu[i], reverse=True)),
+            "pid": array("l", sorted(idx, key=lambda i: self.pid[i])),
+        }
+        return self
+
+    def row(self, i: int) -> Dict[str, Any]:
+        # -1 marca "no disponible" (AccessDenied) en las columnas enteras/reales
+        def _opt(v):
+            return None if v < 0 else v
+
+        return {
+            "pid": self.pid[i],
+            "name": self.names[i],
+            "create_time": _opt(self.create_time[i]),
+            "cpu_percent": _opt(self.cpu[i]),
+            "memory_rss": _opt(self.rss[i]),
+            "num_threads": _opt(self.threads[i]),
+            "io_read_bytes": _opt(self.read_bytes[i]),
+            "io_write_bytes": _opt(self.write_bytes[i]),
+        }
+
+
+_TABLE: Optional[ProcTable] = None
+_TICKS = 0
+_LOCK = threading.Lock()
+_STATS = {"ticks": 0, "errors": 0, "last_tick_ms": 0.0}
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+
+
+def _read(p: psutil.Process) -> tuple:
+    with p.oneshot():
+        try:
+            name = p.name()
+        except psutil.AccessDenied:
+            name = None
+        try:
+            ct = p.create_time()
+        except Exception:
+            ct = -1.0
+        try:
+            cpu = p.cpu_percent(interval=None)
+        except Exception:
+            cpu = -1.0
+        try:
+            rss = p.memory_info().rss
+        except Exception:
+            rss = -1
+        try:
+            io = p.io_counters()
+            rd, wr = io.read_bytes, io.write_bytes
+        except Exception:
+            rd = wr = -1
+        try:
+            threads = p.num_threads()
+        except Exception:
+            threads = -1
+    return ct, cpu, rss, rd, wr, threads, name
+
+
+def tick() -> Dict[str, Any]:
+    """Una vuelta: lee todos los procesos y publica la tabla nueva."""
+    global _TABLE, _TICKS
+    t0 = time.perf_counter()
+    table = ProcTable(time.time())
+    for p in psutil.process_iter():
+        try:
+            ct, cpu, rss, rd, wr, threads, name = _read(p)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            continue
+        except Exception:
+            ct, cpu, rss, rd, wr, threads, name = -1.0, -1.0, -1, -1, -1, -1, None
+        table.append(p.pid, ct, cpu, rss, rd, wr, threads, name)
+    table.finish()
+    elapsed = round((time.perf_counter() - t0) * 1000, 1)
+    with _LOCK:
+        _TABLE = table
+        _TICKS += 1
+        _STATS["ticks"] += 1
+        _STATS["last_tick_ms"] = elapsed
+    return {"processes": len(table), "elapsed_ms": elapsed}
+
+
+def ready() -> bool:
+    """True si hay datos recientes con CPU medida (la primera vuelta sólo fija la base)."""
+    table = _TABLE
+    if table is None or _TICKS < 2:
+        return False
+    return time.time() - table.ts <= max(5.0, 3 * float(cfg.PROC_SAMPLER_INTERVAL_SECONDS))
+
+
+def top(sort_by: str = "memory", limit: int = 20) -> List[Dict[str, Any]]:
+    """Primeros `limit` procesos de la última vuelta según `sort_by` (memory|cpu|pid)."""
+    table = _TABLE
+    if table is None:
+        return []
+    order = table.order.get(sort_by if sort_by in SORT_KEYS else "memory", array("l"))
+    return [table.row(i) for i in order[: max(1, int(limit))]]
+
+
+def get(pid: int) -> Optional[Dict[str, Any]]:
+    table = _TABLE
+    if table is None:
+        return None
+    for i, p in enumerate(table.pid):
+        if p == pid:
+            return table.row(i)
+    return None
+
+
+def _loop() -> None:
+    interval = max(0.5, float(cfg.PROC_SAMPLER_INTERVAL_SECONDS))
+    while not _STOP.is_set():
+        try:
+            tick()
+        except Exception:
+            with _LOCK:
+                _STATS["errors"] += 1
+        _STOP.wait(interval)
+
+
+def start() -> bool:
+    """Arranca el hilo de muestreo (idempotente)."""
+    global _THREAD
+    with _LOCK:
+        if _THREAD is not None and _THREAD.is_alive():
+            return False
+        _STOP.clear()
+        _THREAD = threading.Thread(target=_loop, name="ProcSampler", daemon=True)
+        _THREAD.start()
+        return True
+
+
+def stop(timeout: float = 5.0) -> None:
+    global _THREAD
+    _STOP.set()
+    th = _THREAD
+    if th is not None:
+        th.join(timeout)
+    _THREAD = None
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+        table = _TABLE
+    out["running"] = _THREAD is not None and _THREAD.is_alive()
+    out["processes"] = len(table) if table is not None else 0
+    out["age_seconds"] = round(time.time() - table.ts, 2) if table is not None else None
+    return out
+
+
+def reset() -> None:
+    global _TABLE, _TICKS
+    with _LOCK:
+        _TABLE = None
+        _TICKS = 0
+        _STATS.update({"ticks": 0, "errors": 0, "last_tick_ms": 0.0})
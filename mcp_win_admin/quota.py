@@ -0,0 +1,261 @@
+"""Cuotas por fuente compartidas entre procesos (servidores MCP, dashboard, refrescos).
+
+`_throttle` sólo espacia llamadas dentro de un proceso; varios servidores MCP y el dashboard
+juntos agotan las cuotas de los proveedores y acaban en 429. Este módulo mantiene un libro
+de cuotas en SQLite (archivo propio, MCP_QUOTA_DB_PATH) con un token bucket por
+(fuente, ventana): p.ej. VirusTotal 4/60 s y 500/86400 s. La reserva se hace dentro de
+`BEGIN IMMEDIATE`, así que es atómica entre procesos.
+
+- consume(source): reserva un token; si hay que esperar poco (<= MCP_QUOTA_MAX_WAIT_SECONDS)
+  duerme y reintenta, si no lanza QuotaExhausted.
+- refund(source): devuelve un token; `refund_unsent(source, exc)` lo hace cuando la consulta
+  falló sin llegar al proveedor (error de conexión o DNS).
+- available(source): tokens enteros disponibles ahora, sin reservar (para planificar).
+- report(days): consumo por fuente y día (concedidos, denegados, devueltos) y tokens actuales.
+
+Fuentes sin límites configurados no pasan por el libro. Si el libro falla se permite la
+llamada (fail-open) y se cuenta en `errors`.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from . import config as cfg
+from . import db
+
+# Límites públicos de los planes gratuitos: (peticiones, segundos)
+DEFAULT_LIMITS: Dict[str, Tuple[Tuple[int, int], ...]] = {
+    "virustotal": ((4, 60), (500, 86400)),
+    "abuseipdb": ((1000, 86400),),
+}
+
+LEDGER_PATH: Path = Path(cfg.QUOTA_DB_PATH) if cfg.QUOTA_DB_PATH else db.DEFAULT_DB_DIR / "quota.sqlite3"
+
+_READY: set = set()
+_READY_LOCK = threading.Lock()
+_ERRORS = 0
+
+
+class QuotaExhausted(Exception):
+    def __init__(self, source: str, wait_seconds: float) -> None:
+        super().__init__(f"quota exhausted for {source} (retry in {wait_seconds:.0f}s)")
+        self.source = source
+        self.wait_seconds = wait_seconds
+
+
+def exhausted(source: str) -> Dict[str, Any]:
+    return {"source": source, "verdict": "unknown", "status": "quota_exhausted"}
+
+
+def parse_limits(spec: Optional[str]) -> Dict[str, Tuple[Tuple[int, int], ...]]:
+    """'virustotal=4/60|500/86400,abuseipdb=1000/86400' -> {fuente: ((n, segundos), ...)}."""
+    out: Dict[str, Tuple[Tuple[int, int], ...]] = {}
+    for part in (spec or "").split(","):
+        name, _, windows = part.partition("=")
+        parsed: List[Tuple[int, int]] = []
+        for w in windows.split("|"):
+            n, _, secs = w.partition("/")
+            try:
+                if int(n) > 0 and int(secs) > 0:
+                    parsed.append((int(n), int(secs)))
+            except ValueError:
+                continue
+        if name.strip():
+            out[name.strip()] = tuple(parsed)
+    return out
+
+
+def limits() -> Dict[str, Tuple[Tuple[int, int], ...]]:
+    merged = dict(DEFAULT_LIMITS)
+    merged.update(parse_limits(cfg.QUOTA_LIMITS))
+    return {k: v for k, v in merged.items() if v}
+
+
+def _conn():
+    path = LEDGER_PATH
+    key = str(path)
+    if key not in _READY:
+        with _READY_LOCK, db.get_conn(path) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS quota_buckets (
+                    source TEXT NOT NULL,
+                    window_seconds INTEGER NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (source, window_seconds)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS quota_usage (
+                    day TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    granted INTEGER NOT NULL DEFAULT 0,
+                    denied INTEGER NOT NULL DEFAULT 0,
+                    refunded INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, source)
+                ) WITHOUT ROWID;
+                """
+            )
+            _READY.add(key)
+    return db.get_conn(path)
+
+
+def _bump(conn: sqlite3.Connection, source: str, column: str, n: int) -> None:
+    day = datetime.now(timezone.utc).date().isoformat()
+    conn.execute(
+        f"""
+        INSERT INTO quota_usage (day, source, {column}) VALUES (?, ?, ?)
+        ON CONFLICT(day, source) DO UPDATE SET {column} = {column} + excluded.{column}
+        """,
+        (day, source, n),
+    )
+
+
+def reserve(source: str, n: int = 1) -> float:
+    """Intenta reservar `n` tokens en todas las ventanas de `source` de forma atómica.
+
+    Retorna 0.0 si se concedió o los segundos a esperar hasta que haya tokens suficientes.
+    """
+    windows = limits().get(source)
+    if not windows:
+        return 0.0
+    with _conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            states: List[Tuple[int, float]] = []
+            wait = 0.0
+            for cap, secs in windows:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM quota_buckets WHERE source = ? AND window_seconds = ?",
+                    (source, secs),
+                ).fetchone()
+                rate = cap / secs
+                tokens = float(cap) if row is None else min(float(cap), row[0] + max(0.0, now - row[1]) * rate)
+                if tokens < n:
+                    wait = max(wait, (n - tokens) / rate)
+                states.append((secs, tokens))
+            if wait <= 0:
+                for secs, tokens in states:
+                    conn.execute(
+                        """
+                        INSERT INTO quota_buckets (source, window_seconds, tokens, updated) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(source, window_seconds) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+                        """,
+                        (source, secs, tokens - n, now),
+                    )
+                _bump(conn, source, "granted", n)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return wait
+
+
+def consume(source: str) -> None:
+    """Reserva un token para `source`, esperando si la espera es corta; si no, QuotaExhausted."""
+    global _ERRORS
+    if not cfg.QUOTA_ENABLED:
+        return
+    deadline = time.monotonic() + max(0.0, cfg.QUOTA_MAX_WAIT_SECONDS)
+    while True:
+        try:
+            wait = reserve(source)
+        except Exception:
+            _ERRORS += 1
+            return
+        if wait <= 0:
+            return
+        if time.monotonic() + wait > deadline:
+            # Una llamada denegada cuenta una vez, no una por reintento
+            try:
+                with _conn() as conn:
+                    _bump(conn, source, "denied", 1)
+            except Exception:
+                _ERRORS += 1
+            raise QuotaExhausted(source, wait)
+        time.sleep(wait)
+
+
+def refund(source: str, n: int = 1) -> None:
+    global _ERRORS
+    windows = limits().get(source)
+    if not cfg.QUOTA_ENABLED or not windows:
+        return
+    try:
+        with _conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for cap, secs in windows:
+                    conn.execute(
+                        "UPDATE quota_buckets SET tokens = MIN(?, tokens + ?) WHERE source = ? AND window_seconds = ?",
+                        (float(cap), n, source, secs),
+                    )
+                _bump(conn, source, "refunded", n)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    except Exception:
+        _ERRORS += 1
+
+
+def _refill(cap: int, secs: int, state: Optional[Tuple[float, float]], now: float) -> float:
+    """Tokens de una ventana en `now` a partir de su último estado (tokens, updated)."""
+    tokens, updated = state if state is not None else (float(cap), now)
+    return min(float(cap), tokens + max(0.0, now - updated) * cap / secs)
+
+
+def available(source: str) -> Optional[int]:
+    """Tokens enteros disponibles ahora para `source` (la ventana más justa); None si no tiene límites."""
+    global _ERRORS
+    windows = limits().get(source)
+    if not cfg.QUOTA_ENABLED or not windows:
+        return None
+    try:
+        with _conn() as conn:
+            states = {r["window_seconds"]: (r["tokens"], r["updated"]) for r in conn.execute(
+                "SELECT window_seconds, tokens, updated FROM quota_buckets WHERE source = ?", (source,)
+            ).fetchall()}
+    except Exception:
+        _ERRORS += 1
+        return None
+    now = time.time()
+    return max(0, min(int(_refill(cap, secs, states.get(secs), now)) for cap, secs in windows))
+
+
+# Errores de httpx en los que la petición no llegó a enviarse
+_UNSENT = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def refund_unsent(source: str, exc: BaseException) -> None:
+    """Devuelve el token de `source` si `exc` indica que la consulta no salió (conexión, DNS)."""
+    if isinstance(exc, _UNSENT):
+        refund(source)
+
+
+def report(days: int = 1) -> Dict[str, Any]:
+    """Consumo por fuente de los últimos `days` días y tokens disponibles ahora por ventana."""
+    since = (datetime.now(timezone.utc).date() - timedelta(days=max(1, int(days)) - 1)).isoformat()
+    lim = limits()
+    with _conn() as conn:
+        usage = [dict(r) for r in conn.execute(
+            "SELECT * FROM quota_usage WHERE day >= ? ORDER BY day DESC, source", (since,)
+        ).fetchall()]
+        buckets = {(r["source"], r["window_seconds"]): (r["tokens"], r["updated"]) for r in conn.execute(
+            "SELECT * FROM quota_buckets"
+        ).fetchall()}
+    now = time.time()
+    available: Dict[str, List[Dict[str, Any]]] = {}
+    for source, windows in sorted(lim.items()):
+        for cap, secs in windows:
+            tokens = _refill(cap, secs, buckets.get((source, secs)), now)
+            available.setdefault(source, []).append({"limit": cap, "window_seconds": secs, "available": round(tokens, 2)})
+    return {"enabled": cfg.QUOTA_ENABLED, "ledger": str(LEDGER_PATH), "usage": usage, "available": available, "errors": _ERRORS}
@@ -0,0 +1,171 @@
+"""Refresco en segundo plano para las cachés de reputación y hashes (stale-while-revalidate).
+
+Una entrada de caché tiene tres estados según su antigüedad:
+
+- fresh: dentro del TTL (soft); se sirve tal cual.
+- stale: pasado el TTL soft pero dentro del TTL duro; se sirve y se encola un refresco.
+- expired: pasado el TTL duro; el llamador debe consultar la nube de forma bloqueante.
+
+Los refrescos se ejecutan en un único hilo daemon, de modo que las consultas se serializan
+y respetan el throttling por fuente de `reputation._throttle` / `av._throttle`.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from . import config as cfg
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+_STATS_KEYS = (
+    "fresh_hits",
+    "stale_served",
+    "blocking_fetches",
+    "refresh_enqueued",
+    "refresh_deduped",
+    "refresh_dropped",
+    "refresh_completed",
+    "refresh_failed",
+)
+
+_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {k: 0 for k in _STATS_KEYS}
+_PENDING: set = set()
+_QUEUE: "queue.Queue[Tuple[Hashable, Callable[[], Any]]]" = queue.Queue(
+    maxsize=max(1, cfg.REP_REFRESH_QUEUE_MAX)
+)
+_WORKER: Optional[threading.Thread] = None
+
+
+def record(counter: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[counter] = _STATS.get(counter, 0) + n
+
+
+def hard_ttl(soft_ttl: Optional[int], hard_ttl_seconds: Optional[int] = None) -> Optional[int]:
+    """Devuelve el TTL duro para un TTL soft dado (None = sin expiración)."""
+    if soft_ttl is None or soft_ttl < 0:
+        return None
+    if hard_ttl_seconds is not None and hard_ttl_seconds >= 0:
+        return max(int(soft_ttl), int(hard_ttl_seconds))
+    if not cfg.REP_SWR_ENABLED:
+        return int(soft_ttl)
+    return int(int(soft_ttl) * max(1.0, cfg.REP_HARD_TTL_FACTOR))
+
+
+def classify(last_seen: Any, soft_ttl: Optional[int], hard_ttl_seconds: Optional[int] = None, *, now_ts: Optional[float] = None) -> str:
+    """Clasifica una marca `last_seen` (ISO) como fresh | stale | expired."""
+    if soft_ttl is None or soft_ttl < 0:
+        return FRESH
+    now_ts = datetime.now(timezone.utc).timestamp() if now_ts is None else now_ts
+    try:
+        ts = datetime.fromisoformat(str(last_seen)).timestamp()
+    except Exception:
+        ts = 0
+    age = now_ts - ts
+    if age <= int(soft_ttl):
+        return FRESH
+    hard = hard_ttl(soft_ttl, hard_ttl_seconds)
+    if hard is not None and age <= hard:
+        return STALE
+    return EXPIRED
+
+
+def split_rows(
+    rows: Iterable[Dict[str, Any]],
+    *,
+    ttl_seconds: Optional[int],
+    ttl_by_source: Optional[Dict[str, int]] = None,
+    hard_ttl_seconds: Optional[int] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Separa filas de caché por fuente en (fresh, stale); las expiradas se descartan.
+
+    Si hay `ttl_by_source`, el TTL soft de cada fuente sale de ahí (fallback a `ttl_seconds`).
+    """
+    fresh: Dict[str, Dict[str, Any]] = {}
+    stale: Dict[str, Dict[str, Any]] = {}
+    now_ts = datetime.now(timezone.utc).timestamp()
+    for row in rows:
+        src = str(row.get("source", ""))
+        ttl = ttl_by_source.get(src) if ttl_by_source and src in ttl_by_source else ttl_seconds
+        state = classify(row.get("last_seen", ""), ttl, hard_ttl_seconds, now_ts=now_ts)
+        if state == FRESH:
+            fresh[src] = row
+        elif state == STALE:
+            stale[src] = row
+    return fresh, stale
+
+
+def _worker_loop() -> None:
+    while True:
+        key, fn = _QUEUE.get()
+        try:
+            fn()
+            record("refresh_completed")
+        except Exception:
+            record("refresh_failed")
+        finally:
+            with _LOCK:
+                _PENDING.discard(key)
+            _QUEUE.task_done()
+
+
+def _ensure_worker() -> None:
+    global _WORKER
+    with _LOCK:
+        if _WORKER is not None and _WORKER.is_alive():
+            return
+        _WORKER = threading.Thread(target=_worker_loop, name="RepRefresh", daemon=True)
+        _WORKER.start()
+
+
+def enqueue(key: Hashable, fn: Callable[[], Any]) -> bool:
+    """Encola un refresco; ignora duplicados pendientes y descarta si la cola está llena."""
+    with _LOCK:
+        if key in _PENDING:
+            _STATS["refresh_deduped"] += 1
+            return False
+        _PENDING.add(key)
+    try:
+        _QUEUE.put_nowait((key, fn))
+    except queue.Full:
+        with _LOCK:
+            _PENDING.discard(key)
+            _STATS["refresh_dropped"] += 1
+        return False
+    record("refresh_enqueued")
+    _ensure_worker()
+    return True
+
+
+def wait_idle(timeout: float = 5.0) -> bool:
+    """Espera a que no queden refrescos pendientes. Retorna False si vence el timeout."""
+    deadline = time.monotonic() + max(0.0, timeout)
+    while time.monotonic() < deadline:
+        with _LOCK:
+            if not _PENDING:
+                return True
+        time.sleep(0.01)
+    with _LOCK:
+        return not _PENDING
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+        out["pending"] = len(_PENDING)
+    out["swr_enabled"] = cfg.REP_SWR_ENABLED
+    out["hard_ttl_factor"] = cfg.REP_HARD_TTL_FACTOR
+    return out
+
+
+def reset_stats() -> None:
+    with _LOCK:
+        for k in _STATS_KEYS:
+            _STATS[k] = 0
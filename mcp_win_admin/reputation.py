@@ -1,38 +1,52 @@
 import os
+import threading
 import time
-from typing import Dict, Optional, Tuple
-from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
 
 import httpx
 
 from . import db
 from . import config as cfg
+from . import breaker
+from . import quota
+from . import refresh
+from .singleflight import SingleFlight
 
 _LAST_CALL: Dict[str, float] = {}
 _MIN_INTERVAL = float(os.getenv("REP_THROTTLE_MIN_INTERVAL", "1.0"))  # seconds per source
+_THROTTLE_LOCK = threading.Lock()
+_FLIGHT = SingleFlight("reputation")
 
 
 def _throttle(key: str) -> None:
-    now = time.monotonic()
-    last = _LAST_CALL.get(key, 0.0)
-    delta = now - last
-    if delta < _MIN_INTERVAL:
-        time.sleep(_MIN_INTERVAL - delta)
-    _LAST_CALL[key] = time.monotonic()
+    # Reserve the next slot under the lock so foreground calls and refresh workers share the budget
+    with _THROTTLE_LOCK:
+        now = time.monotonic()
+        last = _LAST_CALL.get(key, 0.0)
+        wait = max(0.0, _MIN_INTERVAL - (now - last))
+        _LAST_CALL[key] = now + wait
+    try:
+        if wait > 0:
+            time.sleep(wait)
+        # Cuota compartida entre procesos (sólo fuentes con límites); QuotaExhausted si no hay tokens
+        quota.consume(key)
+    finally:
+        # Las esperas locales no son latencia de la fuente: no inflan el timeout adaptativo
+        breaker.exclude_wait(time.monotonic() - now)
 
 
 def _vt_client() -> Optional[httpx.Client]:
     api_key = os.getenv("VT_API_KEY")
     if not api_key:
         return None
-    return httpx.Client(timeout=15, headers={"x-apikey": api_key})
+    return httpx.Client(timeout=breaker.timeout_for("virustotal"), headers={"x-apikey": api_key})
 
 
 def _otx_client() -> Optional[httpx.Client]:
     key = os.getenv("OTX_API_KEY")
     if not key:
         return None
-    return httpx.Client(timeout=15, headers={"X-OTX-API-KEY": key})
+    return httpx.Client(timeout=breaker.timeout_for("otx"), headers={"X-OTX-API-KEY": key})
 
 
 def _greynoise_client() -> Optional[httpx.Client]:
@@ -40,14 +54,14 @@ def _greynoise_client() -> Optional[httpx.Client]:
     if not key:
         return None
     # GreyNoise community uses header 'key'
-    return httpx.Client(timeout=15, headers={"key": key, "Accept": "application/json"})
+    return httpx.Client(timeout=breaker.timeout_for("greynoise"), headers={"key": key, "Accept": "application/json"})
 
 
 def _abuseipdb_client() -> Optional[httpx.Client]:
     key = os.getenv("ABUSEIPDB_API_KEY")
     if not key:
         return None
-    return httpx.Client(timeout=15, headers={"Key": key, "Accept": "application/json"})
+    return httpx.Client(timeout=breaker.timeout_for("abuseipdb"), headers={"Key": key, "Accept": "application/json"})
 
 
 def _threatfox_lookup(query_type: str, value: str, *, client: Optional[httpx.Client] = None) -> Dict:
@@ -55,7 +69,7 @@ def _threatfox_lookup(query_type: str, value: str, *, client: Optional[httpx.Cli
     url = "https://threatfox-api.abuse.ch/api/v1/"
     close_client = False
     if client is None:
-        client = httpx.Client(timeout=15)
+        client = httpx.Client(timeout=breaker.timeout_for("threatfox"))
         close_client = True
     try:
         payload = {"query": "search_ioc", "search_term": value}
@@ -67,6 +81,7 @@ def _threatfox_lookup(query_type: str, value: str, *, client: Optional[httpx.Cli
             return {"source": "threatfox", "verdict": "malicious", "count": len(data.get("data", []))}
         return {"source": "threatfox", "verdict": "unknown", "status": status}
     except Exception as e:
+        quota.refund_unsent("threatfox", e)
         return {"source": "threatfox", "error": str(e), "verdict": "unknown"}
     finally:
         if close_client:
@@ -74,11 +89,11 @@ def _threatfox_lookup(query_type: str, value: str, *, client: Optional[httpx.Cli
 
 
 def _otx_ip_lookup(ip: str, *, client: Optional[httpx.Client] = None) -> Dict:
-    _throttle("otx")
     if client is None:
         client = _otx_client()
     if client is None:
         return {"source": "otx", "verdict": "unknown", "status": "no_api_key"}
+    _throttle("otx")
     try:
         resp = client.get(f"https://otx.alienvault.com/api/v1/indicators/IPv4/{ip}/general")
         if resp.status_code == 404:
@@ -89,15 +104,16 @@ def _otx_ip_lookup(ip: str, *, client: Optional[httpx.Client] = None) -> Dict:
         verdict = "malicious" if pulses > 0 else "unknown"
         return {"source": "otx", "verdict": verdict, "pulses": pulses}
     except Exception as e:
+        quota.refund_unsent("otx", e)
         return {"source": "otx", "error": str(e), "verdict": "unknown"}
 
 
 def _otx_domain_lookup(domain: str, *, client: Optional[httpx.Client] = None) -> Dict:
-    _throttle("otx")
     if client is None:
         client = _otx_client()
     if client is None:
         return {"source": "otx", "verdict": "unknown", "status": "no_api_key"}
+    _throttle("otx")
     try:
         resp = client.get(f"https://otx.alienvault.com/api/v1/indicators/domain/{domain}/general")
         if resp.status_code == 404:
@@ -108,15 +124,16 @@ def _otx_domain_lookup(domain: str, *, client: Optional[httpx.Client] = None) ->
         verdict = "malicious" if pulses > 0 else "unknown"
         return {"source": "otx", "verdict": verdict, "pulses": pulses}
     except Exception as e:
+        quota.refund_unsent("otx", e)
         return {"source": "otx", "error": str(e), "verdict": "unknown"}
 
 
 def _greynoise_ip_lookup(ip: str, *, client: Optional[httpx.Client] = None) -> Dict:
-    _throttle("greynoise")
     if client is None:
         client = _greynoise_client()
     if client is None:
         return {"source": "greynoise", "verdict": "unknown", "status": "no_api_key"}
+    _throttle("greynoise")
     try:
         # Community quick endpoint v2
         resp = client.get(f"https://api.greynoise.io/v2/noise/quick/{ip}")
@@ -129,15 +146,16 @@ def _greynoise_ip_lookup(ip: str, *, client: Optional[httpx.Client] = None) -> D
         verdict = "clean" if riot else ("suspicious" if noise else "unknown")
         return {"source": "greynoise", "verdict": verdict, "riot": riot, "noise": noise}
     except Exception as e:
+        quota.refund_unsent("greynoise", e)
         return {"source": "greynoise", "error": str(e), "verdict": "unknown"}
 
 
 def _abuseipdb_ip_lookup(ip: str, *, client: Optional[httpx.Client] = None) -> Dict:
-    _throttle("abuseipdb")
     if client is None:
         client = _abuseipdb_client()
     if client is None:
         return {"source": "abuseipdb", "verdict": "unknown", "status": "no_api_key"}
+    _throttle("abuseipdb")
     try:
         url = f"https://api.abuseipdb.com/api/v2/check?ipAddress={ip}&maxAgeInDays=90"
         resp = client.get(url)
@@ -149,6 +167,7 @@ def _abuseipdb_ip_lookup(ip: str, *, client: Optional[httpx.Client] = None) -> D
         verdict = "malicious" if score >= 70 else ("suspicious" if score > 0 else "unknown")
         return {"source": "abuseipdb", "verdict": verdict, "score": score}
     except Exception as e:
+        quota.refund_unsent("abuseipdb", e)
         return {"source": "abuseipdb", "error": str(e), "verdict": "unknown"}
 
 
@@ -157,7 +176,7 @@ def _urlhaus_host_lookup(host: str, *, client: Optional[httpx.Client] = None) ->
     url = "https://urlhaus-api.abuse.ch/v1/host/"
     close_client = False
     if client is None:
-        client = httpx.Client(timeout=15)
+        client = httpx.Client(timeout=breaker.timeout_for("urlhaus"))
         close_client = True
     try:
         resp = client.post(url, data={"host": host})
@@ -167,6 +186,7 @@ def _urlhaus_host_lookup(host: str, *, client: Optional[httpx.Client] = None) ->
             return {"source": "urlhaus", "verdict": "malicious", "count": len(data.get("urls", []))}
         return {"source": "urlhaus", "verdict": "unknown", "status": data.get("query_status")}
     except Exception as e:
+        quota.refund_unsent("urlhaus", e)
         return {"source": "urlhaus", "error": str(e), "verdict": "unknown"}
     finally:
         if close_client:
@@ -174,9 +194,9 @@ def _urlhaus_host_lookup(host: str, *, client: Optional[httpx.Client] = None) ->
 
 
 def _vt_ip_lookup(ip: str, *, client: Optional[httpx.Client]) -> Optional[Dict]:
-    _throttle("virustotal")
     if client is None:
         return None
+    _throttle("virustotal")
     try:
         resp = client.get(f"https://www.virustotal.com/api/v3/ip_addresses/{ip}")
         if resp.status_code == 404:
@@ -189,13 +209,14 @@ def _vt_ip_lookup(ip: str, *, client: Optional[httpx.Client]) -> Optional[Dict]:
         verdict = "malicious" if malicious_cats and malicious_cats > 0 else ("suspicious" if reps > 0 else "unknown")
         return {"source": "virustotal", "verdict": verdict, "reputation": reps}
     except Exception as e:
+        quota.refund_unsent("virustotal", e)
         return {"source": "virustotal", "error": str(e), "verdict": "unknown"}
 
 
 def _vt_domain_lookup(domain: str, *, client: Optional[httpx.Client]) -> Optional[Dict]:
-    _throttle("virustotal")
     if client is None:
         return None
+    _throttle("virustotal")
     try:
         resp = client.get(f"https://www.virustotal.com/api/v3/domains/{domain}")
         if resp.status_code == 404:
@@ -208,11 +229,156 @@ def _vt_domain_lookup(domain: str, *, client: Optional[httpx.Client]) -> Optiona
         verdict = "malicious" if malicious_cats and malicious_cats > 0 else ("suspicious" if reps > 0 else "unknown")
         return {"source": "virustotal", "verdict": verdict, "reputation": reps}
     except Exception as e:
+        quota.refund_unsent("virustotal", e)
         return {"source": "virustotal", "error": str(e), "verdict": "unknown"}
 
 
 ORDER = {"malicious": 3, "suspicious": 2, "clean": 1, "unknown": 0}
 
+IP_SOURCES = ("threatfox", "urlhaus", "virustotal", "otx", "greynoise", "abuseipdb")
+DOMAIN_SOURCES = ("threatfox", "urlhaus", "virustotal", "otx")
+
+
+def _with_client(
+    make: Callable[[], Optional[httpx.Client]], lookup: Callable[..., Optional[Dict]], value: str
+) -> Optional[Dict]:
+    """Crea el cliente de la fuente para una sola consulta y lo cierra al terminar."""
+    client = make()
+    if client is None:
+        return lookup(value, client=None)
+    with client:
+        return lookup(value, client=client)
+
+
+def _lookup_ip_source(ip: str, source: str) -> Optional[Dict]:
+    if source == "threatfox":
+        return _threatfox_lookup("ip", ip)
+    if source == "urlhaus":
+        return _urlhaus_host_lookup(ip)
+    if source == "virustotal":
+        return _with_client(_vt_client, _vt_ip_lookup, ip) or {"source": "virustotal", "verdict": "unknown"}
+    if source == "otx":
+        return _with_client(_otx_client, _otx_ip_lookup, ip)
+    if source == "greynoise":
+        return _with_client(_greynoise_client, _greynoise_ip_lookup, ip)
+    if source == "abuseipdb":
+        return _with_client(_abuseipdb_client, _abuseipdb_ip_lookup, ip)
+    return None
+
+
+def _lookup_domain_source(domain: str, source: str) -> Optional[Dict]:
+    if source == "threatfox":
+        return _threatfox_lookup("domain", domain)
+    if source == "urlhaus":
+        return _urlhaus_host_lookup(domain)
+    if source == "virustotal":
+        return _with_client(_vt_client, _vt_domain_lookup, domain) or {"source": "virustotal", "verdict": "unknown"}
+    if source == "otx":
+        return _with_client(_otx_client, _otx_domain_lookup, domain)
+    return None
+
+
+def _fetch_ip_source(ip: str, source: str) -> Optional[Dict]:
+    r = breaker.call(source, _lookup_ip_source, ip, source)
+    if r is None:
+        return None
+    r = {**r, "cached": False}
+    if r.get("status") in breaker.UNCACHEABLE_STATUSES:
+        # Circuito abierto o sin cuota: no persistir, para no envenenar la caché con 'unknown'
+        return r
+    v = r.get("verdict", "unknown")
+    src_name = r.get("source", source)
+    try:
+        # Sólo caché por fuente: el agregado lo deriva la vista indicator_verdicts
+        db.upsert_ip_reputation_source(ip=ip, source=src_name, verdict=v, metadata=None)
+    except Exception:
+        pass
+    return r
+
+
+def _fetch_domain_source(domain: str, source: str) -> Optional[Dict]:
+    r = breaker.call(source, _lookup_domain_source, domain, source)
+    if r is None:
+        return None
+    r = {**r, "cached": False}
+    if r.get("status") in breaker.UNCACHEABLE_STATUSES:
+        # Circuito abierto o sin cuota: no persistir, para no envenenar la caché con 'unknown'
+        return r
+    v = r.get("verdict", "unknown")
+    src_name = r.get("source", source)
+    try:
+        db.upsert_domain_reputation_source(domain=domain, source=src_name, verdict=v, metadata=None)
+    except Exception:
+        pass
+    return r
+
+
+def _fetch_ip_sources(ip: str, sources: Tuple[str, ...]) -> List[Dict]:
+    """Consulta las fuentes indicadas para una IP y persiste cada resultado en la caché por fuente.
+
+    Cada (ip, fuente) pasa por single-flight: llamadas concurrentes comparten una sola consulta.
+    """
+    results: List[Dict] = []
+    for s in sources:
+        r = _FLIGHT.do(("ip", ip, s), lambda s=s: _fetch_ip_source(ip, s))
+        if r is not None:
+            results.append(dict(r))
+    return results
+
+
+def _fetch_domain_sources(domain: str, sources: Tuple[str, ...]) -> List[Dict]:
+    """Consulta las fuentes indicadas para un dominio y persiste cada resultado en la caché por fuente."""
+    results: List[Dict] = []
+    for s in sources:
+        r = _FLIGHT.do(("domain", domain.lower(), s), lambda s=s: _fetch_domain_source(domain, s))
+        if r is not None:
+            results.append(dict(r))
+    return results
+
+
+def _split_cached_sources(
+    out: Dict,
+    rows: List[Dict],
+    sources: Tuple[str, ...],
+    *,
+    ttl_seconds: Optional[int],
+    ttl_by_source: Optional[Dict[str, int]],
+    hard_ttl_seconds: Optional[int],
+    use_cloud: bool,
+) -> Tuple[List[str], List[str]]:
+    """Añade a `out` las fuentes servidas desde caché y devuelve (a_consultar, a_refrescar).
+
+    Las entradas stale sólo se sirven si hay nube para refrescarlas en segundo plano.
+    """
+    fresh, stale = refresh.split_rows(
+        rows, ttl_seconds=ttl_seconds, ttl_by_source=ttl_by_source, hard_ttl_seconds=hard_ttl_seconds
+    )
+    to_fetch: List[str] = []
+    to_refresh: List[str] = []
+    for s in sources:
+        row = fresh.get(s)
+        if row:
+            out["sources"].append({"source": s, "verdict": row.get("verdict", "unknown"), "cached": True})
+            refresh.record("fresh_hits")
+        elif use_cloud and s in stale:
+            row = stale[s]
+            out["sources"].append({"source": s, "verdict": row.get("verdict", "unknown"), "cached": True, "stale": True})
+            to_refresh.append(s)
+            refresh.record("stale_served")
+        else:
+            to_fetch.append(s)
+    return to_fetch, to_refresh
+
+
+def _consolidate(out: Dict) -> Dict:
+    best = out.get("verdict", "unknown")
+    for src in out.get("sources", []):
+        cand = src.get("verdict", "unknown")
+        if ORDER.get(cand, -1) > ORDER.get(best, -1):
+            best = cand
+    out["verdict"] = best
+    return out
+
 
 def check_ip(
     ip: str,
@@ -221,86 +387,44 @@ def check_ip(
     ttl_seconds: Optional[int] = None,
     sources: Tuple[str, ...] = ("threatfox", "urlhaus"),
     ttl_by_source: Optional[Dict[str, int]] = None,
+    hard_ttl_seconds: Optional[int] = None,
 ) -> Dict:
+    """Reputación de una IP con caché por fuente y política stale-while-revalidate.
+
+    - ttl_seconds / ttl_by_source: TTL soft; dentro de él la caché se sirve sin más.
+    - hard_ttl_seconds: TTL duro explícito (por defecto TTL soft * MCP_REP_HARD_TTL_FACTOR);
+      entre ambos se sirve la caché marcada `stale` y se encola un refresco en segundo plano.
+    """
     # If using the default free-only sources and FREE_ONLY_SOURCES is disabled, extend to include paid/keyed sources
     if sources == ("threatfox", "urlhaus") and not cfg.FREE_ONLY_SOURCES:
-        sources = ("threatfox", "urlhaus", "virustotal", "otx", "greynoise", "abuseipdb")
+        sources = IP_SOURCES
     out: Dict = {"ip": ip, "verdict": "unknown", "sources": []}
     cached = db.get_ip_reputation(ip=ip, ttl_seconds=ttl_seconds)
     if cached:
         out["cache"] = cached
         out["verdict"] = cached.get("verdict", out["verdict"])  # initial suggestion
 
-    # Consultar caché por fuente (si existe). Si hay ttl_by_source, no filtramos en DB y aplicamos TTL por fuente en memoria.
-    if ttl_by_source:
-        cached_src_rows = db.get_ip_reputation_sources(ip=ip, ttl_seconds=None) or []
-        filtered_rows: Dict[str, Dict] = {}
-        now_ts = datetime.now(timezone.utc).timestamp()
-        for row in cached_src_rows:
-            src = str(row.get("source", ""))
-            # TTL específico por fuente o fallback al ttl_seconds global si está definido
-            ttl = ttl_by_source.get(src) if src in ttl_by_source else ttl_seconds
-            if ttl is None or ttl < 0:
-                filtered_rows[src] = row
-                continue
-            try:
-                dt = datetime.fromisoformat(row.get("last_seen", ""))
-                ts = dt.timestamp()
-            except Exception:
-                ts = 0
-            if ts >= (now_ts - int(ttl)):
-                filtered_rows[src] = row
-        cached_by_source = filtered_rows
-    else:
-        cached_src_rows = db.get_ip_reputation_sources(ip=ip, ttl_seconds=ttl_seconds) or []
-        cached_by_source = {row.get("source", ""): row for row in cached_src_rows}
-
-    to_fetch: list[str] = []
-    for s in sources:
-        row = cached_by_source.get(s)
-        if row:
-            out["sources"].append({"source": s, "verdict": row.get("verdict", "unknown"), "cached": True})
-        else:
-            to_fetch.append(s)
+    # Consultar caché por fuente sin filtrar en DB; el TTL (global o por fuente) se aplica en memoria
+    cached_src_rows = db.get_ip_reputation_sources(ip=ip, ttl_seconds=None) or []
+    to_fetch, to_refresh = _split_cached_sources(
+        out,
+        cached_src_rows,
+        sources,
+        ttl_seconds=ttl_seconds,
+        ttl_by_source=ttl_by_source,
+        hard_ttl_seconds=hard_ttl_seconds,
+        use_cloud=use_cloud,
+    )
+
+    for s in to_refresh:
+        refresh.enqueue(("ip", ip, s), lambda s=s: _fetch_ip_sources(ip, (s,)))
 
     if use_cloud and to_fetch:
-        vt_client = _vt_client()
-        otx_client = _otx_client()
-        gn_client = _greynoise_client()
-        abuse_client = _abuseipdb_client()
-        for s in to_fetch:
-            if s == "threatfox":
-                r = _threatfox_lookup("ip", ip)
-            elif s == "urlhaus":
-                r = _urlhaus_host_lookup(ip)
-            elif s == "virustotal":
-                r = _vt_ip_lookup(ip, client=vt_client) or {"source": "virustotal", "verdict": "unknown"}
-            elif s == "otx":
-                r = _otx_ip_lookup(ip, client=otx_client)
-            elif s == "greynoise":
-                r = _greynoise_ip_lookup(ip, client=gn_client)
-            elif s == "abuseipdb":
-                r = _abuseipdb_ip_lookup(ip, client=abuse_client)
-            else:
-                continue
-            r = {**r, "cached": False}
-            out["sources"].append(r)
-            v = r.get("verdict", "unknown")
-            src_name = r.get("source", s)
-            try:
-                # Escribir caché agregado y por fuente
-                db.upsert_ip_reputation(ip=ip, verdict=v, source=src_name, metadata=None)
-                db.upsert_ip_reputation_source(ip=ip, source=src_name, verdict=v, metadata=None)
-            except Exception:
-                pass
+        fetched = _fetch_ip_sources(ip, tuple(to_fetch))
+        refresh.record("blocking_fetches", len(fetched))
+        out["sources"].extend(fetched)
 
-    best = out.get("verdict", "unknown")
-    for src in out.get("sources", []):
-        cand = src.get("verdict", "unknown")
-        if ORDER.get(cand, -1) > ORDER.get(best, -1):
-            best = cand
-    out["verdict"] = best
-    return out
+    return _consolidate(out)
 
 
 def check_domain(
@@ -310,75 +434,36 @@ def check_domain(
     ttl_seconds: Optional[int] = None,
     sources: Tuple[str, ...] = ("threatfox", "urlhaus"),
     ttl_by_source: Optional[Dict[str, int]] = None,
+    hard_ttl_seconds: Optional[int] = None,
 ) -> Dict:
+    """Reputación de un dominio; misma política de caché que `check_ip`."""
     # If using the default free-only sources and FREE_ONLY_SOURCES is disabled, extend to include paid/keyed domain sources
     if sources == ("threatfox", "urlhaus") and not cfg.FREE_ONLY_SOURCES:
         # Only include sources that support domain lookups
-        sources = ("threatfox", "urlhaus", "virustotal", "otx")
+        sources = DOMAIN_SOURCES
     out: Dict = {"domain": domain, "verdict": "unknown", "sources": []}
     cached = db.get_domain_reputation(domain=domain, ttl_seconds=ttl_seconds)
     if cached:
         out["cache"] = cached
         out["verdict"] = cached.get("verdict", out["verdict"])  # initial suggestion
 
-    if ttl_by_source:
-        cached_src_rows = db.get_domain_reputation_sources(domain=domain, ttl_seconds=None) or []
-        filtered_rows: Dict[str, Dict] = {}
-        now_ts = datetime.now(timezone.utc).timestamp()
-        for row in cached_src_rows:
-            src = str(row.get("source", ""))
-            ttl = ttl_by_source.get(src) if src in ttl_by_source else ttl_seconds
-            if ttl is None or ttl < 0:
-                filtered_rows[src] = row
-                continue
-            try:
-                dt = datetime.fromisoformat(row.get("last_seen", ""))
-                ts = dt.timestamp()
-            except Exception:
-                ts = 0
-            if ts >= (now_ts - int(ttl)):
-                filtered_rows[src] = row
-        cached_by_source = filtered_rows
-    else:
-        cached_src_rows = db.get_domain_reputation_sources(domain=domain, ttl_seconds=ttl_seconds) or []
-        cached_by_source = {row.get("source", ""): row for row in cached_src_rows}
-
-    to_fetch: list[str] = []
-    for s in sources:
-        row = cached_by_source.get(s)
-        if row:
-            out["sources"].append({"source": s, "verdict": row.get("verdict", "unknown"), "cached": True})
-        else:
-            to_fetch.append(s)
+    cached_src_rows = db.get_domain_reputation_sources(domain=domain, ttl_seconds=None) or []
+    to_fetch, to_refresh = _split_cached_sources(
+        out,
+        cached_src_rows,
+        sources,
+        ttl_seconds=ttl_seconds,
+        ttl_by_source=ttl_by_source,
+        hard_ttl_seconds=hard_ttl_seconds,
+        use_cloud=use_cloud,
+    )
+
+    for s in to_refresh:
+        refresh.enqueue(("domain", domain.lower(), s), lambda s=s: _fetch_domain_sources(domain, (s,)))
 
     if use_cloud and to_fetch:
-        vt_client = _vt_client()
-        otx_client = _otx_client()
-        for s in to_fetch:
-            if s == "threatfox":
-                r = _threatfox_lookup("domain", domain)
-            elif s == "urlhaus":
-                r = _urlhaus_host_lookup(domain)
-            elif s == "virustotal":
-                r = _vt_domain_lookup(domain, client=vt_client) or {"source": "virustotal", "verdict": "unknown"}
-            elif s == "otx":
-                r = _otx_domain_lookup(domain, client=otx_client)
-            else:
-                continue
-            r = {**r, "cached": False}
-            out["sources"].append(r)
-            v = r.get("verdict", "unknown")
-            src_name = r.get("source", s)
-            try:
-                db.upsert_domain_reputation(domain=domain, verdict=v, source=src_name, metadata=None)
-                db.upsert_domain_reputation_source(domain=domain, source=src_name, verdict=v, metadata=None)
-            except Exception:
-                pass
+        fetched = _fetch_domain_sources(domain, tuple(to_fetch))
+        refresh.record("blocking_fetches", len(fetched))
+        out["sources"].extend(fetched)
 
-    best = out.get("verdict", "unknown")
-    for src in out.get("sources", []):
-        cand = src.get("verdict", "unknown")
-        if ORDER.get(cand, -1) > ORDER.get(best, -1):
-            best = cand
-    out["verdict"] = best
-    return out
+    return _consolidate(out)
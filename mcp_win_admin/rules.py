@@ -0,0 +1,301 @@
+"""Motor de reglas de comportamiento declarativas.
+
+Las reglas se cargan de JSON (o YAML si PyYAML está instalado) y se compilan a un conjunto
+de predicados indexado, en vez de recorrer listas en código:
+
+- `name`: nombres exactos -> un mapa hash nombre -> reglas;
+- `name_regex`: una única alternancia compilada como prefiltro; sólo si casa se prueban las
+  regex de cada regla;
+- `exe_prefix` / `open_file_prefix`: tries de componentes de ruta (una pasada por ruta);
+- `parent_name`: nombre del proceso padre (junto con `name` expresa relaciones padre/hijo);
+- `remote_port`: puertos remotos de las conexiones del proceso.
+
+Dentro de una regla las condiciones se combinan con AND y los valores de cada lista con OR.
+Los atributos de psutil se piden de forma perezosa y en orden de coste: sólo los que usan
+las reglas activas y sólo para procesos que siguen siendo candidatos.
+
+Formato:
+    {"rules": [{"id": "office-spawns-shell", "severity": "high",
+                "parent_name": ["winword.exe"], "name": ["powershell.exe", "cmd.exe"],
+                "reason": "Office spawned a shell"}]}
+En `reason`, `{path}` y `{port}` se sustituyen por la ruta o el puerto que casó.
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+_SEP = re.compile(r"[\\/]+")
+_END = object()
+
+CONDITIONS = ("name", "name_regex", "exe_prefix", "parent_name", "remote_port", "open_file_prefix")
+# Atributos de psutil que necesita cada condición ("name" siempre se pide al enumerar)
+ATTRS_BY_CONDITION = {
+    "name": (),
+    "name_regex": (),
+    "exe_prefix": ("exe",),
+    "parent_name": ("ppid",),
+    "remote_port": ("connections",),
+    "open_file_prefix": ("open_files",),
+}
+
+
+class RuleError(ValueError):
+    pass
+
+
+class PrefixTrie:
+    """Prefijos de ruta por componentes (sin distinguir mayúsculas; / y \\ equivalentes).
+
+    Una búsqueda recorre la ruta una vez en lugar de compararla con cada prefijo.
+    """
+
+    def __init__(self, prefixes: Iterable[str] = ()) -> None:
+        self._root: Dict[Any, Any] = {}
+        self._size = 0
+        for p in prefixes:
+            self.add(p)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _parts(path: str) -> List[str]:
+        return [p for p in _SEP.split(path.lower()) if p]
+
+    def add(self, prefix: str, value: Any = None) -> None:
+        node = self._root
+        for part in self._parts(prefix):
+            node = node.setdefault(part, {})
+        if _END not in node:
+            self._size += 1
+            node[_END] = (prefix, [])
+        if value is not None:
+            node[_END][1].append(value)
+
+    def match(self, path: str) -> Optional[str]:
+        """Retorna el prefijo registrado más corto que contiene `path`, o None."""
+        for prefix, _ in self._walk(path):
+            return prefix
+        return None
+
+    def values(self, path: str) -> List[Any]:
+        """Valores de todos los prefijos que contienen `path`."""
+        out: List[Any] = []
+        for _, vals in self._walk(path):
+            out.extend(vals)
+        return out
+
+    def _walk(self, path: str):
+        node = self._root
+        for part in self._parts(path):
+            node = node.get(part)
+            if node is None:
+                return
+            if _END in node:
+                yield node[_END]
+
+
+@dataclass
+class Rule:
+    id: str
+    reason: str
+    severity: str = "medium"
+    names: FrozenSet[str] = frozenset()
+    name_regex: Optional[re.Pattern] = None
+    exe_prefixes: Tuple[str, ...] = ()
+    parent_names: FrozenSet[str] = frozenset()
+    remote_ports: FrozenSet[int] = frozenset()
+    open_file_prefixes: Tuple[str, ...] = ()
+    conditions: Tuple[str, ...] = ()
+
+
+def _strings(raw: Dict[str, Any], key: str) -> List[str]:
+    val = raw.get(key) or []
+    if isinstance(val, str):
+        val = [val]
+    if not isinstance(val, list) or not all(isinstance(v, str) for v in val):
+        raise RuleError(f"rule {raw.get('id')!r}: '{key}' must be a string or list of strings")
+    return val
+
+
+def parse_rule(raw: Mapping[str, Any]) -> Rule:
+    if not isinstance(raw, Mapping) or not raw.get("id"):
+        raise RuleError(f"rule without id: {raw!r}")
+    raw = dict(raw)
+    unknown = set(raw) - set(CONDITIONS) - {"id", "reason", "severity", "description", "enabled"}
+    if unknown:
+        raise RuleError(f"rule {raw['id']!r}: unknown keys {sorted(unknown)}")
+    regexes = _strings(raw, "name_regex")
+    try:
+        name_regex = re.compile("|".join(f"(?:{r})" for r in regexes), re.IGNORECASE) if regexes else None
+    except re.error as e:
+        raise RuleError(f"rule {raw['id']!r}: bad name_regex: {e}") from e
+    ports_raw = raw.get("remote_port") or []
+    try:
+        ports = frozenset(int(p) for p in (ports_raw if isinstance(ports_raw, list) else [ports_raw]))
+    except (TypeError, ValueError) as e:
+        raise RuleError(f"rule {raw['id']!r}: remote_port must be integers") from e
+    rule = Rule(
+        id=str(raw["id"]),
+        reason=str(raw.get("reason") or raw.get("description") or raw["id"]),
+        severity=str(raw.get("severity") or "medium"),
+        names=frozenset(n.lower() for n in _strings(raw, "name")),
+        name_regex=name_regex,
+        exe_prefixes=tuple(_strings(raw, "exe_prefix")),
+        parent_names=frozenset(n.lower() for n in _strings(raw, "parent_name")),
+        remote_ports=ports,
+        open_file_prefixes=tuple(_strings(raw, "open_file_prefix")),
+    )
+    rule.conditions = tuple(c for c in CONDITIONS if raw.get(c) not in (None, [], ""))
+    if not rule.conditions:
+        raise RuleError(f"rule {rule.id!r}: no conditions")
+    return rule
+
+
+def load_rules_file(path: Path) -> List[Dict[str, Any]]:
+    text = Path(path).read_text(encoding="utf-8")
+    if Path(path).suffix.lower() in (".yml", ".yaml"):
+        try:
+            import yaml  # type: ignore
+        except Exception as e:
+            raise RuleError(f"PyYAML no disponible para {path}: {e}") from e
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("rules", [])
+    if not isinstance(data, list):
+        raise RuleError(f"{path}: expected a list of rules or {{'rules': [...]}}")
+    return data
+
+
+class ProcessView:
+    """Atributos de un proceso pedidos bajo demanda a `fetch(attr)` y memorizados."""
+
+    __slots__ = ("pid", "name", "_fetch", "_cache")
+
+    def __init__(self, pid: int, name: Optional[str], fetch: Callable[[str], Any]) -> None:
+        self.pid = pid
+        self.name = name
+        self._fetch = fetch
+        self._cache: Dict[str, Any] = {}
+
+    def get(self, attr: str) -> Any:
+        if attr not in self._cache:
+            try:
+                self._cache[attr] = self._fetch(attr)
+            except Exception:
+                self._cache[attr] = None
+        return self._cache[attr]
+
+    @property
+    def fetched(self) -> Tuple[str, ...]:
+        return tuple(self._cache)
+
+
+class RuleSet:
+    """Reglas compiladas a índices. `evaluate(view)` retorna los hallazgos de un proceso."""
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self.rules: List[Rule] = list(rules)
+        self._by_name: Dict[str, List[int]] = {}
+        self._regex_rules: List[int] = []
+        self._unanchored: List[int] = []
+        self._exe_trie = PrefixTrie()
+        self._file_trie = PrefixTrie()
+        alts: List[str] = []
+        for i, r in enumerate(self.rules):
+            for n in r.names:
+                self._by_name.setdefault(n, []).append(i)
+            if r.name_regex is not None:
+                self._regex_rules.append(i)
+                alts.append(f"(?:{r.name_regex.pattern})")
+            if not r.names and r.name_regex is None:
+                self._unanchored.append(i)
+            for p in r.exe_prefixes:
+                self._exe_trie.add(p, i)
+            for p in r.open_file_prefixes:
+                self._file_trie.add(p, i)
+        self._regex_prefilter = re.compile("|".join(alts), re.IGNORECASE) if alts else None
+        self.attrs: Tuple[str, ...] = tuple(sorted({a for r in self.rules for c in r.conditions for a in ATTRS_BY_CONDITION[c]}))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _candidates(self, name: str) -> List[int]:
+        cand: Set[int] = set(self._unanchored)
+        lname = name.lower()
+        cand.update(self._by_name.get(lname, ()))
+        if self._regex_prefilter is not None and self._regex_prefilter.search(lname):
+            cand.update(i for i in self._regex_rules if self.rules[i].name_regex.search(lname))
+        return sorted(cand)
+
+    def evaluate(self, view: ProcessView, parent_name: Optional[Callable[[int], Optional[str]]] = None) -> List[Dict[str, Any]]:
+        findings: List[Dict[str, Any]] = []
+        name = view.name or ""
+        lname = name.lower()
+        exe_rules: Optional[Set[int]] = None
+        file_hits: Optional[Dict[int, List[str]]] = None
+        for i in self._candidates(name):
+            r = self.rules[i]
+            # nombre: si la regla tiene nombres y regex, basta con que case uno de los dos
+            if (r.names or r.name_regex is not None) and not (
+                lname in r.names or (r.name_regex is not None and r.name_regex.search(lname))
+            ):
+                continue
+            if r.exe_prefixes:
+                if exe_rules is None:
+                    exe = view.get("exe")
+                    exe_rules = set(self._exe_trie.values(exe)) if exe else set()
+                if i not in exe_rules:
+                    continue
+            if r.parent_names:
+                ppid = view.get("ppid")
+                pname = parent_name(ppid) if (parent_name and ppid) else None
+                if not pname or pname.lower() not in r.parent_names:
+                    continue
+            ports: List[int] = []
+            if r.remote_ports:
+                for c in view.get("connections") or ():
+                    port = getattr(getattr(c, "raddr", None), "port", None)
+                    if port in r.remote_ports:
+                        ports.append(port)
+                if not ports:
+                    continue
+            paths: List[str] = []
+            if r.open_file_prefixes:
+                if file_hits is None:
+                    file_hits = {}
+                    for f in view.get("open_files") or ():
+                        path = getattr(f, "path", f)
+                        for j in set(self._file_trie.values(path)):
+                            file_hits.setdefault(j, []).append(path)
+                paths = file_hits.get(i, [])
+                if not paths:
+                    continue
+            base = {"pid": view.pid, "name": view.name, "rule": r.id, "severity": r.severity}
+            if paths:
+                findings.extend({**base, "reason": r.reason.replace("{path}", p)} for p in paths)
+            elif ports:
+                findings.extend({**base, "reason": r.reason.replace("{port}", str(p))} for p in sorted(set(ports)))
+            else:
+                findings.append({**base, "reason": r.reason})
+        return findings
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "rules": [{"id": r.id, "severity": r.severity, "conditions": list(r.conditions)} for r in self.rules],
+            "count": len(self.rules),
+            "attrs": list(self.attrs),
+            "indexed_names": len(self._by_name),
+            "regex_rules": len(self._regex_rules),
+            "path_prefixes": len(self._exe_trie) + len(self._file_trie),
+        }
+
+
+def compile_rules(raw_rules: Iterable[Mapping[str, Any]]) -> RuleSet:
+    return RuleSet(parse_rule(r) for r in raw_rules if not isinstance(r, Mapping) or r.get("enabled", True) is not False)
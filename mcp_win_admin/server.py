@@ -6,18 +6,29 @@ from mcp.server.fastmcp import FastMCP
 
 from . import db
 from . import processes as procmod
+from . import procsampler as psampmod
+from . import procjournal as pjmod
+from . import perfsampler as perfmod
+from . import metricstore as msmod
 from . import profiles as profmod
 from . import system as sysmod
 from . import actions as actmod
 from . import av as avmod
+from . import cloudplan as cloudplanmod
 from . import behavioral as bhvmod
 from . import services as svcmod
 from . import connections as conmod
+from . import conntrack as ctmod
 from . import events as evtmod
 from . import startup as stmod
 from . import tasks as tmod
 from . import integrity as intmod
 from . import reputation as repmod
+from . import breaker as brkmod
+from . import refresh as refmod
+from . import prefetch as pfmod
+from . import quota as quotamod
+from . import singleflight as sfmod
 from . import yara_scan as yaramod
 from . import drivers as drvmod
 from . import rootkit as rkmod
@@ -27,6 +38,9 @@ from . import monitor_usn as usnmod
 from . import defense as defmod
 from . import alerts as alertmod
 from . import filesystem as fsmod
+from . import duindex as dumod
+from . import sizetree as sizetreemod
+from . import dupes as dupmod
 from . import config as cfg
 
 # Inicializa la base de datos (WAL) al cargar el servidor
@@ -87,6 +101,55 @@ def _start_db_maintenance_thread() -> None:
 
 _start_db_maintenance_thread()
 
+# Precalentado de reputación a partir de las conexiones vivas (opcional)
+if cfg.REP_PREFETCH_ENABLED:
+    try:
+        pfmod.start()
+    except Exception:
+        pass
+
+# Seguimiento de conexiones por deltas (opcional; sin hilo se muestrea en cada consulta)
+if cfg.CONNTRACK_ENABLED:
+    try:
+        ctmod.start()
+    except Exception:
+        pass
+
+# Muestreo de procesos en segundo plano (opcional; processes_list usa sus valores si está activo)
+if cfg.PROC_SAMPLER_ENABLED:
+    try:
+        psampmod.start()
+    except Exception:
+        pass
+
+# Diario de arranques/salidas de procesos (opcional)
+if cfg.PROC_JOURNAL_ENABLED:
+    try:
+        pjmod.start()
+    except Exception:
+        pass
+
+# Muestreo de métricas del sistema (opcional; system_scan_performance lee su snapshot sin bloquear)
+if cfg.METRICS_SAMPLER_ENABLED:
+    try:
+        perfmod.start()
+    except Exception:
+        pass
+
+# Agregados por minuto/hora de los snapshots (opcional); este proceso también graba los snapshots
+if cfg.METRICS_ROLLUP_ENABLED:
+    try:
+        msmod.start()
+    except Exception:
+        pass
+
+# Índice persistente de uso de disco (opcional; refresca por deltas MCP_DU_INDEX_ROOTS)
+if cfg.DU_INDEX_ENABLED:
+    try:
+        dumod.start()
+    except Exception:
+        pass
+
 # Crea el servidor MCP
 mcp = FastMCP("MCP Windows Admin")
 
@@ -107,6 +170,38 @@ def system_scan_performance(persist: bool = True) -> dict:
     return {"snapshot": snap.to_dict(), "persisted_id": row_id}
 
 
+@mcp.tool()
+def system_metrics_history(limit: int = 120, since: str | None = None) -> dict:
+    """Histórico reciente en memoria del muestreador de métricas (CPU, memoria, disco, red).
+
+    - limit: últimos N puntos (uno por vuelta del muestreador)
+    - since: epoch o ISO-8601; sólo puntos posteriores
+    Requiere MCP_METRICS_SAMPLER_ENABLED; sin hilo activo el histórico está vacío.
+    """
+    out = perfmod.history(since=pjmod.parse_ts(since), limit=max(1, int(limit)))
+    out["stats"] = perfmod.stats()
+    return out
+
+
+@mcp.tool()
+def system_metrics_range(
+    metric: str = "cpu_percent",
+    since: str | None = None,
+    until: str | None = None,
+    resolution: str = "auto",
+    max_points: int = 500,
+) -> dict:
+    """Serie temporal persistida de una métrica (snapshots crudos o agregados por minuto/hora).
+
+    - metric: cpu_percent|mem_percent|disk_percent|mem_used|processes_total
+    - since/until: epoch o ISO-8601 (por defecto las últimas 24 h)
+    - resolution: auto|raw|1m|1h; auto elige la más fina que quepa en max_points
+    """
+    return msmod.query(
+        metric, since=pjmod.parse_ts(since), until=pjmod.parse_ts(until), resolution=resolution, max_points=max_points
+    )
+
+
 @mcp.tool()
 def processes_list(
     limit: int = 20,
@@ -124,6 +219,35 @@ def processes_list(
     return procmod.list_processes(limit=lim, sort_by=sort_by, fast=fast, include_cpu=include_cpu)
 
 
+@mcp.tool()
+def proc_journal_query(since: str = "", until: str = "", exe: str = "", name: str = "", ppid: int = -1, pid: int = -1, event: str = "", limit: int = 200) -> list[dict]:
+    """Consulta el diario de procesos (arranques `start`, salidas `exit`, vivos al iniciar `running`).
+
+    El diario sólo se llena con MCP_PROC_JOURNAL_ENABLED=true; sin el hilo no hay eventos nuevos.
+
+    - since/until: epoch o ISO-8601
+    - exe: ruta exacta (sin distinguir mayúsculas); name: subcadena del nombre
+    - ppid/pid: -1 para no filtrar
+    """
+    try:
+        return pjmod.query(
+            since=since, until=until, exe=exe, name=name,
+            ppid=None if ppid < 0 else ppid, pid=None if pid < 0 else pid, event=event,
+            limit=max(1, min(int(limit), 5000)),
+        )
+    except Exception as e:
+        return [{"error": str(e)}]
+
+
+@mcp.tool()
+def proc_journal_tree(pid: int = -1, since: str = "", limit: int = 5000) -> dict:
+    """Árbol de procesos reconstruido desde el diario. Con `pid` devuelve su rama y la cadena de padres."""
+    try:
+        return pjmod.tree(None if pid < 0 else pid, since=since, limit=max(1, min(int(limit), 50000)))
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @mcp.tool()
 def profiles_list() -> list[dict]:
     """Lista perfiles disponibles y número de acciones sugeridas."""
@@ -149,6 +273,12 @@ def last_snapshot() -> str:
     return json.dumps(data, ensure_ascii=False)
 
 
+@mcp.resource("snapshot://range/{metric}")
+def snapshot_range(metric: str) -> str:
+    """Recurso con las últimas 24 h de una métrica a resolución automática (JSON)."""
+    return json.dumps(msmod.query(metric), ensure_ascii=False)
+
+
 @mcp.tool()
 def db_optimize() -> dict:
     """Ejecuta mantenimiento ligero de SQLite (PRAGMA optimize + WAL checkpoint PASSIVE)."""
@@ -196,13 +326,18 @@ def av_check_hash(hash_hex: str, algo: str = "sha256", use_cloud: bool = True, t
 
 
 @mcp.tool()
-def av_scan_path(target: str, recursive: bool = True, limit: int = 1000, algo: str = "sha256", use_cloud: bool = False, ttl_seconds: int = -1, sources_csv: str = "malwarebazaar,teamcymru") -> list[dict]:
-    """Escanea archivos bajo un path (archivo o carpeta) y contrasta hashes. No desinfecta."""
+def av_scan_path(target: str, recursive: bool = True, limit: int = 1000, algo: str = "sha256", use_cloud: bool = False, ttl_seconds: int = -1, sources_csv: str = "malwarebazaar,teamcymru", cloud_budgets_csv: str = "") -> list[dict]:
+    """Escanea archivos bajo un path (archivo o carpeta) y contrasta hashes. No desinfecta.
+
+    Con use_cloud, las fuentes con presupuesto (cloud_budgets_csv "virustotal=25", o MCP_AV_CLOUD_BUDGETS)
+    se gastan en los hashes más prioritarios; el resto se marca `cloud_deferred` y queda en cola.
+    """
     ttl = cfg.effective_rep_ttl(ttl_seconds)
     default_sources = ("malwarebazaar", "teamcymru")
     extended_sources = ("virustotal", "malwarebazaar", "teamcymru")
     sources = cfg.get_effective_sources(sources_csv, default_sources, extended_sources)
-    return avmod.scan_path(target, recursive=recursive, limit=limit, algo=algo, use_cloud=use_cloud, sources=sources, ttl_seconds=ttl)
+    budgets = cloudplanmod.parse_budgets(cloud_budgets_csv) if cloud_budgets_csv else None
+    return avmod.scan_path(target, recursive=recursive, limit=limit, algo=algo, use_cloud=use_cloud, sources=sources, ttl_seconds=ttl, cloud_budgets=budgets)
 
 
 @mcp.tool()
@@ -215,12 +350,39 @@ def av_scan_path_modern(target: str, limit: int = 1000, algo: str = "sha256", us
     return avmod.scan_path_modern(target, limit=limit, algo=algo, use_cloud=use_cloud, sources=sources, ttl_seconds=ttl, use_behavioral_scan=use_behavioral_scan)
 
 
+@mcp.tool()
+def av_cloud_deferred_list(limit: int = 100, source: str = "") -> list[dict]:
+    """Consultas de hash a la nube aplazadas por falta de presupuesto, por prioridad (score)."""
+    return db.list_deferred_lookups(limit=cfg.clamp_limit(limit, "generic"), source=source or None)
+
+
+@mcp.tool()
+def av_cloud_deferred_process(limit: int = 50, cloud_budgets_csv: str = "") -> dict:
+    """Ejecuta las consultas aplazadas de mayor prioridad dentro del presupuesto por fuente."""
+    budgets = cloudplanmod.parse_budgets(cloud_budgets_csv) if cloud_budgets_csv else None
+    return avmod.process_deferred_lookups(limit=limit, budgets=budgets)
+
+
 @mcp.tool()
 def behavioral_scan() -> list[dict]:
     """Realiza un escaneo de comportamiento para detectar procesos sospechosos."""
     return bhvmod.check_running_processes()
 
 
+@mcp.tool()
+def behavioral_scan_staged() -> dict:
+    """Escaneo de comportamiento por etapas con tiempos por etapa: archivos abiertos sólo de procesos nuevos o
+    cambiados desde la ejecución anterior."""
+    return bhvmod.run_staged()
+
+
+@mcp.tool()
+def behavioral_rules() -> dict:
+    """Reglas de comportamiento activas (integradas + MCP_BEHAVIOR_RULES_PATH), atributos de psutil que necesitan
+    y error de carga del archivo de reglas si lo hay."""
+    return bhvmod.rules_summary()
+
+
 # ---------------------------- Windows Services ----------------------------
 
 @mcp.tool()
@@ -239,6 +401,27 @@ def connections_list(limit: int = 100, kind: str = "inet", listening_only: bool
     return conmod.list_connections(limit=lim, kind=kind, listening_only=listening_only, include_process=include_process)
 
 
+@mcp.tool()
+def connections_changes(since_cursor: int = 0, limit: int = 500) -> dict:
+    """Eventos de apertura/cierre de flujos remotos desde `since_cursor` (usa el `cursor` devuelto en la siguiente
+    llamada). Incluye conexiones cortas vistas entre sondeos si el tracker está activo (MCP_CONNTRACK_ENABLED).
+    `truncated` indica que se perdieron eventos y conviene un listado completo."""
+    try:
+        return ctmod.changes(since_cursor=since_cursor, limit=limit)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+def connections_history(host: str, limit: int = 100) -> dict:
+    """Historia de un host remoto: agregados persistidos (aperturas, cierres, duración total), flujos activos
+    y eventos recientes del buffer."""
+    try:
+        return ctmod.history(host, limit=limit)
+    except Exception as e:
+        return {"error": str(e)}
+
+
 # ---------------------------- Windows Event Log ----------------------------
 
 @mcp.tool()
@@ -280,6 +463,85 @@ def fs_top_dirs(
     )
 
 
+@mcp.tool()
+def fs_tree_stats() -> dict:
+    """Árboles de tamaños en memoria (ver sizetree.py): construcciones, aciertos y refrescos, y por árbol
+    si el recorrido terminó (`complete`), su duración y los subárboles más lentos (`slowest`)."""
+    return sizetreemod.stats()
+
+
+@mcp.tool()
+def fs_top_files(
+    root: str = "C:\\",
+    top_n: int = 20,
+    max_depth: int = 2,
+    min_size_mb: float = 0,
+    extensions: str = "",
+    min_age_days: float = 0,
+    max_age_days: float = 0,
+) -> list[dict]:
+    """Lista los archivos más pesados bajo `root` (selección top-K acotada, sin ordenar todo).
+
+    - extensions: filtro por extensión separado por comas (e.g. ".iso,.vhdx")
+    - min_age_days: sólo archivos sin modificar desde hace al menos N días
+    - max_age_days: sólo archivos modificados en los últimos N días
+    """
+    try:
+        return fsmod.list_heavy_files(
+            root=root,
+            top_n=top_n,
+            max_depth=max_depth,
+            min_size_mb=min_size_mb,
+            extensions=extensions,
+            min_age_days=min_age_days,
+            max_age_days=max_age_days,
+        )
+    except ValueError as e:
+        return [{"error": str(e)}]
+
+
+@mcp.tool()
+def fs_find_duplicates(
+    root: str = "C:\\",
+    min_size_kb: float = 1024,
+    extensions: str = "",
+    max_groups: int = 100,
+    max_seconds: float = 0,
+) -> dict:
+    """Busca archivos duplicados bajo `root` (tamaño -> hash de primeros/últimos 64 KiB -> hash completo).
+
+    - min_size_kb: ignora archivos menores (por defecto 1 MB)
+    - extensions: filtro por extensión separado por comas (e.g. ".iso,.zip")
+    - max_groups: grupos devueltos, los que más espacio liberan primero
+    - max_seconds: plazo; al vencer se devuelve lo confirmado con truncated=true (0 = sin plazo)
+    """
+    try:
+        return dupmod.find_duplicates(
+            root, min_size_kb=min_size_kb, extensions=extensions, max_groups=max_groups, max_seconds=max_seconds
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+def fs_index_refresh(root: str = "C:\\", full: bool = False) -> dict:
+    """Construye o refresca por deltas el índice persistente de uso de disco de `root`.
+
+    - root: raíz a indexar (la primera vez recorre todo el árbol)
+    - full: relistar todas las carpetas aunque su mtime no haya cambiado
+    """
+    try:
+        return dumod.refresh(root, full=full)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+def fs_index_status() -> dict:
+    """Raíces del índice de uso de disco, su tamaño y su último refresco."""
+    return dumod.status()
+
+
 @mcp.tool()
 def tasks_list(limit: int = 200, state: str = "") -> list[dict]:
     """Lista tareas programadas (schtasks)."""
@@ -376,6 +638,35 @@ def rep_check_domain(domain: str, use_cloud: bool = True, ttl_seconds: int = -1,
     return repmod.check_domain(domain, use_cloud=use_cloud, ttl_seconds=ttl, sources=sources, ttl_by_source=ttl_by_source)
 
 
+@mcp.tool()
+def rep_cache_stats() -> dict:
+    """Contadores de la caché de reputación/hashes: aciertos frescos, entradas stale servidas, consultas bloqueantes,
+    refrescos en segundo plano, llamadas coalescidas (single-flight), la caché LRU en memoria delante de SQLite
+    y el precalentado desde conexiones vivas (hit_rate = consultas de enriquecimiento ya precalentadas)."""
+    return {
+        "refresh": refmod.stats(),
+        "singleflight": sfmod.stats(),
+        "memory": db.row_cache_stats(),
+        "prefetch": pfmod.stats(),
+    }
+
+
+@mcp.tool()
+def rep_sources_health() -> dict:
+    """Estado del circuit breaker por fuente de threat-intel (closed/open/half_open), latencias p50/p95 y timeout adaptativo."""
+    return {"sources": brkmod.snapshot()}
+
+
+@mcp.tool()
+def rep_quota_usage(days: int = 1) -> dict:
+    """Consumo de cuota por fuente y día (concedidas, denegadas, devueltas) del libro compartido entre procesos
+    y tokens disponibles ahora en cada ventana."""
+    try:
+        return quotamod.report(days=days)
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @mcp.tool()
 def connections_list_enriched(limit: int = 100, kind: str = "inet", listening_only: bool = False, include_process: bool = False, rep_ttl_seconds: int = 86400, rep_sources_csv: str = "threatfox,urlhaus", rep_ttl_by_source_json: str = "") -> list[dict]:
     """Lista conexiones y añade reputación del host remoto (si aplica)."""
@@ -399,6 +690,7 @@ def connections_list_enriched(limit: int = 100, kind: str = "inet", listening_on
             continue
         ip = raddr.split(":")[0]
         if ip and ip not in ips:
+            pfmod.note_lookup(ip)
             try:
                 ips[ip] = repmod.check_ip(ip, use_cloud=True, ttl_seconds=ttl, sources=sources, ttl_by_source=ttl_by_source)
             except Exception:
@@ -0,0 +1,81 @@
+"""Coalescencia de llamadas concurrentes idénticas (single-flight).
+
+El primer llamador de una clave ejecuta la función; los llamadores concurrentes con la misma
+clave esperan su resultado en lugar de repetir la consulta. Sólo hay variante por hilos: las
+consultas de indicadores corren en hilos (tools MCP, refrescos en segundo plano, precalentado).
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats: Dict[str, int] = {"calls": 0, "leaders": 0, "coalesced": 0, "errors": 0}
+        _REGISTRY.append(self)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Ejecuta `fn` una sola vez por clave en vuelo; el resto de hilos comparte el resultado."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["in_flight"] = len(self._calls)
+        return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
+
+
+_REGISTRY: List[SingleFlight] = []
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Estadísticas de todos los grupos single-flight registrados, por nombre."""
+    return {g.name: g.stats() for g in list(_REGISTRY)}
@@ -0,0 +1,447 @@
+"""Árbol de tamaños de directorios construido con un único recorrido `os.scandir`.
+
+`/api/fs/heavy` llamaba a `list_heavy_paths` para la unidad, otra vez para los hijos de
+cada resultado y además recorría los mismos árboles con `os.walk` para los archivos
+pesados; `fs_top_dirs` hacía su propio `_dir_size` recursivo. Aquí un recorrido en anchura
+construye un árbol en memoria con columnas `array` (padre, profundidad, tamaño, archivos,
+subdirectorios; los hijos de cada nodo quedan contiguos) y un montículo top-K de archivos
+pesados por nodo (`topk.TopK`). Todas esas vistas se responden desde el árbol.
+
+Semántica de `max_depth` (la de `list_heavy_paths`): se cuentan los archivos de los
+directorios con profundidad <= max_depth respecto a la raíz; los de más abajo no se visitan.
+
+El recorrido se reparte en un pool de MCP_FS_SCAN_WORKERS hilos (`os.scandir` libera el
+GIL durante la E/S): cada carpeta de primer nivel se lista en el pool y cada subárbol de
+segundo nivel se recorre entero en otro hilo, así una carpeta lenta (un recurso de red, un
+`node_modules` enorme) no frena a las demás. Con MCP_FS_SCAN_DEADLINE_SECONDS el árbol se
+entrega al vencer el plazo con lo recorrido hasta entonces: los nodos sin terminar quedan
+marcados (`incomplete` en `row`, `complete=False` en el árbol) y `info()` lista los
+subárboles más lentos con su tiempo.
+
+Los árboles se cachean por (raíz, max_depth, follow_symlinks) durante
+MCP_FS_TREE_TTL_SECONDS; pasado ese tiempo se sirve el árbol viejo y se reconstruye en
+segundo plano (sólo un recorrido a la vez por clave). Un árbol incompleto se reintenta antes
+(tras `_INCOMPLETE_RETRY_SECONDS` o el plazo, si es mayor), pero nunca mientras sigan vivos
+hilos de un recorrido anterior de la misma clave: un `scandir` colgado en un recurso de red
+no se puede interrumpir, y relanzar el recorrido sólo acumularía hilos bloqueados.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import config as cfg
+from .singleflight import SingleFlight
+from .topk import TopK
+
+TreeKey = Tuple[str, int, bool]
+
+_INCOMPLETE_RETRY_SECONDS = 30.0
+
+
+def _iter_dir(path: str) -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                yield entry
+    except (PermissionError, FileNotFoundError, OSError):
+        return
+
+
+Listing = Tuple[int, int, int, "TopK[Tuple[int, str]]", List[Tuple[str, str]]]
+
+
+def _list_dir(path: str, follow: bool, top_k: int) -> Listing:
+    """Una carpeta: (bytes, archivos, subcarpetas, top-K de (tamaño, ruta), [(nombre, ruta)] de subcarpetas)."""
+    size = files = dirs = 0
+    heap: TopK[Tuple[int, str]] = TopK(top_k)
+    subdirs: List[Tuple[str, str]] = []
+    for entry in _iter_dir(path):
+        try:
+            if entry.is_symlink() and not follow:
+                continue
+            if entry.is_file(follow_symlinks=follow):
+                try:
+                    sz = entry.stat(follow_symlinks=follow).st_size
+                except (PermissionError, FileNotFoundError, OSError):
+                    sz = 0
+                size += sz
+                files += 1
+                heap.push((sz, entry.path))
+            elif entry.is_dir(follow_symlinks=follow):
+                dirs += 1
+                subdirs.append((entry.name, entry.path))
+        except (PermissionError, FileNotFoundError, OSError):
+            continue
+    return size, files, dirs, heap, subdirs
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return round((time.perf_counter() - t0) * 1000, 1), out
+
+
+class SizeTree:
+    """Árbol por columnas. El nodo 0 es la raíz; los hijos de `i` son `child_start[i]..+child_count[i]`.
+
+    Todo padre tiene índice menor que sus hijos (no necesariamente en orden de anchura).
+    """
+
+    def __init__(self, root: str, max_depth: int, follow_symlinks: bool, top_k: int) -> None:
+        self.root = root
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        self.top_k = max(1, int(top_k))
+        self.built_at = 0.0
+        self.elapsed_ms = 0.0
+        self.complete = True
+        self.workers = 1
+        # (ruta, ms, nodos, completo) de cada tarea del pool; ms None si no terminó a tiempo
+        self.timings: List[Tuple[str, Optional[float], int, bool]] = []
+        self.parent = array("q")
+        self.depth = array("h")
+        self.size = array("q")
+        self.files = array("q")
+        self.dirs = array("q")
+        self.child_start = array("q")
+        self.child_count = array("q")
+        self.partial = array("b")  # 1: el plazo venció antes de terminar este subárbol
+        self.stragglers: List[Future] = []  # tareas que seguían corriendo al vencer el plazo
+        self.names: List[str] = []
+        # top-K de (tamaño, ruta) por nodo; None en nodos sin archivos o ya podados
+        self.heaps: List[Optional[TopK[Tuple[int, str]]]] = []
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def _add(self, parent: int, name: str, depth: int) -> int:
+        self.parent.append(parent)
+        self.depth.append(depth)
+        self.size.append(0)
+        self.files.append(0)
+        self.dirs.append(0)
+        self.child_start.append(0)
+        self.child_count.append(0)
+        self.partial.append(0)
+        self.names.append(name)
+        self.heaps.append(None)
+        return len(self.parent) - 1
+
+    def _merge(self, i: int, heap: Optional[TopK[Tuple[int, str]]]) -> None:
+        if not heap:
+            return
+        if self.heaps[i] is None:
+            self.heaps[i] = TopK(self.top_k)
+        self.heaps[i].merge(heap)
+
+    def _fill(self, i: int, listing: Listing) -> List[Tuple[int, str]]:
+        """Vuelca el listado de la carpeta `i` y crea sus hijos (contiguos) si no se pasa de max_depth."""
+        size, files, dirs, heap, subdirs = listing
+        self.size[i] += size
+        self.files[i] += files
+        self.dirs[i] += dirs
+        self._merge(i, heap)
+        self.child_start[i] = len(self.parent)
+        d = self.depth[i]
+        if d >= self.max_depth:
+            return []
+        kids = [(self._add(i, name, d + 1), path) for name, path in subdirs]
+        self.child_count[i] = len(kids)
+        return kids
+
+    def _walk(self, i: int, path: str, deadline: Optional[float]) -> None:
+        """Recorrido en anchura desde el nodo `i`; al vencer el plazo marca lo pendiente y sale."""
+        queue = deque([(i, path)])
+        while queue:
+            if deadline is not None and time.monotonic() > deadline:
+                self.complete = False
+                for j, _ in queue:
+                    self.partial[j] = 1
+                return
+            j, p = queue.popleft()
+            queue.extend(self._fill(j, _list_dir(p, self.follow_symlinks, self.top_k)))
+
+    def _subtree(self, path: str, depth: int, deadline: Optional[float]) -> "SizeTree":
+        sub = SizeTree(path, self.max_depth - depth, self.follow_symlinks, self.top_k)
+        sub._add(-1, path, 0)
+        sub._walk(0, path, deadline)
+        return sub
+
+    def _graft(self, i: int, sub: "SizeTree") -> None:
+        """Copia en el nodo `i` el subárbol recorrido en otro hilo (su nodo 0 es `i`)."""
+        base = len(self.parent) - 1
+        d = self.depth[i]
+
+        def m(j: int) -> int:
+            return i if j == 0 else base + j
+
+        self.size[i] += sub.size[0]
+        self.files[i] += sub.files[0]
+        self.dirs[i] += sub.dirs[0]
+        self.partial[i] |= sub.partial[0]
+        self._merge(i, sub.heaps[0])
+        self.child_start[i] = m(sub.child_start[0])
+        self.child_count[i] = sub.child_count[0]
+        for j in range(1, len(sub)):
+            self.parent.append(m(sub.parent[j]))
+            self.depth.append(sub.depth[j] + d)
+            self.size.append(sub.size[j])
+            self.files.append(sub.files[j])
+            self.dirs.append(sub.dirs[j])
+            self.child_start.append(m(sub.child_start[j]))
+            self.child_count.append(sub.child_count[j])
+            self.partial.append(sub.partial[j])
+            self.names.append(sub.names[j])
+            self.heaps.append(sub.heaps[j])
+        if not sub.complete:
+            self.complete = False
+
+    def _walk_parallel(self, workers: int, deadline: Optional[float]) -> None:
+        """Raíz en este hilo; carpetas de nivel 1 y subárboles de nivel 2 repartidos en el pool."""
+        follow, top_k = self.follow_symlinks, self.top_k
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="SizeTreeScan")
+        pending: Dict[Future, Tuple[int, str]] = {}
+        try:
+            for j, p in self._fill(0, _list_dir(self.root, follow, top_k)):
+                pending[pool.submit(_timed, _list_dir, p, follow, top_k)] = (j, p)
+            while pending:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    j, p = pending.pop(fut)
+                    try:
+                        ms, out = fut.result()
+                    except Exception:
+                        continue
+                    if isinstance(out, SizeTree):
+                        self._graft(j, out)
+                        self.timings.append((p, ms, len(out), out.complete))
+                        continue
+                    for c, cp in self._fill(j, out):
+                        pending[pool.submit(_timed, self._subtree, cp, self.depth[c], deadline)] = (c, cp)
+                    self.timings.append((p, ms, 1, True))
+            for fut, (j, p) in pending.items():
+                if not fut.cancel():
+                    self.stragglers.append(fut)
+                self.partial[j] = 1
+                self.complete = False
+                self.timings.append((p, None, 0, False))
+        finally:
+            # Un scandir bloqueado (p. ej. recurso de red) no retiene el árbol: no se espera a los hilos
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def build(self, workers: int = 1, deadline_seconds: float = 0.0) -> "SizeTree":
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds and deadline_seconds > 0 else None
+        self.workers = max(1, int(workers))
+        self._add(-1, self.root, 0)
+        if self.workers > 1 and self.max_depth >= 1:
+            self._walk_parallel(self.workers, deadline)
+        else:
+            self._walk(0, self.root, deadline)
+        # Los hijos siempre tienen índice mayor que su padre: acumular al revés
+        keep_heaps = max(0, int(cfg.FS_TREE_HEAP_DEPTH))
+        for i in range(len(self.parent) - 1, 0, -1):
+            p = self.parent[i]
+            self.size[p] += self.size[i]
+            self.files[p] += self.files[i]
+            self.dirs[p] += self.dirs[i]
+            self.partial[p] |= self.partial[i]
+            self._merge(p, self.heaps[i])
+            if self.depth[i] > keep_heaps:
+                self.heaps[i] = None
+        self.built_at = time.time()
+        self.elapsed_ms = round((time.perf_counter() - t0) * 1000, 1)
+        return self
+
+    # --- vistas ------------------------------------------------------------------------
+    def path(self, i: int) -> str:
+        parts: List[str] = []
+        while i > 0:
+            parts.append(self.names[i])
+            i = self.parent[i]
+        return os.path.join(self.root, *reversed(parts)) if parts else self.root
+
+    def find(self, path: str) -> Optional[int]:
+        """Índice del nodo de `path` (dentro de la profundidad recorrida) o None."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == os.curdir:
+            return 0
+        if rel.startswith(os.pardir):
+            return None
+        i = 0
+        for part in rel.split(os.sep):
+            part = os.path.normcase(part)
+            start, count = self.child_start[i], self.child_count[i]
+            for j in range(start, start + count):
+                if os.path.normcase(self.names[j]) == part:
+                    i = j
+                    break
+            else:
+                return None
+        return i
+
+    def row(self, i: int) -> Dict[str, Any]:
+        size = self.size[i]
+        out = {
+            "path": self.path(i),
+            "size_bytes": size,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "file_count": self.files[i],
+            "dir_count": self.dirs[i],
+            "depth": self.depth[i],
+        }
+        if self.partial[i]:
+            out["incomplete"] = True  # el plazo venció: tamaños parciales
+        return out
+
+    def top_children(self, i: int, top_n: int, min_bytes: int = 0) -> List[int]:
+        start, count = self.child_start[i], self.child_count[i]
+        top: TopK[int] = TopK(top_n, key=self.size.__getitem__)
+        for j in range(start, start + count):
+            if self.size[j] >= min_bytes:
+                top.push(j)
+        return top.items()
+
+    def top_files(self, i: int, top_n: int) -> List[Dict[str, Any]]:
+        """Archivos más pesados del subárbol (hasta top_k; nodos más hondos que MCP_FS_TREE_HEAP_DEPTH no guardan lista)."""
+        heap = self.heaps[i]
+        return [
+            {"path": p, "size_bytes": s, "size_mb": round(s / (1024 * 1024), 2)}
+            for s, p in (heap.items(max(1, top_n)) if heap else [])
+        ]
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "max_depth": self.max_depth,
+            "nodes": len(self),
+            "built_at": self.built_at,
+            "age_seconds": round(time.time() - self.built_at, 1),
+            "elapsed_ms": self.elapsed_ms,
+            "complete": self.complete,
+            "workers": self.workers,
+            "slowest": self.slowest(),
+        }
+
+    def slowest(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Tareas del pool más lentas (las que no terminaron a tiempo primero)."""
+        rows = sorted(self.timings, key=lambda t: float("inf") if t[1] is None else t[1], reverse=True)[:n]
+        return [{"path": p, "elapsed_ms": ms, "nodes": nodes, "complete": ok} for p, ms, nodes, ok in rows]
+
+
+_LOCK = threading.Lock()
+_TREES: "OrderedDict[TreeKey, SizeTree]" = OrderedDict()
+_REFRESHING: set = set()
+_FLIGHT = SingleFlight("sizetree")
+_STRAGGLERS: Dict[TreeKey, List[Future]] = {}
+_STATS = {"builds": 0, "hits": 0, "stale_hits": 0, "background_refreshes": 0, "skipped_busy": 0}
+
+
+def _key(root: str, max_depth: int, follow_symlinks: bool) -> TreeKey:
+    return (os.path.normcase(os.path.abspath(root)), int(max_depth), bool(follow_symlinks))
+
+
+def _busy(key: TreeKey) -> bool:
+    """True si siguen vivos hilos de un recorrido anterior de `key` (llamar con _LOCK)."""
+    alive = [f for f in _STRAGGLERS.get(key, ()) if not f.done()]
+    if alive:
+        _STRAGGLERS[key] = alive
+    else:
+        _STRAGGLERS.pop(key, None)
+    return bool(alive)
+
+
+def _max_age(tree: SizeTree) -> float:
+    if tree.complete:
+        return cfg.FS_TREE_TTL_SECONDS
+    retry = max(_INCOMPLETE_RETRY_SECONDS, cfg.FS_SCAN_DEADLINE_SECONDS)
+    return min(cfg.FS_TREE_TTL_SECONDS, retry)
+
+
+def _build(key: TreeKey, root: str) -> SizeTree:
+    tree = SizeTree(root, key[1], key[2], cfg.FS_TREE_TOP_FILES).build(
+        workers=cfg.FS_SCAN_WORKERS, deadline_seconds=cfg.FS_SCAN_DEADLINE_SECONDS
+    )
+    with _LOCK:
+        if tree.stragglers:
+            _STRAGGLERS.setdefault(key, []).extend(tree.stragglers)
+        _TREES[key] = tree
+        _TREES.move_to_end(key)
+        while len(_TREES) > max(1, cfg.FS_TREE_MAX_TREES):
+            _TREES.popitem(last=False)
+        _STATS["builds"] += 1
+    return tree
+
+
+def _refresh_in_background(key: TreeKey, root: str) -> None:
+    with _LOCK:
+        if key in _REFRESHING:
+            return
+        if _busy(key):
+            _STATS["skipped_busy"] += 1
+            return
+        _REFRESHING.add(key)
+        _STATS["background_refreshes"] += 1
+
+    def run() -> None:
+        try:
+            _FLIGHT.do(key, lambda: _build(key, root))
+        except Exception:
+            pass
+        finally:
+            with _LOCK:
+                _REFRESHING.discard(key)
+
+    threading.Thread(target=run, name="SizeTreeRefresh", daemon=True).start()
+
+
+def get_tree(root: str, max_depth: int = 2, follow_symlinks: bool = False, *, refresh: bool = False) -> SizeTree:
+    """Árbol cacheado de `root`. Caducado: se devuelve y se reconstruye en segundo plano.
+
+    Con `refresh`, se reconstruye ya, salvo que un recorrido anterior siga con hilos vivos:
+    entonces se devuelve el árbol cacheado.
+    """
+    root = os.path.abspath(root)
+    key = _key(root, max_depth, follow_symlinks)
+    with _LOCK:
+        tree = _TREES.get(key)
+        if tree is not None:
+            if refresh and not _busy(key):
+                tree = None
+            else:
+                _TREES.move_to_end(key)
+                if refresh:
+                    _STATS["skipped_busy"] += 1
+                    return tree
+                stale = time.time() - tree.built_at > _max_age(tree)
+                _STATS["stale_hits" if stale else "hits"] += 1
+    if tree is not None:
+        if stale:
+            _refresh_in_background(key, root)
+        return tree
+    return _FLIGHT.do(key, lambda: _build(key, root))
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out: Dict[str, Any] = dict(_STATS)
+        out["trees"] = [t.info() for t in _TREES.values()]
+        out["stragglers"] = sum(1 for futs in _STRAGGLERS.values() for f in futs if not f.done())
+    return out
+
+
+def clear() -> None:
+    with _LOCK:
+        _TREES.clear()
+        _STRAGGLERS.clear()
+        for k in _STATS:
+            _STATS[k] = 0
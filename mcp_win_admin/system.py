@@ -7,6 +7,8 @@ from typing import Dict, List
 
 import psutil
 
+from . import perfsampler
+
 
 @dataclass
 class PerformanceSnapshot:
@@ -40,8 +42,28 @@ def _overall_disk_percent() -> float:
     return (used / total * 100.0) if total else 0.0
 
 
+def _from_sampler(s) -> PerformanceSnapshot:
+    mem = s["memory"]
+    return PerformanceSnapshot(
+        ts_iso=datetime.fromtimestamp(s["ts"], timezone.utc).isoformat(),
+        cpu_percent=float(s["cpu_percent"]),
+        mem_percent=float(mem["percent"]),
+        mem_total=int(mem["total"]),
+        mem_used=int(mem["used"]),
+        disk_percent=float(s["disk_percent"]),
+        uptime_seconds=int(datetime.now().timestamp() - (s.get("boot_time") or psutil.boot_time())),
+        processes_total=int(s["processes_total"]),
+    )
+
+
 def get_performance_snapshot() -> PerformanceSnapshot:
-    """Obtiene un snapshot rápido de rendimiento (no bloqueante)."""
+    """Obtiene un snapshot rápido de rendimiento.
+
+    Con el muestreador de métricas activo (MCP_METRICS_SAMPLER_ENABLED) lee su último
+    snapshot sin tocar psutil; si no, mide CPU durante 200 ms.
+    """
+    if perfsampler.ready():
+        return _from_sampler(perfsampler.snapshot())
     cpu = psutil.cpu_percent(interval=0.2)
     vm = psutil.virtual_memory()
     disk = _overall_disk_percent()
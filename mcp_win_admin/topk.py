@@ -0,0 +1,115 @@
+"""Selección en streaming de los K mayores con un min-heap acotado.
+
+Para quedarse con los N archivos o carpetas más pesados no hace falta juntar todos los
+candidatos y ordenarlos: basta un heap de tamaño K cuyo mínimo es el umbral de entrada.
+Memoria O(K) y coste O(n log K) sin importar cuántos elementos pasen. Los selectores se
+pueden fusionar (`merge`) para acumular de hijos a padres.
+
+`file_filter` arma el predicado opcional por extensión y antigüedad (mtime) que usan las
+vistas de archivos pesados.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Callable, Generic, Iterable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Desempate entre claves iguales: los elementos nunca se comparan entre sí
+_TIE = itertools.count()
+
+
+class TopK(Generic[T]):
+    """Los `k` elementos con mayor `key` vistos hasta ahora."""
+
+    __slots__ = ("k", "_key", "_heap", "seen")
+
+    def __init__(self, k: int, key: Optional[Callable[[T], Any]] = None) -> None:
+        self.k = max(1, int(k))
+        self._key = key
+        self._heap: List[tuple] = []
+        self.seen = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def threshold(self) -> Any:
+        """Clave mínima para entrar cuando el heap está lleno (None si aún no lo está)."""
+        return self._heap[0][0] if len(self._heap) >= self.k else None
+
+    def push(self, item: T) -> bool:
+        self.seen += 1
+        k = self._key(item) if self._key is not None else item
+        heap = self._heap
+        if len(heap) < self.k:
+            heapq.heappush(heap, (k, next(_TIE), item))
+            return True
+        if k > heap[0][0]:
+            heapq.heapreplace(heap, (k, next(_TIE), item))
+            return True
+        return False
+
+    def extend(self, items: Iterable[T]) -> "TopK[T]":
+        for item in items:
+            self.push(item)
+        return self
+
+    def merge(self, other: "TopK[T]") -> "TopK[T]":
+        for _, _, item in other._heap:
+            self.push(item)
+        return self
+
+    def items(self, n: Optional[int] = None) -> List[T]:
+        """Elementos de mayor a menor clave (los `n` primeros si se indica)."""
+        ordered = sorted(self._heap, key=lambda e: (e[0], -e[1]), reverse=True)
+        return [e[2] for e in ordered[:n]]
+
+
+def top_k(items: Iterable[T], k: int, key: Optional[Callable[[T], Any]] = None) -> List[T]:
+    """Atajo: los `k` mayores de `items`, de mayor a menor."""
+    return TopK(k, key).extend(items).items()
+
+
+def _exts(extensions: Optional[Sequence[str] | str]) -> Optional[tuple]:
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        extensions = extensions.split(",")
+    out = tuple(
+        os.path.normcase(e if e.startswith(".") else "." + e) for e in (x.strip() for x in extensions) if e
+    )
+    return out or None
+
+
+def file_filter(
+    extensions: Optional[Sequence[str] | str] = None,
+    min_age_days: float = 0.0,
+    max_age_days: float = 0.0,
+    now: Optional[float] = None,
+) -> Optional[Callable[[str, os.stat_result], bool]]:
+    """Predicado (ruta, stat) -> bool, o None si no hay ningún filtro.
+
+    - extensions: ".iso,.vhdx" o lista; sin distinguir mayúsculas en Windows
+    - min_age_days: sólo archivos sin modificar desde hace al menos N días
+    - max_age_days: sólo archivos modificados en los últimos N días
+    """
+    exts = _exts(extensions)
+    if exts is None and not min_age_days and not max_age_days:
+        return None
+    now = time.time() if now is None else now
+    older = now - min_age_days * 86400 if min_age_days else None
+    newer = now - max_age_days * 86400 if max_age_days else None
+
+    def accept(path: str, st: os.stat_result) -> bool:
+        if exts is not None and not os.path.normcase(path).endswith(exts):
+            return False
+        if older is not None and st.st_mtime > older:
+            return False
+        if newer is not None and st.st_mtime < newer:
+            return False
+        return True
+
+    return accept
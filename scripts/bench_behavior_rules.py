@@ -0,0 +1,104 @@
+"""Rendimiento del motor de reglas de comportamiento según el número de reglas.
+
+Compara el RuleSet compilado (mapa de nombres, alternancia regex como prefiltro, tries de
+rutas, atributos perezosos) con una evaluación ingenua regla a regla sobre procesos
+sintéticos, e informa de cuántos atributos caros se llegaron a pedir.
+
+Uso:
+    python scripts/bench_behavior_rules.py --procs 500 --rules 10,100,1000,5000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcp_win_admin import rules  # noqa: E402
+
+DIRS = [f"C:\\Program Files\\Vendor{i}\\bin" for i in range(200)] + ["C:\\Windows\\System32", "C:\\Users\\Public"]
+
+
+def _rules(n: int, rnd: random.Random):
+    out = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            out.append({"id": f"name{i}", "name": [f"tool{i}.exe", f"tool{i}_x64.exe"]})
+        elif kind == 1:
+            out.append({"id": f"re{i}", "name_regex": [rf"^agent{i}[a-z]*\.exe$"]})
+        elif kind == 2:
+            out.append({"id": f"path{i}", "name": [f"svc{i}.exe"], "open_file_prefix": [rnd.choice(DIRS) + f"\\d{i}"]})
+        else:
+            out.append({"id": f"port{i}", "name_regex": [rf"^beacon{i}"], "remote_port": [10000 + i]})
+    return out
+
+
+def _procs(n: int, rnd: random.Random):
+    procs = []
+    for pid in range(n):
+        files = [types.SimpleNamespace(path=f"{rnd.choice(DIRS)}\\f{j}.dll") for j in range(20)]
+        conns = [types.SimpleNamespace(raddr=types.SimpleNamespace(ip="1.2.3.4", port=rnd.randint(1, 65535))) for _ in range(5)]
+        procs.append({"pid": pid, "name": rnd.choice(["chrome.exe", "svchost.exe", "tool3.exe", f"svc{pid}.exe", "agent1x.exe"]),
+                      "open_files": files, "connections": conns, "exe": "C:\\Windows\\x.exe", "ppid": 1})
+    return procs
+
+
+def _naive(raw_rules, proc):
+    """Evaluación directa: cada regla, cada condición, sin índices (siempre pide todo)."""
+    hits = []
+    name = proc["name"].lower()
+    for r in raw_rules:
+        ok = True
+        if "name" in r and name not in [n.lower() for n in r["name"]]:
+            ok = False
+        if ok and "name_regex" in r and not any(re.search(p, name, re.I) for p in r["name_regex"]):
+            ok = False
+        if ok and "open_file_prefix" in r:
+            ok = any(f.path.lower().startswith(p.lower()) for f in proc["open_files"] for p in r["open_file_prefix"])
+        if ok and "remote_port" in r:
+            ok = any(c.raddr.port in r["remote_port"] for c in proc["connections"])
+        if ok:
+            hits.append(r["id"])
+    return hits
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procs", type=int, default=500)
+    ap.add_argument("--rules", default="10,100,1000,5000")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rnd = random.Random(args.seed)
+    procs = _procs(args.procs, rnd)
+
+    print(f"{'rules':>6} {'compile_ms':>10} {'compiled/s':>12} {'naive/s':>10} {'speedup':>8} {'attr_fetches':>12}")
+    for n in [int(x) for x in args.rules.split(",") if x]:
+        raw = _rules(n, rnd)
+        t = time.perf_counter()
+        rs = rules.compile_rules(raw)
+        compile_ms = (time.perf_counter() - t) * 1000
+
+        fetches = 0
+        t = time.perf_counter()
+        for p in procs:
+            def fetch(attr, p=p):
+                nonlocal fetches
+                fetches += 1
+                return p[attr]
+            rs.evaluate(rules.ProcessView(p["pid"], p["name"], fetch), parent_name=lambda _: "explorer.exe")
+        compiled = len(procs) / (time.perf_counter() - t)
+
+        sample = procs[: max(1, min(len(procs), 20000 // max(1, n)))]
+        t = time.perf_counter()
+        for p in sample:
+            _naive(raw, p)
+        naive = len(sample) / (time.perf_counter() - t)
+        print(f"{n:>6} {compile_ms:>10.1f} {compiled:>12,.0f} {naive:>10,.0f} {compiled / naive:>7.1f}x {fetches:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compara tamaño de DB y velocidad de upsert: tablas de reputación antiguas vs `indicators`.
+
+Esquema antiguo: por cada resultado se escriben reputation_ip (agregado) y reputation_ip_src,
+con veredicto/fuente en texto y fechas ISO. Esquema nuevo: una fila en `indicators`
+(WITHOUT ROWID, enteros y epoch) y el agregado como vista.
+
+Uso:
+    python scripts/bench_indicator_store.py --n 1000000
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcp_win_admin import db  # noqa: E402
+
+SOURCES = ("threatfox", "urlhaus", "otx", "abuseipdb")
+VERDICTS = ("unknown", "clean", "suspicious", "malicious")
+
+LEGACY_DDL = """
+CREATE TABLE reputation_ip (
+    ip TEXT PRIMARY KEY, verdict TEXT NOT NULL, source TEXT NOT NULL,
+    first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, metadata TEXT
+);
+CREATE TABLE reputation_ip_src (
+    ip TEXT NOT NULL, source TEXT NOT NULL, verdict TEXT NOT NULL,
+    first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, metadata TEXT,
+    PRIMARY KEY (ip, source)
+);
+CREATE INDEX idx_rep_ip_last_seen ON reputation_ip(last_seen);
+CREATE INDEX idx_rep_ip_src_last_seen ON reputation_ip_src(last_seen);
+"""
+
+
+def _dataset(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    per_ip = len(SOURCES)
+    for i in range(n):
+        ip_idx = i // per_ip
+        ip = f"{10 + (ip_idx >> 24) % 200}.{(ip_idx >> 16) & 255}.{(ip_idx >> 8) & 255}.{ip_idx & 255}"
+        yield ip, SOURCES[i % per_ip], rnd.choice(VERDICTS)
+
+
+def _size(path: Path) -> int:
+    with db.get_conn(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    return path.stat().st_size
+
+
+def bench_legacy(path: Path, n: int, batch: int) -> float:
+    with db.get_conn(path) as conn:
+        conn.executescript(LEGACY_DDL)
+        t0 = time.perf_counter()
+        conn.execute("BEGIN")
+        for i, (ip, src, verdict) in enumerate(_dataset(n), 1):
+            now = datetime.now(timezone.utc).isoformat()
+            conn.execute(
+                """INSERT INTO reputation_ip (ip, verdict, source, first_seen, last_seen, metadata)
+                   VALUES (?, ?, ?, ?, ?, NULL)
+                   ON CONFLICT(ip) DO UPDATE SET verdict = excluded.verdict, source = excluded.source,
+                       last_seen = excluded.last_seen, metadata = excluded.metadata""",
+                (ip, verdict, src, now, now),
+            )
+            conn.execute(
+                """INSERT INTO reputation_ip_src (ip, source, verdict, first_seen, last_seen, metadata)
+                   VALUES (?, ?, ?, ?, ?, NULL)
+                   ON CONFLICT(ip, source) DO UPDATE SET verdict = excluded.verdict,
+                       last_seen = excluded.last_seen, metadata = excluded.metadata""",
+                (ip, src, verdict, now, now),
+            )
+            if i % batch == 0:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+        conn.execute("COMMIT")
+        return time.perf_counter() - t0
+
+
+def bench_indicators(path: Path, n: int, batch: int) -> float:
+    db.init_db(path)
+    with db.get_conn(path) as conn:
+        source_ids = {s: db._source_id(conn, path, s) for s in SOURCES}
+        t0 = time.perf_counter()
+        conn.execute("BEGIN")
+        for i, (ip, src, verdict) in enumerate(_dataset(n), 1):
+            now = int(datetime.now(timezone.utc).timestamp())
+            conn.execute(
+                """INSERT INTO indicators (type, value, source, verdict, first_seen, last_seen, metadata)
+                   VALUES (?, ?, ?, ?, ?, ?, NULL)
+                   ON CONFLICT(type, value, source) DO UPDATE SET verdict = excluded.verdict,
+                       last_seen = excluded.last_seen, metadata = excluded.metadata""",
+                (db.IND_IP, ip, source_ids[src], db.VERDICT_CODES[verdict], now, now),
+            )
+            if i % batch == 0:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+        conn.execute("COMMIT")
+        return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=1_000_000, help="resultados (indicador, fuente) a escribir")
+    ap.add_argument("--batch", type=int, default=10_000, help="upserts por transacción")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, fn in (("legacy", bench_legacy), ("indicators", bench_indicators)):
+            path = Path(tmp) / f"{name}.sqlite3"
+            elapsed = fn(path, args.n, args.batch)
+            results[name] = (elapsed, _size(path))
+            print(f"{name:>10}: {args.n / elapsed:>10.0f} upserts/s  {elapsed:7.2f} s  {results[name][1] / 1e6:8.1f} MB")
+        (t_old, s_old), (t_new, s_new) = results["legacy"], results["indicators"]
+        print(f"speedup x{t_old / t_new:.2f}, size x{s_new / s_old:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compara memoria y tiempo: juntar todos los (tamaño, ruta) y ordenar vs selector top-K acotado.
+
+El modo por defecto alimenta ambos métodos con un flujo sintético de N archivos (sin disco).
+Con --tree N se crea además un árbol real de N archivos dispersos (truncate, sin escribir
+datos) y se compara `os.walk` + sort contra el recorrido en streaming de
+`filesystem.list_heavy_files`.
+
+Uso:
+    python scripts/bench_topk.py --n 1000000 --k 5
+    python scripts/bench_topk.py --n 1000000 --tree 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcp_win_admin import filesystem  # noqa: E402
+from mcp_win_admin.topk import TopK  # noqa: E402
+
+
+def _stream(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    for i in range(n):
+        yield int(rnd.paretovariate(1.2) * 4096), f"C:\\data\\d{i % 1000:03d}\\f{i}.bin"
+
+
+def _measure(fn):
+    """(resultado, segundos, pico de memoria); tracemalloc ralentiza, así que se mide en otra pasada."""
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def collect_then_sort(items, k: int):
+    allf = []
+    for size, path in items:
+        allf.append((size, path))
+    allf.sort(reverse=True)
+    return allf[:k]
+
+
+def streaming(items, k: int):
+    top = TopK(k)
+    for item in items:
+        top.push(item)
+    return top.items()
+
+
+def _make_tree(root: Path, n: int, fanout: int = 100, seed: int = 11) -> None:
+    rnd = random.Random(seed)
+    for i in range(n):
+        d = root / f"d{i // (fanout * fanout) % fanout:02d}" / f"s{i // fanout % fanout:02d}"
+        if i % fanout == 0:
+            d.mkdir(parents=True, exist_ok=True)
+        with open(d / f"f{i}.bin", "wb") as fh:
+            fh.truncate(int(rnd.paretovariate(1.2) * 4096))
+
+
+def walk_then_sort(root: str, k: int):
+    allf = []
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            p = os.path.join(dirpath, name)
+            try:
+                allf.append((os.path.getsize(p), p))
+            except OSError:
+                pass
+    allf.sort(reverse=True)
+    return allf[:k]
+
+
+def _report(name: str, elapsed: float, peak: int) -> None:
+    print(f"{name:>18}: {elapsed:7.2f} s  pico {peak / 1e6:8.2f} MB")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=1_000_000, help="archivos del flujo sintético")
+    ap.add_argument("--k", type=int, default=5, help="archivos pesados a devolver")
+    ap.add_argument("--tree", type=int, default=0, help="archivos del árbol real en disco (0: omitir)")
+    args = ap.parse_args()
+
+    print(f"flujo sintético: {args.n} archivos, top {args.k}")
+    a, t_a, m_a = _measure(lambda: collect_then_sort(_stream(args.n), args.k))
+    _report("collect+sort", t_a, m_a)
+    b, t_b, m_b = _measure(lambda: streaming(_stream(args.n), args.k))
+    _report("TopK", t_b, m_b)
+    assert [s for s, _ in a] == [s for s, _ in b]
+    print(f"speedup x{t_a / t_b:.2f}")
+
+    if args.tree:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"\nárbol en disco: {args.tree} archivos")
+            t0 = time.perf_counter()
+            _make_tree(Path(tmp), args.tree)
+            print(f"{'creación':>18}: {time.perf_counter() - t0:7.2f} s")
+            a, t_a, m_a = _measure(lambda: walk_then_sort(tmp, args.k))
+            _report("os.walk+sort", t_a, m_a)
+            b, t_b, m_b = _measure(
+                lambda: filesystem._stream_heavy_files(tmp, args.k, 64, 0, None, False)
+            )
+            _report("scandir+TopK", t_b, m_b)
+            assert [s for s, _ in a] == [f["size_bytes"] for f in b]
+            print(f"speedup x{t_a / t_b:.2f}")
+
+
+if __name__ == "__main__":
+    main()
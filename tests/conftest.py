@@ -0,0 +1,10 @@
+import pytest
+
+from mcp_win_admin import quota
+
+
+@pytest.fixture(autouse=True)
+def _isolated_quota_ledger(tmp_path, monkeypatch):
+    # El libro de cuotas es compartido entre procesos: los tests no deben tocar el real
+    monkeypatch.setattr(quota, "LEDGER_PATH", tmp_path / "quota.sqlite3")
+    yield
@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from mcp_win_admin import behavioral
+
+
+class FakeProc:
+    def __init__(self, pid, name, files, handles=10):
+        self.info = {"pid": pid, "name": name, "create_time": 1.0}
+        self.files = files
+        self.handles = handles
+        self.open_calls = 0
+
+    def num_handles(self):
+        return self.handles
+
+    def open_files(self):
+        self.open_calls += 1
+        return [types.SimpleNamespace(path=p) for p in self.files]
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    behavioral.reset()
+    yield
+    behavioral.reset()
+
+
+def test_prefix_trie_matches_whole_components_case_insensitively():
+    trie = behavioral.PrefixTrie(["C:\\Windows\\System32", "D:/data"])
+    assert trie.match("c:/windows/system32/drivers/x.sys") == "C:\\Windows\\System32"
+    assert trie.match("D:\\DATA\\a.txt") == "D:/data"
+    assert trie.match("C:\\Windows\\System32x\\a") is None
+    assert trie.match("C:\\Windows") is None
+
+
+def test_open_files_only_fetched_for_new_or_changed_processes(monkeypatch):
+    evil = FakeProc(1, "Mimikatz.exe", [])
+    writer = FakeProc(2, "app.exe", ["C:\\Windows\\System32\\evil.dll", "C:\\Temp\\x"])
+    procs = [evil, writer]
+    monkeypatch.setattr(behavioral.psutil, "process_iter", lambda attrs=None: iter(procs))
+
+    first = behavioral.run_staged()
+    reasons = sorted(f["reason"] for f in first["findings"])
+    assert reasons == ["Suspicious process name", "Writing to sensitive directory: C:\\Windows\\System32\\evil.dll"]
+    assert first["stats"]["open_files_checked"] == 2 and "open_files_ms" in first["stats"]
+
+    writer.handles = 11
+    second = behavioral.run_staged()
+    assert second["stats"]["open_files_reused"] == 1 and second["stats"]["open_files_checked"] == 1
+    assert evil.open_calls == 1 and writer.open_calls == 2
+    assert len(second["findings"]) == 2
+    assert behavioral.check_running_processes() == second["findings"]
+
+
+def test_same_handle_count_file_swap_is_caught_after_max_age(monkeypatch):
+    proc = FakeProc(3, "app.exe", ["C:\\Temp\\harmless.txt"])
+    monkeypatch.setattr(behavioral.psutil, "process_iter", lambda attrs=None: iter([proc]))
+    clock = [1000.0]
+    monkeypatch.setattr(behavioral.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(behavioral.cfg, "BEHAVIOR_OPEN_FILES_MAX_AGE_SECONDS", 30.0)
+
+    assert behavioral.run_staged()["findings"] == []
+    # cierra un archivo y abre otro sensible: el conteo de handles no cambia
+    proc.files = ["C:\\Windows\\System32\\config\\SAM"]
+    clock[0] += 10
+    assert behavioral.run_staged()["stats"]["open_files_reused"] == 1
+    clock[0] += 25
+    res = behavioral.run_staged()
+    assert res["stats"]["open_files_checked"] == 1 and proc.open_calls == 2
+    assert [f["reason"] for f in res["findings"]] == ["Writing to sensitive directory: C:\\Windows\\System32\\config\\SAM"]
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from mcp_win_admin import breaker
+from mcp_win_admin import reputation as rep
+
+
+@pytest.fixture(autouse=True)
+def _clean(monkeypatch):
+    breaker.reset()
+    monkeypatch.setattr(breaker.cfg, "REP_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(breaker.cfg, "REP_BREAKER_COOLDOWN_SECONDS", 60.0)
+    yield
+    breaker.reset()
+
+
+def test_opens_after_consecutive_failures_and_rejects_fast():
+    for _ in range(3):
+        assert breaker.allow("src")
+        breaker.record_failure("src", 0.1)
+    assert breaker.snapshot()["src"]["state"] == breaker.OPEN
+    assert breaker.allow("src") is False
+    out = breaker.call("src", lambda: pytest.fail("must not be called"))
+    assert out["status"] == "source_unavailable"
+    assert breaker.snapshot()["src"]["rejected"] == 2
+
+
+def test_half_open_single_probe_then_close(monkeypatch):
+    clock = {"t": 1000.0}
+    monkeypatch.setattr(breaker.time, "monotonic", lambda: clock["t"])
+    for _ in range(3):
+        breaker.record_failure("src")
+    clock["t"] += 61
+    assert breaker.allow("src") is True  # probe
+    assert breaker.snapshot()["src"]["state"] == breaker.HALF_OPEN
+    assert breaker.allow("src") is False  # only one probe at a time
+    breaker.record_success("src", 0.2)
+    assert breaker.snapshot()["src"]["state"] == breaker.CLOSED
+
+
+def test_half_open_probe_failure_reopens(monkeypatch):
+    clock = {"t": 1000.0}
+    monkeypatch.setattr(breaker.time, "monotonic", lambda: clock["t"])
+    for _ in range(3):
+        breaker.record_failure("src")
+    clock["t"] += 61
+    assert breaker.allow("src")
+    breaker.record_failure("src")
+    assert breaker.snapshot()["src"]["state"] == breaker.OPEN
+    assert breaker.allow("src") is False
+
+
+def test_adaptive_timeout_from_p95(monkeypatch):
+    monkeypatch.setattr(breaker.cfg, "REP_TIMEOUT_MIN_SECONDS", 1.0)
+    monkeypatch.setattr(breaker.cfg, "REP_TIMEOUT_MAX_SECONDS", 15.0)
+    monkeypatch.setattr(breaker.cfg, "REP_TIMEOUT_P95_MULTIPLIER", 3.0)
+    assert breaker.timeout_for("fast") == 15.0  # not enough samples yet
+    for _ in range(20):
+        breaker.record_success("fast", 0.5)
+    assert breaker.timeout_for("fast") == pytest.approx(1.5)
+    for _ in range(20):
+        breaker.record_success("fast", 0.01)
+    assert breaker.timeout_for("fast") >= 1.0  # clamped to the minimum
+
+
+def test_no_api_key_does_not_count():
+    out = breaker.call("otx", lambda: {"source": "otx", "verdict": "unknown", "status": "no_api_key"})
+    assert out["status"] == "no_api_key"
+    snap = breaker.snapshot()["otx"]
+    assert snap["successes"] == 0 and snap["failures"] == 0
+
+
+def test_check_ip_returns_source_unavailable_without_caching(monkeypatch):
+    upserts = []
+    monkeypatch.setattr(rep.db, "get_ip_reputation", lambda ip, ttl_seconds=None: None)
+    monkeypatch.setattr(rep.db, "get_ip_reputation_sources", lambda ip, ttl_seconds=None: [])
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation", lambda **k: upserts.append(k))
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation_source", lambda **k: upserts.append(k))
+    monkeypatch.setattr(rep, "_urlhaus_host_lookup", lambda host, client=None: {"source": "urlhaus", "error": "timeout", "verdict": "unknown"})
+
+    for _ in range(3):
+        rep.check_ip("10.9.8.7", ttl_seconds=60, sources=("urlhaus",))
+    upserts.clear()
+    out = rep.check_ip("10.9.8.7", ttl_seconds=60, sources=("urlhaus",))
+    assert out["sources"][0]["status"] == "source_unavailable"
+    assert upserts == []
+
+
+def test_throttle_and_quota_waits_are_not_latency(monkeypatch):
+    monkeypatch.setattr(rep, "_MIN_INTERVAL", 0.2)
+    monkeypatch.setattr(rep.quota, "consume", lambda key: time.sleep(0.1))
+    monkeypatch.setitem(rep._LAST_CALL, "slowq", time.monotonic())
+
+    def lookup():
+        rep._throttle("slowq")
+        time.sleep(0.02)  # la petición HTTP
+        return {"source": "slowq", "verdict": "clean"}
+
+    breaker.call("slowq", lookup)
+    assert 0.015 <= breaker._SOURCES["slowq"].latencies[-1] < 0.1
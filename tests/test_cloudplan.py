@@ -0,0 +1,109 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import av, cloudplan, db
+
+
+def test_score_prefers_recent_executables_in_risky_locations():
+    now = time.time()
+    hot, why = cloudplan.score(r"C:\Users\bob\Downloads\setup.exe", mtime=now - 60, prevalence=1, prev_unknown=False, now=now)
+    cold, _ = cloudplan.score("/data/docs/report.txt", mtime=now - 90 * 86400, prevalence=5, prev_unknown=False, now=now)
+    seen, _ = cloudplan.score(r"C:\Users\bob\Downloads\setup.exe", mtime=now - 60, prevalence=1, prev_unknown=True, now=now)
+    assert hot > seen > cold
+    assert {"executable", "risky_location", "modified_24h", "rare"} <= set(why)
+
+
+def test_allocate_spends_budget_top_down_and_leaves_unbudgeted_sources_alone():
+    cands = [
+        cloudplan.Candidate(hash="low", algo="sha256", path="a", needs=("virustotal", "teamcymru"), score=1),
+        cloudplan.Candidate(hash="high", algo="sha256", path="b", needs=("virustotal", "teamcymru"), score=9),
+    ]
+    allowed, deferred = cloudplan.allocate(cands, {"virustotal": 1})
+    assert allowed == {"high": ("virustotal", "teamcymru"), "low": ("teamcymru",)}
+    assert [(c.hash, s) for c, s in deferred] == [("low", "virustotal")]
+
+
+def test_parse_budgets_ignores_garbage():
+    assert cloudplan.parse_budgets("virustotal=3, otx=x,,=2") == {"virustotal": 3}
+
+
+def test_budgets_are_capped_by_remaining_quota(monkeypatch):
+    monkeypatch.setattr(cloudplan.quota.cfg, "QUOTA_ENABLED", True)
+    monkeypatch.setattr(cloudplan.quota.cfg, "QUOTA_LIMITS", "virustotal=4/3600,otx=3/3600")
+    for _ in range(3):
+        cloudplan.quota.consume("virustotal")
+    budgets = cloudplan.remaining_budgets(("virustotal", "otx", "teamcymru"), {"virustotal": 25})
+    # virustotal: 25 declarados pero sólo 1 token; otx: sin presupuesto, usa su cuota; teamcymru: sin límite
+    assert budgets == {"virustotal": 1, "otx": 3}
+
+
+@pytest.fixture()
+def tmp_default_db(tmp_path: Path, monkeypatch):
+    path = tmp_path / "state.sqlite3"
+    monkeypatch.setattr(db, "DEFAULT_DB_PATH", path)
+    db.init_db(path)
+    db.row_cache_clear()
+    yield path
+    db.row_cache_clear()
+
+
+def test_scan_path_defers_over_budget_and_processes_queue_later(tmp_path: Path, tmp_default_db, monkeypatch):
+    root = tmp_path / "scan"
+    (root / "Downloads").mkdir(parents=True)
+    (root / "Downloads" / "dropper.exe").write_bytes(b"MZ evil")
+    (root / "notes.txt").write_text("hello")
+    calls = []
+
+    def fake_lookup(hash_hex, source):
+        calls.append((source, hash_hex))
+        return {"source": source, "verdict": "unknown"}
+
+    monkeypatch.setattr(av, "_lookup_hash_source", fake_lookup)
+    res = av.scan_path(str(root), use_cloud=True, sources=("virustotal", "teamcymru"), ttl_seconds=3600,
+                       cloud_budgets={"virustotal": 1})
+    by_name = {Path(r["path"]).name: r for r in res}
+    assert "cloud_deferred" not in by_name["dropper.exe"]
+    assert by_name["notes.txt"]["cloud_deferred"] == ["virustotal"]
+    assert [s for s, h in calls if s == "virustotal"] == ["virustotal"]
+    assert len([s for s, h in calls if s == "teamcymru"]) == 2
+
+    queued = db.list_deferred_lookups()
+    assert [(q["hash"], q["source"]) for q in queued] == [(by_name["notes.txt"]["hash"], "virustotal")]
+
+    out = av.process_deferred_lookups(budgets={"virustotal": 5})
+    assert out["processed"] == 1 and out["remaining"] == 0
+    assert calls[-1] == ("virustotal", by_name["notes.txt"]["hash"])
+
+
+def test_stale_budgeted_rows_count_against_the_plan(tmp_path: Path, tmp_default_db, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+
+    from mcp_win_admin import refresh
+
+    root = tmp_path / "scan"
+    root.mkdir()
+    (root / "a.exe").write_bytes(b"MZ a")
+    (root / "b.exe").write_bytes(b"MZ b")
+    old = (datetime.now(timezone.utc) - timedelta(seconds=7200)).isoformat()
+    calls = []
+
+    def fake_lookup(hash_hex, source):
+        calls.append(source)
+        return {"source": source, "verdict": "unknown"}
+
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", True)
+    monkeypatch.setattr(refresh.cfg, "REP_HARD_TTL_FACTOR", 4.0)
+    monkeypatch.setattr(av, "_lookup_hash_source", fake_lookup)
+    monkeypatch.setattr(
+        av.db, "get_hash_verdict_sources",
+        lambda hash_hex, algo: [{"source": "virustotal", "verdict": "clean", "last_seen": old}],
+    )
+    res = av.scan_path(str(root), use_cloud=True, sources=("virustotal",), ttl_seconds=3600,
+                       cloud_budgets={"virustotal": 1})
+    assert refresh.wait_idle(2.0)
+    # una sola consulta (el refresco en segundo plano) y la otra stale queda aplazada, no refrescada
+    assert calls == ["virustotal"]
+    assert sorted(len(r.get("cloud_deferred", [])) for r in res) == [0, 1]
+    assert all(r["details"]["sources"][0]["stale"] for r in res)
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import conntrack, db
+
+
+LIVE: dict = {}
+
+
+@pytest.fixture(autouse=True)
+def _clean(tmp_path: Path, monkeypatch):
+    LIVE.clear()
+    monkeypatch.setattr(conntrack, "sample_flows", lambda: dict(LIVE))
+    path = tmp_path / "state.sqlite3"
+    monkeypatch.setattr(db, "DEFAULT_DB_PATH", path)
+    db.init_db(path)
+    monkeypatch.setattr(conntrack.procinfo, "name", lambda pid: f"proc{pid}")
+    conntrack.reset()
+    yield
+    conntrack.reset()
+
+
+A = ("10.0.0.2:50000", "8.8.8.8:443", 10)
+B = ("10.0.0.2:50001", "8.8.8.8:443", 10)
+C = ("10.0.0.2:50002", "1.1.1.1:53", 20)
+
+
+def test_changes_report_only_deltas_since_cursor():
+    LIVE.update({A: "ESTABLISHED", C: "ESTABLISHED"})
+    conntrack.sample_once(now=100.0)
+    first = conntrack.changes(0)
+    assert [(e["event"], e["raddr"]) for e in first["events"]] == [("open", "8.8.8.8:443"), ("open", "1.1.1.1:53")]
+
+    LIVE.clear()
+    LIVE.update({A: "ESTABLISHED", B: "SYN_SENT"})
+    conntrack.sample_once(now=110.0)
+    second = conntrack.changes(first["cursor"])
+    kinds = sorted((e["event"], e["laddr"]) for e in second["events"])
+    assert kinds == [("close", C[0]), ("open", B[0])]
+    closed = next(e for e in second["events"] if e["event"] == "close")
+    assert closed["duration"] == 10.0 and closed["process_name"] == "proc20"
+    assert second["active_flows"] == 2 and not second["truncated"]
+
+
+def test_history_combines_aggregate_active_and_events():
+    conntrack.sample_once({A: "ESTABLISHED"}, now=100.0)
+    conntrack.sample_once({B: "ESTABLISHED"}, now=105.0)
+    h = conntrack.history("8.8.8.8:443")
+    agg = h["aggregate"]
+    assert agg["opened"] == 2 and agg["closed"] == 1 and agg["total_seconds"] == 5.0
+    assert agg["last_process"] == "proc10"
+    assert [f["laddr"] for f in h["active"]] == [B[0]]
+    assert len(h["events"]) == 3
+
+
+def test_overflowing_ring_buffer_marks_old_cursor_truncated(monkeypatch):
+    monkeypatch.setattr(conntrack, "_EVENTS", conntrack.deque(maxlen=2))
+    conntrack.sample_once({A: "ESTABLISHED"}, now=1.0)
+    LIVE[B] = "ESTABLISHED"
+    conntrack.sample_once(now=2.0)
+    assert conntrack.changes(1)["truncated"] is False  # el cursor 2 sigue en el buffer
+    out = conntrack.changes(0)
+    assert out["truncated"] is True and [e["cursor"] for e in out["events"]] == [2, 3]
+    assert conntrack.stats()["dropped_events"] == 1
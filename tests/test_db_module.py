@@ -95,8 +95,8 @@ def test_reputation_ip_and_domain_with_sources_and_ttl(tmp_db: Path):
     # Backdate source
     with db.get_conn(tmp_db) as conn:
         conn.execute(
-            "UPDATE reputation_ip_src SET last_seen = ?",
-            ((datetime.now(timezone.utc) - timedelta(days=5)).isoformat(),),
+            "UPDATE indicators SET last_seen = ? WHERE type = ?",
+            (int((datetime.now(timezone.utc) - timedelta(days=5)).timestamp()), db.IND_IP),
         )
     srcs = db.get_ip_reputation_sources(ip="1.1.1.1", db_path=tmp_db, ttl_seconds=60)
     # None fresh -> allow fallback to originals or empty list
@@ -107,15 +107,14 @@ def test_reputation_ip_and_domain_with_sources_and_ttl(tmp_db: Path):
     db.upsert_domain_reputation_source(domain="example.com", source="x", verdict="suspicious", db_path=tmp_db)
     # Backdate both global and sources to enable purge later
     with db.get_conn(tmp_db) as conn:
-        old = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-        conn.execute("UPDATE reputation_domain SET last_seen = ?", (old,))
-        conn.execute("UPDATE reputation_domain_src SET last_seen = ?", (old,))
+        old = int((datetime.now(timezone.utc) - timedelta(days=30)).timestamp())
+        conn.execute("UPDATE indicators SET last_seen = ? WHERE type = ?", (old, db.IND_DOMAIN))
 
     # Purges
     counts = db.purge_reputation_older_than(-1, tmp_db)
-    assert counts == {"reputation_ip": 0, "reputation_domain": 0, "reputation_ip_src": 0, "reputation_domain_src": 0}
+    assert counts == {"ip": 0, "domain": 0}
     counts2 = db.purge_reputation_older_than(60*60*24*7, tmp_db)
-    assert isinstance(counts2["reputation_domain"], int)
+    assert counts2["domain"] == 1 and counts2["ip"] == 0
 
     # Also cover av hash purge
     n = db.purge_av_hash_verdicts_older_than(-1, tmp_db)
@@ -133,7 +132,7 @@ def test_reputation_ttl_edge_cases(tmp_db: Path):
     # IP source: bad ISO last_seen should hit inner parse except and be filtered with numeric TTL
     db.upsert_ip_reputation_source(ip="1.1.1.2", source="s1", verdict="clean", db_path=tmp_db)
     with db.get_conn(tmp_db) as conn:
-        conn.execute("UPDATE reputation_ip_src SET last_seen = ? WHERE ip = ? AND source = ?", ("NOT-ISO", "1.1.1.2", "s1"))
+        conn.execute("UPDATE indicators SET last_seen = ? WHERE value = ?", ("NOT-ISO", "1.1.1.2"))
     lst = db.get_ip_reputation_sources(ip="1.1.1.2", db_path=tmp_db, ttl_seconds=60)
     assert isinstance(lst, list) and len(lst) == 0
     # Outer try/except: non-int TTL should skip TTL filter and include the row
@@ -143,7 +142,7 @@ def test_reputation_ttl_edge_cases(tmp_db: Path):
     # Domain sources: same patterns
     db.upsert_domain_reputation_source(domain="example.org", source="s2", verdict="suspicious", db_path=tmp_db)
     with db.get_conn(tmp_db) as conn:
-        conn.execute("UPDATE reputation_domain_src SET last_seen = ? WHERE domain = ? AND source = ?", ("NOT-ISO", "example.org", "s2"))
+        conn.execute("UPDATE indicators SET last_seen = ? WHERE value = ?", ("NOT-ISO", "example.org"))
     dlst = db.get_domain_reputation_sources(domain="example.org", db_path=tmp_db, ttl_seconds=60)
     assert isinstance(dlst, list) and len(dlst) == 0
     dlst2 = db.get_domain_reputation_sources(domain="example.org", db_path=tmp_db, ttl_seconds=BadTTL())
@@ -152,10 +151,10 @@ def test_reputation_ttl_edge_cases(tmp_db: Path):
     # Domain global: stale and bad-ISO + bad TTL
     db.upsert_domain_reputation(domain="stale.com", verdict="clean", source="s3", db_path=tmp_db)
     with db.get_conn(tmp_db) as conn:
-        conn.execute("UPDATE reputation_domain SET last_seen = ? WHERE domain = ?", ((datetime.now(timezone.utc) - timedelta(days=30)).isoformat(), "stale.com"))
+        conn.execute("UPDATE indicators SET last_seen = ? WHERE value = ?", (int((datetime.now(timezone.utc) - timedelta(days=30)).timestamp()), "stale.com"))
     assert db.get_domain_reputation(domain="stale.com", db_path=tmp_db, ttl_seconds=60) is None
     with db.get_conn(tmp_db) as conn:
-        conn.execute("UPDATE reputation_domain SET last_seen = ? WHERE domain = ?", ("NOT-ISO", "stale.com"))
+        conn.execute("UPDATE indicators SET last_seen = ? WHERE value = ?", ("NOT-ISO", "stale.com"))
     # bad ISO -> ts=0 -> cutoff > 0 -> None
     assert db.get_domain_reputation(domain="stale.com", db_path=tmp_db, ttl_seconds=60) is None
     # non-int TTL -> outer except -> bypass TTL -> row present
@@ -224,13 +223,13 @@ def test_ip_reputation_ttl_paths(tmp_db: Path):
     # stale -> None
     with db.get_conn(tmp_db) as conn:
         conn.execute(
-            "UPDATE reputation_ip SET last_seen = ? WHERE ip = ?",
-            ((datetime.now(timezone.utc) - timedelta(days=30)).isoformat(), ip),
+            "UPDATE indicators SET last_seen = ? WHERE value = ?",
+            (int((datetime.now(timezone.utc) - timedelta(days=30)).timestamp()), ip),
         )
     assert db.get_ip_reputation(ip=ip, db_path=tmp_db, ttl_seconds=60) is None
     # bad ISO -> ts=0 -> cutoff > 0 -> None
     with db.get_conn(tmp_db) as conn:
-        conn.execute("UPDATE reputation_ip SET last_seen = ? WHERE ip = ?", ("NOT-ISO", ip))
+        conn.execute("UPDATE indicators SET last_seen = ? WHERE value = ?", ("NOT-ISO", ip))
     assert db.get_ip_reputation(ip=ip, db_path=tmp_db, ttl_seconds=60) is None
     # outer except on int(TTL) -> bypass TTL
     val = db.get_ip_reputation(ip=ip, db_path=tmp_db, ttl_seconds=BadTTL())
@@ -264,3 +263,42 @@ def test_init_db_optimize_exception(monkeypatch: pytest.MonkeyPatch, tmp_path: P
     monkeypatch.setattr(db, "get_conn", fake_get_conn)
     # Should not raise and cover except: pass
     db.init_db(tmp_path / "x.sqlite3")
+
+
+def test_indicator_view_aggregates_worst_verdict(tmp_db: Path):
+    db.upsert_ip_reputation_source(ip="3.3.3.3", source="a", verdict="clean", db_path=tmp_db)
+    db.upsert_ip_reputation_source(ip="3.3.3.3", source="b", verdict="suspicious", db_path=tmp_db)
+    agg = db.get_ip_reputation(ip="3.3.3.3", db_path=tmp_db, ttl_seconds=60)
+    assert agg["verdict"] == "suspicious" and agg["sources"] == 2
+    assert set(agg["source"].split(",")) == {"a", "b"}
+    with db.get_conn(tmp_db) as conn:
+        row = conn.execute("SELECT type, verdict, typeof(last_seen) FROM indicators WHERE value = ? AND verdict = ?", ("3.3.3.3", 2)).fetchone()
+    assert tuple(row) == (db.IND_IP, 2, "integer")
+
+
+def test_init_db_migrates_legacy_reputation_tables(tmp_path: Path):
+    path = tmp_path / "legacy.sqlite3"
+    ts = "2024-05-01T10:00:00+00:00"
+    with db.get_conn(path) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE reputation_ip (ip TEXT PRIMARY KEY, verdict TEXT NOT NULL, source TEXT NOT NULL,
+                first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, metadata TEXT);
+            CREATE TABLE reputation_ip_src (ip TEXT NOT NULL, source TEXT NOT NULL, verdict TEXT NOT NULL,
+                first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, metadata TEXT, PRIMARY KEY (ip, source));
+            CREATE TABLE reputation_domain_src (domain TEXT NOT NULL, source TEXT NOT NULL, verdict TEXT NOT NULL,
+                first_seen TEXT NOT NULL, last_seen TEXT NOT NULL, metadata TEXT, PRIMARY KEY (domain, source));
+            """
+        )
+        conn.execute("INSERT INTO reputation_ip VALUES ('4.4.4.4', 'clean', 'urlhaus', ?, ?, NULL)", (ts, ts))
+        conn.execute("INSERT INTO reputation_ip_src VALUES ('4.4.4.4', 'urlhaus', 'malicious', ?, ?, 'm')", (ts, ts))
+        conn.execute("INSERT INTO reputation_domain_src VALUES ('evil.test', 'threatfox', 'suspicious', ?, ?, NULL)", (ts, ts))
+
+    db.init_db(path)
+    with db.get_conn(path) as conn:
+        left = conn.execute("SELECT count(*) FROM sqlite_master WHERE name LIKE 'reputation_%'").fetchone()[0]
+    assert left == 0
+    srcs = db.get_ip_reputation_sources(ip="4.4.4.4", db_path=path)
+    assert srcs == [{"ip": "4.4.4.4", "source": "urlhaus", "verdict": "malicious", "first_seen": ts, "last_seen": ts, "metadata": "m"}]
+    assert db.get_domain_reputation(domain="EVIL.test", db_path=path)["verdict"] == "suspicious"
+    db.init_db(path)  # idempotente
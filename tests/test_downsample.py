@@ -0,0 +1,59 @@
+import math
+import time
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import db, downsample
+from dashboard_api import metrics
+
+
+def _series(n):
+    return [[float(i), math.sin(i / 10.0) + (5.0 if i == 123 else 0.0)] for i in range(n)]
+
+
+def test_lttb_keeps_endpoints_peaks_and_size():
+    pts = _series(1000)
+    out = downsample.lttb(pts, 50)
+    assert len(out) == 50
+    assert out[0] is pts[0] and out[-1] is pts[-1]
+    assert pts[123] in out  # el pico aislado sobrevive
+    xs = [p[0] for p in out]
+    assert xs == sorted(xs)
+
+
+def test_lttb_noop_when_small():
+    pts = _series(10)
+    assert downsample.lttb(pts, 50) == pts
+    assert downsample.lttb(pts, 2) == pts
+
+
+@pytest.mark.skipif(downsample.np is None, reason="numpy no instalado")
+def test_numpy_matches_pure_python():
+    pts = _series(5000)
+    xs, ys = [p[0] for p in pts], [p[1] for p in pts]
+    for threshold in (3, 10, 333, 4999):
+        assert downsample._indices_np(xs, ys, threshold) == downsample._indices_py(xs, ys, threshold)
+
+
+def test_history_endpoint_downsamples_and_caches(tmp_path: Path, monkeypatch):
+    path = tmp_path / "state.sqlite3"
+    monkeypatch.setattr(db, "DEFAULT_DB_PATH", path)
+    db.init_db(path)
+    metrics._HISTORY_CACHE.clear()
+
+    now = time.time()
+    for i in range(600):
+        db.insert_snapshot({"cpu_percent": float(i % 50)}, ts=now - 600 + i)
+
+    out = metrics.history("cpu_percent", range="15m", points=100)
+    assert out["resolution"] == "raw" and out["source_points"] == 600
+    assert len(out["points"]) == 100 and out["downsampled"]
+    assert metrics.history("cpu_percent", range="15m", points=100) is out
+
+    agg = metrics.history("cpu_percent", since=now - 600, until=now + 1, resolution="1m", points=5)
+    assert agg["fields"] == ["ts", "n", "min", "max", "avg", "p95"] and len(agg["points"]) == 5
+
+    assert "error" in metrics.history("nope", range="1h")
+    with pytest.raises(ValueError):
+        metrics.parse_range("1 week")
@@ -0,0 +1,129 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import duindex, filesystem, monitor_usn
+
+
+def _file(path: Path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _bump_mtime(path: Path, delta_ns: int = 5_000_000_000) -> None:
+    # algunos sistemas de archivos tienen resolución de mtime gruesa: forzar el cambio
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+
+@pytest.fixture
+def index(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(duindex, "INDEX_PATH", tmp_path / "du.sqlite3")
+    monkeypatch.setattr(duindex.cfg, "DU_INDEX_MIN_FILE_MB", 0.001)  # ~1 KB
+    root = tmp_path / "data"
+    _file(root / "top.bin", 50)
+    _file(root / "a" / "a1.bin", 1000)
+    _file(root / "a" / "sub" / "deep" / "hidden.bin", 9000)
+    _file(root / "b" / "b1.bin", 3000)
+    return root
+
+
+def test_build_and_query(index: Path):
+    res = duindex.refresh(str(index))
+    assert res["initial"] and res["dirs_added"] == 4 and res["dirs_rescanned"] == 5
+    rows = duindex.top_dirs(str(index), top_n=5)
+    # tamaños del subárbol completo, sin límite de profundidad
+    assert [(os.path.basename(r["path"]), r["size_bytes"], r["file_count"], r["depth"]) for r in rows] == [
+        ("a", 10000, 2, 1),
+        ("b", 3000, 1, 1),
+    ]
+    assert [f["size_bytes"] for f in duindex.top_files(str(index), 5)] == [9000, 3000]
+    assert [f["size_bytes"] for f in duindex.top_files(str(index / "a"), 5)] == [9000]
+    assert duindex.top_dirs(str(index.parent), 5) is None
+    st = duindex.status()
+    assert st["roots"][0]["size_bytes"] == 13050 and st["roots"][0]["indexed_dirs"] == 5
+
+
+def test_refresh_rescans_only_changed_dirs_and_rolls_up(index: Path):
+    duindex.refresh(str(index))
+    assert duindex.refresh(str(index))["dirs_rescanned"] == 0
+
+    _file(index / "a" / "sub" / "new.bin", 2000)
+    _bump_mtime(index / "a" / "sub")
+    res = duindex.refresh(str(index))
+    assert res["dirs_checked"] == 5 and res["dirs_rescanned"] == 1
+    # la carpeta cambiada y sus dos ancestros
+    assert res["rows_updated"] == 3
+    assert duindex.top_dirs(str(index), 1)[0]["size_bytes"] == 12000
+
+
+def test_removed_subtree_is_dropped(index: Path):
+    duindex.refresh(str(index))
+    (index / "a" / "sub" / "deep" / "hidden.bin").unlink()
+    (index / "a" / "sub" / "deep").rmdir()
+    (index / "a" / "sub").rmdir()
+    _bump_mtime(index / "a")
+    res = duindex.refresh(str(index))
+    assert res["dirs_removed"] == 2
+    assert duindex.top_dirs(str(index / "a"), 5) == []
+    assert duindex.top_files(str(index), 5)[0]["size_bytes"] == 3000
+    assert duindex.status()["roots"][0]["indexed_dirs"] == 3
+
+
+def test_list_heavy_paths_uses_index_when_enabled(index: Path, monkeypatch):
+    duindex.refresh(str(index))
+    monkeypatch.setattr(filesystem.cfg, "DU_INDEX_ENABLED", True)
+
+    def boom(*a, **k):
+        raise AssertionError("no debería recorrer el árbol")
+
+    monkeypatch.setattr(filesystem.sizetree, "get_tree", boom)
+    rows = filesystem.list_heavy_paths(str(index), max_depth=1, top_n=1, min_size_mb=0)
+    assert rows[0]["size_bytes"] == 10000
+    dirs, files = filesystem.heavy_view(str(index), 2, 1, 0, child_files=1)
+    assert dirs[0]["children"] == []  # hijos: umbral mínimo de 10 MB
+    assert dirs[0]["top_files"][0]["size_bytes"] == 9000 and files[0]["size_bytes"] == 9000
+
+
+def test_parse_readjournal_csv():
+    text = (
+        "Usn Journal ID : 0x01d9\n\n"
+        "Usn,File name,File name length,Reason,Time stamp,File attributes,File ID,Parent file ID,Source info,Security ID,Major version,Minor version,Record length\n"
+        "100,\"a.txt\",10,0x2,x,0x20,0x0001,0x00000000000000000005000000000aa1,0,0,3,0,96\n"
+        "164,\"b.txt\",10,0x2,x,0x20,0x0002,0x00000000000000000005000000000aa1,0,0,3,0,96\n"
+        "228,\"c.txt\",10,0x2,x,0x20,0x0003,0x00000000000000000007000000000bb2,0,0,3,0,96\n"
+    )
+    res = monitor_usn.parse_readjournal_csv(text)
+    assert res["parent_ids"] == ["0x00000000000000000005000000000aa1", "0x00000000000000000007000000000bb2"]
+    assert res["last_usn"] == 228
+
+
+def test_indexing_a_parent_adopts_existing_roots(index: Path):
+    duindex.refresh(str(index / "a" / "sub"))
+    duindex.refresh(str(index / "b"))
+    res = duindex.refresh(str(index))
+    assert res["roots_adopted"] == 2
+    # sólo se listan la raíz y "a" (intermedia); "sub" y "b" conservan sus filas
+    assert res["dirs_added"] == 0 and res["dirs_rescanned"] == 2
+    assert [r["root"] for r in duindex.status()["roots"]] == [str(index)]
+    rows = duindex.top_dirs(str(index), top_n=5)
+    assert [(os.path.basename(r["path"]), r["size_bytes"], r["depth"]) for r in rows] == [("a", 10000, 1), ("b", 3000, 1)]
+    assert duindex.top_dirs(str(index / "a"), 5)[0]["depth"] == 1
+    assert duindex.refresh(str(index))["dirs_rescanned"] == 0
+
+
+def test_usn_dirty_ids_match_directory_file_ids(index: Path, monkeypatch):
+    duindex.refresh(str(index))
+    # crecer un archivo existente no cambia el mtime de la carpeta
+    target = index / "a" / "sub" / "deep"
+    st = os.stat(target)
+    with open(target / "hidden.bin", "ab") as fh:
+        fh.write(b"y" * 500)
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert duindex.refresh(str(index))["dirs_rescanned"] == 0
+
+    monkeypatch.setattr(duindex, "_usn_dirty", lambda root, prev: ({st.st_ino}, {}))
+    res = duindex.refresh(str(index))
+    assert res["usn_dirty"] == 1 and res["dirs_rescanned"] == 1
+    assert duindex.top_dirs(str(index), 1)[0]["size_bytes"] == 10500
@@ -0,0 +1,83 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import dupes
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    dupes._HASHES.clear()
+    yield
+    dupes._HASHES.clear()
+
+
+def _file(path: Path, data: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setattr(dupes.cfg, "DUP_PARTIAL_KB", 4)  # ventanas de 4 KiB: archivos de 20 KB pasan a hash completo
+    big = os.urandom(20_000)
+    _file(tmp_path / "a" / "big1.bin", big)
+    _file(tmp_path / "b" / "big2.bin", big)
+    _file(tmp_path / "b" / "c" / "big3.bin", big)
+    # mismo tamaño y mismos extremos, distinto en medio: sólo el hash completo los separa
+    _file(tmp_path / "a" / "near.bin", big[:10_000] + b"\0" + big[10_001:])
+    small = os.urandom(3000)
+    _file(tmp_path / "s1.txt", small)
+    _file(tmp_path / "a" / "s2.txt", small)
+    _file(tmp_path / "unique.bin", os.urandom(3000))  # mismo tamaño que small, hash parcial distinto
+    _file(tmp_path / "lonely.bin", os.urandom(777))  # tamaño único: nunca se abre
+    return tmp_path
+
+
+def test_pipeline_groups_and_reclaimable(tree: Path):
+    res = dupes.find_duplicates(str(tree), min_size_kb=0.1)
+    groups = [(g["size_bytes"], [os.path.relpath(p, tree) for p in g["paths"]]) for g in res["duplicates"]]
+    assert groups == [
+        (20_000, [os.path.join("a", "big1.bin"), os.path.join("b", "big2.bin"), os.path.join("b", "c", "big3.bin")]),
+        (3000, [os.path.join("a", "s2.txt"), "s1.txt"]),
+    ]
+    assert res["reclaimable_bytes"] == 2 * 20_000 + 3000 and res["duplicate_files"] == 3
+    assert res["files_scanned"] == 8 and res["size_candidates"] == 7
+    # el único de 777 bytes no se hashea; el de 20 KB distinto se descarta en el hash completo
+    assert res["partial_hashed"] == 7 and res["full_hashed"] == 4
+
+
+def test_hash_cache_and_min_size(tree: Path):
+    dupes.find_duplicates(str(tree), min_size_kb=0.1)
+    again = dupes.find_duplicates(str(tree), min_size_kb=0.1)
+    assert again["bytes_read"] == 0 and again["hash_cache_hits"] == 11
+    only_big = dupes.find_duplicates(str(tree), min_size_kb=10, max_groups=1)
+    assert only_big["groups_returned"] == 1 and only_big["duplicates"][0]["count"] == 3
+
+
+@pytest.mark.skipif(not hasattr(os, "link"), reason="sin enlaces duros")
+def test_hardlinks_are_not_duplicates(tmp_path: Path):
+    data = os.urandom(5000)
+    a = _file(tmp_path / "a.bin", data)
+    try:
+        os.link(a, tmp_path / "a_link.bin")
+    except OSError:
+        pytest.skip("el sistema de archivos no admite enlaces duros")
+    res = dupes.find_duplicates(str(tmp_path), min_size_kb=1)
+    assert res["groups"] == 0 and res["hardlinks_skipped"] == 1
+
+
+def test_dashboard_streams_groups_then_summary(tree: Path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from dashboard_api import main
+
+    client = TestClient(main.app)
+    r = client.get("/api/fs/duplicates", params={"root": str(tree), "min_size_kb": 0.1})
+    lines = [json.loads(ln) for ln in r.text.splitlines()]
+    assert [ln["type"] for ln in lines] == ["group", "group", "summary"]
+    assert lines[-1]["reclaimable_bytes"] == 43000
+    assert client.get("/api/fs/duplicates", params={"root": str(tree / "nope")}).status_code == 400
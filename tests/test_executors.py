@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from dashboard_api.executors import BoundedPool, PoolBusy, PoolTimeout
+
+
+def test_queue_limit_rejects_and_stats_per_endpoint():
+    pool = BoundedPool("t", workers=1, max_queue=1, timeout=5)
+    gate = threading.Event()
+
+    async def main():
+        slow = asyncio.ensure_future(pool.run("/slow", gate.wait))
+        queued = asyncio.ensure_future(pool.run("/q", lambda: 42))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["running"] == 1 and pool.stats()["queued"] == 1
+        with pytest.raises(PoolBusy):
+            await pool.run("/q", lambda: 0)
+        gate.set()
+        return await slow, await queued
+
+    assert asyncio.run(main()) == (True, 42)
+    st = pool.stats()
+    assert st["inflight"] == 0
+    q = st["endpoints"]["/q"]
+    assert q["calls"] == 1 and q["rejected"] == 1 and q["queue_wait_max_ms"] >= 40
+    assert st["endpoints"]["/slow"]["p95_ms"] >= 40
+
+
+def test_timeout_frees_the_loop_and_cancels_queued_work():
+    pool = BoundedPool("t", workers=1, max_queue=4, timeout=0.1)
+    gate = threading.Event()
+    ran = []
+
+    async def main():
+        t0 = time.perf_counter()
+        first = asyncio.ensure_future(pool.run("/a", gate.wait))
+        second = asyncio.ensure_future(pool.run("/b", lambda: ran.append(1)))
+        for fut in (first, second):
+            with pytest.raises(PoolTimeout):
+                await fut
+        elapsed = time.perf_counter() - t0
+        # el hilo arrancado sigue ocupando su hueco hasta terminar; el encolado se canceló
+        busy = pool.stats()["inflight"]
+        gate.set()
+        await asyncio.sleep(0.05)
+        return elapsed, busy
+
+    elapsed, busy = asyncio.run(main())
+    assert elapsed < 0.5 and busy == 1 and ran == []
+    st = pool.stats()
+    assert st["inflight"] == 0 and st["endpoints"]["/a"]["timeouts"] == 1 and st["endpoints"]["/b"]["timeouts"] == 1
+
+
+def test_errors_are_counted_and_reraised():
+    pool = BoundedPool("t", workers=2, max_queue=0, timeout=1)
+
+    def boom():
+        raise ValueError("x")
+
+    async def main():
+        with pytest.raises(ValueError):
+            await pool.run("/e", boom)
+        return await pool.run("/e", lambda a, b=0: a + b, 1, b=2)
+
+    assert asyncio.run(main()) == 3
+    assert pool.stats()["endpoints"]["/e"]["errors"] == 1 and pool.stats()["endpoints"]["/e"]["calls"] == 2
+
+
+def test_dashboard_maps_pool_errors_and_exposes_stats(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from dashboard_api import executors, main
+
+    monkeypatch.setitem(executors.POOLS, "network", BoundedPool("network", workers=1, max_queue=0, timeout=0.05))
+    monkeypatch.setattr(main.metrics, "connections", lambda limit=50: time.sleep(0.3) or [])
+    client = TestClient(main.app)
+    r = client.get("/api/connections")
+    assert r.status_code == 504 and r.json()["pool"] == "network"
+    stats = client.get("/api/executors/stats").json()
+    assert stats["network"]["endpoints"]["/api/connections"]["timeouts"] == 1
+    assert set(stats) == {"fs", "network", "wmi", "defense", "general"}
+
+
+def test_fs_heavy_surfaces_pool_timeout(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from dashboard_api import executors, main
+
+    monkeypatch.setitem(executors.POOLS, "fs", BoundedPool("fs", workers=1, max_queue=0, timeout=0.05))
+    monkeypatch.setattr(main, "_fs_heavy_sync", lambda *a: time.sleep(0.3) or [])
+    with TestClient(main.app) as client:
+        r = client.get("/api/fs/heavy")
+    assert r.status_code == 504 and r.json()["pool"] == "fs"
@@ -0,0 +1,105 @@
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import db
+from mcp_win_admin.lru import LRUCache
+
+
+def _cache(**kw):
+    opts = {"max_entries": 3, "max_bytes": 10_000, "ttl_seconds": 60, "negative_ttl_seconds": 5}
+    opts.update(kw)
+    return LRUCache("test", **opts)
+
+
+def test_evicts_least_recently_used_by_count():
+    c = _cache()
+    for k in "abc":
+        c.put(k, k)
+    assert c.get("a") == "a"  # 'a' pasa a ser el más reciente
+    c.put("d", "d")
+    assert c.get("b") is None and c.get("a") == "a"
+    assert c.stats()["evictions"] == 1
+
+
+def test_evicts_by_bytes():
+    c = _cache(max_entries=100, max_bytes=300, sizeof=lambda v: 100)
+    for k in range(4):
+        c.put(k, k)
+    st = c.stats()
+    assert st["entries"] == 3 and st["bytes"] == 300 and st["evictions"] == 1
+
+
+def test_negative_entries_use_shorter_ttl(monkeypatch):
+    clock = {"t": 100.0}
+    monkeypatch.setattr("mcp_win_admin.lru.time.monotonic", lambda: clock["t"])
+    c = _cache()
+    c.put("pos", [{"verdict": "malicious"}])
+    c.put("neg", [], negative=True)
+    clock["t"] += 10
+    assert c.get("neg") is None
+    assert c.get("pos") == [{"verdict": "malicious"}]
+    assert c.stats()["expired"] == 1
+
+
+def test_put_with_stale_generation_is_ignored():
+    c = _cache()
+    gen = c.generation()
+    c.invalidate("k")
+    assert c.put("k", "old", generation=gen) is False
+    assert c.get("k") is None
+
+
+def test_invalidating_other_keys_does_not_drop_puts():
+    c = _cache()
+    c.invalidate("k")  # invalidación anterior a la lectura: no afecta
+    gen = c.generation()
+    c.invalidate("other")
+    assert c.put("k", "fresh", generation=gen) is True and c.get("k") == "fresh"
+    # clear no sabe qué claves tocó: descarta toda lectura en curso
+    gen = c.generation()
+    c.clear()
+    assert c.put("k", "old", generation=gen) is False
+
+
+def test_pruned_tombstones_reject_older_reads_conservatively():
+    c = _cache(max_entries=1)  # 4 marcas como mucho
+    gen = c.generation()
+    for k in "abcde":
+        c.invalidate(k)
+    assert c.put("z", "old", generation=gen) is False
+    assert c.put("z", "new", generation=c.generation()) is True
+
+
+@pytest.fixture()
+def tmp_db(tmp_path: Path):
+    path = tmp_path / "state.sqlite3"
+    db.init_db(path)
+    db.row_cache_clear()
+    return path
+
+
+def test_db_reads_hit_memory_and_upsert_invalidates(tmp_db: Path, monkeypatch):
+    db.upsert_ip_reputation(ip="9.9.9.9", verdict="clean", source="a", db_path=tmp_db)
+    assert db.get_ip_reputation(ip="9.9.9.9", db_path=tmp_db)["verdict"] == "clean"
+
+    opened = []
+    real_connect = db._connect
+    monkeypatch.setattr(db, "_connect", lambda p: opened.append(p) or real_connect(p))
+    assert db.get_ip_reputation(ip="9.9.9.9", db_path=tmp_db, ttl_seconds=60)["verdict"] == "clean"
+    assert opened == []  # servido desde memoria
+
+    db.upsert_ip_reputation(ip="9.9.9.9", verdict="malicious", source="b", db_path=tmp_db)
+    assert db.get_ip_reputation(ip="9.9.9.9", db_path=tmp_db)["verdict"] == "malicious"
+
+
+def test_hash_getters_share_cached_rows_and_return_copies(tmp_db: Path):
+    db.upsert_hash_verdict(hash_hex="AB", algo="sha256", verdict="clean", source="s", db_path=tmp_db)
+    rows = db.get_hash_verdict_sources(hash_hex="ab", algo="sha256", db_path=tmp_db)
+    rows[0]["verdict"] = "tampered"
+    best = db.get_hash_verdict(hash_hex="ab", algo="SHA256", db_path=tmp_db)
+    assert best["verdict"] == "clean"
+    assert db.row_cache_stats()["hits"] >= 1
+
+    db.purge_av_hash_verdicts_older_than(0, tmp_db)
+    assert db.get_hash_verdict(hash_hex="ab", algo="sha256", db_path=tmp_db) is None
@@ -0,0 +1,106 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import db, metricstore
+
+
+@pytest.fixture(autouse=True)
+def _clean(tmp_path: Path, monkeypatch):
+    path = tmp_path / "state.sqlite3"
+    monkeypatch.setattr(db, "DEFAULT_DB_PATH", path)
+    db.init_db(path)
+    metricstore.reset()
+    yield
+    metricstore.reset()
+
+
+def _insert(ts, cpu):
+    db.insert_snapshot({"cpu_percent": cpu, "mem_percent": 50.0, "processes_total": 100}, ts=ts)
+
+
+def test_aggregate_min_max_avg_p95():
+    rows = [{"ts": 120.0 + i, "cpu_percent": float(v)} for i, v in enumerate(range(1, 21))]
+    (r,) = metricstore.aggregate(rows, 60, ("cpu_percent",))
+    assert (r["bucket"], r["n"], r["min"], r["max"], r["avg"], r["p95"]) == (120, 20, 1.0, 20.0, 10.5, 19.0)
+
+
+def test_compact_only_closed_buckets_and_is_incremental():
+    now = (time.time() // 3600) * 3600 + 1800  # a mitad de hora
+    base = now - 600
+    for i in range(10):
+        _insert(base + i * 60, float(i))
+    _insert(now + 5, 99.0)  # minuto en curso: no se compacta
+
+    out = metricstore.compact(now)
+    assert out["rollups_1m"] == 10 * len(metricstore.METRICS)
+    minutes = db.query_snapshot_rollups(60, "cpu_percent", 0, now + 60)
+    assert [r["avg"] for r in minutes] == [float(i) for i in range(10)]
+    assert db.query_snapshot_rollups(3600, "cpu_percent", 0, now + 3600) == []
+
+    assert metricstore.compact(now)["rollups_1m"] == 0
+    out = metricstore.compact(now + 3600)
+    assert out["rollups_1m"] > 0 and out["rollups_1h"] > 0
+    (hour,) = db.query_snapshot_rollups(3600, "cpu_percent", 0, now + 3600)
+    assert hour["n"] == 11 and hour["max"] == 99.0
+
+
+def test_query_picks_resolution_and_fills_open_bucket():
+    now = time.time()
+    start = (now // 60) * 60 - 50 * 60
+    for i in range(50 * 6):  # una muestra cada 10 s durante 50 min
+        _insert(start + i * 10, float(i % 7))
+
+    raw = metricstore.query("cpu_percent", since=start, until=now + 1, max_points=1000)
+    assert raw["resolution"] == "raw" and raw["fields"] == ["ts", "value"] and len(raw["points"]) == 300
+
+    agg = metricstore.query("cpu_percent", since=start, until=now + 1, max_points=100)
+    assert agg["resolution"] == "1m"
+    assert len(agg["points"]) == 50
+    assert sum(p[1] for p in agg["points"]) == 300
+    assert agg["points"][0][0] == start
+
+    hourly = metricstore.query("cpu_percent", since=start, until=now + 1, resolution="1h")
+    assert sum(p[1] for p in hourly["points"]) == 300
+
+
+def test_query_rejects_unknown_metric_and_resolution():
+    assert metricstore.query("bogus")["error"] == "unknown_metric"
+    assert metricstore.query("cpu_percent", resolution="5m")["error"] == "bad_resolution"
+
+
+def test_purge_respects_retention(monkeypatch):
+    monkeypatch.setattr(metricstore.cfg, "METRICS_RAW_RETENTION_HOURS", 1.0)
+    now = time.time()
+    _insert(now - 3 * 3600, 1.0)
+    _insert(now - 60, 2.0)
+    out = metricstore.compact(now)
+    assert out["purged"] == 1
+    # el dato viejo sobrevive en los agregados
+    assert [r["avg"] for r in db.query_snapshot_rollups(60, "cpu_percent", 0, now)] == [1.0, 2.0]
+
+
+def test_read_path_compacts_without_purging_and_is_throttled(monkeypatch):
+    monkeypatch.setattr(metricstore.cfg, "METRICS_RAW_RETENTION_HOURS", 1.0)
+    now = time.time()
+    _insert(now - 3 * 3600, 1.0)
+    metricstore.query("cpu_percent", since=now - 4 * 3600)
+    assert metricstore.stats()["runs"] == 1 and metricstore.stats()["purged"] == 0
+    assert db.first_snapshot_ts() is not None  # la fila vieja sigue ahí
+    metricstore.query("cpu_percent", since=now - 4 * 3600)
+    assert metricstore.stats()["runs"] == 1
+
+
+def test_thread_without_record_only_compacts(monkeypatch):
+    calls = []
+    monkeypatch.setattr(metricstore, "record", lambda: calls.append(1))
+    monkeypatch.setattr(metricstore, "compact", lambda *a, **k: calls.append(0))
+    metricstore.start(record=False)
+    try:
+        deadline = time.time() + 5
+        while not calls and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        metricstore.stop()
+    assert calls and 1 not in calls
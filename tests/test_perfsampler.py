@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from mcp_win_admin import perfsampler, system
+from dashboard_api import metrics
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    perfsampler.stop()
+    perfsampler.reset()
+    yield
+    perfsampler.stop()
+    perfsampler.reset()
+
+
+def test_refresh_publishes_new_snapshot_object():
+    perfsampler.refresh()
+    # la primera lectura de CPU sólo fija la base: no se publica un 0 % falso
+    assert "cpu_percent" not in perfsampler.snapshot() and perfsampler.history()["points"] == []
+    perfsampler.refresh()
+    first = perfsampler.snapshot()
+    assert {"cpu_percent", "memory", "disks", "disk_percent", "net", "processes_total"} <= set(first)
+    with pytest.raises(TypeError):
+        first["cpu_percent"] = 1.0  # de sólo lectura
+    perfsampler.refresh(("memory",))
+    second = perfsampler.snapshot()
+    assert second is not first
+    assert second["updated"]["memory"] >= first["updated"]["memory"]
+    assert second["updated"]["disks"] == first["updated"]["disks"]
+
+
+def test_history_ring_buffer(monkeypatch):
+    monkeypatch.setattr(perfsampler, "_HISTORY", perfsampler.deque(maxlen=3))
+    for _ in range(5):
+        perfsampler.refresh(("cpu",))
+    h = perfsampler.history()
+    assert h["fields"][0] == "ts" and len(h["points"]) == 3
+    assert len(perfsampler.history(limit=2)["points"]) == 2
+    assert perfsampler.history(since=h["points"][-1][0])["points"] == []
+
+
+def test_snapshot_reads_sampler_when_ready(monkeypatch):
+    def boom(*a, **k):
+        raise AssertionError("psutil no debería consultarse")
+
+    perfsampler.start()
+    deadline = time.time() + 5
+    while not perfsampler.ready() and time.time() < deadline:
+        time.sleep(0.05)
+    assert perfsampler.ready()
+    monkeypatch.setattr(system.psutil, "cpu_percent", boom)
+    monkeypatch.setattr(system, "_overall_disk_percent", boom)
+    monkeypatch.setattr(system.psutil, "boot_time", boom)
+    monkeypatch.setattr(metrics.psutil, "disk_partitions", boom)
+    snap = system.get_performance_snapshot()
+    assert snap.mem_total > 0 and snap.processes_total > 0
+    d = metrics.snapshot()
+    assert d["memory"]["total"] == snap.mem_total and isinstance(d["disks"], list)
+
+
+def test_not_ready_without_thread():
+    perfsampler.refresh()
+    assert not perfsampler.ready()
+    assert perfsampler.stats()["running"] is False
@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from mcp_win_admin import prefetch
+
+
+@pytest.fixture(autouse=True)
+def _clean(monkeypatch):
+    prefetch.reset()
+    monkeypatch.setattr(prefetch.cfg, "REP_PREFETCH_SOURCES", "threatfox,urlhaus")
+    monkeypatch.setattr(prefetch.cfg, "REP_PREFETCH_BUDGET", 2)
+    yield
+    prefetch.reset()
+
+
+def _fake_cache(monkeypatch, warm_ips=()):
+    now = datetime.now(timezone.utc).isoformat()
+
+    def sources(ip, ttl_seconds=None):
+        if ip in warm_ips:
+            return [{"source": s, "verdict": "clean", "last_seen": now} for s in ("threatfox", "urlhaus")]
+        return []
+
+    monkeypatch.setattr(prefetch.db, "get_ip_reputation_sources", sources)
+
+
+def test_only_new_cold_ips_are_looked_up_within_budget(monkeypatch):
+    _fake_cache(monkeypatch, warm_ips={"8.8.4.4"})
+    looked = []
+    monkeypatch.setattr(prefetch.rep, "check_ip", lambda ip, **k: looked.append(ip) or {"ip": ip})
+
+    first = prefetch.run_once({"1.1.1.1", "8.8.8.8", "9.9.9.9", "8.8.4.4"})
+    assert first["prefetched"] == 2 and first["already_warm"] == 1 and first["deferred"] == 1
+    assert looked == ["1.1.1.1", "8.8.8.8"]
+
+    # Segundo ciclo: sin IPs nuevas, se atiende el pendiente
+    second = prefetch.run_once({"1.1.1.1", "8.8.8.8", "9.9.9.9", "8.8.4.4"})
+    assert second["new"] == 0 and second["prefetched"] == 1
+    assert looked[-1] == "9.9.9.9"
+
+
+def test_backlog_drops_ips_no_longer_connected(monkeypatch):
+    _fake_cache(monkeypatch)
+    monkeypatch.setattr(prefetch.cfg, "REP_PREFETCH_BUDGET", 0)
+    monkeypatch.setattr(prefetch.rep, "check_ip", lambda ip, **k: pytest.fail("no budget"))
+    prefetch.run_once({"1.1.1.1", "9.9.9.9"})
+    prefetch.run_once({"9.9.9.9"})
+    st = prefetch.stats()
+    assert st["backlog"] == 1 and st["dropped"] == 1
+
+
+def test_hit_rate_counts_enrichment_lookups(monkeypatch):
+    _fake_cache(monkeypatch)
+    monkeypatch.setattr(prefetch.rep, "check_ip", lambda ip, **k: {"ip": ip})
+    prefetch.run_once({"1.1.1.1"})
+    assert prefetch.note_lookup("1.1.1.1") is True
+    assert prefetch.note_lookup("5.5.5.5") is False
+    assert prefetch.stats()["hit_rate"] == 0.5
+
+
+def test_sample_skips_private_and_listening(monkeypatch):
+    class Addr:
+        def __init__(self, ip):
+            self.ip, self.port = ip, 443
+
+    class Conn:
+        def __init__(self, raddr):
+            self.raddr = raddr
+
+    conns = [Conn(Addr("1.1.1.1")), Conn(Addr("192.168.1.5")), Conn(Addr("127.0.0.1")), Conn(())]
+    monkeypatch.setattr(prefetch.psutil, "net_connections", lambda kind="inet": conns)
+    assert prefetch.sample_remote_ips() == {"1.1.1.1"}
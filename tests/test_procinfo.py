@@ -0,0 +1,92 @@
+import hashlib
+
+import pytest
+
+from mcp_win_admin import connections, procinfo
+
+
+class FakeProc:
+    reads = []
+
+    def __init__(self, pid, ct=100.0, name="app.exe"):
+        self.pid = pid
+        self._ct = ct
+        self._name = name
+
+    def create_time(self):
+        return self._ct
+
+    def name(self):
+        FakeProc.reads.append(("name", self.pid))
+        return self._name
+
+    def username(self):
+        raise PermissionError("denied")
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    procinfo.clear()
+    FakeProc.reads = []
+    yield
+    procinfo.clear()
+
+
+def test_fields_are_read_once_per_process(monkeypatch):
+    monkeypatch.setattr(procinfo.psutil, "Process", lambda pid: FakeProc(pid))
+    assert procinfo.name(10) == "app.exe"
+    assert procinfo.name(10) == "app.exe"
+    info = procinfo.describe(10, ("name", "username"))
+    assert info["username"] is None and info["create_time"] == 100.0
+    assert FakeProc.reads == [("name", 10)]
+    assert procinfo.stats()["hits"] == 2
+
+
+def test_reused_pid_is_not_served_stale_data(monkeypatch):
+    procs = {"current": FakeProc(10, ct=100.0, name="old.exe")}
+    monkeypatch.setattr(procinfo.psutil, "Process", lambda pid: procs["current"])
+    assert procinfo.name(10) == "old.exe"
+    procs["current"] = FakeProc(10, ct=200.0, name="new.exe")
+    assert procinfo.name(10) == "new.exe"
+    st = procinfo.stats()
+    assert st["pid_reused"] == 1 and st["entries"] == 1
+
+
+def test_exe_hash_is_computed_from_exe(tmp_path, monkeypatch):
+    exe = tmp_path / "tool.exe"
+    exe.write_bytes(b"MZ")
+
+    class WithExe(FakeProc):
+        def exe(self):
+            return str(exe)
+
+    monkeypatch.setattr(procinfo.psutil, "Process", lambda pid: WithExe(pid))
+    info = procinfo.describe(7, ("exe_sha256",))
+    assert info["exe_sha256"] == hashlib.sha256(b"MZ").hexdigest()
+    assert procinfo.describe(7, ("exe",))["exe"] == str(exe)
+
+
+def test_missing_process_returns_none(monkeypatch):
+    def gone(pid):
+        raise procinfo.psutil.NoSuchProcess(pid)
+
+    monkeypatch.setattr(procinfo.psutil, "Process", gone)
+    assert procinfo.describe(99) is None
+
+
+def test_connections_share_the_cache(monkeypatch):
+    class Addr:
+        def __init__(self, ip, port):
+            self.ip, self.port = ip, port
+
+    class Conn:
+        def __init__(self, fd, pid):
+            self.fd, self.family, self.type = fd, 2, 1
+            self.laddr, self.raddr = Addr("10.0.0.2", 5000 + fd), Addr("1.1.1.1", 443)
+            self.status, self.pid = "ESTABLISHED", pid
+
+    monkeypatch.setattr(connections.psutil, "net_connections", lambda kind="inet": [Conn(i, 42) for i in range(5)])
+    monkeypatch.setattr(procinfo.psutil, "Process", lambda pid: FakeProc(pid))
+    out = connections.list_connections(include_process=True)
+    assert {o["process_name"] for o in out} == {"app.exe"}
+    assert FakeProc.reads == [("name", 42)]
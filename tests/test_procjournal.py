@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import db, procjournal
+
+
+INFO = {
+    10: {"ppid": 1, "name": "explorer.exe", "exe": r"C:\Windows\explorer.exe", "cmdline": ["explorer.exe"], "username": "bob"},
+    20: {"ppid": 10, "name": "cmd.exe", "exe": r"C:\Windows\System32\cmd.exe", "cmdline": ["cmd.exe", "/c", "x"], "username": "bob"},
+    30: {"ppid": 20, "name": "evil.exe", "exe": r"C:\Users\bob\AppData\Local\Temp\evil.exe", "cmdline": ["evil.exe"], "username": "bob"},
+}
+
+
+@pytest.fixture(autouse=True)
+def _clean(tmp_path: Path, monkeypatch):
+    path = tmp_path / "state.sqlite3"
+    monkeypatch.setattr(db, "DEFAULT_DB_PATH", path)
+    db.init_db(path)
+    monkeypatch.setattr(procjournal.cfg, "PROC_JOURNAL_HASH", False)
+    monkeypatch.setattr(
+        procjournal.procinfo, "describe", lambda pid, fields: {"pid": pid, **INFO.get(pid, {})}
+    )
+    procjournal.reset()
+    yield
+    procjournal.reset()
+
+
+def _run(live, now):
+    procjournal.sample_once({(pid, ct): pid for pid, ct in live}, now=now)
+
+
+def test_short_lived_process_is_journaled(monkeypatch):
+    monkeypatch.setattr(procjournal, "sample_keys", lambda: {(10, 1.0): 10})
+    _run([(10, 1.0)], 100.0)
+    _run([(10, 1.0), (20, 101.0), (30, 101.5)], 102.0)
+    _run([(10, 1.0)], 103.0)
+
+    rows = procjournal.query(exe=r"c:\users\bob\appdata\local\temp\EVIL.exe")
+    assert [r["event"] for r in rows] == ["exit", "start"]
+    assert rows[1]["cmdline"] == "evil.exe" and rows[1]["ppid"] == 20
+    assert [r["pid"] for r in procjournal.query(ppid=10, event="start")] == [20]
+    assert procjournal.query(since=102.5, event="start") == []
+    assert procjournal.stats()["started"] == 2
+
+
+def test_tree_links_children_and_ignores_reused_parent_pid(monkeypatch):
+    monkeypatch.setattr(procjournal, "sample_keys", lambda: {(10, 1.0): 10})
+    _run([(10, 1.0)], 100.0)
+    _run([(10, 1.0), (20, 101.0), (30, 101.5)], 102.0)
+    # pid 20 se reutiliza después de que arrancara 30: no debe heredar a 30
+    _run([(10, 1.0), (20, 200.0), (30, 101.5)], 201.0)
+
+    out = procjournal.tree(30)
+    assert [a["pid"] for a in out["ancestors"]] == [20, 10]
+    assert out["ancestors"][0]["create_time"] == 101.0
+
+    whole = procjournal.tree()
+    root = next(r for r in whole["roots"] if r["pid"] == 10)
+    assert sorted(c["create_time"] for c in root["children"]) == [101.0, 200.0]
+
+
+def test_retention_purges_old_rows(monkeypatch):
+    monkeypatch.setattr(procjournal, "sample_keys", lambda: {})
+    _run([(10, 1.0)], 1000.0)
+    assert db.purge_proc_journal_older_than(3600) == 1
+
+
+def test_query_never_samples_without_thread(monkeypatch):
+    def boom():
+        raise AssertionError("la consulta no debe muestrear")
+
+    monkeypatch.setattr(procjournal, "sample_keys", boom)
+    assert not procjournal.is_running()
+    assert procjournal.query() == [] and procjournal.tree() == {"roots": [], "processes": 0}
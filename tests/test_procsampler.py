@@ -0,0 +1,75 @@
+import contextlib
+import os
+import types
+
+import psutil
+import pytest
+
+from mcp_win_admin import processes, procsampler
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    procsampler.reset()
+    yield
+    procsampler.reset()
+
+
+def test_table_orders_are_precomputed():
+    t = procsampler.ProcTable(0.0)
+    t.append(1, 1.0, 5.0, 300, 0, 0, 2, "a")
+    t.append(2, 1.0, 50.0, 100, -1, -1, 4, "b")
+    t.append(3, 1.0, -1.0, 200, 0, 0, -1, "c")
+    t.finish()
+    assert [t.pid[i] for i in t.order["memory"]] == [1, 3, 2]
+    assert [t.pid[i] for i in t.order["cpu"]] == [2, 1, 3]
+    row = t.row(2)
+    assert row["cpu_percent"] is None and row["num_threads"] is None and row["memory_rss"] == 200
+
+
+def test_list_processes_reads_sampler_after_two_ticks():
+    procsampler.tick()
+    assert not procsampler.ready()
+    procsampler.tick()
+    assert procsampler.ready()
+    rows = processes.list_processes(limit=5, sort_by="memory", fast=True)
+    assert 0 < len(rows) <= 5
+    rss = [r["memory_rss"] or 0 for r in rows]
+    assert rss == sorted(rss, reverse=True)
+    assert {"cpu_percent", "num_threads", "username"} <= set(rows[0])
+    assert procsampler.get(os.getpid())["pid"] == os.getpid()
+
+
+def test_stale_table_is_not_used(monkeypatch):
+    procsampler.tick()
+    procsampler.tick()
+    monkeypatch.setattr(procsampler._TABLE, "ts", 0.0)
+    assert not procsampler.ready()
+
+
+def test_access_denied_name_keeps_readable_fields():
+    class Proc:
+        pid = 4
+
+        def oneshot(self):
+            return contextlib.nullcontext()
+
+        def name(self):
+            raise psutil.AccessDenied(4)
+
+        def create_time(self):
+            return 1.0
+
+        def cpu_percent(self, interval=None):
+            return 12.5
+
+        def memory_info(self):
+            return types.SimpleNamespace(rss=4096)
+
+        def io_counters(self):
+            raise psutil.AccessDenied(4)
+
+        def num_threads(self):
+            return 3
+
+    assert procsampler._read(Proc()) == (1.0, 12.5, 4096, -1, -1, 3, None)
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from mcp_win_admin import breaker, quota
+
+
+@pytest.fixture()
+def tight(monkeypatch):
+    monkeypatch.setattr(quota.cfg, "QUOTA_ENABLED", True)
+    monkeypatch.setattr(quota.cfg, "QUOTA_LIMITS", "testsrc=3/3600")
+    monkeypatch.setattr(quota.cfg, "QUOTA_MAX_WAIT_SECONDS", 0.0)
+    breaker.reset()
+    yield
+    breaker.reset()
+
+
+def test_parse_limits_accepts_multiple_windows_and_skips_garbage():
+    assert quota.parse_limits("virustotal=4/60|500/86400,otx=x/1,=3/5") == {
+        "virustotal": ((4, 60), (500, 86400)),
+        "otx": (),
+    }
+
+
+def test_reserve_denies_after_cap_and_refund_restores(tight):
+    assert [quota.reserve("testsrc") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert quota.reserve("testsrc") > 0
+    quota.refund("testsrc")
+    assert quota.reserve("testsrc") == 0.0
+    usage = quota.report()["usage"]
+    # reserve() no cuenta denegaciones: sólo consume() al rendirse
+    assert usage[0]["granted"] == 4 and usage[0]["denied"] == 0 and usage[0]["refunded"] == 1
+
+
+def test_unlimited_source_skips_ledger(tight):
+    assert quota.reserve("threatfox") == 0.0
+    assert quota.report()["usage"] == []
+
+
+def test_consume_raises_when_wait_exceeds_max(tight):
+    for _ in range(3):
+        quota.consume("testsrc")
+    with pytest.raises(quota.QuotaExhausted):
+        quota.consume("testsrc")
+    assert quota.report()["usage"][0]["denied"] == 1
+
+
+def test_waited_consume_counts_one_denial_and_unsent_requests_are_refunded(tight, monkeypatch):
+    monkeypatch.setattr(quota.cfg, "QUOTA_MAX_WAIT_SECONDS", 1.0)
+    waits = iter([0.1, 0.1, 100.0])  # dos esperas cortas y luego demasiado larga
+    monkeypatch.setattr(quota, "reserve", lambda source, n=1: next(waits))
+    monkeypatch.setattr(quota.time, "sleep", lambda s: None)
+    with pytest.raises(quota.QuotaExhausted):
+        quota.consume("testsrc")
+    assert quota.report()["usage"][0]["denied"] == 1
+
+    quota.refund_unsent("testsrc", ValueError("respuesta inválida"))
+    quota.refund_unsent("testsrc", quota.httpx.ConnectError("dns"))
+    assert quota.report()["usage"][0]["refunded"] == 1
+
+
+def test_breaker_maps_exhaustion_to_uncacheable_status(tight):
+    for _ in range(3):
+        quota.consume("testsrc")
+
+    def lookup():
+        quota.consume("testsrc")
+        return {"source": "testsrc", "verdict": "clean"}
+
+    res = breaker.call("testsrc", lookup)
+    assert res["status"] == "quota_exhausted"
+    assert res["status"] in breaker.UNCACHEABLE_STATUSES
+    assert breaker.snapshot()["testsrc"]["failures"] == 0
+
+
+def test_concurrent_reservations_never_exceed_cap(tight, monkeypatch):
+    monkeypatch.setattr(quota.cfg, "QUOTA_LIMITS", "testsrc=5/3600")
+    granted = []
+
+    def worker():
+        for _ in range(4):
+            if quota.reserve("testsrc") == 0.0:
+                granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(granted) == 5
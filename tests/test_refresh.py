@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mcp_win_admin import refresh
+from mcp_win_admin import reputation as rep
+
+
+def iso_ago(seconds: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+
+
+@pytest.fixture(autouse=True)
+def _reset_stats():
+    refresh.wait_idle(2.0)
+    refresh.reset_stats()
+    yield
+    refresh.wait_idle(2.0)
+
+
+def test_classify_soft_and_hard_windows(monkeypatch):
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", True)
+    monkeypatch.setattr(refresh.cfg, "REP_HARD_TTL_FACTOR", 4.0)
+    assert refresh.classify(iso_ago(10), 100) == refresh.FRESH
+    assert refresh.classify(iso_ago(200), 100) == refresh.STALE
+    assert refresh.classify(iso_ago(500), 100) == refresh.EXPIRED
+    assert refresh.classify("not-a-date", 100) == refresh.EXPIRED
+    assert refresh.classify(iso_ago(10_000), None) == refresh.FRESH
+    # explicit hard TTL wins over the factor
+    assert refresh.classify(iso_ago(200), 100, hard_ttl_seconds=150) == refresh.EXPIRED
+
+
+def test_classify_swr_disabled(monkeypatch):
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", False)
+    assert refresh.classify(iso_ago(200), 100) == refresh.EXPIRED
+
+
+def test_enqueue_dedupes_and_runs():
+    gate = threading.Event()
+    calls = []
+
+    def job():
+        gate.wait(2.0)
+        calls.append(1)
+
+    assert refresh.enqueue(("t", "k"), job) is True
+    assert refresh.enqueue(("t", "k"), job) is False  # still pending
+    gate.set()
+    assert refresh.wait_idle(2.0)
+    st = refresh.stats()
+    assert st["refresh_enqueued"] == 1 and st["refresh_deduped"] == 1
+    assert st["refresh_completed"] == 1 and calls == [1]
+
+
+def test_check_ip_serves_stale_and_refreshes(monkeypatch):
+    rows = [{"source": "threatfox", "verdict": "malicious", "last_seen": iso_ago(200)}]
+    upserts = []
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", True)
+    monkeypatch.setattr(refresh.cfg, "REP_HARD_TTL_FACTOR", 4.0)
+    monkeypatch.setattr(rep.db, "get_ip_reputation", lambda ip, ttl_seconds=None: None)
+    monkeypatch.setattr(rep.db, "get_ip_reputation_sources", lambda ip, ttl_seconds=None: rows)
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation", lambda **k: None)
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation_source", lambda **k: upserts.append(k))
+    monkeypatch.setattr(rep, "_threatfox_lookup", lambda *a, **k: {"source": "threatfox", "verdict": "unknown"})
+
+    out = rep.check_ip("1.2.3.4", use_cloud=True, ttl_seconds=100, sources=("threatfox",))
+    assert out["verdict"] == "malicious"
+    assert out["sources"][0]["cached"] is True and out["sources"][0]["stale"] is True
+    assert refresh.wait_idle(2.0)
+    assert upserts and upserts[0]["source"] == "threatfox"
+    st = refresh.stats()
+    assert st["stale_served"] == 1 and st["blocking_fetches"] == 0
+
+
+def test_check_ip_blocks_past_hard_ttl(monkeypatch):
+    rows = [{"source": "threatfox", "verdict": "malicious", "last_seen": iso_ago(1000)}]
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", True)
+    monkeypatch.setattr(refresh.cfg, "REP_HARD_TTL_FACTOR", 4.0)
+    monkeypatch.setattr(rep.db, "get_ip_reputation", lambda ip, ttl_seconds=None: None)
+    monkeypatch.setattr(rep.db, "get_ip_reputation_sources", lambda ip, ttl_seconds=None: rows)
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation", lambda **k: None)
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation_source", lambda **k: None)
+    monkeypatch.setattr(rep, "_threatfox_lookup", lambda *a, **k: {"source": "threatfox", "verdict": "unknown"})
+
+    out = rep.check_ip("1.2.3.4", use_cloud=True, ttl_seconds=100, sources=("threatfox",))
+    assert out["sources"][0]["cached"] is False
+    st = refresh.stats()
+    assert st["blocking_fetches"] == 1 and st["stale_served"] == 0
+
+
+def test_check_domain_stale_without_cloud_is_not_served(monkeypatch):
+    rows = [{"source": "urlhaus", "verdict": "malicious", "last_seen": iso_ago(200)}]
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", True)
+    monkeypatch.setattr(rep.db, "get_domain_reputation", lambda domain, ttl_seconds=None: None)
+    monkeypatch.setattr(rep.db, "get_domain_reputation_sources", lambda domain, ttl_seconds=None: rows)
+    out = rep.check_domain("example.com", use_cloud=False, ttl_seconds=100, sources=("urlhaus",))
+    assert out["sources"] == []
+
+
+def test_check_hash_without_ttl_uses_default_soft_ttl(monkeypatch):
+    from mcp_win_admin import av
+
+    rows = [{"source": "teamcymru", "verdict": "clean", "last_seen": iso_ago(10_000)}]
+    calls = []
+    monkeypatch.setattr(refresh.cfg, "REP_SWR_ENABLED", True)
+    monkeypatch.setattr(refresh.cfg, "REP_HARD_TTL_FACTOR", 4.0)
+    monkeypatch.setattr(av.cfg, "DEFAULT_REP_TTL", 100)
+    monkeypatch.setattr(av.db, "get_hash_verdict", lambda **k: None)
+    monkeypatch.setattr(av.db, "get_hash_verdict_sources", lambda **k: rows)
+    monkeypatch.setattr(av, "_fetch_hash_source", lambda h, algo, s: calls.append(s) or {"source": s, "verdict": "clean"})
+
+    out = av.check_hash("ab" * 32, use_cloud=True, sources=("teamcymru",), ttl_seconds=None)
+    # pasado el TTL por defecto (y el duro) la fila cacheada se vuelve a consultar
+    assert calls == ["teamcymru"] and out["sources"][0]["verdict"] == "clean"
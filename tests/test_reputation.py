@@ -219,8 +219,18 @@ def test_check_domain_cloud_with_otx_no_key_and_vt_fallback(fake_db, monkeypatch
     from mcp_win_admin import reputation as rep
 
     # Force clients
+    class ClosingClient:
+        closed = False
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.closed = True
+
+    vt_client = ClosingClient()
     monkeypatch.setattr(rep, "_otx_client", lambda: None)
-    monkeypatch.setattr(rep, "_vt_client", lambda: object())
+    monkeypatch.setattr(rep, "_vt_client", lambda: vt_client)
     # VT lookup returns None to trigger fallback dict
     monkeypatch.setattr(rep, "_vt_domain_lookup", lambda domain, client=None: None)
     monkeypatch.setattr(rep, "_otx_domain_lookup", lambda domain, client=None: {"source": "otx", "verdict": "unknown", "status": "no_api_key"})
@@ -234,6 +244,8 @@ def test_check_domain_cloud_with_otx_no_key_and_vt_fallback(fake_db, monkeypatch
     assert any(s["source"] == "otx" for s in out["sources"]) 
     # Upserts should exist
     assert ("example.com", "virustotal") in fake_db["domain_src"]
+    # El cliente por consulta se cierra al terminar
+    assert vt_client.closed
 
 
 def test_throttle_called(no_throttle, monkeypatch):
@@ -318,8 +318,8 @@ def test_check_ip_cache_ttl_by_source_and_cloud_fetch(monkeypatch):
     assert any(s['source']=='threatfox' and s['cached'] for s in cached)
     assert any(s['source']=='urlhaus' and not s['cached'] for s in fetched)
     assert any(s['source']=='virustotal' for s in fetched)
-    # upserts called for fetched only
-    assert any(t=='agg' for t, _ in calls) and any(t=='src' for t, _ in calls)
+    # upserts called for fetched only, per-source table only (aggregate is a view)
+    assert any(t=='src' for t, _ in calls) and not any(t=='agg' for t, _ in calls)
 
 
 def test_check_ip_no_cloud_only_cache(monkeypatch):
@@ -358,7 +358,7 @@ def test_check_domain_cloud_and_upserts(monkeypatch):
 
     out = rep.check_domain('example.com', use_cloud=True, sources=('threatfox','urlhaus','virustotal'))
     assert {s['source'] for s in out['sources']} == {'threatfox','urlhaus','virustotal'}
-    assert any(t=='agg' for t, _ in calls) and any(t=='src' for t, _ in calls)
+    assert any(t=='src' for t, _ in calls) and not any(t=='agg' for t, _ in calls)
 
 
 def test_reputation_throttle_sleep(monkeypatch):
@@ -0,0 +1,76 @@
+import json
+import os
+import types
+
+import pytest
+
+from mcp_win_admin import behavioral, rules
+
+
+def _view(pid, name, **attrs):
+    fetched = []
+
+    def fetch(attr):
+        fetched.append(attr)
+        return attrs.get(attr)
+
+    return rules.ProcessView(pid, name, fetch), fetched
+
+
+def test_name_rules_do_not_fetch_expensive_attributes():
+    rs = rules.compile_rules([
+        {"id": "tools", "name": ["mimikatz.exe"]},
+        {"id": "lolbins", "name_regex": [r"^psexe(c|svc)"], "remote_port": [4444], "reason": "port {port}"},
+    ])
+    view, fetched = _view(1, "Mimikatz.EXE", connections=[])
+    assert [f["rule"] for f in rs.evaluate(view)] == ["tools"]
+    assert fetched == []
+
+    conn = types.SimpleNamespace(raddr=types.SimpleNamespace(ip="1.2.3.4", port=4444))
+    view, fetched = _view(2, "PsExeSvc.exe", connections=[conn])
+    out = rs.evaluate(view)
+    assert out[0]["reason"] == "port 4444" and fetched == ["connections"]
+
+
+def test_parent_child_and_path_prefix_rules():
+    rs = rules.compile_rules([
+        {"id": "office-shell", "parent_name": ["winword.exe"], "name": ["powershell.exe"], "severity": "high"},
+        {"id": "temp-exe", "exe_prefix": ["C:\\Users\\Public"], "reason": "Runs from public dir"},
+        {"id": "lsass-dump", "open_file_prefix": ["C:/Windows/Temp"], "reason": "Touches {path}"},
+    ])
+    parents = {10: "WINWORD.EXE"}
+    view, _ = _view(2, "powershell.exe", ppid=10, exe="C:\\Users\\Public\\x.exe",
+                    open_files=[types.SimpleNamespace(path="c:\\windows\\temp\\lsass.dmp")])
+    ids = sorted(f["rule"] for f in rs.evaluate(view, parent_name=parents.get))
+    assert ids == ["lsass-dump", "office-shell", "temp-exe"]
+
+    view, fetched = _view(3, "powershell.exe", ppid=11, exe="C:\\Windows\\x.exe", open_files=[])
+    assert rs.evaluate(view, parent_name=parents.get) == []
+    assert set(fetched) == {"ppid", "exe", "open_files"}
+    assert rs.attrs == ("exe", "open_files", "ppid")
+
+
+@pytest.mark.parametrize("bad", [
+    {"id": "x"},
+    {"id": "x", "name": 3},
+    {"id": "x", "name_regex": ["("]},
+    {"id": "x", "nmae": ["a"]},
+    {"name": ["a"]},
+])
+def test_invalid_rules_are_rejected(bad):
+    with pytest.raises(rules.RuleError):
+        rules.compile_rules([bad])
+
+
+def test_behavioral_loads_rules_file_and_reloads_on_change(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": [{"id": "extra", "name": ["evil.exe"]}]}))
+    monkeypatch.setattr(behavioral.cfg, "BEHAVIOR_RULES_PATH", str(path))
+    behavioral.reset()
+    assert [r["id"] for r in behavioral.rules_summary()["rules"]][-1] == "extra"
+
+    path.write_text("{not json")
+    os.utime(path, ns=(1, 1))
+    summary = behavioral.rules_summary()
+    assert summary["error"] and summary["count"] == 2  # integradas siguen activas
+    behavioral.reset()
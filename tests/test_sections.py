@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from dashboard_api.sections import SectionCache
+
+
+def test_concurrent_refresh_runs_fetcher_once():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"n": len(calls)}
+
+    async def main():
+        cache = SectionCache()
+        res = await asyncio.gather(*(cache.get("core", fetch, ttl=10) for _ in range(20)))
+        again = await cache.get("core", fetch, ttl=10)
+        return cache, res, again
+
+    cache, res, again = asyncio.run(main())
+    assert len(calls) == 1 and all(r == {"n": 1} for r in res) and again == {"n": 1}
+    st = cache.stats()
+    assert st["refreshes"] == 1 and st["coalesced"] == 19 and st["hits"] == 1
+
+
+def test_version_only_moves_on_content_change_and_wakes_waiters():
+    values = iter([{"a": 1}, {"a": 1}, {"a": 2}])
+
+    async def fetch():
+        return next(values)
+
+    async def main():
+        cache = SectionCache()
+        await cache.get("s", fetch, ttl=0)
+        tag1 = cache.etag(["s"])
+        await asyncio.sleep(0.01)
+        await cache.get("s", fetch, ttl=0)
+        tag2 = cache.etag(["s"])
+        waiter = asyncio.ensure_future(cache.wait_for_change(1.0))
+        await asyncio.sleep(0.01)
+        await cache.get("s", fetch, ttl=0)
+        return tag1, tag2, cache.etag(["s"]), await waiter, await cache.wait_for_change(0.01)
+
+    tag1, tag2, tag3, woke, timed_out = asyncio.run(main())
+    assert tag1 == tag2 != tag3
+    assert woke is True and timed_out is False
+
+
+def test_info_etag_304_and_long_poll(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from dashboard_api import main
+
+    state = {"status": "idle"}
+    monkeypatch.setattr(main, "_sections", SectionCache())
+    monkeypatch.setitem(main._SECTION_TTLS, "diagnostics", 0.05)
+    monkeypatch.setattr(main.actions, "get_diagnostics_status", lambda: dict(state))
+    with TestClient(main.app) as client:
+        r = client.get("/api/info", params={"sections": "diagnostics"})
+        tag = r.headers["etag"]
+        assert r.status_code == 200 and r.json()["sections"]["diagnostics"] == {"status": "idle"}
+        assert client.get("/api/info", params={"sections": "diagnostics"}, headers={"If-None-Match": tag}).status_code == 304
+
+        t0 = time.perf_counter()
+        r = client.get(
+            "/api/info", params={"sections": "diagnostics", "wait_for_change": 0.3}, headers={"If-None-Match": tag}
+        )
+        assert r.status_code == 304 and time.perf_counter() - t0 >= 0.3
+
+        state["status"] = "running"
+        r = client.get(
+            "/api/info", params={"sections": "diagnostics", "wait_for_change": 5}, headers={"If-None-Match": tag}
+        )
+        assert r.status_code == 200 and r.json()["sections"]["diagnostics"]["status"] == "running"
+        assert r.headers["etag"] != tag
+
+
+def test_etag_is_content_based_and_survives_restart():
+    async def fetch_a():
+        return {"a": 1}
+
+    async def fetch_b():
+        return {"a": 2}
+
+    async def tags(*fetchers):
+        # cada caché simula un proceso nuevo: las versiones empiezan en 1 en ambos
+        out = []
+        for f in fetchers:
+            cache = SectionCache()
+            await cache.get("s", f, ttl=10)
+            assert cache.version("s") == 1
+            out.append(cache.etag(["s"]))
+        return out
+
+    same1, same2, other = asyncio.run(tags(fetch_a, fetch_a, fetch_b))
+    assert same1 == same2 and same1 != other
+    assert SectionCache().etag(["s"], extra="core") != SectionCache().etag(["s"])
+
+
+def test_change_wakes_waiters_on_other_loops():
+    import threading
+
+    cache = SectionCache()
+    woke = []
+
+    async def fetch():
+        return {"a": 1}
+
+    async def wait():
+        return await cache.wait_for_change(2.0)
+
+    t = threading.Thread(target=lambda: woke.append(asyncio.run(wait())))
+    t.start()
+    deadline = time.monotonic() + 2
+    while not cache._changed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    asyncio.run(cache.get("s", fetch, ttl=0))
+    t.join(3)
+    assert woke == [True]
+    # la caché sigue sirviendo desde un loop nuevo
+    assert asyncio.run(cache.get("s", fetch, ttl=0)) == {"a": 1}
+
+
+def test_if_none_match_accepts_lists_and_star():
+    from dashboard_api.main import _etag_matches
+
+    tag = 'W/"abc"'
+    assert _etag_matches('W/"zzz", W/"abc"', tag)
+    assert _etag_matches('"abc"', tag)
+    assert _etag_matches("*", tag)
+    assert not _etag_matches('W/"zzz"', tag) and not _etag_matches(None, tag)
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from mcp_win_admin import reputation as rep
+from mcp_win_admin.singleflight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    sf = SingleFlight("test-threads")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(2.0)
+        return {"verdict": "malicious"}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(sf.do("k", slow)))
+    leader.start()
+    assert started.wait(2.0)
+    followers = [threading.Thread(target=lambda: results.append(sf.do("k", slow))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    while sf.stats()["coalesced"] < 4:
+        time.sleep(0.005)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(2.0)
+
+    assert calls == [1]
+    assert len(results) == 5 and all(r == {"verdict": "malicious"} for r in results)
+    st = sf.stats()
+    assert st["leaders"] == 1 and st["coalesced"] == 4 and st["in_flight"] == 0
+
+
+def test_error_is_propagated_and_key_released():
+    sf = SingleFlight("test-errors")
+
+    def boom():
+        raise RuntimeError("lookup failed")
+
+    with pytest.raises(RuntimeError):
+        sf.do("k", boom)
+    assert sf.do("k", lambda: 42) == 42
+    assert sf.stats()["errors"] == 1
+
+
+def test_check_ip_concurrent_callers_single_lookup(monkeypatch):
+    monkeypatch.setattr(rep.db, "get_ip_reputation", lambda ip, ttl_seconds=None: None)
+    monkeypatch.setattr(rep.db, "get_ip_reputation_sources", lambda ip, ttl_seconds=None: [])
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation", lambda **k: None)
+    monkeypatch.setattr(rep.db, "upsert_ip_reputation_source", lambda **k: None)
+    lookups = []
+
+    def fake_urlhaus(host, client=None):
+        lookups.append(host)
+        time.sleep(0.1)
+        return {"source": "urlhaus", "verdict": "malicious"}
+
+    monkeypatch.setattr(rep, "_urlhaus_host_lookup", fake_urlhaus)
+    out = []
+    threads = [
+        threading.Thread(target=lambda: out.append(rep.check_ip("10.0.0.1", ttl_seconds=60, sources=("urlhaus",))))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5.0)
+    assert len(out) == 5 and all(o["verdict"] == "malicious" for o in out)
+    assert len(lookups) < 5
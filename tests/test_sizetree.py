@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from mcp_win_admin import filesystem, sizetree
+
+
+@pytest.fixture(autouse=True)
+def _clean():
+    sizetree.clear()
+    yield
+    sizetree.clear()
+
+
+def _file(path: Path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+@pytest.fixture
+def tree_root(tmp_path: Path) -> Path:
+    _file(tmp_path / "top.bin", 50)
+    _file(tmp_path / "a" / "a1.bin", 1000)
+    _file(tmp_path / "a" / "sub" / "big.bin", 4000)
+    _file(tmp_path / "a" / "sub" / "deep" / "hidden.bin", 9000)  # profundidad 3: fuera con max_depth=2
+    _file(tmp_path / "b" / "b1.bin", 300)
+    (tmp_path / "c").mkdir()
+    return tmp_path
+
+
+def test_sizes_follow_max_depth_semantics(tree_root: Path):
+    t = sizetree.get_tree(str(tree_root), max_depth=2)
+    a = t.find(str(tree_root / "a"))
+    sub = t.find(str(tree_root / "a" / "sub"))
+    assert t.row(a)["size_bytes"] == 5000 and t.row(a)["file_count"] == 2 and t.row(a)["dir_count"] == 2
+    assert t.row(sub)["depth"] == 2 and t.find(str(tree_root / "a" / "sub" / "deep")) is None
+    assert t.row(0)["size_bytes"] == 5350
+    # hijos contiguos y ordenados por tamaño
+    assert [t.row(i)["path"] for i in t.top_children(0, 5)] == [str(tree_root / n) for n in ("a", "b", "c")]
+    assert [f["size_bytes"] for f in t.top_files(0, 3)] == [4000, 1000, 300]
+    assert [f["size_bytes"] for f in t.top_files(a, 5)] == [4000, 1000]
+
+
+def test_list_heavy_paths_reads_cached_tree(tree_root: Path, monkeypatch):
+    rows = filesystem.list_heavy_paths(str(tree_root), max_depth=2, top_n=2, min_size_mb=0)
+    assert [(os.path.basename(r["path"]), r["size_bytes"], r["depth"]) for r in rows] == [("a", 5000, 1), ("b", 300, 1)]
+
+    def boom(*a, **k):
+        raise AssertionError("no debería volver a recorrer")
+
+    monkeypatch.setattr(sizetree, "_iter_dir", boom)
+    assert filesystem.list_heavy_paths(str(tree_root), max_depth=2, top_n=2, min_size_mb=0) == rows
+    assert sizetree.stats()["builds"] == 1 and sizetree.stats()["hits"] == 1
+    with pytest.raises(ValueError):
+        filesystem.list_heavy_paths(str(tree_root / "top.bin"))
+
+
+def test_stale_tree_is_served_and_rebuilt_in_background(tree_root: Path, monkeypatch):
+    old = sizetree.get_tree(str(tree_root), max_depth=1)
+    _file(tree_root / "b" / "more.bin", 700)
+    monkeypatch.setattr(sizetree.cfg, "FS_TREE_TTL_SECONDS", 0.0)
+    assert sizetree.get_tree(str(tree_root), max_depth=1) is old
+    deadline = time.time() + 5
+    while sizetree.stats()["builds"] < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    new = sizetree.get_tree(str(tree_root), max_depth=1)
+    assert new is not old
+    assert new.row(new.find(str(tree_root / "b")))["size_bytes"] == 1000
+
+
+def test_parallel_build_matches_sequential(tree_root: Path):
+    _file(tree_root / "a" / "sub2" / "x" / "y.bin", 77)
+    seq = sizetree.SizeTree(str(tree_root), 3, False, 20).build(workers=1)
+    par = sizetree.SizeTree(str(tree_root), 3, False, 20).build(workers=4)
+    assert par.complete and len(par) == len(seq)
+    for path in ("a", "a/sub", "a/sub2/x", "a/sub/deep", "b", "c"):
+        p = str(tree_root / path)
+        assert par.row(par.find(p)) == seq.row(seq.find(p))
+    assert par.row(0) == seq.row(0)
+    assert par.top_files(0, 5) == seq.top_files(0, 5)
+    assert {t["path"] for t in par.slowest(20)} >= {str(tree_root / "a" / "sub"), str(tree_root / "b")}
+
+
+def test_deadline_returns_partial_tree_flagged_incomplete(tree_root: Path, monkeypatch):
+    real = sizetree._list_dir
+
+    def slow(path, follow, top_k):
+        if os.path.basename(path) == "sub":
+            time.sleep(0.5)
+        return real(path, follow, top_k)
+
+    monkeypatch.setattr(sizetree, "_list_dir", slow)
+    t0 = time.perf_counter()
+    tree = sizetree.SizeTree(str(tree_root), 2, False, 20).build(workers=4, deadline_seconds=0.2)
+    assert time.perf_counter() - t0 < 0.45
+    assert not tree.complete
+    a, b = tree.row(tree.find(str(tree_root / "a"))), tree.row(tree.find(str(tree_root / "b")))
+    assert a["incomplete"] and a["size_bytes"] == 1000
+    assert "incomplete" not in b and b["size_bytes"] == 300
+    assert tree.slowest(1) == [{"path": str(tree_root / "a" / "sub"), "elapsed_ms": None, "nodes": 0, "complete": False}]
+
+
+def test_incomplete_tree_waits_for_stragglers_before_rebuilding(tree_root: Path, monkeypatch):
+    real = sizetree._list_dir
+    gate = threading.Event()
+
+    def hung(path, follow, top_k):
+        if os.path.basename(path) == "sub":
+            gate.wait(5)  # scandir colgado en un recurso de red
+        return real(path, follow, top_k)
+
+    monkeypatch.setattr(sizetree, "_list_dir", hung)
+    monkeypatch.setattr(sizetree.cfg, "FS_SCAN_WORKERS", 4)
+    monkeypatch.setattr(sizetree.cfg, "FS_SCAN_DEADLINE_SECONDS", 0.1)
+    first = sizetree.get_tree(str(tree_root), max_depth=2)
+    assert not first.complete and sizetree.stats()["stragglers"] == 1
+    # incompleto pero reciente: no se reconstruye en cada petición
+    assert sizetree.get_tree(str(tree_root), max_depth=2) is first
+    assert sizetree.stats()["background_refreshes"] == 0
+
+    first.built_at -= 3600
+    assert sizetree.get_tree(str(tree_root), max_depth=2) is first
+    assert sizetree.get_tree(str(tree_root), max_depth=2, refresh=True) is first
+    assert sizetree.stats()["skipped_busy"] == 2 and sizetree.stats()["builds"] == 1
+
+    gate.set()
+    deadline = time.time() + 5
+    while sizetree.stats()["stragglers"] and time.time() < deadline:
+        time.sleep(0.02)
+    assert sizetree.get_tree(str(tree_root), max_depth=2, refresh=True) is not first
+
+
+def test_tree_timings_are_exposed_by_tool_and_dashboard(tree_root: Path):
+    from fastapi.testclient import TestClient
+
+    from dashboard_api import main
+    from mcp_win_admin import server
+
+    sizetree.get_tree(str(tree_root), max_depth=2)
+    tool = server.fs_tree_stats()
+    [info] = tool["trees"]
+    assert info["root"] == str(tree_root) and info["complete"] is True
+    assert {s["path"] for s in info["slowest"]} >= {str(tree_root / "a")}
+    body = TestClient(main.app).get("/api/fs/tree/stats").json()
+    assert body["trees"][0]["slowest"] == info["slowest"] and body["builds"] == 1
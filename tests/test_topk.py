@@ -0,0 +1,56 @@
+import os
+import random
+import time
+from pathlib import Path
+
+from mcp_win_admin import filesystem, sizetree
+from mcp_win_admin.topk import TopK, file_filter, top_k
+
+
+def test_topk_matches_full_sort_and_merges():
+    rnd = random.Random(3)
+    data = [(rnd.randrange(10_000), f"f{i}") for i in range(5000)]
+    expected = sorted(data, reverse=True)[:7]
+    assert top_k(data, 7) == expected
+
+    a, b = TopK(7), TopK(7)
+    a.extend(data[:2500])
+    b.extend(data[2500:])
+    assert a.merge(b).items() == expected and len(a) == 7
+    assert a.threshold() == expected[-1]
+    # con clave: los elementos no necesitan ser comparables
+    assert [d["n"] for d in top_k([{"n": 1}, {"n": 5}, {"n": 5}, {"n": 2}], 3, key=lambda d: d["n"])] == [5, 5, 2]
+
+
+def test_file_filter_by_extension_and_age():
+    now = 1_000_000_000.0
+    st_old = os.stat_result((0,) * 8 + (now - 40 * 86400, 0))
+    st_new = os.stat_result((0,) * 8 + (now - 86400, 0))
+    assert file_filter() is None
+    f = file_filter("iso, .VHDX", now=now)
+    assert f("C:/a/x.iso", st_new) and f("C:/a/y.VHDX", st_new)
+    assert not f("C:/a/x.txt", st_new)
+    old = file_filter(min_age_days=30, now=now)
+    assert old("x", st_old) and not old("x", st_new)
+    recent = file_filter(max_age_days=7, now=now)
+    assert recent("x", st_new) and not recent("x", st_old)
+
+
+def test_list_heavy_files_filters_stream_with_bounded_selector(tmp_path: Path):
+    sizetree.clear()
+    for name, size in (("a/big.iso", 5000), ("a/b/mid.iso", 3000), ("c/huge.log", 9000), ("small.iso", 10)):
+        p = tmp_path / name
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(b"x" * size)
+    old = time.time() - 60 * 86400
+    os.utime(tmp_path / "a" / "b" / "mid.iso", (old, old))
+
+    unfiltered = filesystem.list_heavy_files(str(tmp_path), top_n=2)
+    assert [f["size_bytes"] for f in unfiltered] == [9000, 5000]
+    isos = filesystem.list_heavy_files(str(tmp_path), top_n=5, extensions=".iso")
+    assert [os.path.basename(f["path"]) for f in isos] == ["big.iso", "mid.iso", "small.iso"]
+    stale = filesystem.list_heavy_files(str(tmp_path), top_n=5, extensions="iso", min_age_days=30)
+    assert [os.path.basename(f["path"]) for f in stale] == ["mid.iso"]
+    shallow = filesystem.list_heavy_files(str(tmp_path), top_n=5, max_depth=1, extensions="iso")
+    assert [os.path.basename(f["path"]) for f in shallow] == ["big.iso", "small.iso"]
+    sizetree.clear()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from dashboard_api.wshub import BroadcastHub
+
+
+def test_full_then_delta_and_shared_frames():
+    async def main():
+        hub = BroadcastHub(lambda: {}, interval=3600)
+        a, b = hub.subscribe(), hub.subscribe()
+        hub.publish({"cpu": 1, "mem": {"p": 10}, "disks": []})
+        fa, fb = await hub.next_text(a), await hub.next_text(b)
+        assert fa is fb  # mismo texto serializado para todos
+        assert json.loads(fa)["type"] == "full"
+
+        assert hub.publish({"cpu": 1, "mem": {"p": 10}, "disks": []}) is None  # sin cambios, sin frame
+        hub.publish({"cpu": 2, "mem": {"p": 10}})
+        delta = json.loads(await hub.next_text(a))
+        assert delta == {"type": "delta", "seq": 2, "data": {"cpu": 2}, "removed": ["disks"]}
+        hub._task.cancel()
+        return hub.stats()
+
+    stats = asyncio.run(main())
+    assert stats["subscribers"] == 2 and stats["frames"] == 2
+
+
+def test_slow_consumer_drops_intermediate_frames_and_resyncs_with_full():
+    async def main():
+        hub = BroadcastHub(lambda: {}, interval=3600)
+        slow = hub.subscribe()
+        hub.publish({"v": 1})
+        assert json.loads(await hub.next_text(slow))["seq"] == 1
+        for v in (2, 3, 4):
+            hub.publish({"v": v})
+        frame = json.loads(await hub.next_text(slow))
+        hub._task.cancel()
+        return frame, slow.dropped
+
+    frame, dropped = asyncio.run(main())
+    # se saltó 2 y 3: recibe el 4 completo, no un delta que no podría aplicar
+    assert frame == {"type": "full", "seq": 4, "data": {"v": 4}}
+    assert dropped == 2
+
+
+def test_producer_runs_once_per_tick_for_all_subscribers():
+    calls = []
+
+    def produce():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    async def main():
+        hub = BroadcastHub(produce, interval=0.05)
+        subs = [hub.subscribe() for _ in range(10)]
+        sent = []
+
+        async def send(text):
+            sent.append(text)
+
+        tasks = [asyncio.create_task(hub.serve(send, s)) for s in subs]
+        await asyncio.sleep(0.18)
+        for s in subs:
+            hub.unsubscribe(s)
+        for t in tasks:
+            t.cancel()
+        await asyncio.sleep(0.1)
+        return hub.stats(), sent
+
+    stats, sent = asyncio.run(main())
+    assert 2 <= len(calls) <= 5
+    assert stats["subscribers"] == 0 and not stats["running"]
+    assert stats["sends"] == len(sent) >= 10 and stats["send_ms_avg"] is not None
+
+
+def test_producer_uses_runner_and_counts_errors():
+    calls = []
+
+    async def run(fn):
+        calls.append(fn)
+        if len(calls) == 1:
+            raise RuntimeError("pool saturado")
+        return fn()
+
+    async def main():
+        hub = BroadcastHub(lambda: {"v": 1}, interval=0.02, run=run)
+        sub = hub.subscribe()
+        text = await asyncio.wait_for(hub.next_text(sub), 1.0)
+        hub.unsubscribe(sub)
+        await asyncio.sleep(0.05)
+        return hub.stats(), text
+
+    stats, text = asyncio.run(main())
+    assert len(calls) >= 2 and json.loads(text)["data"] == {"v": 1}
+    assert stats["produce_errors"] == 1 and stats["frames"] == 1